@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# benchmarks/__init__.py
+"""
+Powtarzalne benchmarki potoku drukowania zamówień.
+
+Moduły:
+- synthetic - generatory syntetycznych zamówień (1-1000 pozycji, różne długości tekstów)
+- stages - benchmarki poszczególnych etapów (HTML, PDF, przycinanie, ZPL, walidacja, wysyłka)
+- runner - pomiar czasu, test przepustowości całego potoku, wyniki JSON
+  i porównanie z zapisanym wynikiem bazowym
+
+Użycie:
+    python -m benchmarks --output wyniki.json
+    python -m benchmarks --save-baseline
+    python -m benchmarks --baseline benchmarks/baseline.json
+"""
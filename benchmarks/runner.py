@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# benchmarks/runner.py
+"""
+Uruchamia benchmarki etapów i test przepustowości całego potoku, zapisuje
+wyniki w JSON i porównuje je z zapisanym wynikiem bazowym.
+
+Porównywane są mediany czasów przypadków o tym samym źródle danych
+wejściowych; regresja to wzrost mediany o więcej niż ``tolerance`` (i więcej
+niż ``min_delta_ms``, aby pomijać szum przy bardzo krótkich etapach) lub
+spadek przepustowości potoku o więcej niż ``tolerance``.
+
+Użycie:
+    python -m benchmarks --output wyniki.json
+    python -m benchmarks --save-baseline
+    python -m benchmarks --bench generate_order_html --sizes 10,100 --text short
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+from lib.log_config import get_logger
+from benchmarks.synthetic import SIZES, TEXT_LENGTHS, make_order, make_pdf
+from benchmarks.stages import (Case, BenchmarkSkipped, get_benchmarks, get_sink, close_sink,
+                               render_pdf)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(samples):
+    """Zwraca statystyki próbek czasu (sekundy) w milisekundach"""
+    ms = [sample * 1000 for sample in samples]
+    return {
+        'repeat': len(ms),
+        'min_ms': round(min(ms), 3),
+        'median_ms': round(statistics.median(ms), 3),
+        'mean_ms': round(statistics.mean(ms), 3),
+        'p90_ms': round(_percentile(ms, 0.9), 3),
+    }
+
+
+def measure(function, repeat=5, warmup=1):
+    """
+    Mierzy czas wykonania funkcji.
+
+    Args:
+        function (callable): Funkcja bez argumentów
+        repeat (int): Liczba mierzonych wywołań
+        warmup (int): Liczba wywołań rozgrzewających (bez pomiaru)
+
+    Returns:
+        dict: Statystyki (min, mediana, średnia, p90) w ms
+    """
+    for _ in range(warmup):
+        function()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def case_key(name, case):
+    return f"{name}[{case.lines}/{case.text}]"
+
+
+def run_stages(benchmarks, sizes, texts, workdir, repeat=5, full=False, progress=None):
+    """
+    Uruchamia benchmarki etapów dla wszystkich przypadków.
+
+    Returns:
+        tuple: (wyniki przypadków, pominięte etapy {nazwa: przyczyna})
+    """
+    results = {}
+    skipped = {}
+    for bench in benchmarks:
+        for lines in sizes:
+            if bench.max_lines and lines > bench.max_lines and not full:
+                continue
+            for text in texts:
+                if bench.name in skipped:
+                    break
+                case = Case(lines, text)
+                try:
+                    function = bench.setup(case, workdir)
+                    stats = measure(function, repeat=repeat)
+                except BenchmarkSkipped as e:
+                    skipped[bench.name] = str(e)
+                    break
+                stats.update(bench=bench.name, lines=lines, text=text)
+                if getattr(function, 'fixture', None):
+                    stats['fixture'] = function.fixture
+                results[case_key(bench.name, case)] = stats
+                if progress:
+                    progress(case_key(bench.name, case), stats)
+    return results, skipped
+
+
+def _pick_renderer(html_content, path):
+    try:
+        if render_pdf(html_content, path):
+            return 'chromium'
+    except BenchmarkSkipped:
+        pass
+    return 'reportlab'
+
+
+def _pick_zpl_converter():
+    try:
+        from sql2html import convert_pdf_to_zpl_with_original_dimensions
+        return 'convert_pdf_to_zpl_with_original_dimensions', convert_pdf_to_zpl_with_original_dimensions
+    except Exception:
+        return 'HtmlToZplConverter', None
+
+
+def run_end_to_end(workdir, orders=20, lines=10, text='medium'):
+    """
+    Przepustowość całego potoku: HTML -> PDF -> przycięcie -> ZPL -> walidacja
+    -> wysyłka do lokalnego odbiornika TCP, zamówienie po zamówieniu.
+
+    Gdy Chromium nie jest dostępne, PDF powstaje z reportlab, a gdy nie da się
+    zaimportować sql2html, ZPL generuje HtmlToZplConverter; użyte komponenty
+    są zapisywane w wyniku i porównanie z bazą wymaga ich zgodności.
+
+    Returns:
+        dict: Liczba zamówień, czas całkowity, zamówienia/s i opóźnienia na zamówienie
+    """
+    from lib.html_generator import generate_order_html
+    from html2pdfs.pdf_trimmer import trim_pdf_to_content
+    from zpl.html_to_zpl import HtmlToZplConverter
+    from zpl.zpl_file import validate_zpl_file
+    from zpl.network_printer import print_zpl_to_network_printer
+
+    sink = get_sink()
+    jobs_before = sink.jobs
+    pdf_path = os.path.join(workdir, 'e2e.pdf')
+    trimmed_path = os.path.join(workdir, 'e2e_trimmed.pdf')
+    zpl_path = os.path.join(workdir, 'e2e.zpl')
+
+    renderer = _pick_renderer(generate_order_html(*make_order(lines, text)), pdf_path)
+    zpl_name, pdf_to_zpl = _pick_zpl_converter()
+
+    samples = []
+    started = time.perf_counter()
+    for seed in range(orders):
+        start = time.perf_counter()
+        html_content = generate_order_html(*make_order(lines, text, seed=seed))
+        if renderer == 'chromium':
+            render_pdf(html_content, pdf_path)
+        else:
+            make_pdf(pdf_path, lines, text, seed=seed)
+        trim_pdf_to_content(pdf_path, trimmed_path)
+        if pdf_to_zpl is not None:
+            zpl_code = pdf_to_zpl(trimmed_path, dpi=203)
+        else:
+            zpl_code = HtmlToZplConverter().html_to_zpl(html_content)
+        with open(zpl_path, 'w', encoding='utf-8') as f:
+            f.write(zpl_code)
+        if not validate_zpl_file(zpl_path)['success']:
+            raise RuntimeError(f"Nieprawidłowy ZPL zamówienia {seed}")
+        result = print_zpl_to_network_printer(zpl_path, config=sink)
+        if not result.get('success'):
+            raise RuntimeError(result.get('message'))
+        samples.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+
+    # Odbiornik zlicza zadanie po zamknięciu połączenia
+    deadline = time.monotonic() + 5
+    while sink.jobs - jobs_before < orders and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stats = summarize(samples)
+    stats.update(orders=orders, lines=lines, text=text, seconds=round(elapsed, 3),
+                 orders_per_second=round(orders / elapsed, 3),
+                 received_jobs=sink.jobs - jobs_before,
+                 components={'render': renderer, 'zpl': zpl_name})
+    return stats
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=10,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    """Opis środowiska zapisywany razem z wynikami"""
+    return {
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'revision': _git_revision(),
+    }
+
+
+def compare(results, baseline, tolerance=0.25, min_delta_ms=0.5):
+    """
+    Porównuje wyniki z wynikiem bazowym.
+
+    Args:
+        results (dict): Bieżące wyniki
+        baseline (dict): Wynik bazowy (ten sam format)
+        tolerance (float): Dopuszczalny względny wzrost czasu / spadek przepustowości
+        min_delta_ms (float): Minimalny bezwzględny wzrost mediany uznawany za regresję
+
+    Returns:
+        list: Porównania [{'key', 'baseline', 'current', 'ratio', 'regression'}]
+    """
+    comparisons = []
+    base_cases = baseline.get('benchmarks', {})
+    for key, current in results.get('benchmarks', {}).items():
+        base = base_cases.get(key)
+        if not base or base.get('fixture') != current.get('fixture'):
+            continue
+        ratio = current['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+        regression = (ratio > 1 + tolerance
+                      and current['median_ms'] - base['median_ms'] > min_delta_ms)
+        comparisons.append({'key': key, 'baseline': base['median_ms'],
+                            'current': current['median_ms'], 'ratio': round(ratio, 3),
+                            'regression': regression})
+
+    current_e2e = results.get('end_to_end')
+    base_e2e = baseline.get('end_to_end')
+    if (current_e2e and base_e2e and current_e2e['components'] == base_e2e['components']
+            and (current_e2e['lines'], current_e2e['text']) == (base_e2e['lines'], base_e2e['text'])):
+        ratio = base_e2e['orders_per_second'] / current_e2e['orders_per_second']
+        comparisons.append({'key': 'end_to_end[orders/s]', 'baseline': base_e2e['orders_per_second'],
+                            'current': current_e2e['orders_per_second'], 'ratio': round(ratio, 3),
+                            'regression': ratio > 1 + tolerance})
+    return comparisons
+
+
+def _parse_list(value, cast=str):
+    return [cast(item.strip()) for item in value.split(',') if item.strip()] if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarki potoku drukowania zamówień')
+    parser.add_argument('--bench', action='append', help='Nazwa etapu (domyślnie wszystkie)')
+    parser.add_argument('--list', action='store_true', help='Wypisz dostępne etapy')
+    parser.add_argument('--sizes', help=f"Liczby pozycji, np. 1,10,100 (domyślnie {','.join(map(str, SIZES))})")
+    parser.add_argument('--text', help=f"Długości tekstów: {','.join(TEXT_LENGTHS)} (domyślnie wszystkie)")
+    parser.add_argument('--repeat', type=int, default=5, help='Liczba pomiarów na przypadek')
+    parser.add_argument('--full', action='store_true',
+                        help='Uruchom także przypadki powyżej limitu etapów rastrowych')
+    parser.add_argument('--orders', type=int, default=20,
+                        help='Liczba zamówień w teście przepustowości (0 - pomiń)')
+    parser.add_argument('--output', help='Plik wyników JSON')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Plik wyniku bazowego')
+    parser.add_argument('--save-baseline', action='store_true', help='Zapisz wyniki jako bazowe')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Dopuszczalny względny wzrost czasu (domyślnie 0.25)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='Minimalny bezwzględny wzrost mediany uznawany za regresję')
+    parser.add_argument('--log-level', default='WARNING',
+                        help='Poziom logowania podczas pomiarów (domyślnie WARNING)')
+    args = parser.parse_args(argv)
+
+    benchmarks = get_benchmarks(args.bench)
+    if args.list:
+        for bench in benchmarks:
+            limit = f" (domyślnie do {bench.max_lines} pozycji)" if bench.max_lines else ''
+            print(f"{bench.name}{limit}")
+        return 0
+
+    sizes = _parse_list(args.sizes, int) or list(SIZES)
+    texts = _parse_list(args.text) or list(TEXT_LENGTHS)
+    unknown = set(texts) - set(TEXT_LENGTHS)
+    if unknown:
+        parser.error(f"Nieznane długości tekstów: {', '.join(sorted(unknown))}")
+
+    # Komunikaty INFO etapów (np. każda wysyłka) zaburzałyby pomiar
+    get_logger()
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    def progress(key, stats):
+        fixture = f"  ({stats['fixture']})" if 'fixture' in stats else ''
+        print(f"{key:<58} {stats['median_ms']:>10.2f} ms  p90 {stats['p90_ms']:>10.2f} ms{fixture}")
+
+    results = {'environment': environment()}
+    with tempfile.TemporaryDirectory(prefix='waproprint_bench_') as workdir:
+        try:
+            results['benchmarks'], results['skipped'] = run_stages(
+                benchmarks, sizes, texts, workdir, repeat=args.repeat, full=args.full,
+                progress=progress)
+            for name, reason in results['skipped'].items():
+                print(f"{name:<58} pominięto: {reason}")
+            if args.orders > 0:
+                e2e = run_end_to_end(workdir, orders=args.orders)
+                results['end_to_end'] = e2e
+                print(f"Potok ({e2e['components']['render']} + {e2e['components']['zpl']}): "
+                      f"{e2e['orders_per_second']:.2f} zamówień/s, "
+                      f"mediana {e2e['median_ms']:.1f} ms na zamówienie")
+        finally:
+            close_sink()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Zapisano wyniki: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Zapisano wynik bazowy: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Brak wyniku bazowego {args.baseline} - pomijam porównanie (--save-baseline)")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    comparisons = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    regressions = [c for c in comparisons if c['regression']]
+    print(f"\nPorównanie z {args.baseline} ({baseline.get('environment', {}).get('revision')}):")
+    for c in comparisons:
+        flag = '  REGRESJA' if c['regression'] else ''
+        print(f"{c['key']:<58} {c['baseline']:>10.2f} -> {c['current']:>10.2f}  x{c['ratio']:.2f}{flag}")
+    if regressions:
+        print(f"Wykryto regresje: {len(regressions)}")
+        return 1
+    print("Brak regresji")
+    return 0
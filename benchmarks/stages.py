@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# benchmarks/stages.py
+"""
+Benchmarki poszczególnych etapów potoku drukowania.
+
+Każdy benchmark przygotowuje dane wejściowe dla przypadku (liczba pozycji,
+długość tekstów) i zwraca funkcję bez argumentów mierzoną przez runner.
+Etapy wymagające niedostępnych zależności (np. Playwright/Chromium) zgłaszają
+BenchmarkSkipped z przyczyną zamiast przerywać cały przebieg.
+"""
+
+import os
+import asyncio
+import importlib
+import threading
+import socketserver
+from collections import namedtuple
+
+from benchmarks.synthetic import make_order, make_pdf
+
+Case = namedtuple('Case', 'lines text')
+
+
+class BenchmarkSkipped(Exception):
+    """Benchmark nie może zostać uruchomiony w tym środowisku"""
+
+
+class Benchmark:
+    """Opis benchmarku etapu"""
+
+    def __init__(self, name, setup, max_lines=None):
+        """
+        Args:
+            name (str): Nazwa etapu w wynikach
+            setup (callable): setup(case, workdir) -> funkcja mierzona
+            max_lines (int): Największa liczba pozycji uruchamiana domyślnie
+                (etapy rastrowe dla 1000 pozycji trwają minuty; --full je włącza)
+        """
+        self.name = name
+        self.setup = setup
+        self.max_lines = max_lines
+
+
+def _require(module, name):
+    """Importuje zależność etapu, zamieniając błąd importu na BenchmarkSkipped"""
+    try:
+        return getattr(importlib.import_module(module), name)
+    except Exception as e:
+        raise BenchmarkSkipped(f"{module}: {type(e).__name__}: {e}")
+
+
+def _html(case):
+    from lib.html_generator import generate_order_html
+    return generate_order_html(*make_order(case.lines, case.text))
+
+
+def _case_path(case, workdir, name):
+    return os.path.join(workdir, f"{case.lines}_{case.text}_{name}")
+
+
+def render_pdf(html_content, output_path):
+    """Renderuje HTML do PDF w Chromium (tryb lean); zwraca ścieżkę lub None"""
+    html_content_to_pdf = _require('html2pdf3', 'html_content_to_pdf')
+    return asyncio.run(html_content_to_pdf(html_content, output_path))
+
+
+def pdf_fixture(case, workdir):
+    """
+    Zwraca PDF zamówienia dla etapów przycinania i ZPL oraz jego źródło
+    ('chromium' lub 'reportlab', gdy Chromium nie jest dostępne).
+    """
+    path = _case_path(case, workdir, 'fixture.pdf')
+    source_path = path + '.source'
+    if os.path.exists(path) and os.path.exists(source_path):
+        with open(source_path, encoding='utf-8') as f:
+            return path, f.read()
+
+    source = 'reportlab'
+    try:
+        if render_pdf(_html(case), path):
+            source = 'chromium'
+    except BenchmarkSkipped:
+        pass
+    if source == 'reportlab':
+        make_pdf(path, case.lines, case.text)
+    with open(source_path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    return path, source
+
+
+def zpl_fixture(case, workdir):
+    """Zwraca plik ZPL zamówienia wygenerowany przez HtmlToZplConverter"""
+    path = _case_path(case, workdir, 'fixture.zpl')
+    if not os.path.exists(path):
+        converter_class = _require('zpl.html_to_zpl', 'HtmlToZplConverter')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(converter_class().html_to_zpl(_html(case)))
+    return path
+
+
+class ZplSink:
+    """
+    Lokalny serwer TCP przyjmujący dane jak drukarka na porcie 9100
+    (odczytuje do zamknięcia połączenia i zlicza bajty).
+    """
+
+    class _Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            received = 0
+            while True:
+                chunk = self.request.recv(65536)
+                if not chunk:
+                    break
+                received += len(chunk)
+            with self.server.lock:
+                self.server.received += received
+                self.server.jobs += 1
+
+    def __init__(self, host='127.0.0.1', port=0):
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, port), self._Handler)
+        self._server.daemon_threads = True
+        self._server.lock = threading.Lock()
+        self._server.received = 0
+        self._server.jobs = 0
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='zpl-sink', daemon=True)
+        self._thread.start()
+
+    @property
+    def jobs(self):
+        return self._server.jobs
+
+    @property
+    def received(self):
+        return self._server.received
+
+    # Interfejs ConfigManager używany przez print_zpl_to_network_printer
+    def get_thermal_printer_ip(self):
+        return self.host
+
+    def get_thermal_printer_port(self):
+        return self.port
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5)
+
+
+_sink = None
+
+
+def get_sink():
+    """Zwraca wspólny serwer ZplSink dla przebiegu benchmarków"""
+    global _sink
+    if _sink is None:
+        _sink = ZplSink()
+    return _sink
+
+
+def close_sink():
+    global _sink
+    if _sink is not None:
+        _sink.close()
+        _sink = None
+
+
+# Funkcje setup mogą ustawić atrybut ``fixture`` zwracanej funkcji - źródło
+# danych wejściowych zapisywane w wynikach (porównanie tylko przy zgodnym źródle)
+
+def _setup_generate_order_html(case, workdir):
+    from lib.html_generator import generate_order_html
+    order_data, items = make_order(case.lines, case.text)
+    return lambda: generate_order_html(order_data, items)
+
+
+def _setup_html_to_pdf(case, workdir):
+    html_to_pdf = _require('html2pdf3', 'html_to_pdf')
+    html_path = _case_path(case, workdir, 'order.html')
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write(_html(case))
+    output_path = _case_path(case, workdir, 'html_to_pdf.pdf')
+
+    def run():
+        if not asyncio.run(html_to_pdf(html_path, output_path)):
+            raise BenchmarkSkipped("html_to_pdf nie wygenerował pliku (brak przeglądarki Chromium?)")
+    return run
+
+
+def _setup_html_content_to_pdf(case, workdir):
+    _require('html2pdf3', 'html_content_to_pdf')
+    html_content = _html(case)
+    output_path = _case_path(case, workdir, 'lean.pdf')
+
+    def run():
+        if not render_pdf(html_content, output_path):
+            raise BenchmarkSkipped("html_content_to_pdf nie wygenerował pliku (brak przeglądarki Chromium?)")
+    return run
+
+
+def _setup_trim_pdf_to_content(case, workdir):
+    trim_pdf_to_content = _require('html2pdfs.pdf_trimmer', 'trim_pdf_to_content')
+    pdf_path, source = pdf_fixture(case, workdir)
+    output_path = _case_path(case, workdir, 'trimmed.pdf')
+
+    def run():
+        trim_pdf_to_content(pdf_path, output_path)
+    run.fixture = source
+    return run
+
+
+def _setup_pdf_to_zpl(case, workdir):
+    convert = _require('sql2html', 'convert_pdf_to_zpl_with_original_dimensions')
+    pdf_path, source = pdf_fixture(case, workdir)
+
+    def run():
+        convert(pdf_path, dpi=203)
+    run.fixture = source
+    return run
+
+
+def _setup_html_to_zpl(case, workdir):
+    converter_class = _require('zpl.html_to_zpl', 'HtmlToZplConverter')
+    html_content = _html(case)
+    return lambda: converter_class().html_to_zpl(html_content)
+
+
+def _setup_validate_zpl_file(case, workdir):
+    validate_zpl_file = _require('zpl.zpl_file', 'validate_zpl_file')
+    zpl_path = zpl_fixture(case, workdir)
+    return lambda: validate_zpl_file(zpl_path)
+
+
+def _setup_network_send(case, workdir):
+    print_zpl = _require('zpl.network_printer', 'print_zpl_to_network_printer')
+    zpl_path = zpl_fixture(case, workdir)
+    sink = get_sink()
+
+    def run():
+        result = print_zpl(zpl_path, config=sink)
+        if not result.get('success'):
+            raise RuntimeError(result.get('message'))
+    return run
+
+
+BENCHMARKS = [
+    Benchmark('generate_order_html', _setup_generate_order_html),
+    Benchmark('html_to_pdf', _setup_html_to_pdf, max_lines=100),
+    Benchmark('html_content_to_pdf', _setup_html_content_to_pdf, max_lines=100),
+    Benchmark('trim_pdf_to_content', _setup_trim_pdf_to_content),
+    Benchmark('convert_pdf_to_zpl_with_original_dimensions', _setup_pdf_to_zpl, max_lines=100),
+    Benchmark('HtmlToZplConverter.html_to_zpl', _setup_html_to_zpl),
+    Benchmark('validate_zpl_file', _setup_validate_zpl_file),
+    Benchmark('network_send', _setup_network_send),
+]
+
+
+def get_benchmarks(names=None):
+    """Zwraca benchmarki o podanych nazwach (None - wszystkie) w stałej kolejności"""
+    if not names:
+        return list(BENCHMARKS)
+    unknown = set(names) - {bench.name for bench in BENCHMARKS}
+    if unknown:
+        raise ValueError(f"Nieznane benchmarki: {', '.join(sorted(unknown))}")
+    return [bench for bench in BENCHMARKS if bench.name in names]
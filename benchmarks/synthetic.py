@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# benchmarks/synthetic.py
+"""
+Syntetyczne zamówienia o strukturze zwracanej przez lib.order_processor2
+(nagłówek z danymi kontrahenta i lista pozycji), generowane deterministycznie
+z ziarna, aby kolejne przebiegi benchmarków mierzyły te same dane.
+"""
+
+import random
+from decimal import Decimal
+
+# Liczby pozycji zamówienia używane domyślnie w benchmarkach
+SIZES = (1, 10, 100, 1000)
+
+# Długość nazw pozycji i uwag (znaki) dla poszczególnych wariantów
+TEXT_LENGTHS = {
+    'short': 16,
+    'medium': 64,
+    'long': 256,
+}
+
+_WORDS = ('płyta', 'gipsowo-kartonowa', 'wkręt', 'ocynkowany', 'klej', 'żywiczny',
+          'taśma', 'zbrojąca', 'profil', 'ścienny', 'kołek', 'rozporowy', 'farba',
+          'lateksowa', 'biała', 'grunt', 'głęboko', 'penetrujący', 'łącznik', 'kątowy')
+
+_UNITS = ('szt.', 'kg', 'm', 'opak.', 'm2')
+
+
+def _text(rng, length):
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length].strip().capitalize()
+
+
+def make_order(lines=10, text='medium', seed=0, number=None):
+    """
+    Tworzy syntetyczne zamówienie.
+
+    Args:
+        lines (int): Liczba pozycji
+        text (str): Wariant długości tekstów ('short', 'medium', 'long')
+        seed (int): Ziarno generatora
+        number (str): Numer zamówienia (domyślnie wyliczany z ziarna)
+
+    Returns:
+        tuple: (order_data, items) w postaci przyjmowanej przez generate_order_html
+    """
+    length = TEXT_LENGTHS[text]
+    rng = random.Random(f'{seed}:{lines}:{text}')
+    number = number or f'ZO {seed + 1}/25'
+
+    order_data = {
+        'NUMER': number,
+        'UWAGI': _text(rng, length),
+        'KOD_KRESKOWY': f'{rng.randrange(10 ** 12):012d}',
+        'NR_ZAMOWIENIA_KLIENTA': f'K/{rng.randrange(10000)}/25',
+        'KONTRAHENT_NAZWA': 'Hurtownia Budowlana',
+        'kontrahent': {
+            'NAZWA': 'Hurtownia Budowlana',
+            'NAZWA_PELNA': 'Przedsiębiorstwo Handlowe Hurtownia Budowlana Sp. z o.o.',
+            'KOD_POCZTOWY': '80-001',
+            'MIEJSCOWOSC': 'Gdańsk',
+            'ULICA_LOKAL': 'Długa 12/4',
+            'NIP': '5840000000',
+            'KOD_KONTRAHENTA': f'K{rng.randrange(100000):05d}',
+            'PESEL': '',
+            'KOD_KRESKOWY': f'{rng.randrange(10 ** 12):012d}',
+        },
+    }
+
+    items = []
+    for position in range(1, lines + 1):
+        price = Decimal(rng.randrange(100, 100000)) / 100
+        items.append({
+            'ID_ARTYKULU': position,
+            'ZAMOWIONO': str(Decimal(rng.randrange(1, 50))),
+            'NAZWA': _text(rng, min(length, 40)),
+            'NAZWA_CALA': _text(rng, length),
+            'INDEKS_KATALOGOWY': f'IDX-{position:05d}',
+            'JEDNOSTKA': rng.choice(_UNITS),
+            'CENA_NETTO': str(price),
+            'CENA_BRUTTO': str((price * Decimal('1.23')).quantize(Decimal('0.01'))),
+            'NARZUT': '0',
+            'DO_REZ_USER': '',
+        })
+    return order_data, items
+
+
+def make_pdf(path, lines=10, text='medium', seed=0, width_mm=104):
+    """
+    Zapisuje syntetyczny PDF zamówienia (jedna ciągła strona o szerokości
+    etykiety) przy użyciu reportlab. Służy jako dane wejściowe dla etapów
+    przycinania i konwersji do ZPL, gdy Chromium nie jest dostępne.
+
+    Args:
+        path (str): Ścieżka pliku PDF
+        lines (int): Liczba pozycji
+        text (str): Wariant długości tekstów
+        seed (int): Ziarno generatora
+        width_mm (float): Szerokość strony w mm
+
+    Returns:
+        str: Ścieżka zapisanego pliku
+    """
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    order_data, items = make_order(lines, text, seed)
+    line_height = 4 * mm
+    chars_per_line = int(width_mm / 1.9)
+    rows = [order_data['NUMER'], order_data['kontrahent']['NAZWA_PELNA'], order_data['UWAGI']]
+    for item in items:
+        name = f"{item['ID_ARTYKULU']}. {item['NAZWA_CALA']}"
+        rows.extend(name[i:i + chars_per_line] for i in range(0, len(name), chars_per_line))
+        rows.append(f"{item['ZAMOWIONO']} {item['JEDNOSTKA']} x {item['CENA_BRUTTO']} zł")
+
+    # Strona dłuższa niż zawartość, aby przycinanie miało co usunąć
+    height = (len(rows) + 20) * line_height
+    pdf = canvas.Canvas(path, pagesize=(width_mm * mm, height))
+    pdf.setFont('Helvetica', 8)
+    y = height - 5 * mm
+    for row in rows:
+        pdf.drawString(3 * mm, y, row)
+        y -= line_height
+    pdf.showPage()
+    pdf.save()
+    return path
@@ -2,9 +2,10 @@
 # -*- coding: utf-8 -*-
 # html2pdf3.py
 
-from lib.ConfigManager import ConfigManager
+from lib.config_snapshot import get_config
+from lib.tracing import span
 import asyncio
-from playwright.async_api import async_playwright
+import contextlib
 import socket
 import tempfile
 import os
@@ -12,8 +13,10 @@ import re
 import os
 import sys
 import logging
-from html2text import HTML2Text
-from playwright.async_api import async_playwright
+from html2pdfs.html_processor import inline_local_assets, build_font_face_css
+
+# playwright (przeglądarka) i html2text są importowane dopiero przy renderowaniu,
+# więc import modułu nie uruchamia ich ładowania ani nie czyta config.ini
 
 # Windows-specific imports
 try:
@@ -25,9 +28,6 @@ except ImportError:
     if sys.platform == 'win32':
         logging.warning(
             "pywin32 is not installed. Windows printing functionality will be disabled.")
-    else:
-        logging.info(
-            "Non-Windows platform detected. Windows printing functionality is not available.")
 
 
 async def print_to_zebra_printer(url, printer_name=None, connection_type="windows",
@@ -48,8 +48,11 @@ async def print_to_zebra_printer(url, printer_name=None, connection_type="window
     """
     try:
         # 1. Pobierz zawartość strony HTML za pomocą Playwright
+        from playwright.async_api import async_playwright
+
         async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
+            with span('chromium.launch'):
+                browser = await p.chromium.launch(headless=True)
             page = await browser.new_page()
 
             # Ustaw wymiary strony na wymiary etykiety
@@ -132,6 +135,8 @@ def html_to_zpl(html_content, width_mm=104, height_mm=150, dpi=203):
     - Kod ZPL gotowy do wysłania do drukarki
     """
     # Konwertuj HTML na prosty tekst
+    from html2text import HTML2Text
+
     h = HTML2Text()
     h.ignore_links = True
     h.ignore_images = True
@@ -234,21 +239,186 @@ def print_network_raw(zpl_code, network_args):
         return False
 
 
-config = ConfigManager()
-zpl_dir = config.get_zo_zpl_dir()
-# Pobierz parametry drukarki z konfiguracji
-printer_name = config.get_thermal_printer_name()
-dpi = config.get_printer_dpi()
-label_margin = config.get_printer_label_margin()
-label_width = config.get_printer_label_width()
-label_height = config.get_printer_label_height()
-font_size = config.get_printer_font_size()
-encoding = config.get_printer_encoding()
+# Flaga ustawiana przez stronę, gdy dokument jest gotowy do wydruku (tryb set_content)
+READY_FLAG = "__waproprintReady"
+
+# Skrypt dołączany na końcu dokumentu: sygnalizuje gotowość po załadowaniu czcionek
+READY_SCRIPT = f"""
+<script>
+  (document.fonts ? document.fonts.ready : Promise.resolve()).then(function () {{
+    window.{READY_FLAG} = true;
+  }});
+</script>
+"""
+
+
+class ResidentBrowser:
+    """
+    Przeglądarka Chromium uruchamiana raz i współdzielona przez kolejne renderowania
+    (tryb rezydentny sql2html). Każde renderowanie dostaje nową kartę; przeglądarka
+    jest uruchamiana ponownie po rozłączeniu lub po max_pages kartach, aby ograniczyć
+    narastające zużycie pamięci. Renderowania są wykonywane kolejno.
+    """
+
+    def __init__(self, max_pages=500):
+        self.max_pages = max_pages
+        self.launches = 0
+        self.pages = 0
+        self._pages_since_launch = 0
+        self._playwright = None
+        self._browser = None
+
+    @property
+    def connected(self):
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self):
+        """Uruchamia Chromium (wywoływane też automatycznie przy pierwszej karcie)"""
+        from playwright.async_api import async_playwright
+
+        await self.close()
+        with span('chromium.launch'):
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+        self.launches += 1
+        self._pages_since_launch = 0
+        return self
+
+    async def new_page(self):
+        """Otwiera nową kartę w działającej przeglądarce (uruchamia ją w razie potrzeby)"""
+        if not self.connected or (self.max_pages and self._pages_since_launch >= self.max_pages):
+            await self.start()
+        self._pages_since_launch += 1
+        self.pages += 1
+        return await self._browser.new_page()
+
+    async def close(self):
+        """Zamyka przeglądarkę i proces Playwright"""
+        browser, self._browser = self._browser, None
+        playwright, self._playwright = self._playwright, None
+        try:
+            if browser is not None:
+                await browser.close()
+        except Exception as e:
+            logging.warning(f"Błąd podczas zamykania przeglądarki: {e}")
+        finally:
+            if playwright is not None:
+                await playwright.stop()
+
+    def stats(self):
+        return {'connected': self.connected, 'launches': self.launches, 'pages': self.pages}
+
+
+@contextlib.asynccontextmanager
+async def browser_page(browser=None):
+    """
+    Zwraca kartę przeglądarki: w podanej przeglądarce (Browser z Playwright lub
+    ResidentBrowser) albo w nowo uruchomionym Chromium zamykanym po renderowaniu.
+
+    Parametry:
+    - browser: Opcjonalna uruchomiona przeglądarka
+    """
+    if browser is not None:
+        page = await browser.new_page()
+        try:
+            yield page
+        finally:
+            await page.close()
+        return
+
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        with span('chromium.launch'):
+            launched = await p.chromium.launch(headless=True)
+        try:
+            yield await launched.new_page()
+        finally:
+            await launched.close()
+
+
+def build_thermal_css(label_width_mm, css_styles=None):
+    """
+    Buduje domyślne style CSS dla drukarki termicznej.
+
+    Parametry:
+    - label_width_mm: Szerokość etykiety/wydruku w milimetrach
+    - css_styles: Dodatkowe style CSS dołączane na końcu
+
+    Zwraca:
+    - Style CSS jako tekst
+    """
+    default_css = f"""
+        @page {{
+            size: {label_width_mm}mm auto !important;
+            margin: 0mm !important;
+            padding: 0mm !important;
+        }}
+        html, body {{
+            width: {label_width_mm}mm !important;
+            margin: 0 !important;
+            padding: 0 !important;
+            background-color: white;
+            color: black;
+            line-height: 1.2;
+        }}
+        * {{
+            page-break-inside: avoid !important;
+            page-break-before: avoid !important;
+            page-break-after: avoid !important;
+            box-sizing: border-box !important;
+        }}
+        table {{
+            width: 100%;
+            border-collapse: collapse;
+        }}
+        td, th {{
+            padding: 2px;
+        }}
+        img {{
+            max-width: 100%;
+        }}
+    """
+
+    if css_styles:
+        default_css += css_styles
+    return default_css
+
+
+def build_continuous_print_css(label_width_mm):
+    """
+    Buduje style @media print wymuszające ciągły wydruk bez paginacji.
+
+    Parametry:
+    - label_width_mm: Szerokość etykiety/wydruku w milimetrach
+
+    Zwraca:
+    - Style CSS jako tekst
+    """
+    return f"""
+        @media print {{
+            body, html {{
+                width: 100%;
+                margin: 0 !important;
+                padding: 0 !important;
+                page-break-after: avoid !important;
+                page-break-before: avoid !important;
+            }}
+            * {{
+                page-break-inside: avoid !important;
+            }}
+            @page {{
+                size: {label_width_mm}mm auto;
+                margin: 0mm !important;
+                padding: 0mm !important;
+            }}
+        }}
+    """
 
 
 async def html_to_pdf(url, output_path=None, label_width_mm=104, continuous=True,
                       margins=None, timeout=30000, css_styles=None,
-                      wait_for_selectors=None, print_background=True, dpi=203):
+                      wait_for_selectors=None, print_background=True, dpi=203, browser=None):
     """
     Konwertuje stronę HTML do formatu PDF dostosowanego do drukarki termicznej.
 
@@ -263,6 +433,7 @@ async def html_to_pdf(url, output_path=None, label_width_mm=104, continuous=True
     - wait_for_selectors: Lista selektorów CSS, na które trzeba poczekać przed generowaniem PDF
     - print_background: Czy uwzględniać tła podczas drukowania (bool)
     - dpi: Rozdzielczość drukarki w DPI (typowo 203 DPI dla drukarek termicznych)
+    - browser: Opcjonalna uruchomiona przeglądarka (np. ResidentBrowser); None - nowa instancja Chromium
 
     Zwraca:
     - Ścieżkę do wygenerowanego pliku PDF lub None w przypadku błędu
@@ -277,80 +448,26 @@ async def html_to_pdf(url, output_path=None, label_width_mm=104, continuous=True
         if margins is None:
             margins = {"top": 0, "right": 0, "bottom": 0, "left": 0}
 
-        # Ustaw domyślne style CSS dla drukarki termicznej
-        default_css = f"""
-            @page {{
-                size: {label_width_mm}mm auto !important;
-                margin: 0mm !important;
-                padding: 0mm !important;
-            }}
-            html, body {{
-                width: {label_width_mm}mm !important;
-                margin: 0 !important;
-                padding: 0 !important;
-                background-color: white;
-                color: black;
-                line-height: 1.2;
-            }}
-            * {{
-                page-break-inside: avoid !important;
-                page-break-before: avoid !important;
-                page-break-after: avoid !important;
-                box-sizing: border-box !important;
-            }}
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-            }}
-            td, th {{
-                padding: 2px;
-            }}
-            img {{
-                max-width: 100%;
-            }}
-        """
-
-        css_to_inject = default_css
-        if css_styles:
-            css_to_inject += css_styles
-
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
+        css_to_inject = build_thermal_css(label_width_mm, css_styles)
 
+        async with browser_page(browser) as page:
             # Jeśli URL jest ścieżką lokalną, dostosuj
             if os.path.exists(url):
                 url = f"file://{os.path.abspath(url)}"
 
             # Przejdź do strony
-            await page.goto(url, wait_until="networkidle", timeout=timeout)
+            with span('chromium.networkidle'):
+                await page.goto(url, wait_until="networkidle", timeout=timeout)
 
             # Dodaj style CSS
             await page.add_style_tag(content=css_to_inject)
 
             # Dodaj dodatkowe style CSS, aby wymusić ciągły wydruk bez paginacji
-            await page.add_style_tag(content=f"""
-                @media print {{
-                    body, html {{
-                        width: 100%;
-                        margin: 0 !important;
-                        padding: 0 !important;
-                        page-break-after: avoid !important;
-                        page-break-before: avoid !important;
-                    }}
-                    * {{
-                        page-break-inside: avoid !important;
-                    }}
-                    @page {{
-                        size: {label_width_mm}mm auto;
-                        margin: 0mm !important;
-                        padding: 0mm !important;
-                    }}
-                }}
-            """)
+            await page.add_style_tag(content=build_continuous_print_css(label_width_mm))
 
             # Poczekaj, aż strona będzie w pełni załadowana
-            await page.wait_for_load_state("networkidle")
+            with span('chromium.networkidle'):
+                await page.wait_for_load_state("networkidle")
 
             # Jeśli są określone selektory, poczekaj na nie
             if wait_for_selectors:
@@ -401,13 +518,12 @@ async def html_to_pdf(url, output_path=None, label_width_mm=104, continuous=True
                            if v is not None}
 
             # Generuj PDF
-            await page.pdf(**pdf_options)
+            with span('chromium.pdf'):
+                await page.pdf(**pdf_options)
 
             # Opcjonalnie: Po utworzeniu PDF możemy sprawdzić, czy plik zawiera paginację
             # i wykonać dodatkowe kroki, jeśli to konieczne
 
-            await browser.close()
-
             # Sprawdź czy plik został utworzony
             if os.path.exists(output_path):
                 # Tutaj można dodać dodatkowe sprawdzenie PDF z użyciem np. PyPDF2 lub podobnej biblioteki
@@ -434,6 +550,137 @@ async def html_to_pdf(url, output_path=None, label_width_mm=104, continuous=True
         return None
 
 
+async def html_content_to_pdf(html_content, output_path=None, label_width_mm=104, continuous=True,
+                              timeout=30000, css_styles=None, print_background=True, dpi=203,
+                              assets_dir=None, font_files=None, browser=None):
+    """
+    Konwertuje zawartość HTML do PDF w trybie "lean", bez zapisu HTML na dysk.
+
+    W odróżnieniu od html_to_pdf dokument nie jest ładowany przez URL file://
+    i nie czeka na "networkidle". Style druku i czcionki są osadzane w <head>
+    przed renderowaniem (bez ponownego układu strony po załadowaniu), lokalne
+    skrypty są osadzane z katalogu assets_dir, wszystkie żądania sieciowe są
+    blokowane, a renderer czeka wyłącznie na flagę gotowości ustawianą przez stronę.
+
+    Parametry:
+    - html_content: Zawartość HTML do konwersji
+    - output_path: Ścieżka wyjściowa dla pliku PDF (domyślnie: 'output.pdf')
+    - label_width_mm: Szerokość etykiety/wydruku w milimetrach (domyślnie: 104 mm)
+    - continuous: Tryb drukowania ciągłego bez podziału na strony (bool)
+    - timeout: Timeout w milisekundach dla oczekiwania na gotowość strony
+    - css_styles: Dodatkowe style CSS dla strony
+    - print_background: Czy uwzględniać tła podczas drukowania (bool)
+    - dpi: Rozdzielczość drukarki w DPI (typowo 203 DPI dla drukarek termicznych)
+    - assets_dir: Katalog z lokalnymi zasobami (np. JsBarcode.all.min.js)
+    - font_files: Słownik {nazwa_rodziny: ścieżka} czcionek do osadzenia
+    - browser: Opcjonalna uruchomiona przeglądarka (np. ResidentBrowser); None - nowa instancja Chromium
+
+    Zwraca:
+    - Ścieżkę do wygenerowanego pliku PDF lub None w przypadku błędu
+    """
+    try:
+        if output_path is None:
+            output_path = "output.pdf"
+
+        document = prepare_lean_html(
+            html_content, label_width_mm, css_styles, assets_dir, font_files)
+
+        async with browser_page(browser) as page:
+            # Zablokuj wszystkie żądania wychodzące - dokument jest samowystarczalny
+            blocked_requests = []
+
+            async def block_request(route):
+                blocked_requests.append(route.request.url)
+                await route.abort()
+
+            await page.route("**/*", block_request)
+
+            with span('chromium.ready'):
+                await page.set_content(document, wait_until="load", timeout=timeout)
+                await page.wait_for_function(
+                    f"window.{READY_FLAG} === true", timeout=timeout)
+
+            if blocked_requests:
+                logging.warning(
+                    f"Zablokowano {len(blocked_requests)} żądań sieciowych podczas renderowania: "
+                    f"{', '.join(blocked_requests[:5])}")
+
+            content_height = await page.evaluate("""
+                Math.max(
+                    document.body.scrollHeight,
+                    document.documentElement.scrollHeight,
+                    document.body.offsetHeight,
+                    document.documentElement.offsetHeight
+                )
+            """)
+
+            width_px = int(label_width_mm * dpi / 25.4)
+            await page.set_viewport_size({"width": width_px, "height": content_height})
+
+            pdf_options = {
+                "path": output_path,
+                "width": f"{label_width_mm}mm",
+                "height": f"{content_height}px" if continuous else None,
+                "print_background": print_background,
+                "margin": {"top": "0mm", "right": "0mm", "bottom": "0mm", "left": "0mm"},
+                "display_header_footer": False,
+                "prefer_css_page_size": True,
+                "scale": 1.0,
+                "page_ranges": ""
+            }
+            pdf_options = {k: v for k, v in pdf_options.items()
+                           if v is not None}
+
+            await page.pdf(**pdf_options)
+
+        if os.path.exists(output_path):
+            return output_path
+        return None
+
+    except Exception as e:
+        print(f"Wystąpił błąd podczas konwersji HTML do PDF (tryb lean): {e}")
+        return None
+
+
+def prepare_lean_html(html_content, label_width_mm=104, css_styles=None,
+                      assets_dir=None, font_files=None):
+    """
+    Przygotowuje samowystarczalny dokument HTML dla trybu renderowania "lean".
+
+    Parametry:
+    - html_content: Zawartość HTML
+    - label_width_mm: Szerokość etykiety w milimetrach
+    - css_styles: Dodatkowe style CSS
+    - assets_dir: Katalog z lokalnymi zasobami do osadzenia
+    - font_files: Słownik {nazwa_rodziny: ścieżka} czcionek do osadzenia
+    - browser: Opcjonalna uruchomiona przeglądarka (np. ResidentBrowser); None - nowa instancja Chromium
+
+    Zwraca:
+    - Dokument HTML z osadzonymi stylami, zasobami i skryptem gotowości
+    """
+    if assets_dir:
+        html_content = inline_local_assets(html_content, assets_dir)
+
+    inline_css = (build_font_face_css(font_files) + "\n"
+                  + build_thermal_css(label_width_mm, css_styles)
+                  + build_continuous_print_css(label_width_mm))
+    style_tag = f"<style>{inline_css}</style>"
+
+    # Style dołączamy na końcu <head>, aby nadpisywały style dokumentu
+    # tak samo jak style wstrzykiwane po załadowaniu w html_to_pdf
+    if '</head>' in html_content:
+        html_content = html_content.replace('</head>', style_tag + '</head>', 1)
+    else:
+        html_content = style_tag + html_content
+
+    if '</body>' in html_content:
+        html_content = html_content.replace('</body>', READY_SCRIPT + '</body>', 1)
+    else:
+        html_content += READY_SCRIPT
+
+    return html_content
+
+
 # Przykład użycia:
 
 
@@ -484,7 +731,7 @@ async def main3():
 async def main2():
     success = await print_to_zebra_printer(
         "zamowienie.html",
-        printer_name=printer_name,  # Nazwa twojej drukarki Zebra
+        printer_name=get_config().get_thermal_printer_name(),  # Nazwa twojej drukarki Zebra
         connection_type="file",  # Użycie API Windows
         label_width_mm=104  # Szerokość etykiety
         # label_height_mm=150  # Wysokość etykiety
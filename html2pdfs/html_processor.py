@@ -6,7 +6,9 @@
 Moduł do przetwarzania HTML przed konwersją na PDF
 """
 
+import os
 import re
+import base64
 import tempfile
 import logging
 
@@ -266,3 +268,115 @@ def calculate_optimal_height(html_file, item_count=None):
         logger.warning(f"Błąd podczas obliczania optymalnej wysokości: {e}")
         # Domyślna wysokość jeśli nie można obliczyć
         return 800  # Bezpieczna wartość dla większości dokumentów
+
+
+# Pamięć podręczna zawartości lokalnych zasobów (skrypty, arkusze CSS, czcionki),
+# aby przy każdym renderowaniu nie czytać ich ponownie z dysku
+_asset_cache = {}
+
+# Typy MIME czcionek osadzanych jako data URI
+FONT_MIME_TYPES = {
+    '.ttf': 'font/ttf',
+    '.otf': 'font/otf',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+}
+
+
+def _read_asset(path, binary=False):
+    """
+    Odczytuje plik zasobu z pamięci podręcznej lub z dysku.
+
+    Args:
+        path (str): Ścieżka do pliku zasobu
+        binary (bool): Czy odczytać plik w trybie binarnym
+
+    Returns:
+        str | bytes | None: Zawartość pliku lub None, jeśli plik nie istnieje
+    """
+    key = (os.path.abspath(path), binary)
+    if key in _asset_cache:
+        return _asset_cache[key]
+
+    if not os.path.isfile(path):
+        logger.warning(f"Nie znaleziono zasobu do osadzenia: {path}")
+        _asset_cache[key] = None
+        return None
+
+    if binary:
+        with open(path, 'rb') as f:
+            content = f.read()
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+    _asset_cache[key] = content
+    return content
+
+
+def build_font_face_css(font_files):
+    """
+    Buduje reguły @font-face z czcionkami osadzonymi jako data URI.
+
+    Args:
+        font_files (dict): Słownik {nazwa_rodziny: ścieżka_do_pliku_czcionki}
+
+    Returns:
+        str: Reguły CSS @font-face (pusty string, jeśli brak czcionek)
+    """
+    rules = []
+    for family, path in (font_files or {}).items():
+        content = _read_asset(path, binary=True)
+        if content is None:
+            continue
+        extension = os.path.splitext(path)[1].lower()
+        mime_type = FONT_MIME_TYPES.get(extension, 'application/octet-stream')
+        encoded = base64.b64encode(content).decode('ascii')
+        rules.append(
+            f"@font-face {{ font-family: '{family}'; "
+            f"src: url(data:{mime_type};base64,{encoded}); }}")
+    return "\n".join(rules)
+
+
+def inline_local_assets(html_content, assets_dir):
+    """
+    Osadza w dokumencie HTML lokalne skrypty i arkusze stylów.
+    Zastępuje <script src="..."> oraz <link rel="stylesheet" href="...">
+    odwołujące się do plików względnych ich zawartością, dzięki czemu dokument
+    może być renderowany bez adresu bazowego i bez żadnych żądań sieciowych.
+
+    Args:
+        html_content (str): Zawartość HTML
+        assets_dir (str): Katalog, względem którego rozwiązywane są ścieżki zasobów
+
+    Returns:
+        str: Zawartość HTML z osadzonymi zasobami
+    """
+    def is_local(reference):
+        return not re.match(r'^(?:[a-z][a-z0-9+.-]*:|//)', reference, re.IGNORECASE)
+
+    def replace_script(match):
+        src = match.group(1)
+        if not is_local(src):
+            return match.group(0)
+        content = _read_asset(os.path.join(assets_dir, src))
+        if content is None:
+            return match.group(0)
+        # Zabezpieczenie przed przedwczesnym zamknięciem tagu script
+        content = content.replace('</script', '<\\/script')
+        return f"<script>{content}</script>"
+
+    def replace_stylesheet(match):
+        href = match.group(1)
+        if not is_local(href):
+            return match.group(0)
+        content = _read_asset(os.path.join(assets_dir, href))
+        if content is None:
+            return match.group(0)
+        return f"<style>{content}</style>"
+
+    html_content = re.sub(
+        r'<script\s+src="([^"]+)"\s*>\s*</script>', replace_script, html_content)
+    html_content = re.sub(
+        r'<link\s+rel="stylesheet"\s+href="([^"]+)"\s*/?>', replace_stylesheet, html_content)
+    return html_content
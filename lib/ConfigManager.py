@@ -7,11 +7,27 @@ Monitoruje co 5 sekund nowe dokumenty i generuje wydruki PDF.
 """
 
 import configparser
+import copy
 import os
+import re
 from lib.log_config import get_logger
 
 logger = get_logger().getLogger(__name__)
 
+# Sekcje [SOURCE:nazwa] opisują kolejne bazy WAPRO / magazyny obsługiwane przez jeden proces
+SOURCE_PREFIX = 'SOURCE:'
+SOURCE_NAME_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+# Katalogi rozdzielane między źródła (domyślnie podkatalog o nazwie źródła),
+# aby numery zamówień z różnych baz nie kolidowały
+SOURCE_DIRECTORIES = {
+    ('FILES', 'zo_html_dir'): 'ZO_HTML',
+    ('FILES', 'zo_json_dir'): 'ZO_JSON',
+    ('FILES', 'zo_zpl_dir'): 'ZO_ZPL',
+    ('FILES', 'zo_pdf_dir'): 'ZO_PDF',
+    ('ARCHIVE', 'directory'): 'ZO_ARCHIVE',
+}
+
 
 class ConfigManager:
     """Klasa zarządzająca konfiguracją aplikacji"""
@@ -81,9 +97,107 @@ class ConfigManager:
                 logger.warning(
                     f"Brak wymaganej sekcji w pliku konfiguracyjnym: {section}")
 
+    def get_source_names(self):
+        """
+        Zwraca nazwy źródeł zamówień z sekcji [SOURCE:nazwa] w kolejności z pliku.
+
+        Returns:
+            list: Nazwy źródeł; pusta lista - jedna baza z sekcji [DATABASE]
+        """
+        names = []
+        for section in self.config.sections():
+            if not section.upper().startswith(SOURCE_PREFIX):
+                continue
+            name = section[len(SOURCE_PREFIX):].strip()
+            if not SOURCE_NAME_RE.match(name):
+                logger.error(f"Nieprawidłowa nazwa źródła w sekcji [{section}] - dozwolone litery, "
+                             f"cyfry, '_' i '-'")
+                continue
+            names.append(name)
+        return names
+
+    def _source_section(self, name):
+        for section in self.config.sections():
+            if section.upper().startswith(SOURCE_PREFIX) and section[len(SOURCE_PREFIX):].strip() == name:
+                return section
+        raise KeyError(f"Brak sekcji [{SOURCE_PREFIX}{name}] w konfiguracji")
+
+    def get_source_settings(self, name):
+        """
+        Pobiera ustawienia źródła zamówień (klucze bez prefiksu sekcji).
+
+        Args:
+            name (str): Nazwa źródła
+
+        Returns:
+            dict: Ustawienia (enabled, weight); weight - liczba zamówień źródła
+                w jednej kolejce przeplatania
+        """
+        defaults = {
+            'enabled': True,
+            'weight': 1
+        }
+        try:
+            section = self.config[self._source_section(name)]
+            return {
+                'enabled': section.getboolean('enabled', fallback=defaults['enabled']),
+                'weight': max(section.getint('weight', fallback=defaults['weight']), 1)
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień źródła {name}: {str(e)}")
+            return defaults
+
+    def for_source(self, name):
+        """
+        Tworzy konfigurację źródła: kopię wszystkich sekcji z nadpisaniami z sekcji
+        [SOURCE:nazwa]. Klucz ``sekcja.opcja`` nadpisuje opcję w danej sekcji,
+        np. ``database.database = FIRMA2`` lub ``thermal_printer.ip_address``.
+        Katalogi zamówień i archiwum, jeśli źródło ich nie nadpisuje, są
+        podkatalogami o nazwie źródła.
+
+        Args:
+            name (str): Nazwa źródła
+
+        Returns:
+            ConfigManager: Konfiguracja źródła (bez odczytu pliku)
+        """
+        source_section = self._source_section(name)
+        overlay = configparser.ConfigParser()
+        for section in self.config.sections():
+            if not section.upper().startswith(SOURCE_PREFIX):
+                overlay[section] = dict(self.config.items(section, raw=True))
+
+        overrides = {}
+        for key, value in self.config.items(source_section, raw=True):
+            if '.' in key:
+                section, option = key.split('.', 1)
+                overrides[(section.strip().upper(), option.strip())] = value
+
+        for (section, option), default in SOURCE_DIRECTORIES.items():
+            if (section, option) not in overrides:
+                base = overlay.get(section, option, raw=True, fallback=default)
+                overrides[(section, option)] = os.path.join(base, name)
+
+        for (section, option), value in overrides.items():
+            if not overlay.has_section(section):
+                overlay.add_section(section)
+            overlay.set(section, option, value)
+
+        manager = copy.copy(self)
+        manager.config = overlay
+        return manager
+
     def get_connection_string(self):
         """Zwraca ciąg połączenia do bazy danych"""
         try:
+            # Lokalny emulator bazy WAPRO (lib/wapro_emulator.py) zamiast SQL Server
+            emulator = self.config['DATABASE'].get('emulator', fallback='').strip()
+            if emulator:
+                from lib.wapro_emulator import EMULATOR_PREFIX
+                logger.info(f"Używam emulatora bazy WAPRO: {emulator}")
+                return EMULATOR_PREFIX + emulator
+
             server = self.config['DATABASE']['server']
             database = self.config['DATABASE']['database']
             username = self.config['DATABASE']['username']
@@ -103,7 +217,10 @@ class ConfigManager:
             # Dodajemy dodatkowe parametry specyficzne dla FreeTDS
             connection_string += f";TDS_Version=7.4;Port=1433;timeout={timeout};encrypt={encrypt};"
 
-            logger.info(f"Wygenerowany string połączenia: {connection_string}")
+            masked_connection_string = re.sub(
+                r'PWD=[^;]*', 'PWD=***', connection_string)
+            logger.info(
+                f"Wygenerowany string połączenia: {masked_connection_string}")
             return connection_string
 
         except KeyError as e:
@@ -160,6 +277,15 @@ class ConfigManager:
                 "Nieprawidłowa wartość interwału sprawdzania. Używam domyślnej wartości 5 sekund.")
             return 5
 
+    def get_column_projection_enabled(self):
+        """Czy zapytania o zamówienia mają pobierać tylko kolumny używane przez szablon"""
+        try:
+            return self.config.getboolean('DATABASE', 'column_projection', fallback=True)
+        except ValueError:
+            logger.warning(
+                "Nieprawidłowa wartość column_projection. Używam domyślnej wartości true.")
+            return True
+
     def get_allowed_users(self):
         """Zwraca listę dozwolonych użytkowników"""
         try:
@@ -191,6 +317,24 @@ class ConfigManager:
                 f"Błąd podczas pobierania ścieżki katalogu ZPL: {str(e)}")
             return None
 
+    def get_files_dir(self, option, fallback):
+        """
+        Pobiera ścieżkę katalogu z sekcji [FILES].
+
+        Args:
+            option (str): Nazwa opcji, np. 'zo_pdf_dir'
+            fallback (str): Wartość domyślna
+
+        Returns:
+            str: Ścieżka do katalogu
+        """
+        try:
+            return self.config.get('FILES', option, fallback=fallback)
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ścieżki katalogu {option}: {str(e)}")
+            return fallback
+
     def get_printer_dpi(self):
         """
         Pobiera rozdzielczość drukarki w DPI z konfiguracji.
@@ -327,6 +471,504 @@ class ConfigManager:
             logger.error(f"Błąd podczas pobierania kodowania: {str(e)}")
             return 'utf8'
 
+    def get_render_mode(self):
+        """
+        Pobiera tryb renderowania HTML do PDF z konfiguracji.
+
+        Returns:
+            str: 'lean' (set_content z osadzonymi zasobami) lub 'file' (URL file://)
+        """
+        try:
+            mode = self.config.get('PRINTING', 'render_mode', fallback='lean')
+            return mode.strip().lower()
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania trybu renderowania: {str(e)}")
+            return 'lean'
+
+    def get_assets_dir(self):
+        """
+        Pobiera katalog z lokalnymi zasobami dokumentów (skrypty, style).
+        Domyślnie jest to katalog plików HTML, z którego zasoby były
+        dotychczas ładowane przez URL file://.
+
+        Returns:
+            str: Ścieżka do katalogu zasobów
+        """
+        try:
+            html_dir = self.config.get('FILES', 'zo_html_dir', fallback='ZO_HTML')
+            return self.config.get('FILES', 'assets_dir', fallback=html_dir)
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania katalogu zasobów: {str(e)}")
+            return 'ZO_HTML'
+
+    def get_font_files(self):
+        """
+        Pobiera czcionki osadzane w dokumentach w trybie renderowania 'lean'.
+        Format wpisu: fonts = Rodzina=sciezka.ttf, Inna=sciezka2.woff2
+
+        Returns:
+            dict: Słownik {nazwa_rodziny: ścieżka_do_pliku}
+        """
+        try:
+            fonts = self.config.get('PRINTING', 'fonts', fallback='')
+            font_files = {}
+            for entry in fonts.split(','):
+                if '=' in entry:
+                    family, path = entry.split('=', 1)
+                    font_files[family.strip()] = path.strip()
+            return font_files
+        except Exception as e:
+            logger.error(f"Błąd podczas pobierania czcionek: {str(e)}")
+            return {}
+
+    def get_zpl_encoder_workers(self):
+        """
+        Pobiera liczbę procesów puli kodującej ZPL.
+        Wartość 'auto' oznacza liczbę rdzeni procesora, 0 wyłącza pulę.
+
+        Returns:
+            int: Liczba procesów roboczych
+        """
+        try:
+            workers = self.config.get(
+                'PRINTING', 'zpl_encoder_workers', fallback='0').strip().lower()
+            if workers == 'auto':
+                return os.cpu_count() or 1
+            return int(workers)
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania liczby koderów ZPL: {str(e)}")
+            return 0
+
+    def get_discovery_settings(self):
+        """
+        Pobiera ustawienia wykrywania drukarek sieciowych z sekcji [DISCOVERY].
+
+        Returns:
+            dict: Ustawienia (enabled, cidr, port, ttl, timeout, concurrency, inventory_file)
+        """
+        defaults = {
+            'enabled': False,
+            'cidr': '',
+            'port': 9100,
+            'ttl': 3600,
+            'timeout': 1.0,
+            'concurrency': 128,
+            'inventory_file': 'thermal_printers.json'
+        }
+        try:
+            if 'DISCOVERY' not in self.config:
+                return defaults
+            section = self.config['DISCOVERY']
+            return {
+                'enabled': section.getboolean('enabled', fallback=defaults['enabled']),
+                'cidr': section.get('cidr', fallback=defaults['cidr']).strip(),
+                'port': section.getint('port', fallback=defaults['port']),
+                'ttl': max(section.getint('ttl', fallback=defaults['ttl']), 1),
+                'timeout': section.getfloat('timeout', fallback=defaults['timeout']),
+                'concurrency': section.getint('concurrency', fallback=defaults['concurrency']),
+                'inventory_file': section.get('inventory_file', fallback=defaults['inventory_file'])
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień wykrywania drukarek: {str(e)}")
+            return defaults
+
+    def get_printer_cache_settings(self):
+        """
+        Pobiera ustawienia pamięci podręcznej drukarek z sekcji [PRINTER_CACHE].
+
+        Returns:
+            dict: Ustawienia (enumeration_ttl, status_ttl, refresh_interval, job_check_timeout)
+        """
+        defaults = {
+            'enumeration_ttl': 300.0,
+            'status_ttl': 10.0,
+            'refresh_interval': 0.0,
+            'job_check_timeout': 1.5
+        }
+        try:
+            if 'PRINTER_CACHE' not in self.config:
+                return defaults
+            section = self.config['PRINTER_CACHE']
+            return {key: section.getfloat(key, fallback=value)
+                    for key, value in defaults.items()}
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień pamięci podręcznej drukarek: {str(e)}")
+            return defaults
+
+    def get_history_settings(self):
+        """
+        Pobiera ustawienia retencji historii wydruków z sekcji [PRINT_HISTORY].
+
+        Returns:
+            dict: Ustawienia (retention_days, batch_size, interval_hours,
+                write_batch_size, flush_interval_ms, journal_file)
+        """
+        defaults = {
+            'retention_days': 90,
+            'batch_size': 50000,
+            'interval_hours': 24.0,
+            'write_batch_size': 100,
+            'flush_interval_ms': 500,
+            'journal_file': 'print_history.journal'
+        }
+        try:
+            if 'PRINT_HISTORY' not in self.config:
+                return defaults
+            section = self.config['PRINT_HISTORY']
+            return {
+                # Historia z bieżącego dnia jest potrzebna do wykluczania wydrukowanych dokumentów
+                'retention_days': max(section.getint('retention_days', fallback=defaults['retention_days']), 1),
+                'batch_size': max(section.getint('batch_size', fallback=defaults['batch_size']), 1),
+                'interval_hours': section.getfloat('interval_hours', fallback=defaults['interval_hours']),
+                'write_batch_size': max(section.getint('write_batch_size', fallback=defaults['write_batch_size']), 1),
+                'flush_interval_ms': max(section.getint('flush_interval_ms', fallback=defaults['flush_interval_ms']), 1),
+                'journal_file': section.get('journal_file', fallback=defaults['journal_file'])
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień historii wydruków: {str(e)}")
+            return defaults
+
+    def get_dimension_cache_settings(self):
+        """
+        Pobiera ustawienia pamięci podręcznej kontrahentów i artykułów z sekcji [DIMENSION_CACHE].
+
+        Returns:
+            dict: Ustawienia (enabled, max_entries, validate_interval, warm_up_articles,
+                contractor_version_column, article_version_column)
+        """
+        defaults = {
+            'enabled': True,
+            'max_entries': 5000,
+            'validate_interval': 30.0,
+            'warm_up_articles': 200,
+            'contractor_version_column': '',
+            'article_version_column': ''
+        }
+        try:
+            if 'DIMENSION_CACHE' not in self.config:
+                return defaults
+            section = self.config['DIMENSION_CACHE']
+            return {
+                'enabled': section.getboolean('enabled', fallback=defaults['enabled']),
+                'max_entries': max(section.getint('max_entries', fallback=defaults['max_entries']), 1),
+                'validate_interval': section.getfloat('validate_interval', fallback=defaults['validate_interval']),
+                'warm_up_articles': section.getint('warm_up_articles', fallback=defaults['warm_up_articles']),
+                'contractor_version_column': section.get(
+                    'contractor_version_column', fallback=defaults['contractor_version_column']).strip(),
+                'article_version_column': section.get(
+                    'article_version_column', fallback=defaults['article_version_column']).strip()
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień pamięci kontrahentów i artykułów: {str(e)}")
+            return defaults
+
+    def get_archive_settings(self):
+        """
+        Pobiera ustawienia archiwum artefaktów zamówień z sekcji [ARCHIVE].
+
+        Returns:
+            dict: Ustawienia (enabled, directory, codec, level, keep_files)
+        """
+        defaults = {
+            'enabled': True,
+            'directory': 'ZO_ARCHIVE',
+            'codec': 'auto',
+            'level': 6,
+            'keep_files': False
+        }
+        try:
+            if 'ARCHIVE' not in self.config:
+                return defaults
+            section = self.config['ARCHIVE']
+            codec = section.get('codec', fallback=defaults['codec']).strip().lower()
+            if codec not in ('auto', 'zstd', 'gzip', 'none'):
+                logger.warning(
+                    f"Nieprawidłowy kodek archiwum: {codec}. Używam domyślnego: auto")
+                codec = defaults['codec']
+            return {
+                'enabled': section.getboolean('enabled', fallback=defaults['enabled']),
+                'directory': section.get('directory', fallback=defaults['directory']).strip()
+                             or defaults['directory'],
+                'codec': codec,
+                'level': section.getint('level', fallback=defaults['level']),
+                'keep_files': section.getboolean('keep_files', fallback=defaults['keep_files'])
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień archiwum artefaktów: {str(e)}")
+            return defaults
+
+    def get_logging_settings(self):
+        """
+        Pobiera ustawienia logowania z sekcji [LOGGING].
+
+        Opcja module_levels ma postać ``moduł=POZIOM`` rozdzieloną przecinkami,
+        np. ``lib.order_processor2=WARNING, lib.dimension_cache=DEBUG``.
+
+        Returns:
+            dict: Ustawienia (level, file, max_bytes, backup_count, queue_size,
+                sample_interval, module_levels)
+        """
+        defaults = {
+            'level': 'INFO',
+            'file': '',
+            'max_bytes': 10 * 1024 * 1024,
+            'backup_count': 5,
+            'queue_size': 10000,
+            'sample_interval': 60.0,
+            'module_levels': {}
+        }
+        try:
+            if 'LOGGING' not in self.config:
+                return defaults
+            section = self.config['LOGGING']
+            module_levels = {}
+            for item in section.get('module_levels', fallback='').split(','):
+                if '=' not in item:
+                    continue
+                name, level = item.split('=', 1)
+                if name.strip() and level.strip():
+                    module_levels[name.strip()] = level.strip().upper()
+            return {
+                'level': section.get('level', fallback=defaults['level']).strip().upper(),
+                'file': section.get('file', fallback=defaults['file']).strip(),
+                'max_bytes': max(section.getint('max_bytes', fallback=defaults['max_bytes']), 0),
+                'backup_count': max(section.getint('backup_count', fallback=defaults['backup_count']), 0),
+                'queue_size': max(section.getint('queue_size', fallback=defaults['queue_size']), 1),
+                'sample_interval': section.getfloat('sample_interval', fallback=defaults['sample_interval']),
+                'module_levels': module_levels
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień logowania: {str(e)}")
+            return defaults
+
+    def get_metrics_settings(self):
+        """
+        Pobiera ustawienia metryk z sekcji [METRICS].
+
+        Returns:
+            dict: Ustawienia (enabled, host, port, snapshot_file, snapshot_interval)
+        """
+        defaults = {
+            'enabled': True,
+            'host': '127.0.0.1',
+            'port': 9464,
+            'snapshot_file': 'metrics.json',
+            'snapshot_interval': 60.0
+        }
+        try:
+            if 'METRICS' not in self.config:
+                return defaults
+            section = self.config['METRICS']
+            return {
+                'enabled': section.getboolean('enabled', fallback=defaults['enabled']),
+                'host': section.get('host', fallback=defaults['host']).strip() or defaults['host'],
+                'port': max(section.getint('port', fallback=defaults['port']), 0),
+                'snapshot_file': section.get('snapshot_file', fallback=defaults['snapshot_file']).strip(),
+                'snapshot_interval': max(
+                    section.getfloat('snapshot_interval', fallback=defaults['snapshot_interval']), 1.0)
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień metryk: {str(e)}")
+            return defaults
+
+    def get_tracing_settings(self):
+        """
+        Pobiera ustawienia śledzenia zamówień z sekcji [TRACING].
+
+        Returns:
+            dict: Ustawienia (enabled, sample_rate, file, max_bytes, backup_count)
+        """
+        defaults = {
+            'enabled': True,
+            'sample_rate': 0.05,
+            'file': 'traces.jsonl',
+            'max_bytes': 20 * 1024 * 1024,
+            'backup_count': 3
+        }
+        try:
+            if 'TRACING' not in self.config:
+                return defaults
+            section = self.config['TRACING']
+            sample_rate = section.getfloat('sample_rate', fallback=defaults['sample_rate'])
+            return {
+                'enabled': section.getboolean('enabled', fallback=defaults['enabled']),
+                'sample_rate': min(max(sample_rate, 0.0), 1.0),
+                'file': section.get('file', fallback=defaults['file']).strip() or defaults['file'],
+                'max_bytes': max(section.getint('max_bytes', fallback=defaults['max_bytes']), 0),
+                'backup_count': max(section.getint('backup_count', fallback=defaults['backup_count']), 0)
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień śledzenia: {str(e)}")
+            return defaults
+
+    def get_daemon_settings(self):
+        """
+        Pobiera ustawienia trybu rezydentnego (sql2html.py --daemon) z sekcji [DAEMON].
+
+        Returns:
+            dict: Ustawienia (poll_interval, host, port, drain_timeout, browser_max_pages);
+                poll_interval = 0 oznacza check_interval z sekcji [PRINTING]
+        """
+        defaults = {
+            'poll_interval': 0.0,
+            'host': '127.0.0.1',
+            'port': 9465,
+            'drain_timeout': 60.0,
+            'browser_max_pages': 500
+        }
+        try:
+            if 'DAEMON' not in self.config:
+                return defaults
+            section = self.config['DAEMON']
+            return {
+                'poll_interval': max(section.getfloat('poll_interval', fallback=defaults['poll_interval']), 0.0),
+                'host': section.get('host', fallback=defaults['host']).strip() or defaults['host'],
+                'port': max(section.getint('port', fallback=defaults['port']), 0),
+                'drain_timeout': max(section.getfloat('drain_timeout', fallback=defaults['drain_timeout']), 0.0),
+                'browser_max_pages': max(
+                    section.getint('browser_max_pages', fallback=defaults['browser_max_pages']), 0)
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień trybu rezydentnego: {str(e)}")
+            return defaults
+
+    def get_lease_settings(self):
+        """
+        Pobiera ustawienia dzierżaw zamówień (kilka instancji sql2html) z sekcji [LEASES].
+
+        Returns:
+            dict: Ustawienia (enabled, node_id, lease_seconds, heartbeat_interval,
+                batch_size, max_attempts, retry_delay, retention_days);
+                pusty node_id oznacza host:pid, heartbeat_interval = 0 - lease_seconds / 3
+        """
+        defaults = {
+            'enabled': False,
+            'node_id': '',
+            'lease_seconds': 120,
+            'heartbeat_interval': 0.0,
+            'batch_size': 5,
+            'max_attempts': 3,
+            'retry_delay': 30,
+            'retention_days': 7
+        }
+        try:
+            if 'LEASES' not in self.config:
+                return defaults
+            section = self.config['LEASES']
+            return {
+                'enabled': section.getboolean('enabled', fallback=defaults['enabled']),
+                'node_id': section.get('node_id', fallback=defaults['node_id']).strip(),
+                'lease_seconds': max(section.getint('lease_seconds', fallback=defaults['lease_seconds']), 1),
+                'heartbeat_interval': max(
+                    section.getfloat('heartbeat_interval', fallback=defaults['heartbeat_interval']), 0.0),
+                'batch_size': max(section.getint('batch_size', fallback=defaults['batch_size']), 1),
+                'max_attempts': max(section.getint('max_attempts', fallback=defaults['max_attempts']), 1),
+                'retry_delay': max(section.getint('retry_delay', fallback=defaults['retry_delay']), 1),
+                'retention_days': max(section.getint('retention_days', fallback=defaults['retention_days']), 1)
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień dzierżaw zamówień: {str(e)}")
+            return defaults
+
+    def get_retry_settings(self):
+        """
+        Pobiera ustawienia kolejki ponownych wydruków z sekcji [RETRY].
+
+        Returns:
+            dict: Ustawienia (enabled, database, base_delay, max_delay, max_attempts,
+                failure_threshold, open_seconds, workers, poll_interval)
+        """
+        defaults = {
+            'enabled': True,
+            'database': 'retry_queue.db',
+            'base_delay': 5.0,
+            'max_delay': 600.0,
+            'max_attempts': 10,
+            'failure_threshold': 3,
+            'open_seconds': 30.0,
+            'workers': 4,
+            'poll_interval': 1.0
+        }
+        try:
+            if 'RETRY' not in self.config:
+                return defaults
+            section = self.config['RETRY']
+            return {
+                'enabled': section.getboolean('enabled', fallback=defaults['enabled']),
+                'database': section.get('database', fallback=defaults['database']).strip() or defaults['database'],
+                'base_delay': max(section.getfloat('base_delay', fallback=defaults['base_delay']), 0.1),
+                'max_delay': max(section.getfloat('max_delay', fallback=defaults['max_delay']), 1.0),
+                'max_attempts': max(section.getint('max_attempts', fallback=defaults['max_attempts']), 1),
+                'failure_threshold': max(
+                    section.getint('failure_threshold', fallback=defaults['failure_threshold']), 1),
+                'open_seconds': max(section.getfloat('open_seconds', fallback=defaults['open_seconds']), 1.0),
+                'workers': max(section.getint('workers', fallback=defaults['workers']), 1),
+                'poll_interval': max(section.getfloat('poll_interval', fallback=defaults['poll_interval']), 0.1)
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień kolejki ponownych wydruków: {str(e)}")
+            return defaults
+
+    def get_priority_settings(self):
+        """
+        Pobiera ustawienia priorytetów zamówień z sekcji [PRIORITY].
+
+        Klasy są opcjami ``class.<nazwa> = poziom, termin_sla_s``, a reguły
+        opcjami ``rule.<klasa>[.<dowolny_sufiks>] = POLE operator wartości``.
+
+        Returns:
+            dict: Ustawienia (enabled, aging_seconds, refresh_seconds, default_class,
+                classes {nazwa: (poziom, termin)}, rules [(klasa, warunek)])
+        """
+        defaults = {
+            'enabled': False,
+            'aging_seconds': 600.0,
+            'refresh_seconds': 30.0,
+            'default_class': 'normal',
+            'classes': {},
+            'rules': []
+        }
+        try:
+            if 'PRIORITY' not in self.config:
+                return defaults
+            section = self.config['PRIORITY']
+            classes = {}
+            rules = []
+            for option, value in section.items():
+                if option.startswith('class.'):
+                    level, _, deadline = value.partition(',')
+                    classes[option[len('class.'):]] = (int(level.strip()), max(float(deadline.strip() or 0), 0.0))
+                elif option.startswith('rule.'):
+                    rules.append((option[len('rule.'):].split('.', 1)[0], value))
+            return {
+                'enabled': section.getboolean('enabled', fallback=defaults['enabled']),
+                'aging_seconds': max(section.getfloat('aging_seconds', fallback=defaults['aging_seconds']), 1.0),
+                'refresh_seconds': max(
+                    section.getfloat('refresh_seconds', fallback=defaults['refresh_seconds']), 0.0),
+                'default_class': section.get('default_class', fallback=defaults['default_class']).strip().lower()
+                                 or defaults['default_class'],
+                'classes': classes,
+                'rules': rules
+            }
+        except Exception as e:
+            logger.error(
+                f"Błąd podczas pobierania ustawień priorytetów zamówień: {str(e)}")
+            return defaults
+
 # if __name__ == "__main__":
 #     config_manager = ConfigManager()
 #     print("Connection string:", config_manager.get_connection_string())
@@ -1,13 +1,22 @@
 import sys
+import sqlite3
 import logging
-import pyodbc
-import tabulate
+
+# pyodbc jest wymagany tylko dla SQL Server (emulator WAPRO działa bez niego)
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
 
 # from DocumentProcessor import DocumentProcessor
 # from ConfigManager import ConfigManager
 
 from lib.log_config import get_logger
 from lib.DatabaseSchemaReader import DatabaseSchemaReader  # Import the new class
+from lib.print_history import ensure_history_schema, not_printed_condition
+from lib.query_registry import QueryRegistry, ConnectionPool
+from lib.print_history_writer import PrintHistoryWriter
+from lib.wapro_emulator import is_emulator_dsn, connect as connect_emulator
 
 logger = get_logger().getLogger(__name__)
 
@@ -20,6 +29,87 @@ console_formatter = logging.Formatter(
 console_handler.setFormatter(console_formatter)
 logger.addHandler(console_handler)
 
+# Błędy bazy danych obsługiwane w zapytaniach (SQL Server lub emulator WAPRO)
+DB_ERRORS = (pyodbc.Error, sqlite3.Error) if pyodbc is not None else (sqlite3.Error,)
+
+
+def connect_database(connection_string):
+    """
+    Otwiera połączenie z bazą WAPRO: SQL Server przez pyodbc lub lokalny
+    emulator (lib.wapro_emulator) dla ciągu połączenia ``sqlite:///ścieżka``.
+
+    Args:
+        connection_string (str): Ciąg połączenia ODBC lub emulatora
+
+    Returns:
+        Połączenie DB-API (pyodbc.Connection lub EmulatorConnection)
+    """
+    if is_emulator_dsn(connection_string):
+        return connect_emulator(connection_string)
+    if pyodbc is None:
+        raise ImportError(
+            "The 'pyodbc' module is not installed. Please install it using 'pip install pyodbc'.")
+    return pyodbc.connect(connection_string)
+
+
+# Domyślne nazwy tabel WAPRO (nadpisywane przez verify_database_tables)
+DEFAULT_TABLE_NAMES = {
+    'dokumenty': 'DOKUMENT_MAGAZYNOWY',
+    'kontrahenci': 'KONTRAHENT',
+    'operatorzy': 'AUK_PACZKA_OPERATORZY'
+}
+
+# Zapytanie dostosowane do struktury tabel WAPRO; {user_filter} jest zastępowany
+# przy rejestracji, więc tekst SQL nie zależy od listy użytkowników
+NEW_DOCUMENTS_SQL = """
+    SELECT
+        d.ID_DOK_MAGAZYNOWEGO as id,
+        d.RODZAJ_DOKUMENTU as typ_dokumentu,
+        d.NUMER as numer_pelny,
+        d.ID_KONTRAHENTA as kontrahent_id,
+        k.NAZWA as nazwa_kontrahenta,
+        k.ULICA_LOKAL as adres_kontrahenta,
+        k.KOD_POCZTOWY as kod_pocztowy,
+        k.MIEJSCOWOSC as miejscowosc,
+        op.KOD as operator_id,
+        d.UWAGI as komentarz
+    FROM
+        {dokumenty} d
+    JOIN
+        {kontrahenci} k ON d.ID_KONTRAHENTA = k.ID_KONTRAHENTA
+    JOIN
+        {operatorzy} op ON d.ID_UZYTKOWNIKA = op.ID
+    WHERE
+        d.RODZAJ_DOKUMENTU = 'ZO'
+        AND d.DATA >= CAST(CONVERT(VARCHAR(8), GETDATE(), 112) AS INT)
+        AND """ + not_printed_condition('d.ID_DOK_MAGAZYNOWEGO') + """
+        USER_FILTER
+    ORDER BY
+        d.DATA DESC, d.NUMER DESC
+"""
+
+DOCUMENT_ITEMS_SQL = """
+    SELECT
+        p.ID_TOWARU,
+        t.NAZWA,
+        t.KOD,
+        p.ILOSC,
+        t.JM
+    FROM
+        POZYCJA_DOKUMENTU_MAGAZYNOWEGO p
+    JOIN
+        TOWAR t ON p.ID_TOWARU = t.ID_TOWARU
+    WHERE
+        p.ID_DOKUMENTU = {document_id}
+    ORDER BY
+        p.ID_POZYCJI
+"""
+
+INSERT_PRINT_HISTORY_SQL = """
+    INSERT INTO WaproPrintHistory (DOK_ID, PRINT_DATE, OPERATOR_ID, PRINT_STATUS)
+    VALUES ({document_id}, CONVERT(DATETIME, GETDATE(), 120), {operator_id}, 'PRINTED')
+"""
+
 
 class DatabaseManager:
     """Zarządzanie połączeniem z bazą danych"""
@@ -27,13 +117,14 @@ class DatabaseManager:
     def __init__(self, connection_string):
         logger.info("Inicjalizacja DatabaseManager")
         logger.info(f"Oryginalny string połączenia: {connection_string}")
-        # Dodajemy parametry timeout i encryption do stringu połączenia
-        if 'timeout=' not in connection_string:
-            connection_string += ';timeout=30'
-            logger.info("Dodano parametr timeout=30")
-        if 'encrypt=' not in connection_string:
-            connection_string += ';encrypt=no'
-            logger.info("Dodano parametr encrypt=no")
+        # Dodajemy parametry timeout i encryption do stringu połączenia ODBC
+        if not is_emulator_dsn(connection_string):
+            if 'timeout=' not in connection_string:
+                connection_string += ';timeout=30'
+                logger.info("Dodano parametr timeout=30")
+            if 'encrypt=' not in connection_string:
+                connection_string += ';encrypt=no'
+                logger.info("Dodano parametr encrypt=no")
         self.connection_string = connection_string
         logger.info(f"Finalny string połączenia: {self.connection_string}")
         self.processed_documents = set()
@@ -43,6 +134,49 @@ class DatabaseManager:
         # self.read_database_schema()  # Read database schema on initialization
         self.connection = None
         self.cursor = None
+        self.history_writer = None
+        # Zapytania z gorącej ścieżki i pula połączeń z przygotowanymi instrukcjami
+        self.queries = QueryRegistry()
+        self.pool = ConnectionPool(
+            lambda: connect_database(self.connection_string), self.queries)
+        self.register_queries()
+
+    def register_queries(self):
+        """Rejestruje sparametryzowane zapytania dla bieżących nazw tabel"""
+        tables = dict(DEFAULT_TABLE_NAMES, **self.table_names)
+        self.queries.register(
+            'new_documents', NEW_DOCUMENTS_SQL.replace('USER_FILTER', ''),
+            identifiers=tables)
+        self.queries.register(
+            'new_documents_for_users',
+            NEW_DOCUMENTS_SQL.replace('USER_FILTER', 'AND op.KOD IN ({users})'),
+            list_params=('users',), identifiers=tables)
+        self.queries.register('document_items', DOCUMENT_ITEMS_SQL)
+        self.queries.register('insert_print_history', INSERT_PRINT_HISTORY_SQL)
+
+    def start_history_writer(self, batch_size=100, flush_interval_ms=500,
+                             journal_file='print_history.journal'):
+        """
+        Włącza buforowany zapis historii wydruków - update_print_history
+        nie czeka wtedy na zatwierdzenie transakcji w bazie.
+        """
+        if self.history_writer is None:
+            self.history_writer = PrintHistoryWriter(
+                lambda: connect_database(self.connection_string),
+                batch_size=batch_size, flush_interval_ms=flush_interval_ms,
+                journal_file=journal_file)
+            self.history_writer.start()
+        return self.history_writer
+
+    def stop_history_writer(self):
+        """Zapisuje buforowaną historię wydruków i zatrzymuje wątek zapisu"""
+        if self.history_writer is not None:
+            self.history_writer.close()
+            self.history_writer = None
+
+    def get_query_stats(self):
+        """Zwraca liczniki ponownego użycia przygotowanych instrukcji"""
+        return self.queries.stats()
 
     def read_database_schema(self):
         """Reads and stores the database schema using DatabaseSchemaReader."""
@@ -59,15 +193,11 @@ class DatabaseManager:
     def verify_database_tables(self):
         """Sprawdza i zapisuje prawidłowe nazwy tabel w bazie danych"""
         try:
-            # Check if pyodbc is installed
             try:
-                import pyodbc
-            except ImportError:
-                print(
-                    "The 'pyodbc' module is not installed. Please install it using 'pip install pyodbc'.")
+                conn = connect_database(self.connection_string)
+            except ImportError as e:
+                print(e)
                 sys.exit(1)
-
-            conn = pyodbc.connect(self.connection_string)
             cursor = conn.cursor()
 
             # Najpierw sprawdźmy strukturę tabel
@@ -119,22 +249,10 @@ class DatabaseManager:
             for key, value in self.table_names.items():
                 logger.info(f"- {key}: {value}")
 
-            # Utworzenie tabeli historii wydruków jeśli nie istnieje
-            create_history_table = """
-            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'WaproPrintHistory')
-            BEGIN
-                CREATE TABLE WaproPrintHistory (
-                    ID INT IDENTITY(1,1) PRIMARY KEY,
-                    DOK_ID INT NOT NULL,
-                    PRINT_DATE DATETIME DEFAULT GETDATE(),
-                    OPERATOR_ID VARCHAR(50),
-                    PRINT_STATUS VARCHAR(20)
-                );
-            END
-            """
+            self.register_queries()
 
-            cursor.execute(create_history_table)
-            conn.commit()
+            # Utworzenie tabeli historii wydruków i jej indeksów jeśli nie istnieją
+            ensure_history_schema(cursor)
 
             # Po znalezieniu tabel, sprawdźmy ich strukturę
             if 'dokumenty' in self.table_names:
@@ -176,15 +294,16 @@ class DatabaseManager:
             logger.info(
                 f"Próba połączenia z bazą danych: {self.connection_string}")
 
-            # Sprawdzamy dostępne sterowniki ODBC
-            drivers = [x for x in pyodbc.drivers()]
-            logger.info(f"Dostępne sterowniki ODBC: {drivers}")
+            if pyodbc is not None and not is_emulator_dsn(self.connection_string):
+                # Sprawdzamy dostępne sterowniki ODBC
+                drivers = [x for x in pyodbc.drivers()]
+                logger.info(f"Dostępne sterowniki ODBC: {drivers}")
 
-            # Sprawdzamy dostępne źródła danych
-            dsn_list = [x for x in pyodbc.dataSources()]
-            logger.info(f"Dostępne źródła danych: {dsn_list}")
+                # Sprawdzamy dostępne źródła danych
+                dsn_list = [x for x in pyodbc.dataSources()]
+                logger.info(f"Dostępne źródła danych: {dsn_list}")
 
-            conn = pyodbc.connect(self.connection_string)
+            conn = connect_database(self.connection_string)
             cursor = conn.cursor()
             cursor.execute("SELECT @@VERSION")
             row = cursor.fetchone()
@@ -192,7 +311,7 @@ class DatabaseManager:
                 f"Pomyślnie połączono z bazą danych. Wersja SQL Server: {row[0]}")
             conn.close()
             return True
-        except pyodbc.Error as e:
+        except DB_ERRORS as e:
             logger.error(f"Błąd połączenia z bazą danych: {e}")
             logger.error(f"String połączenia: {self.connection_string}")
             return False
@@ -206,48 +325,16 @@ class DatabaseManager:
         documents = []
 
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-
-            # Tworzenie filtra użytkowników
-            user_filter = ""
-            if allowed_users:
-                user_list = ", ".join([f"'{user}'" for user in allowed_users])
-                user_filter = f"AND op.KOD IN ({user_list})"
-
-            # Zapytanie dostosowane do struktury tabel WAPRO
-            query = f"""
-                SELECT 
-                    d.ID_DOK_MAGAZYNOWEGO as id,
-                    d.RODZAJ_DOKUMENTU as typ_dokumentu,
-                    d.NUMER as numer_pelny,
-                    d.ID_KONTRAHENTA as kontrahent_id,
-                    k.NAZWA as nazwa_kontrahenta,
-                    k.ULICA_LOKAL as adres_kontrahenta,
-                    k.KOD_POCZTOWY as kod_pocztowy,
-                    k.MIEJSCOWOSC as miejscowosc,
-                    op.KOD as operator_id,
-                    d.UWAGI as komentarz
-                FROM 
-                    {self.table_names['dokumenty']} d
-                JOIN 
-                    {self.table_names['kontrahenci']} k ON d.ID_KONTRAHENTA = k.ID_KONTRAHENTA
-                JOIN 
-                    {self.table_names['operatorzy']} op ON d.ID_UZYTKOWNIKA = op.ID
-                WHERE 
-                    d.RODZAJ_DOKUMENTU = 'ZO' 
-                    AND d.DATA >= CAST(CONVERT(VARCHAR(8), GETDATE(), 112) AS INT)
-                    AND d.ID_DOK_MAGAZYNOWEGO NOT IN (SELECT DOK_ID FROM WaproPrintHistory WHERE DOK_ID IS NOT NULL)
-                    {user_filter}
-                ORDER BY 
-                    d.DATA DESC, d.NUMER DESC
-            """
-
-            # Wykonanie zapytania
-            cursor.execute(query)
+            with self.pool.acquire() as conn:
+                # Lista użytkowników przekazywana jako parametry listy IN o stałej długości
+                if allowed_users:
+                    cursor = conn.execute('new_documents_for_users', users=list(allowed_users))
+                else:
+                    cursor = conn.execute('new_documents')
+                rows = cursor.fetchall()
 
             # Przetworzenie wyników
-            for row in cursor.fetchall():
+            for row in rows:
                 doc_id = row[0]
 
                 # Pomijamy już przetworzone dokumenty
@@ -270,9 +357,6 @@ class DatabaseManager:
 
                 documents.append(document)
 
-            cursor.close()
-            conn.close()
-
         except Exception as e:
             logger.error(
                 f"Błąd podczas pobierania nowych dokumentów: {e}", exc_info=True)
@@ -284,32 +368,12 @@ class DatabaseManager:
         items = []
 
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-
-            # Zapytanie pobierające pozycje dokumentu
-            query = """
-                SELECT 
-                    p.ID_TOWARU,
-                    t.NAZWA,
-                    t.KOD,
-                    p.ILOSC,
-                    t.JM
-                FROM 
-                    POZYCJA_DOKUMENTU_MAGAZYNOWEGO p
-                JOIN 
-                    TOWAR t ON p.ID_TOWARU = t.ID_TOWARU
-                WHERE 
-                    p.ID_DOKUMENTU = ?
-                ORDER BY 
-                    p.ID_POZYCJI
-            """
-
-            # Wykonanie zapytania
-            cursor.execute(query, (document_id,))
+            with self.pool.acquire() as conn:
+                cursor = conn.execute('document_items', document_id=document_id)
+                rows = cursor.fetchall()
 
             # Przetworzenie wyników
-            for row in cursor.fetchall():
+            for row in rows:
                 item = {
                     'product_id': row[0],
                     'product_name': row[1],
@@ -320,9 +384,6 @@ class DatabaseManager:
 
                 items.append(item)
 
-            cursor.close()
-            conn.close()
-
         except Exception as e:
             logger.error(
                 f"Błąd podczas pobierania pozycji dokumentu {document_id}: {e}", exc_info=True)
@@ -334,19 +395,18 @@ class DatabaseManager:
         if document_id is None:
             return True  # Pomijamy aktualizację jeśli nie ma ID dokumentu
 
-        try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
+        if self.history_writer is not None:
+            # Zapis w tle; do czasu zapisu dokument wyklucza lista przetworzonych
+            self.history_writer.record(document_id, 'SYSTEM')
+            self.processed_documents.add(document_id)
+            return True
 
+        try:
             # Dodanie wpisu do tabeli historii z poprawnym konwertowaniem daty
-            cursor.execute("""
-                INSERT INTO WaproPrintHistory (DOK_ID, PRINT_DATE, OPERATOR_ID, PRINT_STATUS)
-                VALUES (?, CONVERT(DATETIME, GETDATE(), 120), ?, 'PRINTED')
-            """, (document_id, 'SYSTEM'))
-
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with self.pool.acquire() as conn:
+                conn.execute('insert_print_history',
+                             document_id=document_id, operator_id='SYSTEM')
+                conn.commit()
 
             # Dodanie dokumentu do listy przetworzonych
             self.processed_documents.add(document_id)
@@ -361,36 +421,24 @@ class DatabaseManager:
     def execute_query(self, query, params=None):
         """Wykonuje zapytanie SQL z opcjonalnymi parametrami"""
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-
-            # Jeśli zapytanie zwraca wyniki, zwracamy je
-            if query.strip().upper().startswith('SELECT'):
-                columns = [column[0] for column in cursor.description]
-                results = []
-                for row in cursor.fetchall():
-                    results.append(dict(zip(columns, row)))
-                return results
-            else:
-                # Dla zapytań modyfikujących dane (INSERT, UPDATE, DELETE)
-                conn.commit()
-                return True
+            with self.pool.acquire() as conn:
+                cursor = conn.execute_sql(query, params)
+
+                # Jeśli zapytanie zwraca wyniki, zwracamy je
+                if query.strip().upper().startswith('SELECT'):
+                    columns = [column[0] for column in cursor.description]
+                    results = []
+                    for row in cursor.fetchall():
+                        results.append(dict(zip(columns, row)))
+                    return results
+                else:
+                    # Dla zapytań modyfikujących dane (INSERT, UPDATE, DELETE)
+                    conn.commit()
+                    return True
 
         except Exception as e:
             logger.error(f"Błąd podczas wykonywania zapytania: {e}")
-            if 'conn' in locals():
-                conn.rollback()
             raise
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def connect(self):
         """
@@ -400,7 +448,7 @@ class DatabaseManager:
             bool: True if connection was successful, False otherwise.
         """
         try:
-            self.connection = pyodbc.connect(self.connection_string)
+            self.connection = connect_database(self.connection_string)
             self.cursor = self.connection.cursor()
             logger.info("Database schema read successfully.")
             return True
@@ -412,6 +460,7 @@ class DatabaseManager:
         """
         Closes the database connection.
         """
+        self.stop_history_writer()
         if self.cursor:
             self.cursor.close()
         if self.connection:
@@ -436,7 +485,7 @@ class DatabaseManager:
             else:
                 self.cursor.execute(query)
             return self.cursor.fetchall()  # Return Row objects
-        except pyodbc.Error as ex:
+        except DB_ERRORS as ex:
             sqlstate = ex.args[0]
             # Keep original error message
             logger.error(f"Error executing query: {sqlstate}")
@@ -459,7 +508,7 @@ class DatabaseManager:
                 self.cursor.execute(query)
             self.connection.commit()
             return self.cursor.rowcount
-        except pyodbc.Error as ex:
+        except DB_ERRORS as ex:
             sqlstate = ex.args[0]
             logger.error(f"Error executing non-query: {sqlstate}")
             self.connection.rollback()
@@ -1,4 +1,3 @@
-import pyodbc
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,20 +26,23 @@ class DatabaseSchemaReader:
         """
         tables_and_columns = {}
         try:
-            conn = pyodbc.connect(self.connection_string)
+            from lib.DatabaseManager import connect_database
+            conn = connect_database(self.connection_string)
             cursor = conn.cursor()
 
-            # Get all table names
-            cursor.execute(
-                "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
-            tables = [table[0] for table in cursor.fetchall()]
-
-            for table_name in tables:
-                # Get column names for each table
-                cursor.execute(
-                    f"SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = '{table_name}'")
-                columns = [column[0] for column in cursor.fetchall()]
-                tables_and_columns[table_name] = columns
+            # Get all base tables with their columns in a single query
+            cursor.execute("""
+                SELECT t.TABLE_NAME, c.COLUMN_NAME
+                FROM INFORMATION_SCHEMA.TABLES t
+                LEFT JOIN INFORMATION_SCHEMA.COLUMNS c
+                    ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+                WHERE t.TABLE_TYPE = ?
+                ORDER BY t.TABLE_NAME, c.ORDINAL_POSITION
+            """, ('BASE TABLE',))
+            for table_name, column_name in cursor.fetchall():
+                columns = tables_and_columns.setdefault(table_name, [])
+                if column_name is not None:
+                    columns.append(column_name)
 
             cursor.close()
             conn.close()
@@ -4,8 +4,9 @@ import win32api
 import pythoncom
 
 from lib.DocumentProcessor import DocumentProcessor
-from lib.ConfigManager import ConfigManager
-from lib.DatabaseManager import DatabaseManager
+from lib.config_snapshot import get_config, start_config_watcher
+from lib.DatabaseManager import DatabaseManager, connect_database
+from lib.print_history import HistoryRetentionJob
 from lib.log_config import get_logger
 
 logger = get_logger().getLogger(__name__)
@@ -15,11 +16,12 @@ class MonitorService:
     """Główna klasa usługi monitorującej"""
 
     def __init__(self):
-        self.config_manager = ConfigManager()
+        self.config_manager = get_config()
         self.db_manager = None
         self.document_processor = None
         self.check_interval = None
         self.allowed_users = None
+        self.retention_job = None
         self.running = False
         self.initialize()
 
@@ -45,6 +47,12 @@ class MonitorService:
 
         self.log_startup_info()
         self.db_manager.update_print_history(None)
+        settings = self.config_manager.get_history_settings()
+        self.db_manager.start_history_writer(
+            batch_size=settings['write_batch_size'],
+            flush_interval_ms=settings['flush_interval_ms'],
+            journal_file=settings['journal_file'])
+        self.start_history_retention()
         self.running = True
 
         try:
@@ -71,13 +79,36 @@ class MonitorService:
 
     def run_monitoring_loop(self):
         """Główna pętla monitorowania"""
+        start_config_watcher()
         while self.running:
             self.check_for_new_documents()
+            # Uwzględnij zmiany config.ini wczytane przez wątek obserwujący
+            self.config_manager = get_config()
+            self.check_interval = self.config_manager.get_check_interval()
+            self.allowed_users = self.config_manager.get_allowed_users()
             time.sleep(self.check_interval)
 
+    def start_history_retention(self):
+        """Uruchamia w tle okresową archiwizację starej historii wydruków"""
+        settings = self.config_manager.get_history_settings()
+        if settings['interval_hours'] <= 0:
+            return
+        connection_string = self.db_manager.connection_string
+        self.retention_job = HistoryRetentionJob(
+            lambda: connect_database(connection_string),
+            retention_days=settings['retention_days'],
+            batch_size=settings['batch_size'],
+            interval_hours=settings['interval_hours'])
+        self.retention_job.start()
+
     def stop(self):
         """Zatrzymuje usługę monitorowania"""
         self.running = False
+        if self.retention_job:
+            self.retention_job.stop()
+            self.retention_job = None
+        # Synchroniczny zapis buforowanej historii wydruków
+        self.db_manager.stop_history_writer()
 
     def check_for_new_documents(self):
         """Sprawdza nowe dokumenty w bazie danych"""
@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/artifact_archive.py
+"""
+Archiwum artefaktów zamówień (JSON, HTML, ZPL) w plikach dziennych.
+
+Zamiast osobnego pliku dla każdego zamówienia i rodzaju artefaktu dane są
+dopisywane do jednego segmentu na dzień (``YYYY-MM-DD.seg``). Każdy wpis to
+niezależna ramka zstd (gdy dostępny jest pakiet zstandard) lub gzip, więc
+można ją odczytać bez rozpakowywania całego segmentu. Obok segmentu
+prowadzony jest indeks JSONL (``YYYY-MM-DD.idx``) z numerem zamówienia,
+rodzajem artefaktu, przesunięciem i długością ramki oraz skrótem SHA-256.
+
+Identyczne dane (np. ten sam ZPL wysłany do kilku drukarek lub ponowny
+wydruk) zapisywane są raz - kolejne wpisy indeksu wskazują istniejącą ramkę.
+
+Indeks jest dopisywany po zapisaniu ramki, dlatego przerwanie zapisu może
+zostawić w segmencie co najwyżej nieużywane bajty, a niepełna ostatnia linia
+indeksu jest pomijana przy wczytywaniu.
+
+Do jednego katalogu może pisać kilka procesów (np. kilka instancji sql2html
+z dzierżawami albo tryb rezydentny i skrypt jednorazowy). Dopisanie ramki
+i wpisu indeksu odbywa się pod blokadą pliku ``YYYY-MM-DD.lock`` (fcntl lub
+msvcrt), a przed deduplikacją i odczytem indeksu archiwum doczytuje wpisy
+dopisane w międzyczasie przez inne procesy.
+
+W pamięci przechowywany jest tylko indeks bieżącego dnia (doczytywany
+przyrostowo od zapamiętanej pozycji); po północy jest zastępowany indeksem
+nowego dnia. Indeksy poprzednich dni są wczytywane dopiero przy wyszukiwaniu
+(np. eksport starszego zamówienia), a deduplikacja obejmuje segment bieżącego dnia.
+
+Użycie:
+    python -m lib.artifact_archive --list
+    python -m lib.artifact_archive --export "ZO 12/25" --output eksport
+"""
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from lib.log_config import get_logger
+from lib.file_lock import lock_file, unlock_file
+from lib.file_utils import normalize_filename
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = get_logger().getLogger(__name__)
+
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+LOCK_SUFFIX = '.lock'
+
+# Liczba indeksów poprzednich dni trzymanych w pamięci po wyszukiwaniu
+PAST_DAYS_CACHED = 2
+
+# Rozszerzenia plików przy eksporcie artefaktów
+KIND_EXTENSIONS = {
+    'json': '.json',
+    'html': '.html',
+    'zpl': '.zpl',
+}
+
+
+def _compress(data, codec, level):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if codec == 'gzip':
+        return gzip.compress(data, compresslevel=level)
+    return data
+
+
+def _decompress(frame, codec):
+    if codec == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Do odczytu ramek zstd wymagany jest pakiet zstandard")
+        return zstandard.ZstdDecompressor().decompress(frame)
+    if codec == 'gzip':
+        return gzip.decompress(frame)
+    return frame
+
+
+class ArtifactArchive:
+    """Dzienne segmenty artefaktów zamówień z indeksem i deduplikacją"""
+
+    def __init__(self, directory='ZO_ARCHIVE', codec='auto', level=6):
+        """
+        Args:
+            directory (str): Katalog segmentów i indeksów
+            codec (str): 'zstd', 'gzip', 'none' lub 'auto' (zstd, gdy dostępny)
+            level (int): Poziom kompresji
+        """
+        if codec == 'auto':
+            codec = 'zstd' if ZSTD_AVAILABLE else 'gzip'
+        elif codec == 'zstd' and not ZSTD_AVAILABLE:
+            logger.warning("Brak pakietu zstandard, archiwum używa kompresji gzip")
+            codec = 'gzip'
+        elif codec not in ('gzip', 'none', 'zstd'):
+            raise ValueError(f"Nieznany kodek archiwum: {codec}")
+
+        self.directory = directory
+        self.codec = codec
+        self.level = level
+
+        # Indeks bieżącego dnia: znormalizowany numer zamówienia -> rodzaj -> ostatni wpis
+        self._index = {}
+        # SHA-256 danych -> wpis wskazujący ramkę (segment bieżącego dnia)
+        self._frames = {}
+        # Dzień wczytanego indeksu i pozycja za ostatnią wczytaną pełną linią
+        self._index_day = None
+        self._position = 0
+        # Indeksy poprzednich dni wczytane przy wyszukiwaniu (najnowsze na końcu)
+        self._past = OrderedDict()
+        self._day = None
+        self._segment = None
+        self._index_file = None
+        self._lock_handle = None
+        self._lock = threading.Lock()
+        self._stats = {'written': 0, 'deduplicated': 0, 'bytes_in': 0, 'bytes_stored': 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._refresh()
+
+    def _refresh(self, day=None):
+        """
+        Doczytuje wpisy indeksu bieżącego dnia dopisane od ostatniego wczytania
+        (także przez inne procesy). Po zmianie dnia indeks poprzedniego dnia
+        jest usuwany z pamięci. Niepełna ostatnia linia jest wczytywana dopiero
+        po dopisaniu znaku końca linii.
+
+        Args:
+            day (str): Dzień 'YYYY-MM-DD' (domyślnie dzisiejszy)
+
+        Returns:
+            bool: True, gdy indeks dnia kończy się niepełną linią
+        """
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        if day != self._index_day:
+            self._index, self._frames = {}, {}
+            self._index_day, self._position = day, 0
+        path = os.path.join(self.directory, day + INDEX_SUFFIX)
+        try:
+            if os.path.getsize(path) == self._position:
+                return False
+        except FileNotFoundError:
+            return False
+        with open(path, 'rb') as f:
+            f.seek(self._position)
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        self._position += len(complete)
+        for entry in self._parse(complete, path):
+            self._remember(entry)
+        return len(complete) < len(data)
+
+    @staticmethod
+    def _parse(data, path):
+        """Wpisy indeksu z pełnych linii (uszkodzone linie są pomijane)"""
+        for line in data.splitlines():
+            try:
+                yield json.loads(line.decode('utf-8'))
+            except ValueError:
+                # Linia przerwanego zapisu zakończona przez kolejny zapis
+                logger.warning(f"Pominięto uszkodzony wpis indeksu archiwum w {os.path.basename(path)}")
+
+    def _remember(self, entry):
+        key = normalize_filename(entry['order'])
+        self._index.setdefault(key, {})[entry['kind']] = entry
+        self._frames.setdefault(entry['sha256'], entry)
+
+    def days(self):
+        """Zwraca dni ('YYYY-MM-DD') z indeksem w archiwum, od najnowszego"""
+        return sorted((name[:-len(INDEX_SUFFIX)] for name in os.listdir(self.directory)
+                       if name.endswith(INDEX_SUFFIX)), reverse=True)
+
+    def _day_index(self, day=None):
+        """
+        Zwraca indeks dnia: bieżący z pamięci, poprzednie wczytywane z pliku
+        przy pierwszym wyszukiwaniu (w pamięci zostaje PAST_DAYS_CACHED ostatnich).
+        Wywoływane pod blokadą.
+        """
+        self._refresh()
+        if day is None or day == self._index_day:
+            return self._index
+        index = self._past.get(day)
+        if index is not None:
+            self._past.move_to_end(day)
+            return index
+        index = {}
+        path = os.path.join(self.directory, day + INDEX_SUFFIX)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return index
+        for entry in self._parse(data[:data.rfind(b'\n') + 1], path):
+            index.setdefault(normalize_filename(entry['order']), {})[entry['kind']] = entry
+        self._past[day] = index
+        while len(self._past) > PAST_DAYS_CACHED:
+            self._past.popitem(last=False)
+        return index
+
+    def _lookup(self, order_number):
+        """Rodzaje i wpisy zamówienia z najnowszego dnia, w którym występuje (pod blokadą)"""
+        key = normalize_filename(order_number)
+        self._refresh()
+        if key in self._index:
+            return self._index[key]
+        for day in self.days():
+            kinds = self._day_index(day).get(key)
+            if kinds:
+                return kinds
+        return {}
+
+    def _open_day(self, day):
+        if self._day == day:
+            return
+        self._close_files()
+        base = os.path.join(self.directory, day)
+        self._segment = open(base + SEGMENT_SUFFIX, 'ab')
+        self._index_file = open(base + INDEX_SUFFIX, 'a', encoding='utf-8')
+        self._lock_handle = open(base + LOCK_SUFFIX, 'a+b')
+        self._day = day
+
+    def _close_files(self):
+        for f in (self._segment, self._index_file, self._lock_handle):
+            if f is not None:
+                f.close()
+        self._segment = self._index_file = self._lock_handle = None
+        self._day = None
+
+    def put(self, order_number, kind, data, tag=None):
+        """
+        Dopisuje artefakt zamówienia do archiwum.
+
+        Args:
+            order_number (str): Numer zamówienia
+            kind (str): Rodzaj artefaktu ('json', 'html', 'zpl', ...)
+            data (bytes|str): Zawartość (tekst zapisywany jest w UTF-8)
+            tag (str): Dodatkowy opis wpisu, np. adres drukarki
+
+        Returns:
+            dict: Wpis indeksu
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        now = datetime.now()
+
+        with self._lock:
+            self._open_day(now.strftime('%Y-%m-%d'))
+            lock_file(self._lock_handle)
+            try:
+                # Ramki i wpisy dopisane przez inne procesy od ostatniego zapisu
+                if self._refresh(self._day):
+                    # Niepełna linia procesu przerwanego w trakcie zapisu
+                    self._index_file.write('\n')
+                    self._index_file.flush()
+                frame_entry = self._frames.get(digest)
+                if frame_entry is not None:
+                    location = {k: frame_entry[k] for k in ('segment', 'offset', 'length', 'codec')}
+                    self._stats['deduplicated'] += 1
+                else:
+                    frame = _compress(data, self.codec, self.level)
+                    self._segment.seek(0, os.SEEK_END)
+                    offset = self._segment.tell()
+                    self._segment.write(frame)
+                    self._segment.flush()
+                    location = {'segment': self._day + SEGMENT_SUFFIX, 'offset': offset,
+                                'length': len(frame), 'codec': self.codec}
+                    self._stats['written'] += 1
+                    self._stats['bytes_stored'] += len(frame)
+                self._stats['bytes_in'] += len(data)
+
+                entry = dict(order=order_number, kind=kind, size=len(data), sha256=digest,
+                             time=now.strftime('%Y-%m-%d %H:%M:%S'), **location)
+                if tag:
+                    entry['tag'] = tag
+                self._index_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self._index_file.flush()
+                self._refresh(self._day)
+            finally:
+                unlock_file(self._lock_handle)
+        return entry
+
+    def entry(self, order_number, kind):
+        """Zwraca ostatni wpis indeksu dla zamówienia i rodzaju lub None"""
+        with self._lock:
+            return self._lookup(order_number).get(kind)
+
+    def get(self, order_number, kind):
+        """
+        Odczytuje ostatnio zapisany artefakt zamówienia.
+
+        Returns:
+            bytes: Zawartość lub None, gdy artefaktu nie ma w archiwum
+        """
+        entry = self.entry(order_number, kind)
+        if entry is None:
+            return None
+        with open(os.path.join(self.directory, entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            frame = f.read(entry['length'])
+        return _decompress(frame, entry['codec'])
+
+    def get_text(self, order_number, kind):
+        """Odczytuje artefakt tekstowy (UTF-8)"""
+        data = self.get(order_number, kind)
+        return data.decode('utf-8') if data is not None else None
+
+    def kinds(self, order_number, day=None):
+        """
+        Zwraca rodzaje artefaktów zapisanych dla zamówienia.
+
+        Args:
+            order_number (str): Numer zamówienia
+            day (str): Dzień 'YYYY-MM-DD'; None - najnowszy dzień z zamówieniem
+        """
+        with self._lock:
+            if day is not None:
+                return sorted(self._day_index(day).get(normalize_filename(order_number), {}))
+            return sorted(self._lookup(order_number))
+
+    def orders(self, kind=None, day=None):
+        """
+        Zwraca znormalizowane numery zamówień zapisanych danego dnia.
+
+        Args:
+            kind (str): Tylko zamówienia z artefaktem danego rodzaju
+            day (str): Dzień 'YYYY-MM-DD' (domyślnie dzisiejszy)
+        """
+        with self._lock:
+            index = self._day_index(day)
+            return {key for key, kinds in index.items() if kind is None or kind in kinds}
+
+    def export(self, order_number, output_dir, kinds=None):
+        """
+        Zapisuje artefakty zamówienia jako osobne pliki (jak przed archiwum).
+
+        Args:
+            order_number (str): Numer zamówienia
+            output_dir (str): Katalog docelowy
+            kinds (list): Rodzaje artefaktów; None - wszystkie
+
+        Returns:
+            list: Ścieżki zapisanych plików
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for kind in kinds or self.kinds(order_number):
+            data = self.get(order_number, kind)
+            if data is None:
+                continue
+            extension = KIND_EXTENSIONS.get(kind, f'.{kind}')
+            path = os.path.join(output_dir, normalize_filename(order_number) + extension)
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+        return paths
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, orders=len(self._index), frames=len(self._frames),
+                        codec=self.codec)
+
+    def close(self):
+        with self._lock:
+            self._close_files()
+
+
+# Archiwa według katalogu (każde źródło zamówień ma własny katalog archiwum)
+_archives = {}
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """
+    Zwraca wspólne archiwum artefaktów bieżącego źródła zamówień lub None,
+    gdy archiwum jest wyłączone w konfiguracji (sekcja [ARCHIVE]).
+    """
+    try:
+        from lib.config_snapshot import get_config
+        settings = get_config().get_archive_settings()
+    except Exception as e:
+        logger.debug(f"Brak konfiguracji archiwum artefaktów: {e}")
+        return None
+    if not settings['enabled']:
+        return None
+
+    with _archive_lock:
+        archive = _archives.get(settings['directory'])
+        if archive is None:
+            try:
+                archive = ArtifactArchive(settings['directory'], codec=settings['codec'],
+                                          level=settings['level'])
+            except Exception as e:
+                logger.error(f"Nie udało się otworzyć archiwum artefaktów: {e}")
+                return None
+            _archives[settings['directory']] = archive
+        return archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archiwum artefaktów zamówień')
+    parser.add_argument('--directory', help='Katalog archiwum (domyślnie z config.ini)')
+    parser.add_argument('--list', action='store_true', help='Wypisz zamówienia w archiwum')
+    parser.add_argument('--day', help='Dzień YYYY-MM-DD dla --list (domyślnie wszystkie)')
+    parser.add_argument('--export', metavar='NUMER', help='Eksportuj artefakty zamówienia do plików')
+    parser.add_argument('--kind', action='append', help='Rodzaj artefaktu (json, html, zpl)')
+    parser.add_argument('--output', default='.', help='Katalog docelowy eksportu')
+    args = parser.parse_args()
+
+    if args.directory:
+        archive = ArtifactArchive(args.directory)
+    else:
+        archive = get_archive()
+        if archive is None:
+            print("Archiwum jest wyłączone w config.ini; podaj --directory")
+            return 1
+
+    if args.list:
+        total = 0
+        for day in [args.day] if args.day else archive.days():
+            orders = sorted(archive.orders(day=day))
+            total += len(orders)
+            print(f"{day}:")
+            for order in orders:
+                print(f"  {order}: {', '.join(archive.kinds(order, day=day))}")
+        print(f"Zamówienia: {total}")
+        return 0
+
+    if args.export:
+        paths = archive.export(args.export, args.output, args.kind)
+        if not paths:
+            print(f"Brak artefaktów zamówienia {args.export} w archiwum")
+            return 1
+        for path in paths:
+            print(path)
+        return 0
+
+    parser.print_help()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/column_projection.py
+"""
+Projekcja kolumn dla szerokich tabel WAPRO.
+
+Zamiast ``SELECT *`` na ZAMOWIENIE, KONTRAHENT, POZYCJA_ZAMOWIENIA i ARTYKUL
+zapytania pobierają tylko kolumny deklarowane przez szablon zamówienia
+(html_generator.TEMPLATE_FIELDS) oraz kolumny kluczy potrzebne do złączeń
+i logiki przetwarzania. Lista kolumn każdej tabeli jest odczytywana raz
+(``SELECT TOP 0 *``), a deklarowane pola, których tabela nie ma, są pomijane.
+Gdy odczyt struktury się nie powiedzie lub projekcja jest wyłączona
+w konfiguracji, zapytania używają ``*`` jak dotychczas.
+"""
+
+import threading
+
+from lib.log_config import get_logger
+from lib.html_generator import TEMPLATE_FIELDS
+from lib.query_registry import validate_identifier
+
+logger = get_logger().getLogger(__name__)
+
+# Tabele, z których pochodzą pola poszczególnych obiektów szablonu
+ENTITY_TABLES = {
+    'order': ('ZAMOWIENIE',),
+    'contractor': ('KONTRAHENT',),
+    'item': ('POZYCJA_ZAMOWIENIA', 'ARTYKUL'),
+}
+
+# Kolumny wymagane przez logikę przetwarzania niezależnie od szablonu
+PROCESSING_COLUMNS = {
+    'ZAMOWIENIE': ('ID_ZAMOWIENIA', 'ID_KONTRAHENTA', 'NUMER', 'KOD_KRESKOWY',
+                   'DATA_UTWORZENIA_WIERSZA'),
+    'KONTRAHENT': ('ID_KONTRAHENTA',),
+    'POZYCJA_ZAMOWIENIA': ('ID_POZYCJI_ZAMOWIENIA', 'ID_ZAMOWIENIA', 'ID_ARTYKULU',
+                           'ZAMOWIONO', 'ZREALIZOWANO'),
+    'ARTYKUL': ('ID_ARTYKULU',),
+}
+
+
+class ColumnProjection:
+    """Wyznacza listy kolumn dla zapytań na podstawie pól szablonu"""
+
+    def __init__(self, template_fields=None, processing_columns=None):
+        template_fields = template_fields or TEMPLATE_FIELDS
+        processing_columns = processing_columns or PROCESSING_COLUMNS
+
+        self.required = {}
+        for entity, tables in ENTITY_TABLES.items():
+            for table in tables:
+                self.required.setdefault(table, set()).update(template_fields.get(entity, ()))
+        for table, columns in processing_columns.items():
+            self.required.setdefault(table, set()).update(columns)
+
+        self._table_columns = {}
+        self._lock = threading.Lock()
+
+    def table_columns(self, cursor, table):
+        """Zwraca (i zapamiętuje) pełną listę kolumn tabeli"""
+        columns = self._table_columns.get(table)
+        if columns is None:
+            cursor.execute(f"SELECT TOP 0 * FROM {validate_identifier(table)}")
+            columns = [column[0] for column in cursor.description]
+            with self._lock:
+                self._table_columns[table] = columns
+        return columns
+
+    def columns(self, cursor, table):
+        """
+        Zwraca kolumny tabeli potrzebne szablonowi, w kolejności z tabeli.
+
+        Returns:
+            list: Nazwy kolumn lub None, gdy nie udało się odczytać struktury
+        """
+        try:
+            table_columns = self.table_columns(cursor, table)
+        except Exception as e:
+            logger.warning(f"Nie udało się odczytać kolumn tabeli {table}: {e}")
+            return None
+        required = self.required.get(table, set())
+        return [column for column in table_columns
+                if column in required and validate_identifier(column)]
+
+    def select_list(self, cursor, table, alias=None):
+        """
+        Zwraca listę wyrażeń SELECT dla tabeli, np. ``Z.NUMER, Z.UWAGI``.
+
+        Args:
+            cursor: Kursor bazy danych
+            table (str): Nazwa tabeli
+            alias (str): Alias tabeli w zapytaniu
+
+        Returns:
+            str: Lista kolumn lub ``*`` / ``alias.*``
+        """
+        prefix = f"{alias}." if alias else ''
+        columns = self.columns(cursor, table)
+        if not columns:
+            return f"{prefix}*"
+        return ', '.join(f"{prefix}{column}" for column in columns)
+
+    def invalidate(self):
+        """Usuwa zapamiętane struktury tabel (np. po aktualizacji bazy WAPRO)"""
+        with self._lock:
+            self._table_columns.clear()
+
+
+_projection = None
+_projection_lock = threading.Lock()
+
+
+def get_projection():
+    """Zwraca wspólny obiekt projekcji lub None, gdy projekcja jest wyłączona"""
+    global _projection
+
+    try:
+        from lib.config_snapshot import get_config
+        if not get_config().get_column_projection_enabled():
+            return None
+    except Exception as e:
+        logger.debug(f"Brak konfiguracji projekcji kolumn, używam domyślnej: {e}")
+
+    with _projection_lock:
+        if _projection is None:
+            _projection = ColumnProjection()
+        return _projection
+
+
+def select_list(cursor, table, alias=None):
+    """
+    Lista kolumn SELECT dla tabeli z uwzględnieniem konfiguracji projekcji.
+
+    Returns:
+        str: Lista kolumn lub ``*`` / ``alias.*``, gdy projekcja jest wyłączona
+    """
+    projection = get_projection()
+    if projection is None:
+        return f"{alias}.*" if alias else '*'
+    return projection.select_list(cursor, table, alias)
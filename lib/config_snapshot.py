@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/config_snapshot.py
+"""
+Współdzielona, niezmienna migawka konfiguracji aplikacji.
+
+Plik config.ini jest wczytywany raz, a wszystkie moduły korzystają z tej samej
+migawki zwracanej przez get_config(). Wątek obserwujący plik podmienia migawkę
+atomowo po zmianie config.ini, więc długo działające usługi widzą nowe
+ustawienia drukarek lub interwałów bez restartu i bez ponownego parsowania
+pliku w ścieżkach krytycznych.
+
+Migawka udostępnia te same metody get_* co ConfigManager, dzięki czemu może
+być przekazywana wszędzie tam, gdzie dotąd tworzono ConfigManager().
+
+Przy kilku źródłach zamówień (sekcje [SOURCE:nazwa]) bieżące źródło jest
+przechowywane w contextvars: wewnątrz use_source(nazwa) (oraz w zadaniach
+asyncio i wątkach run_in_thread uruchomionych w tym kontekście)
+get_config() zwraca migawkę źródła z jego bazą, drukarką i katalogami.
+"""
+
+import os
+import copy
+import asyncio
+import functools
+import threading
+import contextlib
+import contextvars
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lib.ConfigManager import ConfigManager
+from lib.log_config import get_logger, apply_logging_settings
+
+logger = get_logger().getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Niezmienna migawka konfiguracji z najczęściej używanymi ustawieniami"""
+
+    config_file: str
+    mtime: float
+    thermal_printer_ip: str
+    thermal_printer_port: int
+    printer_dpi: int
+    check_interval: int
+    allowed_users: Optional[Tuple[str, ...]]
+    zo_zpl_dir: Optional[str]
+    render_mode: str
+    manager: ConfigManager = field(repr=False, compare=False)
+    _memo: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+    source: Optional[str] = None
+
+    @classmethod
+    def load(cls, config_file=None):
+        """
+        Wczytuje config.ini i tworzy nową migawkę.
+
+        Parametry:
+        - config_file: Opcjonalna ścieżka do pliku konfiguracyjnego
+
+        Zwraca:
+        - Obiekt ConfigSnapshot
+        """
+        manager = ConfigManager(config_file)
+        return cls.from_manager(manager, mtime=_get_mtime(manager.config_file))
+
+    @classmethod
+    def from_manager(cls, manager, mtime=0.0, source=None):
+        """
+        Tworzy migawkę z wczytanego obiektu ConfigManager.
+
+        Parametry:
+        - manager: Obiekt ConfigManager
+        - mtime: Czas modyfikacji pliku konfiguracyjnego
+        - source: Nazwa źródła zamówień lub None
+
+        Zwraca:
+        - Obiekt ConfigSnapshot
+        """
+        allowed_users = manager.get_allowed_users()
+        return cls(
+            config_file=os.path.abspath(manager.config_file),
+            mtime=mtime,
+            thermal_printer_ip=manager.get_thermal_printer_ip(),
+            thermal_printer_port=manager.get_thermal_printer_port(),
+            printer_dpi=manager.get_printer_dpi(),
+            check_interval=manager.get_check_interval(),
+            allowed_users=tuple(allowed_users) if allowed_users is not None else None,
+            zo_zpl_dir=manager.get_zo_zpl_dir(),
+            render_mode=manager.get_render_mode(),
+            manager=manager,
+            source=source,
+        )
+
+    def for_source(self, name):
+        """
+        Zwraca migawkę źródła zamówień (tworzoną raz na migawkę główną).
+
+        Parametry:
+        - name: Nazwa źródła z sekcji [SOURCE:nazwa]
+
+        Zwraca:
+        - Obiekt ConfigSnapshot źródła
+        """
+        key = f"{SOURCE_MEMO_PREFIX}{name}"
+        snapshot = self._memo.get(key)
+        if snapshot is None:
+            snapshot = self._memo.setdefault(key, ConfigSnapshot.from_manager(
+                self.manager.for_source(name), mtime=self.mtime, source=name))
+        return snapshot
+
+    def load_config(self):
+        """Zgodność z ConfigManager - migawka jest już wczytana i nie jest modyfikowana"""
+        return None
+
+    @property
+    def config(self):
+        """Obiekt ConfigParser, z którego utworzono migawkę (tylko do odczytu)"""
+        return self.manager.config
+
+    def get_thermal_printer_ip(self):
+        return self.thermal_printer_ip
+
+    def get_thermal_printer_port(self):
+        return self.thermal_printer_port
+
+    def get_printer_dpi(self):
+        return self.printer_dpi
+
+    def get_check_interval(self):
+        return self.check_interval
+
+    def get_allowed_users(self):
+        return list(self.allowed_users) if self.allowed_users is not None else None
+
+    def get_zo_zpl_dir(self):
+        return self.zo_zpl_dir
+
+    def get_render_mode(self):
+        return self.render_mode
+
+    def __getattr__(self, name):
+        # Pozostałe metody get_* są delegowane do ConfigManager, a wyniki
+        # wywołań bez argumentów zapamiętywane na czas życia migawki
+        if name in ('manager', '_memo') or name.startswith('__'):
+            raise AttributeError(name)
+
+        attribute = getattr(self.manager, name)
+        if not (name.startswith('get_') and callable(attribute)):
+            return attribute
+
+        memo = self._memo
+
+        def memoized(*args, **kwargs):
+            if args or kwargs:
+                return attribute(*args, **kwargs)
+            if name not in memo:
+                memo[name] = attribute()
+            return copy.copy(memo[name])
+
+        return memoized
+
+
+def _get_mtime(path):
+    """Zwraca czas modyfikacji pliku lub 0, jeśli plik nie istnieje"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+SOURCE_MEMO_PREFIX = 'source:'
+
+_current: Optional[ConfigSnapshot] = None
+_lock = threading.Lock()
+_listeners: List[Callable[[ConfigSnapshot], None]] = []
+_watcher: Optional['ConfigWatcher'] = None
+_current_source = contextvars.ContextVar('waproprint_source', default=None)
+
+
+def get_config(config_file=None):
+    """
+    Zwraca bieżącą migawkę konfiguracji (wczytywaną przy pierwszym użyciu);
+    wewnątrz use_source() - migawkę bieżącego źródła zamówień.
+
+    Parametry:
+    - config_file: Ścieżka do pliku konfiguracyjnego używana przy pierwszym wczytaniu
+
+    Zwraca:
+    - Obiekt ConfigSnapshot
+    """
+    snapshot = _get_root_config(config_file)
+    source = _current_source.get()
+    return snapshot if source is None else snapshot.for_source(source)
+
+
+def current_source():
+    """Zwraca nazwę bieżącego źródła zamówień lub None (konfiguracja główna)"""
+    return _current_source.get()
+
+
+@contextlib.contextmanager
+def use_source(name):
+    """
+    Ustawia bieżące źródło zamówień w kontekście wywołania.
+
+    Parametry:
+    - name: Nazwa źródła z sekcji [SOURCE:nazwa] lub None (konfiguracja główna)
+    """
+    token = _current_source.set(name)
+    try:
+        yield
+    finally:
+        _current_source.reset(token)
+
+
+def source_context(name):
+    """
+    Tworzy osobny kontekst (contextvars.Context) z ustawionym źródłem zamówień.
+    Kod uruchamiany przez context.run() - w tym generatory zamówień kilku źródeł
+    przeplatane w jednym wątku - nie miesza zmiennych kontekstowych innych źródeł.
+
+    Parametry:
+    - name: Nazwa źródła lub None
+
+    Zwraca:
+    - Obiekt contextvars.Context
+    """
+    context = contextvars.copy_context()
+    context.run(_current_source.set, name)
+    return context
+
+
+async def run_in_thread(function, *args, **kwargs):
+    """
+    Wywołuje funkcję blokującą w domyślnej puli wątków pętli zdarzeń z kopią
+    bieżącego kontekstu (źródło zamówień) - odpowiednik asyncio.to_thread,
+    dostępnego dopiero od Pythona 3.9.
+
+    Parametry:
+    - function: Funkcja blokująca
+    - args, kwargs: Argumenty funkcji
+
+    Zwraca:
+    - Wynik funkcji
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        None, functools.partial(context.run, function, *args, **kwargs))
+
+
+def _get_root_config(config_file=None):
+    global _current
+
+    snapshot = _current
+    if snapshot is None:
+        loaded = False
+        with _lock:
+            if _current is None:
+                _current = ConfigSnapshot.load(config_file)
+                loaded = True
+            snapshot = _current
+        if loaded:
+            _apply_logging(snapshot)
+    return snapshot
+
+
+def _apply_logging(snapshot):
+    """Stosuje ustawienia [LOGGING] z migawki (poziomy modułów, plik, rotacja)"""
+    try:
+        apply_logging_settings(snapshot.manager.get_logging_settings())
+    except Exception as e:
+        logger.error(f"Nie udało się zastosować ustawień logowania: {str(e)}")
+
+
+def reload_config(force=False):
+    """
+    Wczytuje ponownie config.ini i atomowo podmienia migawkę.
+    Przy błędzie wczytywania pozostaje poprzednia migawka.
+
+    Parametry:
+    - force: Czy wczytać plik nawet, gdy nie zmienił się czas modyfikacji
+
+    Zwraca:
+    - Bieżąca migawka konfiguracji
+    """
+    global _current
+
+    current = _get_root_config()
+    if not force and _get_mtime(current.config_file) == current.mtime:
+        return current
+
+    try:
+        snapshot = ConfigSnapshot.load(current.config_file)
+    except Exception as e:
+        logger.error(
+            f"Nie udało się przeładować konfiguracji, używam poprzedniej: {str(e)}")
+        return current
+
+    with _lock:
+        _current = snapshot
+        listeners = list(_listeners)
+
+    logger.info(f"Przeładowano konfigurację z pliku: {snapshot.config_file}")
+    _apply_logging(snapshot)
+    for listener in listeners:
+        try:
+            listener(snapshot)
+        except Exception as e:
+            logger.error(
+                f"Błąd w obsłudze przeładowania konfiguracji: {str(e)}")
+    return snapshot
+
+
+def add_reload_listener(callback):
+    """
+    Rejestruje funkcję wywoływaną z nową migawką po przeładowaniu konfiguracji.
+
+    Parametry:
+    - callback: Funkcja przyjmująca obiekt ConfigSnapshot
+    """
+    with _lock:
+        _listeners.append(callback)
+
+
+class ConfigWatcher:
+    """Wątek sprawdzający czas modyfikacji config.ini i przeładowujący konfigurację"""
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='config-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            reload_config()
+
+
+def start_config_watcher(interval=2.0):
+    """
+    Uruchamia (jednokrotnie) wątek obserwujący plik konfiguracyjny.
+
+    Parametry:
+    - interval: Odstęp między sprawdzeniami pliku w sekundach
+
+    Zwraca:
+    - Obiekt ConfigWatcher
+    """
+    global _watcher
+
+    get_config()
+    with _lock:
+        if _watcher is None:
+            _watcher = ConfigWatcher(interval)
+        watcher = _watcher
+    watcher.start()
+    return watcher
+
+
+def stop_config_watcher():
+    """Zatrzymuje wątek obserwujący plik konfiguracyjny"""
+    global _watcher
+
+    with _lock:
+        watcher, _watcher = _watcher, None
+    if watcher:
+        watcher.stop()
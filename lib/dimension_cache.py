@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/dimension_cache.py
+"""
+Pamięć podręczna rekordów słownikowych (KONTRAHENT, ARTYKUL).
+
+Kontrahenci i artykuły zmieniają się rzadko w porównaniu z liczbą zamówień,
+dlatego są przechowywane w ograniczonej pamięci LRU według ID. Każdy rekord
+zapamiętuje wersję wiersza - wartość kolumny wersji (np. rowversion lub data
+modyfikacji) albo, domyślnie, BINARY_CHECKSUM pobieranych kolumn liczony
+przez SQL Server.
+Co validate_interval sekund wersje wszystkich zapamiętanych rekordów są
+sprawdzane zbiorczo (listy IN o stałej długości), a zmienione lub usunięte
+rekordy usuwane z pamięci.
+
+Rekordy przechowywane są jako lib.order_model.Record (wiersz z bazy
+i wspólny układ kolumn); wywołujący otrzymują lekkie kopie współdzielące
+wiersz, więc przypisania w jednym zamówieniu nie zmieniają pamięci.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+from lib.log_config import get_logger
+from lib.order_model import Record, RecordLayout, Contractor, Article
+from lib.query_registry import QueryRegistry, validate_identifier
+
+logger = get_logger().getLogger(__name__)
+
+VERSION_ALIAS = 'DIM_CACHE_VERSION'
+# Liczba kluczy sprawdzanych jednym zapytaniem przy walidacji
+PROBE_CHUNK = 256
+
+# Wspólny rejestr zapytań wszystkich pamięci słownikowych
+dimension_queries = QueryRegistry()
+
+
+class DimensionCache:
+    """Ograniczona pamięć LRU rekordów jednej tabeli z wykrywaniem zmian"""
+
+    def __init__(self, table, key_column, version_column=None, max_entries=5000,
+                 validate_interval=30.0, select_columns=None, record_class=Record):
+        """
+        Args:
+            table (str): Nazwa tabeli
+            key_column (str): Kolumna klucza (ID)
+            version_column (str): Kolumna wersji wiersza; None - suma kontrolna pobieranych kolumn
+            max_entries (int): Maksymalna liczba rekordów w pamięci
+            validate_interval (float): Odstęp między sprawdzeniami wersji w sekundach
+            select_columns (list): Pobierane kolumny (projekcja); None - wszystkie
+            record_class (type): Klasa rekordu (lib.order_model.Record lub pochodna)
+        """
+        self.table = validate_identifier(table)
+        self.key_column = validate_identifier(key_column)
+        if select_columns:
+            select_columns = [validate_identifier(c) for c in select_columns]
+            if self.key_column not in select_columns:
+                select_columns.insert(0, self.key_column)
+            select = ', '.join(select_columns)
+        else:
+            select = '*'
+        if version_column:
+            version = validate_identifier(version_column)
+        else:
+            version = f'BINARY_CHECKSUM({select})'
+        self.max_entries = max(int(max_entries), 1)
+        self.validate_interval = validate_interval
+        self.columns = list(select_columns) if select_columns else None
+        self.record_class = record_class
+
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_validation = time.monotonic()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+        identifiers = {'table': self.table, 'key': self.key_column}
+        self._fetch_query = f'{self.table}:fetch'
+        self._probe_query = f'{self.table}:probe'
+        self._columns_query = f'{self.table}:columns'
+        dimension_queries.register(
+            self._fetch_query,
+            f"SELECT {select}, {version} AS {VERSION_ALIAS} FROM {{table}} WHERE {{key}} IN ({{keys}})",
+            list_params=('keys',), identifiers=identifiers)
+        dimension_queries.register(
+            self._probe_query,
+            f"SELECT {{key}}, {version} FROM {{table}} WHERE {{key}} IN ({{keys}})",
+            list_params=('keys',), identifiers=identifiers)
+        dimension_queries.register(
+            self._columns_query, "SELECT TOP 0 * FROM {table}", identifiers=identifiers)
+
+    def get(self, cursor, key):
+        """
+        Zwraca rekord o podanym kluczu (kopię rekordu) lub None.
+
+        Args:
+            cursor: Kursor bazy danych używany przy braku rekordu w pamięci
+            key: Wartość klucza
+        """
+        return self.get_many(cursor, [key]).get(key)
+
+    def get_many(self, cursor, keys):
+        """
+        Zwraca rekordy dla podanych kluczy, pobierając brakujące jednym zapytaniem.
+
+        Args:
+            cursor: Kursor bazy danych
+            keys (iterable): Wartości kluczy
+
+        Returns:
+            dict: Klucz -> kopia rekordu (brak klucza, gdy rekord nie istnieje)
+        """
+        self.validate_if_due(cursor)
+
+        result = {}
+        missing = []
+        with self._lock:
+            for key in dict.fromkeys(k for k in keys if k is not None):
+                entry = self._entries.get(key)
+                if entry is None:
+                    missing.append(key)
+                    self._stats['misses'] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    result[key] = entry[1].copy()
+                    self._stats['hits'] += 1
+
+        for start in range(0, len(missing), PROBE_CHUNK):
+            for key, row in self._fetch(cursor, missing[start:start + PROBE_CHUNK]).items():
+                result[key] = row.copy()
+        return result
+
+    def _fetch(self, cursor, keys):
+        sql, params = dimension_queries.build(self._fetch_query, keys=keys)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        columns = [column[0] for column in cursor.description]
+
+        fetched = {}
+        with self._lock:
+            self.columns = columns[:-1]
+            # Ostatnia kolumna wiersza (wersja) nie należy do układu rekordu
+            layout = RecordLayout.for_columns(self.columns)
+            for row in rows:
+                record = self.record_class(layout, row)
+                key = record.get(self.key_column)
+                fetched[key] = record
+                self._entries[key] = (row[-1], record)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return fetched
+
+    def get_columns(self, cursor):
+        """Zwraca listę kolumn tabeli (zapamiętaną po pierwszym odczycie)"""
+        if self.columns is None:
+            sql, params = dimension_queries.build(self._columns_query)
+            cursor.execute(sql, params)
+            self.columns = [column[0] for column in cursor.description]
+        return self.columns
+
+    def validate_if_due(self, cursor):
+        """Sprawdza wersje rekordów, jeśli minął validate_interval"""
+        if time.monotonic() - self._last_validation >= self.validate_interval:
+            self.validate(cursor)
+
+    def validate(self, cursor):
+        """
+        Zbiorczo porównuje wersje zapamiętanych rekordów z bazą danych
+        i usuwa rekordy zmienione lub usunięte.
+
+        Returns:
+            int: Liczba usuniętych rekordów
+        """
+        self._last_validation = time.monotonic()
+        with self._lock:
+            cached = {key: entry[0] for key, entry in self._entries.items()}
+        if not cached:
+            return 0
+
+        current = {}
+        keys = list(cached)
+        try:
+            for start in range(0, len(keys), PROBE_CHUNK):
+                sql, params = dimension_queries.build(
+                    self._probe_query, keys=keys[start:start + PROBE_CHUNK])
+                cursor.execute(sql, params)
+                current.update((row[0], row[1]) for row in cursor.fetchall())
+        except Exception as e:
+            # Bez możliwości sprawdzenia wersji nie ufamy zapamiętanym rekordom
+            logger.warning(f"Nie udało się sprawdzić wersji rekordów {self.table}: {e}")
+            self.invalidate()
+            return len(cached)
+
+        stale = [key for key, version in cached.items()
+                 if key not in current or current[key] != version]
+        with self._lock:
+            for key in stale:
+                if self._entries.pop(key, None) is not None:
+                    self._stats['invalidations'] += 1
+        if stale:
+            logger.debug(f"Usunięto {len(stale)} zmienionych rekordów {self.table} z pamięci")
+        return len(stale)
+
+    def warm_up(self, cursor, keys):
+        """Wczytuje podane rekordy do pamięci"""
+        keys = list(keys)[:self.max_entries]
+        self.get_many(cursor, keys)
+        return len(keys)
+
+    def invalidate(self, key=None):
+        """Usuwa z pamięci jeden rekord lub wszystkie rekordy"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
+
+
+TOP_ARTICLES_SQL = """
+    SELECT TOP (?) ID_ARTYKULU
+    FROM POZYCJA_ZAMOWIENIA
+    WHERE ID_ARTYKULU IS NOT NULL
+    GROUP BY ID_ARTYKULU
+    ORDER BY COUNT(*) DESC
+"""
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _load_settings():
+    try:
+        from lib.config_snapshot import get_config
+        return get_config().get_dimension_cache_settings()
+    except Exception as e:
+        logger.warning(f"Nie udało się wczytać ustawień pamięci słownikowej: {e}")
+        return None
+
+
+def _get_cache(name, table, key_column, record_class, cursor=None):
+    # Każde źródło zamówień (osobna baza WAPRO) ma własne pamięci - te same ID
+    # w różnych bazach oznaczają różne rekordy
+    from lib.config_snapshot import current_source
+    key = (current_source(), name)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            settings = _load_settings() or {}
+            select_columns = None
+            if cursor is not None:
+                from lib.column_projection import get_projection
+                projection = get_projection()
+                if projection is not None:
+                    select_columns = projection.columns(cursor, table)
+            cache = DimensionCache(
+                table, key_column,
+                version_column=settings.get(f'{name}_version_column') or None,
+                max_entries=settings.get('max_entries', 5000),
+                validate_interval=settings.get('validate_interval', 30.0),
+                select_columns=select_columns,
+                record_class=record_class)
+            _caches[key] = cache
+        return cache
+
+
+def get_contractor_cache(cursor=None):
+    """
+    Zwraca wspólną pamięć rekordów KONTRAHENT. Kursor podany przy pierwszym
+    wywołaniu służy do wyznaczenia projekcji kolumn.
+    """
+    return _get_cache('contractor', 'KONTRAHENT', 'ID_KONTRAHENTA', Contractor, cursor)
+
+
+def get_article_cache(cursor=None):
+    """
+    Zwraca wspólną pamięć rekordów ARTYKUL. Kursor podany przy pierwszym
+    wywołaniu służy do wyznaczenia projekcji kolumn.
+    """
+    return _get_cache('article', 'ARTYKUL', 'ID_ARTYKULU', Article, cursor)
+
+
+def is_dimension_cache_enabled():
+    """Czy pamięć słownikowa jest włączona w konfiguracji"""
+    settings = _load_settings()
+    return settings['enabled'] if settings else False
+
+
+def warm_up_dimension_caches(db_connection, top_articles=None):
+    """
+    Wczytuje do pamięci najczęściej zamawiane artykuły.
+
+    Args:
+        db_connection: Połączenie z bazą danych
+        top_articles (int): Liczba artykułów; None - wartość z konfiguracji
+
+    Returns:
+        int: Liczba wczytanych artykułów
+    """
+    if top_articles is None:
+        settings = _load_settings() or {}
+        top_articles = settings.get('warm_up_articles', 0)
+    if top_articles <= 0:
+        return 0
+
+    cursor = db_connection.cursor()
+    try:
+        cursor.execute(TOP_ARTICLES_SQL, (top_articles,))
+        article_ids = [row[0] for row in cursor.fetchall()]
+        loaded = get_article_cache(cursor).warm_up(cursor, article_ids)
+        logger.info(f"Wczytano {loaded} najczęściej zamawianych artykułów do pamięci")
+        return loaded
+    except Exception as e:
+        logger.error(f"Błąd podczas wstępnego wczytywania artykułów: {e}")
+        return 0
+    finally:
+        cursor.close()
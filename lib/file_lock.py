@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/file_lock.py
+"""
+Blokada wyłączna plików między procesami (fcntl lub msvcrt na Windows).
+
+Używana tam, gdzie kilka procesów (np. kolejne uruchomienia sql2html, tryb
+rezydentny i skrypty jednorazowe) zapisuje wspólny plik: archiwum artefaktów,
+inwentarz drukarek thermal_printers.json.
+"""
+
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    # Windows - blokada pierwszego bajtu pliku przez msvcrt
+    fcntl = None
+    import msvcrt
+
+
+def lock_file(f):
+    """Zakłada blokadę wyłączną na otwarty plik (czeka na zwolnienie)"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def unlock_file(f):
+    """Zdejmuje blokadę założoną przez lock_file()"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def locked(path):
+    """
+    Blokada wyłączna na czas bloku ``with`` na pliku blokady ``path``
+    (tworzonym w razie potrzeby).
+
+    Args:
+        path (str): Ścieżka pliku blokady, np. ``thermal_printers.json.lock``
+    """
+    with open(path, 'a+b') as f:
+        lock_file(f)
+        try:
+            yield
+        finally:
+            unlock_file(f)
@@ -4,14 +4,28 @@
 import os
 import re
 import logging
-import configparser
+
+from lib.config_snapshot import get_config
 
 
 logger = logging.getLogger(__name__)
 
-# Wczytaj konfigurację
-config = configparser.ConfigParser()
-config.read('config.ini')
+
+def _get_files_dir(option, fallback):
+    """
+    Pobiera ścieżkę katalogu z sekcji [FILES] bieżącej migawki konfiguracji.
+
+    Args:
+        option (str): Nazwa opcji w sekcji [FILES]
+        fallback (str): Wartość domyślna, gdy brak opcji lub pliku config.ini
+
+    Returns:
+        str: Ścieżka do katalogu
+    """
+    try:
+        return get_config().get_files_dir(option, fallback)
+    except FileNotFoundError:
+        return fallback
 
 
 def get_zo_pdf_dir():
@@ -21,7 +35,7 @@ def get_zo_pdf_dir():
     Returns:
         str: Ścieżka do katalogu z plikami HTML
     """
-    return config.get('FILES', 'zo_pdf_dir', fallback='ZO_PDF')
+    return _get_files_dir('zo_pdf_dir', 'ZO_PDF')
 
 
 def get_zo_html_dir():
@@ -31,7 +45,7 @@ def get_zo_html_dir():
     Returns:
         str: Ścieżka do katalogu z plikami HTML
     """
-    return config.get('FILES', 'zo_html_dir', fallback='ZO_HTML')
+    return _get_files_dir('zo_html_dir', 'ZO_HTML')
 
 
 def get_zo_json_dir():
@@ -41,7 +55,7 @@ def get_zo_json_dir():
     Returns:
         str: Ścieżka do katalogu z plikami JSON
     """
-    return config.get('FILES', 'zo_json_dir', fallback='ZO_JSON')
+    return _get_files_dir('zo_json_dir', 'ZO_JSON')
 
 
 def get_zo_zpl_dir():
@@ -51,7 +65,7 @@ def get_zo_zpl_dir():
     Returns:
         str: Ścieżka do katalogu z plikami ZPL
     """
-    return config.get('FILES', 'zo_zpl_dir', fallback='ZO_ZPL')
+    return _get_files_dir('zo_zpl_dir', 'ZO_ZPL')
 
 
 def normalize_filename(filename):
@@ -75,17 +89,22 @@ def normalize_filename(filename):
 
 def get_printed_orders():
     """
-    Pobiera listę już wydrukowanych zamówień z folderu ZO_HTML.
+    Pobiera listę już wydrukowanych zamówień z folderu ZO_HTML
+    oraz z archiwum artefaktów (zamówienia z zapisanym HTML).
 
     Returns:
         set: Zbiór numerów zamówień, które zostały już wydrukowane
     """
+    from lib.artifact_archive import get_archive
+
+    archive = get_archive()
+    printed_orders = archive.orders('html') if archive is not None else set()
+
     zo_html_dir = get_zo_html_dir()
     if not os.path.exists(zo_html_dir):
         os.makedirs(zo_html_dir)
-        return set()
+        return printed_orders
 
-    printed_orders = set()
     for filename in os.listdir(zo_html_dir):
         if filename.endswith('.html'):
             # Usuń rozszerzenie .html
@@ -93,8 +112,9 @@ def get_printed_orders():
             # Dodaj znormalizowaną nazwę do zbioru
             printed_orders.add(normalized_name)
 
-    logger.info(
-        f"Znaleziono {len(printed_orders)} wydrukowanych zamówień: {', '.join(sorted(printed_orders))}")
+    logger.info(f"Znaleziono {len(printed_orders)} wydrukowanych zamówień")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Wydrukowane zamówienia: {', '.join(sorted(printed_orders))}")
     return printed_orders
 
 
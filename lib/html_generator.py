@@ -4,6 +4,16 @@
 import locale
 from datetime import datetime
 
+# Pola odczytywane przez szablon zamówienia (generate_order_html). Warstwa dostępu
+# do danych pobiera z tabel WAPRO tylko te kolumny (lib/column_projection.py).
+TEMPLATE_FIELDS = {
+    'order': ('NUMER', 'UWAGI', 'KOD_KRESKOWY', 'NR_ZAMOWIENIA_KLIENTA', 'KONTRAHENT_NAZWA'),
+    'contractor': ('NAZWA', 'NAZWA_PELNA', 'KOD_POCZTOWY', 'MIEJSCOWOSC', 'ULICA_LOKAL',
+                   'NIP', 'KOD_KONTRAHENTA', 'PESEL', 'KOD_KRESKOWY'),
+    'item': ('ID_ARTYKULU', 'ZAMOWIONO', 'NAZWA', 'NAZWA_CALA', 'INDEKS_KATALOGOWY',
+             'JEDNOSTKA', 'CENA_NETTO', 'CENA_BRUTTO', 'NARZUT', 'DO_REZ_USER'),
+}
+
 
 def format_currency(value):
     """Formatuje wartość walutową z separatorem tysięcy i przecinkiem."""
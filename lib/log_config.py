@@ -1,27 +1,195 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 # lib/log_config.py
-# !/usr/bin/env python
-# -*- coding: utf-8 -*-
-# lib/logger.py
 
 """
 Moduł konfigurujący system logowania dla aplikacji.
 Używa jednego pliku do logowania wszystkich komunikatów.
+
+Rekordy logów trafiają do ograniczonej kolejki (QueueHandler), a zapis do
+pliku z rotacją według rozmiaru i na konsolę wykonuje osobny wątek
+(QueueListener). Przetwarzanie zamówień nie czeka więc na operacje
+wejścia-wyjścia; gdy kolejka jest pełna, rekordy są odrzucane i liczone
+zamiast blokować wątek wywołujący.
+
+Import modułu nie otwiera pliku logów ani nie uruchamia wątku - plik
+i QueueListener powstają przy pierwszym zapisanym rekordzie, więc samo
+``import sql2html`` (np. w narzędziach i testach) nie tworzy app.log.
+
+Dodatkowo moduł udostępnia:
+- log_event - zdarzenia strukturalne w postaci ``zdarzenie klucz=wartość``,
+- log_sampled - ograniczenie liczby powtarzalnych komunikatów (np. na pozycję),
+- apply_logging_settings - poziomy logowania dla poszczególnych modułów
+  z sekcji [LOGGING] pliku config.ini.
 """
 
+import atexit
 import logging
 import os
+import queue
 import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+DEFAULT_SETTINGS = {
+    'level': 'INFO',
+    'file': '',
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 5,
+    'queue_size': 10000,
+    'sample_interval': 60.0,
+    'module_levels': {},
+}
 
 # Singleton logger - będzie zwracany przez funkcję get_logger
 logger = None
 
+_listener = None
+_queue_handler = None
+_file_settings = None
+# Czy QueueListener ma zostać uruchomiony przy pierwszym rekordzie
+_start_pending = False
+_module_loggers = set()
+_lock = threading.Lock()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler, który przy pełnej kolejce odrzuca rekord zamiast blokować"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if _start_pending and _listener is None:
+            _start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _build_handlers(log_filename, log_format, max_bytes, backup_count):
+    formatter = logging.Formatter(log_format)
+
+    # Handler do pliku z rotacją według rozmiaru
+    file_handler = RotatingFileHandler(
+        log_filename, encoding='utf-8', mode='a',
+        maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(formatter)
+
+    # Handler do konsoli
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    return [file_handler, console_handler]
+
+
+def _default_log_path():
+    # Katalog projektu (poziom wyżej od lib/log_config.py)
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(script_dir, 'app.log')
+
+
+def _start_listener():
+    """Otwiera plik logów i uruchamia wątek zapisu (przy pierwszym rekordzie)"""
+    global _listener, _start_pending
+
+    with _lock:
+        if _listener is not None or not _start_pending:
+            return
+        log_filename, log_format, max_bytes, backup_count, _ = _file_settings
+        _listener = QueueListener(
+            _queue_handler.queue, *_build_handlers(log_filename, log_format, max_bytes, backup_count),
+            respect_handler_level=True)
+        _listener.start()
+        _start_pending = False
+
+    # Rekordy trafiają do kolejki przed rekordem, który uruchomił zapis
+    logging.info("Rozpoczęto logowanie aplikacji")
+    logging.info(f"Logi są zapisywane w pliku: {log_filename}")
+
+
+def configure_logging(filename=None, format=None, max_bytes=None, backup_count=None,
+                      queue_size=None):
+    """
+    Konfiguruje (lub ponownie konfiguruje) asynchroniczne logowanie root loggera.
+    Plik logów jest otwierany, a wątek zapisu uruchamiany dopiero przy
+    pierwszym rekordzie.
+
+    Parametry:
+    - filename: Ścieżka do pliku z logami (domyślnie 'app.log' w katalogu projektu)
+    - format: Format logów
+    - max_bytes: Rozmiar pliku, po którym następuje rotacja
+    - backup_count: Liczba zachowywanych plików po rotacji
+    - queue_size: Pojemność kolejki rekordów
+
+    Zwraca:
+    - Ścieżka do pliku z logami
+    """
+    global _listener, _queue_handler, _file_settings, _start_pending
+
+    log_filename = filename or _default_log_path()
+    log_format = format or DEFAULT_FORMAT
+    max_bytes = DEFAULT_SETTINGS['max_bytes'] if max_bytes is None else max_bytes
+    backup_count = DEFAULT_SETTINGS['backup_count'] if backup_count is None else backup_count
+    queue_size = DEFAULT_SETTINGS['queue_size'] if queue_size is None else queue_size
+
+    with _lock:
+        root = logging.getLogger()
+        if _listener is not None:
+            # Opróżnij kolejkę i zamknij dotychczasowe pliki przed podmianą
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+        if _queue_handler is not None:
+            root.removeHandler(_queue_handler)
+        else:
+            # Synchroniczne handlery dodane wcześniej przez logging.basicConfig
+            # (np. niejawnie przy logging.info przed konfiguracją) zastępuje kolejka
+            for handler in list(root.handlers):
+                if type(handler) in (logging.StreamHandler, logging.FileHandler):
+                    root.removeHandler(handler)
+
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        root.addHandler(_queue_handler)
+        if root.level == logging.WARNING:
+            # Poziom domyślny Pythona - jak dotąd logujemy od INFO
+            root.setLevel(logging.INFO)
+        _file_settings = (log_filename, log_format, max_bytes, backup_count, queue_size)
+        _start_pending = True
+    return log_filename
+
+
+def shutdown_logging():
+    """Zapisuje rekordy oczekujące w kolejce i zatrzymuje wątek logowania"""
+    global _listener, _start_pending
+
+    with _lock:
+        # Rekordy zapisane po zamknięciu nie uruchamiają ponownie wątku
+        _start_pending = False
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                try:
+                    handler.flush()
+                except (OSError, ValueError):
+                    # Strumień konsoli mógł zostać już zamknięty
+                    pass
+            _listener = None
+
+
+atexit.register(shutdown_logging)
+
 
 def get_logger(filename=None, format=None):
     """
     Konfiguruje i zwraca moduł logging.
     Parametry filename i format są opcjonalne - domyślnie używa centralnej konfiguracji.
+    Plik logów powstaje dopiero przy pierwszym zapisanym rekordzie.
 
     Parametry:
     - filename: Opcjonalna ścieżka do pliku z logami (domyślnie 'app.log' w katalogu skryptu)
@@ -36,44 +204,153 @@ def get_logger(filename=None, format=None):
     if logger:
         return logger
 
-    # Pobierz ścieżkę do katalogu skryptu (dwa poziomy wyżej od lib/logger.py)
-    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    configure_logging(filename, format)
 
-    # Określ nazwę pliku logów
-    log_filename = filename if filename else os.path.join(
-        script_dir, 'app.log')
+    # Zapisz logger jako singleton
+    logger = logging
 
-    # Określ format logów
-    log_format = format if format else '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    # Zwróć moduł logging
+    return logger
 
-    # Konfiguracja formatu logów
-    formatter = logging.Formatter(log_format)
 
-    # Handler do pliku
-    file_handler = logging.FileHandler(
-        log_filename, encoding='utf-8', mode='a')
-    file_handler.setFormatter(formatter)
+def _parse_level(level):
+    if isinstance(level, str):
+        return logging.getLevelName(level.strip().upper())
+    return level
 
-    # Handler do konsoli
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
 
-    # Konfiguracja root loggera
-    logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        handlers=[file_handler, console_handler]
-    )
+def apply_logging_settings(settings):
+    """
+    Stosuje ustawienia z sekcji [LOGGING] (ConfigManager.get_logging_settings).
+    Zmiana pliku, rotacji lub pojemności kolejki powoduje podmianę handlerów,
+    a poziomy modułów usunięte z konfiguracji wracają do poziomu domyślnego.
 
-    # Zapisz logger jako singleton
-    logger = logging
+    Parametry:
+    - settings: Słownik ustawień (level, file, max_bytes, backup_count,
+      queue_size, sample_interval, module_levels)
+    """
+    get_logger()
 
-    # Dodaj informację o rozpoczęciu logowania
-    logger.info("Rozpoczęto logowanie aplikacji")
-    logger.info(f"Logi są zapisywane w pliku: {log_filename}")
+    file_settings = (settings.get('file') or _default_log_path(), _file_settings[1],
+                     settings.get('max_bytes', DEFAULT_SETTINGS['max_bytes']),
+                     settings.get('backup_count', DEFAULT_SETTINGS['backup_count']),
+                     settings.get('queue_size', DEFAULT_SETTINGS['queue_size']))
+    if file_settings != _file_settings:
+        configure_logging(*file_settings)
+
+    level = _parse_level(settings.get('level', DEFAULT_SETTINGS['level']))
+    if isinstance(level, int):
+        logging.getLogger().setLevel(level)
+
+    module_levels = settings.get('module_levels') or {}
+    with _lock:
+        for name in _module_loggers - set(module_levels):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+        for name, module_level in module_levels.items():
+            module_level = _parse_level(module_level)
+            if isinstance(module_level, int):
+                logging.getLogger(name).setLevel(module_level)
+        _module_loggers.clear()
+        _module_loggers.update(module_levels)
+
+    _sampler.interval = settings.get('sample_interval', DEFAULT_SETTINGS['sample_interval'])
+
+
+def get_logging_stats():
+    """Zwraca liczbę rekordów oczekujących w kolejce i odrzuconych przy jej przepełnieniu"""
+    handler = _queue_handler
+    if handler is None:
+        return {'queued': 0, 'dropped': 0, 'suppressed': _sampler.suppressed_total}
+    return {'queued': handler.queue.qsize(), 'dropped': handler.dropped,
+            'suppressed': _sampler.suppressed_total}
 
-    # Zwróć moduł logging
-    return logger
+
+def _format_value(value):
+    text = str(value)
+    if not text or any(c in text for c in ' ="'):
+        text = '"' + text.replace('"', '\\"') + '"'
+    return text
+
+
+def format_event(event, **fields):
+    """Zwraca zdarzenie w postaci ``zdarzenie klucz=wartość klucz2=wartość``"""
+    if not fields:
+        return event
+    return event + ' ' + ' '.join(f"{key}={_format_value(value)}" for key, value in fields.items())
+
+
+def log_event(log, event, level=logging.INFO, **fields):
+    """
+    Zapisuje zdarzenie strukturalne. Tekst komunikatu jest budowany tylko,
+    gdy poziom jest włączony; pola są też dostępne w rekordzie
+    (record.event, record.fields) dla handlerów strukturalnych.
+
+    Parametry:
+    - log: Obiekt logger
+    - event: Nazwa zdarzenia, np. 'order.items'
+    - level: Poziom logowania
+    - fields: Pola zdarzenia
+    """
+    if log.isEnabledFor(level):
+        log.log(level, format_event(event, **fields),
+                extra={'event': event, 'fields': fields})
+
+
+class _Sampler:
+    """Przepuszcza jeden komunikat na klucz w danym odstępie czasu"""
+
+    def __init__(self, interval, max_keys=1024):
+        self.interval = interval
+        self.max_keys = max_keys
+        self.suppressed_total = 0
+        self._last = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key, interval=None):
+        """Zwraca (czy zapisać komunikat, liczba pominiętych od poprzedniego zapisu)"""
+        interval = self.interval if interval is None else interval
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                self.suppressed_total += 1
+                return False, 0
+            # Ponowne wstawienie utrzymuje słownik w kolejności ostatniego zapisu
+            self._last.pop(key, None)
+            self._last[key] = now
+            while len(self._last) > self.max_keys:
+                oldest = next(iter(self._last))
+                del self._last[oldest]
+                self._suppressed.pop(oldest, None)
+            return True, self._suppressed.pop(key, 0)
+
+
+_sampler = _Sampler(DEFAULT_SETTINGS['sample_interval'])
+
+
+def log_sampled(log, key, message, level=logging.INFO, interval=None):
+    """
+    Zapisuje komunikat co najwyżej raz na ``interval`` sekund dla danego klucza
+    (domyślnie sample_interval z [LOGGING]). Liczba pominiętych komunikatów
+    jest dopisywana do następnego zapisanego.
+
+    Parametry:
+    - log: Obiekt logger
+    - key: Klucz grupujący powtarzalne komunikaty (stały, np. 'skip_printed';
+      zmienne wartości należy umieszczać w treści komunikatu)
+    - message: Treść komunikatu
+    - level: Poziom logowania
+    - interval: Odstęp w sekundach
+    """
+    if not log.isEnabledFor(level):
+        return
+    allowed, suppressed = _sampler.allow(key, interval)
+    if allowed:
+        if suppressed:
+            message = f"{message} (pominięto {suppressed} podobnych komunikatów)"
+        log.log(level, message)
 
 
 # Funkcja do uzyskania ścieżki do pliku logów
@@ -84,17 +361,9 @@ def get_log_path():
     Zwraca:
     - Ścieżka do pliku logów lub None, jeśli logger nie został jeszcze skonfigurowany
     """
-    global logger
-
-    if not logger:
+    if not logger or _file_settings is None:
         return None
-
-    # Próbujemy znaleźć handler pliku
-    for handler in logging.root.handlers:
-        if isinstance(handler, logging.FileHandler):
-            return handler.baseFilename
-
-    return None
+    return _file_settings[0]
 
 
 # Funkcja do zmiany poziomu logowania
@@ -109,8 +378,6 @@ def set_log_level(level):
         level = getattr(logging, level.upper())
 
     logging.root.setLevel(level)
-    for handler in logging.root.handlers:
-        handler.setLevel(level)
 
     logging.info(
         f"Zmieniono poziom logowania na: {logging.getLevelName(level)}")
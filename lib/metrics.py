@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/metrics.py
+"""
+Metryki przetwarzania zamówień: liczniki, wskaźniki i histogramy czasu.
+
+Każdy etap obsługi zamówienia (pobranie z bazy, generowanie HTML,
+renderowanie w Chromium, przycinanie PDF, kodowanie i walidacja ZPL,
+wysyłka do drukarki) jest mierzony w histogramie o stałych przedziałach
+``waproprint_stage_duration_seconds{stage, printer}``. Na tej podstawie
+liczone są percentyle p50/p90/p99 w migawce JSON, a Prometheus może je
+wyznaczyć funkcją histogram_quantile.
+
+Metryki są udostępniane:
+- lokalnie przez HTTP w formacie tekstowym Prometheusa (``/metrics``)
+  oraz JSON (``/metrics.json``),
+- okresowo zapisywanym plikiem JSON z migawką wszystkich metryk.
+
+Użycie w kodzie:
+    with stage_timer('render', printer=printer_id):
+        ...
+
+stage_timer tworzy jednocześnie span śledzenia zamówienia (lib.tracing).
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lib.log_config import get_logger
+from lib.tracing import span
+
+logger = get_logger().getLogger(__name__)
+
+# Przedziały histogramów czasu w sekundach
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Przedziały czasu oczekiwania zamówienia w kolejce (od utworzenia do wydruku)
+QUEUE_WAIT_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 900.0, 1800.0, 3600.0, 7200.0, 14400.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Wspólna część metryk z etykietami"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """Zwraca metrykę dla podanych wartości etykiet"""
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Licznik rosnący"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+
+class Gauge(_Metric):
+    """Wskaźnik o dowolnej bieżącej wartości"""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value, **labels):
+        self.labels(**labels).set(value)
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def cumulative(self):
+        """Zwraca [(górna granica, liczba obserwacji <= granica)] łącznie z +Inf"""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        result = []
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            result.append((bound, running))
+        result.append((float('inf'), total))
+        return result
+
+    def quantile(self, q):
+        """
+        Szacuje kwantyl tak jak histogram_quantile w Prometheusie
+        (interpolacja liniowa w przedziale).
+
+        Returns:
+            float: Wartość kwantyla lub None, gdy brak obserwacji
+        """
+        cumulative = self.cumulative()
+        total = cumulative[-1][1]
+        if total == 0:
+            return None
+        rank = q * total
+        lower_bound, lower_count = 0.0, 0
+        for bound, count in cumulative:
+            if count >= rank:
+                if bound == float('inf'):
+                    # Powyżej ostatniego przedziału - zwracamy jego granicę
+                    return self.buckets[-1]
+                if count == lower_count:
+                    return bound
+                return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+            lower_bound, lower_count = bound, count
+        return self.buckets[-1]
+
+
+class Histogram(_Metric):
+    """Histogram o stałych przedziałach"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+
+class MetricsRegistry:
+    """Zbiór metryk aplikacji"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metryka {name} jest już zarejestrowana jako {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labels, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def render_prometheus(self):
+        """Zwraca wszystkie metryki w formacie tekstowym Prometheusa"""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, child in metric._items():
+                if metric.kind == 'histogram':
+                    for bound, count in child.cumulative():
+                        labels = _format_labels(metric.label_names, key, f'le="{_format_number(bound)}"')
+                        lines.append(f"{metric.name}_bucket{labels} {count}")
+                    labels = _format_labels(metric.label_names, key)
+                    lines.append(f"{metric.name}_sum{labels} {_format_number(child.sum)}")
+                    lines.append(f"{metric.name}_count{labels} {child.count}")
+                else:
+                    labels = _format_labels(metric.label_names, key)
+                    lines.append(f"{metric.name}{labels} {_format_number(float(child.value))}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """
+        Zwraca migawkę metryk jako słownik (histogramy z liczbą obserwacji,
+        sumą i percentylami p50/p90/p99).
+        """
+        result = {'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'metrics': {}}
+        for metric in self.metrics():
+            series = []
+            for key, child in metric._items():
+                entry = {'labels': dict(zip(metric.label_names, key))}
+                if metric.kind == 'histogram':
+                    entry.update(count=child.count, sum=round(child.sum, 6))
+                    for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+                        value = child.quantile(q)
+                        entry[name] = round(value, 6) if value is not None else None
+                else:
+                    entry['value'] = child.value
+                series.append(entry)
+            result['metrics'][metric.name] = {'type': metric.kind, 'series': series}
+        return result
+
+    def write_snapshot(self, path):
+        """Zapisuje migawkę JSON atomowo (plik tymczasowy + os.replace)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+# Domyślny rejestr i metryki etapów przetwarzania
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'waproprint_stage_duration_seconds', 'Czas etapu przetwarzania zamówienia',
+    labels=('stage', 'printer'))
+STAGE_ERRORS = registry.counter(
+    'waproprint_stage_errors_total', 'Liczba błędów etapów przetwarzania',
+    labels=('stage', 'printer'))
+ORDERS = registry.counter(
+    'waproprint_orders_total', 'Liczba przetworzonych zamówień według wyniku',
+    labels=('result', 'printer'))
+LAST_ORDER = registry.gauge(
+    'waproprint_last_order_timestamp_seconds', 'Czas zakończenia ostatniego zamówienia (epoch)',
+    labels=('printer',))
+QUEUE_WAIT = registry.histogram(
+    'waproprint_queue_wait_seconds', 'Czas od utworzenia zamówienia do przekazania do wydruku',
+    labels=('priority', 'printer'), buckets=QUEUE_WAIT_BUCKETS)
+SLA_MISSED = registry.counter(
+    'waproprint_sla_missed_total', 'Liczba zamówień przekazanych do wydruku po terminie SLA',
+    labels=('priority', 'printer'))
+
+
+def observe_stage(stage, seconds, printer=''):
+    """Zapisuje czas etapu w histogramie"""
+    STAGE_SECONDS.labels(stage=stage, printer=printer).observe(seconds)
+
+
+@contextmanager
+def stage_timer(stage, printer=''):
+    """
+    Mierzy czas bloku jako etap ``stage``; wyjątek jest liczony jako błąd
+    etapu i przekazywany dalej. W śledzonym zamówieniu blok jest też
+    spanem o nazwie etapu (lib.tracing).
+    """
+    start = time.perf_counter()
+    try:
+        with span(stage, printer=printer) if printer else span(stage):
+            yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage=stage, printer=printer).inc()
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start, printer)
+
+
+def record_stage_error(stage, printer=''):
+    """Zlicza błąd etapu zgłoszony wynikiem (bez wyjątku), np. odrzucony wydruk"""
+    STAGE_ERRORS.labels(stage=stage, printer=printer).inc()
+
+
+def record_order(result, printer=''):
+    """Zlicza zakończone zamówienie ('printed', 'failed', ...)"""
+    ORDERS.labels(result=result, printer=printer).inc()
+    LAST_ORDER.labels(printer=printer).set(time.time())
+
+
+def observe_queue_wait(priority, seconds, deadline_missed=False, printer=''):
+    """Zapisuje czas oczekiwania zamówienia klasy ``priority`` (i przekroczenie SLA)"""
+    QUEUE_WAIT.labels(priority=priority, printer=printer).observe(max(seconds, 0.0))
+    if deadline_missed:
+        SLA_MISSED.labels(priority=priority, printer=printer).inc()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = registry
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            body = self.registry.render_prometheus().encode('utf-8')
+            content_type = PROMETHEUS_CONTENT_TYPE
+        elif path == '/metrics.json':
+            body = json.dumps(self.registry.snapshot(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metryki HTTP: {format % args}")
+
+
+class MetricsService:
+    """Serwer HTTP metryk i okresowy zapis migawki JSON w wątkach w tle"""
+
+    def __init__(self, metrics_registry=None, host='127.0.0.1', port=9464,
+                 snapshot_file=None, snapshot_interval=60.0):
+        """
+        Args:
+            metrics_registry (MetricsRegistry): Rejestr metryk (domyślnie wspólny)
+            host (str): Adres nasłuchiwania serwera HTTP
+            port (int): Port serwera HTTP (0 - wybrany przez system); None - bez serwera
+            snapshot_file (str): Plik migawki JSON; None - bez zapisu
+            snapshot_interval (float): Odstęp między zapisami migawki w sekundach
+        """
+        self.registry = metrics_registry or registry
+        self.host = host
+        self.port = port
+        self.snapshot_file = snapshot_file
+        self.snapshot_interval = snapshot_interval
+        self._server = None
+        self._threads = []
+        self._stop_event = threading.Event()
+
+    def start(self):
+        self._stop_event.clear()
+        if self.port is not None:
+            handler = type('MetricsRequestHandler', (_MetricsRequestHandler,),
+                           {'registry': self.registry})
+            try:
+                self._server = ThreadingHTTPServer((self.host, self.port), handler)
+                self._server.daemon_threads = True
+            except OSError as e:
+                logger.error(f"Nie udało się uruchomić serwera metryk na {self.host}:{self.port}: {e}")
+                self._server = None
+            else:
+                # Rzeczywisty port (przy port=0 w testach wybiera go system)
+                self.port = self._server.server_address[1]
+                self._start_thread(self._server.serve_forever, 'metrics-http')
+                logger.info(f"Metryki dostępne pod adresem http://{self.host}:{self.port}/metrics")
+        if self.snapshot_file:
+            self._start_thread(self._snapshot_loop, 'metrics-snapshot')
+        return self
+
+    def _start_thread(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _snapshot_loop(self):
+        while not self._stop_event.wait(self.snapshot_interval):
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        try:
+            self.registry.write_snapshot(self.snapshot_file)
+        except Exception as e:
+            logger.warning(f"Nie udało się zapisać migawki metryk: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self.snapshot_file:
+            self._write_snapshot()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def start_metrics_service(config=None):
+    """
+    Uruchamia (jednokrotnie) usługę metryk zgodnie z sekcją [METRICS].
+
+    Args:
+        config: Migawka konfiguracji; None - get_config()
+
+    Returns:
+        MetricsService lub None, gdy metryki są wyłączone
+    """
+    global _service
+
+    if config is None:
+        from lib.config_snapshot import get_config
+        config = get_config()
+    settings = config.get_metrics_settings()
+    if not settings['enabled']:
+        return None
+
+    with _service_lock:
+        if _service is None:
+            _service = MetricsService(
+                host=settings['host'], port=settings['port'] or None,
+                snapshot_file=settings['snapshot_file'] or None,
+                snapshot_interval=settings['snapshot_interval']).start()
+        return _service
+
+
+def stop_metrics_service():
+    """Zatrzymuje usługę metryk i zapisuje ostatnią migawkę"""
+    global _service
+
+    with _service_lock:
+        service, _service = _service, None
+    if service is not None:
+        service.stop()
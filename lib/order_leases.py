@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/order_leases.py
+"""
+Dzierżawy zamówień w bazie (tabela WaproPrintLease) dla wielu instancji sql2html.
+
+Bez dzierżaw każda instancja sprawdza tylko lokalny katalog ZO_HTML, więc dwa
+węzły drukują te same zamówienia. Z dzierżawami:
+
+- register() dopisuje numery dzisiejszych zamówień do tabeli (idempotentnie)
+  wraz z kluczem kolejki PRIORITY_KEY (wirtualny czas przybycia z [PRIORITY]),
+- claim() przejmuje partię wolnych zamówień jedną instrukcją UPDATE: na SQL
+  Server z podpowiedziami UPDLOCK/READPAST (węzły pomijają wiersze zablokowane
+  przez innych zamiast na nie czekać) i OUTPUT, w emulatorze przez RETURNING,
+- dzierżawa wygasa po ``lease_seconds``; wątek heartbeat odnawia dzierżawy
+  węzła co ``heartbeat_interval`` sekund na osobnym połączeniu,
+- zamówienie, którego dzierżawa wygasła (węzeł padł lub się zawiesił), przejmuje
+  inny węzeł; po ``max_attempts`` takich przejęciach zamówienie dostaje status
+  FAILED (zamówienie powodujące awarię węzła nie zatrzymuje całej kolejki),
+- renew(), complete() i release() działają tylko na dzierżawach, których
+  właścicielem nadal jest węzeł (OWNER), więc węzeł, któremu przejęto
+  zamówienie, nie oznaczy go ani nie wyśle ponownie.
+
+Wysyłka do drukarki i complete() nie są jedną transakcją: awaria węzła między
+nimi oznacza ponowny wydruk po przejęciu (co najmniej jedna wysyłka).
+"""
+
+import os
+import socket
+import threading
+import time
+
+from lib.log_config import get_logger
+
+logger = get_logger().getLogger(__name__)
+
+LEASE_TABLE = 'WaproPrintLease'
+
+STATUS_PENDING = 'PENDING'
+STATUS_DONE = 'DONE'
+STATUS_FAILED = 'FAILED'
+
+# Migracje schematu - każda jest idempotentna i wykonywana w podanej kolejności
+MIGRATIONS = [
+    ('create_lease_table', f"""
+        IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{LEASE_TABLE}')
+        BEGIN
+            CREATE TABLE {LEASE_TABLE} (
+                ORDER_KEY VARCHAR(60) NOT NULL PRIMARY KEY,
+                STATUS VARCHAR(10) NOT NULL DEFAULT '{STATUS_PENDING}',
+                OWNER VARCHAR(100) NULL,
+                LEASE_UNTIL DATETIME NULL,
+                CLAIM_COUNT INT NOT NULL DEFAULT 0,
+                EXPIRED_COUNT INT NOT NULL DEFAULT 0,
+                CREATED_DATE DATETIME DEFAULT GETDATE(),
+                DONE_DATE DATETIME NULL,
+                PRIORITY_KEY FLOAT NULL
+            );
+        END
+    """),
+    ('index_status_lease', f"""
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'IX_{LEASE_TABLE}_STATUS'
+                       AND object_id = OBJECT_ID('{LEASE_TABLE}'))
+        BEGIN
+            CREATE NONCLUSTERED INDEX IX_{LEASE_TABLE}_STATUS
+                ON {LEASE_TABLE} (STATUS, LEASE_UNTIL) INCLUDE (OWNER, CREATED_DATE, PRIORITY_KEY);
+        END
+    """),
+]
+
+# Wiersz jest wolny, gdy czeka na wydruk i nikt nie ma ważnej dzierżawy
+_AVAILABLE = (f"STATUS = '{STATUS_PENDING}' "
+              f"AND (LEASE_UNTIL IS NULL OR LEASE_UNTIL <= GETDATE())")
+
+# Przejęcie partii: parametry (limit, max_attempts, owner, lease_seconds)
+CLAIM_SQL = {
+    'mssql': f"""
+        SET NOCOUNT ON;
+        WITH candidates AS (
+            SELECT TOP (?) *
+            FROM {LEASE_TABLE} WITH (ROWLOCK, UPDLOCK, READPAST)
+            WHERE {_AVAILABLE}
+              AND EXPIRED_COUNT + CASE WHEN OWNER IS NULL THEN 0 ELSE 1 END < ?
+            ORDER BY PRIORITY_KEY, CREATED_DATE, ORDER_KEY
+        )
+        UPDATE candidates
+        SET EXPIRED_COUNT = EXPIRED_COUNT + CASE WHEN OWNER IS NULL THEN 0 ELSE 1 END,
+            OWNER = ?,
+            LEASE_UNTIL = DATEADD(second, ?, GETDATE()),
+            CLAIM_COUNT = CLAIM_COUNT + 1
+        OUTPUT inserted.ORDER_KEY;
+    """,
+    # SQLite nie ma UPDATE na CTE ani blokad wierszy - instrukcja zapisu jest
+    # i tak wykonywana pod blokadą całej bazy, więc partie węzłów są rozłączne
+    'sqlite': f"""
+        UPDATE {LEASE_TABLE}
+        SET EXPIRED_COUNT = EXPIRED_COUNT + CASE WHEN OWNER IS NULL THEN 0 ELSE 1 END,
+            OWNER = ?,
+            LEASE_UNTIL = DATEADD(second, ?, GETDATE()),
+            CLAIM_COUNT = CLAIM_COUNT + 1
+        WHERE ORDER_KEY IN (
+            SELECT ORDER_KEY FROM {LEASE_TABLE}
+            WHERE {_AVAILABLE}
+              AND EXPIRED_COUNT + CASE WHEN OWNER IS NULL THEN 0 ELSE 1 END < ?
+            ORDER BY PRIORITY_KEY, CREATED_DATE, ORDER_KEY
+            LIMIT ?
+        )
+        RETURNING ORDER_KEY
+    """,
+}
+
+# Dopisanie zamówienia do kolejki, jeśli jeszcze go w niej nie ma
+REGISTER_SQL = {
+    'mssql': f"""
+        INSERT INTO {LEASE_TABLE} (ORDER_KEY, PRIORITY_KEY)
+        SELECT ?, ? WHERE NOT EXISTS (
+            SELECT 1 FROM {LEASE_TABLE} WITH (UPDLOCK, HOLDLOCK) WHERE ORDER_KEY = ?)
+    """,
+    'sqlite': f"INSERT OR IGNORE INTO {LEASE_TABLE} (ORDER_KEY, PRIORITY_KEY) VALUES (?, ?)",
+}
+
+# Zamówienia porzucone zbyt wiele razy (dzierżawa wygasła u kolejnych węzłów)
+QUARANTINE_SQL = f"""
+    UPDATE {LEASE_TABLE}
+    SET STATUS = '{STATUS_FAILED}', OWNER = NULL, LEASE_UNTIL = NULL, DONE_DATE = GETDATE()
+    WHERE {_AVAILABLE} AND OWNER IS NOT NULL AND EXPIRED_COUNT + 1 >= ?
+"""
+
+_OWNED = f"OWNER = ? AND STATUS = '{STATUS_PENDING}'"
+
+RENEW_SQL = f"UPDATE {LEASE_TABLE} SET LEASE_UNTIL = DATEADD(second, ?, GETDATE()) WHERE ORDER_KEY = ? AND {_OWNED}"
+RENEW_ALL_SQL = f"UPDATE {LEASE_TABLE} SET LEASE_UNTIL = DATEADD(second, ?, GETDATE()) WHERE {_OWNED}"
+COMPLETE_SQL = (f"UPDATE {LEASE_TABLE} SET STATUS = ?, LEASE_UNTIL = NULL, DONE_DATE = GETDATE() "
+                f"WHERE ORDER_KEY = ? AND {_OWNED}")
+# Zwolnienie po nieudanym wydruku: OWNER = NULL (to nie jest porzucenie),
+# a LEASE_UNTIL opóźnia ponowną próbę o retry_delay sekund
+RELEASE_SQL = (f"UPDATE {LEASE_TABLE} SET OWNER = NULL, LEASE_UNTIL = DATEADD(second, ?, GETDATE()) "
+               f"WHERE ORDER_KEY = ? AND {_OWNED}")
+PURGE_SQL = f"DELETE FROM {LEASE_TABLE} WHERE CREATED_DATE < DATEADD(day, -?, CAST(GETDATE() AS DATE))"
+
+# Odstęp między czyszczeniami starych wierszy (sekundy)
+PURGE_INTERVAL = 3600
+
+
+def ensure_lease_schema(cursor):
+    """
+    Wykonuje migracje schematu tabeli dzierżaw.
+
+    Args:
+        cursor: Kursor bazy danych (SQL Server lub emulator)
+    """
+    for name, sql in MIGRATIONS:
+        cursor.execute(sql)
+        logger.debug(f"Migracja dzierżaw zamówień: {name}")
+    cursor.connection.commit()
+    logger.info("Schemat dzierżaw zamówień jest aktualny")
+
+
+def default_owner():
+    """Identyfikator węzła: nazwa hosta i PID (kilka procesów na jednym hoście)"""
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+class OrderLeases:
+    """Kolejka zamówień współdzielona przez węzły przez dzierżawy w bazie"""
+
+    def __init__(self, connection, owner=None, dialect='mssql', lease_seconds=120,
+                 heartbeat_interval=None, max_attempts=3, retry_delay=30,
+                 retention_days=7, connect=None):
+        """
+        Args:
+            connection: Połączenie DB-API używane przez wątek przetwarzający zamówienia
+            owner (str): Identyfikator węzła (domyślnie host:pid)
+            dialect (str): 'mssql' (SQL Server) lub 'sqlite' (emulator WAPRO)
+            lease_seconds (int): Czas ważności dzierżawy
+            heartbeat_interval (float): Odstęp odnawiania dzierżaw (domyślnie lease_seconds / 3)
+            max_attempts (int): Liczba porzuceń, po której zamówienie dostaje status FAILED
+            retry_delay (int): Opóźnienie ponownej próby po zwolnieniu zamówienia
+            retention_days (int): Po ilu dniach wiersze są usuwane z tabeli
+            connect: Funkcja otwierająca osobne połączenie dla wątku heartbeat
+        """
+        if dialect not in CLAIM_SQL:
+            raise ValueError(f"Nieobsługiwany dialekt: {dialect}")
+        self.connection = connection
+        self.owner = owner or default_owner()
+        self.dialect = dialect
+        self.lease_seconds = max(int(lease_seconds), 1)
+        self.heartbeat_interval = heartbeat_interval or self.lease_seconds / 3
+        self.max_attempts = max(int(max_attempts), 1)
+        self.retry_delay = max(int(retry_delay), 1)
+        self.retention_days = max(int(retention_days), 1)
+        self.connect = connect
+        self.held = set()
+        self.lost = 0
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _execute(self, sql, params, fetch=False, connection=None):
+        connection = connection or self.connection
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if fetch else None
+            count = cursor.rowcount
+            connection.commit()
+            return rows if fetch else count
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def register(self, order_keys, priority_keys=None):
+        """
+        Dopisuje zamówienia do kolejki; istniejące wiersze (także wydrukowane
+        przez inne węzły) pozostają bez zmian.
+
+        Args:
+            order_keys: Numery zamówień
+            priority_keys (dict): Klucz kolejki (epoch, mniejszy - pilniejszy) dla
+                numeru zamówienia; brakujące dostają bieżący czas (kolejność rejestracji)
+
+        Returns:
+            int: Liczba zarejestrowanych numerów
+        """
+        keys = list(dict.fromkeys(order_keys))
+        if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+            self.purge()
+        if not keys:
+            return 0
+        now = time.time()
+        priority_keys = priority_keys or {}
+        if self.dialect == 'mssql':
+            params = [(key, priority_keys.get(key, now), key) for key in keys]
+        else:
+            params = [(key, priority_keys.get(key, now)) for key in keys]
+        cursor = self.connection.cursor()
+        try:
+            cursor.executemany(REGISTER_SQL[self.dialect], params)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        return len(keys)
+
+    def claim(self, limit=1):
+        """
+        Przejmuje do ``limit`` wolnych zamówień (najmniejszy PRIORITY_KEY,
+        potem najstarsze najpierw).
+
+        Args:
+            limit (int): Maksymalna liczba zamówień
+
+        Returns:
+            list: Numery przejętych zamówień
+        """
+        quarantined = self._execute(QUARANTINE_SQL, (self.max_attempts,))
+        if quarantined > 0:
+            logger.error(f"Zamówienia porzucone {self.max_attempts} razy oznaczono jako "
+                         f"{STATUS_FAILED}: {quarantined}")
+        if self.dialect == 'mssql':
+            params = (limit, self.max_attempts, self.owner, self.lease_seconds)
+        else:
+            params = (self.owner, self.lease_seconds, self.max_attempts, limit)
+        keys = [row[0] for row in self._execute(CLAIM_SQL[self.dialect], params, fetch=True)]
+        with self._lock:
+            self.held.update(keys)
+        if keys:
+            logger.debug(f"Węzeł {self.owner} przejął zamówienia: {', '.join(keys)}")
+        return keys
+
+    def renew(self, order_key):
+        """
+        Przedłuża dzierżawę zamówienia tuż przed wysyłką do drukarki.
+
+        Args:
+            order_key (str): Numer zamówienia
+
+        Returns:
+            bool: False, gdy zamówienie przejął inny węzeł (nie wolno go drukować)
+        """
+        if self._execute(RENEW_SQL, (self.lease_seconds, order_key, self.owner)) == 1:
+            return True
+        self._forget(order_key, lost=True)
+        return False
+
+    def complete(self, order_key, status=STATUS_DONE):
+        """
+        Oznacza zamówienie jako zakończone.
+
+        Args:
+            order_key (str): Numer zamówienia
+            status (str): DONE lub FAILED
+
+        Returns:
+            bool: False, gdy dzierżawa została wcześniej przejęta przez inny węzeł
+        """
+        done = self._execute(COMPLETE_SQL, (status, order_key, self.owner)) == 1
+        self._forget(order_key, lost=not done)
+        return done
+
+    def release(self, order_key, retry_delay=None):
+        """
+        Zwalnia zamówienie po nieudanej próbie; ponowna próba (na dowolnym
+        węźle) po ``retry_delay`` sekundach.
+
+        Args:
+            order_key (str): Numer zamówienia
+            retry_delay (int): Opóźnienie ponownej próby (domyślnie z konstruktora)
+
+        Returns:
+            bool: False, gdy dzierżawa została wcześniej przejęta przez inny węzeł
+        """
+        delay = self.retry_delay if retry_delay is None else max(int(retry_delay), 0)
+        released = self._execute(RELEASE_SQL, (delay, order_key, self.owner)) == 1
+        self._forget(order_key, lost=not released)
+        return released
+
+    def _forget(self, order_key, lost=False):
+        with self._lock:
+            self.held.discard(order_key)
+            if lost:
+                self.lost += 1
+        if lost:
+            logger.warning(f"Dzierżawa zamówienia {order_key} została przejęta przez inny węzeł")
+
+    def renew_all(self, connection=None):
+        """
+        Odnawia wszystkie dzierżawy węzła (heartbeat).
+
+        Args:
+            connection: Połączenie wątku heartbeat (domyślnie połączenie główne)
+
+        Returns:
+            int: Liczba odnowionych dzierżaw
+        """
+        with self._lock:
+            held = len(self.held)
+        if not held:
+            return 0
+        renewed = self._execute(RENEW_ALL_SQL, (self.lease_seconds, self.owner),
+                                connection=connection)
+        if renewed < held:
+            logger.warning(f"Odnowiono {renewed} z {held} dzierżaw węzła {self.owner} - "
+                           f"część zamówień przejęły inne węzły")
+        return renewed
+
+    def purge(self):
+        """Usuwa wiersze starsze niż retention_days"""
+        self._last_purge = time.monotonic()
+        deleted = self._execute(PURGE_SQL, (self.retention_days,))
+        if deleted > 0:
+            logger.info(f"Usunięto {deleted} starych wierszy z {LEASE_TABLE}")
+        return deleted
+
+    def start_heartbeat(self):
+        """Uruchamia wątek odnawiający dzierżawy na osobnym połączeniu"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True,
+                                        name='OrderLeaseHeartbeat')
+        self._thread.start()
+
+    def stop_heartbeat(self, timeout=5.0):
+        """Zatrzymuje wątek heartbeat"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _heartbeat(self):
+        connection = None
+        while not self._stop_event.wait(self.heartbeat_interval):
+            try:
+                if connection is None and self.connect is not None:
+                    connection = self.connect()
+                self.renew_all(connection)
+            except Exception as e:
+                logger.error(f"Błąd odnawiania dzierżaw zamówień: {str(e)}")
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                    connection = None
+        if connection is not None:
+            connection.close()
+
+    def stats(self):
+        """Zwraca stan dzierżaw węzła (odpowiedź status trybu rezydentnego)"""
+        with self._lock:
+            return {'owner': self.owner, 'held': sorted(self.held), 'lost': self.lost}
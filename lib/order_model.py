@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/order_model.py
+"""
+Zwarte rekordy zamówień (Order, Contractor, Article, OrderLine).
+
+Rekord przechowuje wiersz z bazy (pyodbc.Row lub krotkę) bez kopiowania oraz
+wspólny dla wszystkich wierszy zapytania układ kolumn - słownik
+nazwa kolumny -> indeks tworzony raz dla danego zestawu kolumn. Klasy używają
+__slots__, więc pojedynczy rekord zajmuje kilka wskaźników zamiast pełnego
+słownika z setkami kluczy.
+
+OrderLine nie łączy słowników artykułu i pozycji - odczyt sprawdza najpierw
+pozycję zamówienia, a potem (współdzielony) rekord artykułu.
+
+Rekordy implementują collections.abc.Mapping, dlatego szablon HTML
+(item.get(...)) i zapis JSON działają bez zmian. Przypisanie
+``rekord[klucz] = wartość`` zapisuje wartość nadpisującą w rekordzie,
+nie zmieniając wiersza źródłowego.
+
+Benchmark:
+    python -m lib.order_model --benchmark
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+from collections.abc import Mapping
+from decimal import Decimal
+
+
+class RecordLayout:
+    """Układ kolumn wiersza: nazwa kolumny -> indeks (wspólny dla wielu rekordów)"""
+
+    __slots__ = ('columns', 'index')
+
+    _layouts = {}
+
+    def __init__(self, columns):
+        index = {}
+        for i, column in enumerate(columns):
+            # Jak przy budowie słownika z wiersza: powtórzona kolumna
+            # (np. SELECT Z.*, K.*) przyjmuje wartość z ostatniego wystąpienia
+            index[column] = i
+        self.index = index
+        self.columns = tuple(index)
+
+    @classmethod
+    def for_columns(cls, columns):
+        """Zwraca (zapamiętany) układ dla podanej listy kolumn"""
+        key = tuple(columns)
+        layout = cls._layouts.get(key)
+        if layout is None:
+            layout = cls._layouts[key] = cls(key)
+        return layout
+
+    @classmethod
+    def from_description(cls, description):
+        """Zwraca układ dla cursor.description"""
+        return cls.for_columns(column[0] for column in description)
+
+
+class Record(Mapping):
+    """Rekord oparty na wierszu z bazy; przypisania trafiają do wartości nadpisujących"""
+
+    __slots__ = ('_layout', '_values', '_extra')
+
+    def __init__(self, layout, values):
+        self._layout = layout
+        self._values = values
+        self._extra = None
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """Tworzy rekord z wiersza i cursor.description"""
+        return cls(RecordLayout.from_description(cursor.description), row)
+
+    @classmethod
+    def from_rows(cls, cursor, rows):
+        """Tworzy listę rekordów ze wspólnym układem kolumn"""
+        layout = RecordLayout.from_description(cursor.description)
+        return [cls(layout, row) for row in rows]
+
+    def __getitem__(self, key):
+        extra = self._extra
+        if extra is not None and key in extra:
+            return extra[key]
+        return self._values[self._layout.index[key]]
+
+    def get(self, key, default=None):
+        extra = self._extra
+        if extra is not None and key in extra:
+            return extra[key]
+        i = self._layout.index.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key):
+        return key in self._layout.index or (self._extra is not None and key in self._extra)
+
+    def __setitem__(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __iter__(self):
+        yield from self._layout.columns
+        if self._extra:
+            for key in self._extra:
+                if key not in self._layout.index:
+                    yield key
+
+    def __len__(self):
+        extra = sum(1 for key in self._extra if key not in self._layout.index) if self._extra else 0
+        return len(self._layout.columns) + extra
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def copy(self):
+        """Kopia rekordu współdzieląca wiersz źródłowy"""
+        record = type(self)(self._layout, self._values)
+        if self._extra:
+            record._extra = dict(self._extra)
+        return record
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class Order(Record):
+    """Nagłówek zamówienia (ZAMOWIENIE); dane kontrahenta pod kluczem 'kontrahent'"""
+    __slots__ = ()
+
+
+class Contractor(Record):
+    """Kontrahent (KONTRAHENT)"""
+    __slots__ = ()
+
+
+class Article(Record):
+    """Artykuł (ARTYKUL)"""
+    __slots__ = ()
+
+
+class OrderLine(Mapping):
+    """Pozycja zamówienia: wartości pozycji mają pierwszeństwo przed danymi artykułu"""
+
+    __slots__ = ('position', 'article', '_extra')
+
+    def __init__(self, position, article=None):
+        self.position = position
+        self.article = article
+        self._extra = None
+
+    def __getitem__(self, key):
+        extra = self._extra
+        if extra is not None and key in extra:
+            return extra[key]
+        if key in self.position:
+            return self.position[key]
+        if self.article is not None:
+            return self.article[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return (key in self.position
+                or (self.article is not None and key in self.article)
+                or (self._extra is not None and key in self._extra))
+
+    def __setitem__(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __iter__(self):
+        # Kolejność kluczy jak w dotychczasowym słowniku: najpierw artykuł, potem pozycja
+        seen = set()
+        for source in (self.article, self.position, self._extra):
+            if not source:
+                continue
+            for key in source:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"OrderLine({self.to_dict()!r})"
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+def _synthetic_rows(lines, position_width, article_width, articles):
+    position_columns = ['ID_POZYCJI_ZAMOWIENIA', 'ID_ZAMOWIENIA', 'ID_ARTYKULU', 'ZAMOWIONO'] + \
+        [f'POZ_{i}' for i in range(position_width - 4)]
+    article_columns = ['ID_ARTYKULU', 'NAZWA', 'CENA_NETTO'] + \
+        [f'ART_{i}' for i in range(article_width - 3)]
+    position_rows = [
+        (n, 1, n % articles, Decimal('2.0000')) + tuple(f'p{i}' for i in range(position_width - 4))
+        for n in range(lines)]
+    article_rows = [
+        (a, f'Artykuł {a}', Decimal('10.50')) + tuple(f'a{i}' for i in range(article_width - 3))
+        for a in range(articles)]
+    return position_columns, position_rows, article_columns, article_rows
+
+
+def _build_dicts(position_columns, position_rows, article_columns, article_rows):
+    articles = {row[0]: {article_columns[i]: value for i, value in enumerate(row)}
+                for row in article_rows}
+    items = []
+    for row in position_rows:
+        position = {position_columns[i]: value for i, value in enumerate(row)}
+        item = dict(articles[position['ID_ARTYKULU']])
+        item.update(position)
+        items.append(item)
+    return items
+
+
+def _build_records(position_columns, position_rows, article_columns, article_rows):
+    article_layout = RecordLayout.for_columns(article_columns)
+    articles = {row[0]: Article(article_layout, row) for row in article_rows}
+    position_layout = RecordLayout.for_columns(position_columns)
+    items = []
+    for row in position_rows:
+        position = Record(position_layout, row)
+        items.append(OrderLine(position, articles[row[2]]))
+    return items
+
+
+def benchmark(lines=10000, position_width=40, article_width=60, articles=500, repeat=3):
+    """
+    Porównuje budowę pozycji zamówień jako słowników i jako rekordów.
+
+    Args:
+        lines (int): Liczba pozycji
+        position_width (int): Liczba kolumn pozycji
+        article_width (int): Liczba kolumn artykułu
+        articles (int): Liczba różnych artykułów
+        repeat (int): Liczba powtórzeń pomiaru czasu
+
+    Returns:
+        dict: Czas budowy (ms) i pamięć zajmowana przez pozycje (KiB) dla obu wariantów
+    """
+    data = _synthetic_rows(lines, position_width, article_width, articles)
+    results = {'lines': lines}
+    for name, build in (('dict', _build_dicts), ('record', _build_records)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            build(*data)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+
+        # Wiersze z kursora liczone są w obu wariantach - rekordy je przechowują,
+        # a słowniki kopiują ich wartości
+        tracemalloc.start()
+        rows = _synthetic_rows(lines, position_width, article_width, articles)
+        items = build(*rows)
+        del rows
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Sprawdzenie, że oba warianty zwracają te same dane
+        results[f'{name}_sample'] = dict(items[-1].items())
+        results[f'{name}_ms'] = round(best, 2)
+        results[f'{name}_kib'] = round(current / 1024, 1)
+        del items
+    results['equal'] = results.pop('dict_sample') == results.pop('record_sample')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rekordy zamówień')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Porównaj słowniki i rekordy na partii pozycji')
+    parser.add_argument('--lines', type=int, default=10000, help='Liczba pozycji')
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        return 1
+
+    results = benchmark(lines=args.lines)
+    print(f"Pozycje: {results['lines']} (wyniki identyczne: {results['equal']})")
+    print(f"Słowniki: {results['dict_ms']:>10.2f} ms {results['dict_kib']:>12.1f} KiB")
+    print(f"Rekordy:  {results['record_ms']:>10.2f} ms {results['record_kib']:>12.1f} KiB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
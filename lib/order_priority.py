@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/order_priority.py
+"""
+Kolejność wydruku zamówień według klas priorytetu i terminów SLA.
+
+Bez priorytetów zamówienia są drukowane w kolejności DATA_UTWORZENIA_WIERSZA,
+więc zaległość zwykłych zamówień opóźnia pilne (kurier ekspresowy, wybrani
+kontrahenci, operatorzy). Sekcja [PRIORITY] definiuje:
+
+- klasy priorytetu: ``class.express = 0, 900`` - poziom (0 - najpilniejsze)
+  i termin SLA w sekundach od utworzenia zamówienia (0 - bez terminu),
+- reguły przypisania klasy na podstawie pól ZAMOWIENIE:
+  ``rule.express = UWAGI ~ kurier, express`` (``=`` - równe jednej z wartości,
+  ``!=`` - różne od wszystkich, ``~`` - zawiera jedną z wartości; wielkość
+  liter bez znaczenia); reguły kilku klas są sprawdzane od najpilniejszej.
+
+Kolejka źródła (każde źródło ma swoją drukarkę) jest kopcem uporządkowanym
+według "wirtualnego czasu przybycia": zamówienie klasy o poziomie p jest
+traktowane tak, jakby powstało p * aging_seconds później, ale nie później niż
+jego termin SLA. Każde aging_seconds oczekiwania jest więc warte jeden poziom
+priorytetu (postarzanie) i zwykłe zamówienia nie czekają w nieskończoność,
+a klucz nie zależy od bieżącego czasu, więc kopiec nie wymaga przeliczania.
+"""
+
+import heapq
+import re
+import time
+from datetime import datetime
+
+from lib.log_config import get_logger
+from lib.metrics import observe_queue_wait
+from lib.query_registry import validate_identifier
+
+logger = get_logger().getLogger(__name__)
+
+ORDER_TABLE = 'ZAMOWIENIE'
+
+_RULE_RE = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(!=|=|~)\s*(.*?)\s*$')
+
+
+def _timestamp(value, default):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return default
+
+
+class PriorityRule:
+    """Warunek na polu zamówienia, np. ``ID_KONTRAHENTA = 17, 42``"""
+
+    def __init__(self, priority_class, expression):
+        """
+        Args:
+            priority_class (str): Klasa przypisywana zamówieniom spełniającym warunek
+            expression (str): Warunek ``POLE operator wartość[, wartość...]``
+
+        Raises:
+            ValueError: Niepoprawny warunek lub nazwa pola
+        """
+        match = _RULE_RE.match(expression or '')
+        if not match:
+            raise ValueError(f"Niepoprawna reguła priorytetu: {expression!r}")
+        self.priority_class = priority_class
+        self.field = validate_identifier(match.group(1).upper())
+        self.operator = match.group(2)
+        self.values = [value.strip().lower() for value in match.group(3).split(',') if value.strip()]
+        if not self.values:
+            raise ValueError(f"Reguła priorytetu bez wartości: {expression!r}")
+
+    def matches(self, fields):
+        value = fields.get(self.field)
+        text = '' if value is None else str(value).strip().lower()
+        if self.operator == '~':
+            return any(expected in text for expected in self.values)
+        equal = text in self.values
+        return equal if self.operator == '=' else not equal
+
+
+class PriorityScheduler:
+    """Przypisuje zamówieniom klasę priorytetu, termin SLA i klucz kolejki"""
+
+    def __init__(self, classes, rules=(), default_class='normal', aging_seconds=600):
+        """
+        Args:
+            classes (dict): Klasy {nazwa: (poziom, termin_sla_w_sekundach)}
+            rules: Lista par (klasa, warunek) w kolejności z konfiguracji
+            default_class (str): Klasa zamówień niespełniających żadnej reguły
+            aging_seconds (float): Czas oczekiwania równoważny jednemu poziomowi priorytetu
+        """
+        self.classes = dict(classes)
+        self.default_class = default_class
+        if default_class not in self.classes:
+            self.classes[default_class] = (max([level for level, _ in self.classes.values()] or [0]), 0)
+        self.aging_seconds = aging_seconds
+
+        self.rules = []
+        for priority_class, expression in rules:
+            if priority_class not in self.classes:
+                logger.warning(f"Reguła priorytetu dla nieznanej klasy {priority_class} - pomijam")
+                continue
+            try:
+                self.rules.append(PriorityRule(priority_class, expression))
+            except ValueError as e:
+                logger.warning(f"{e} - pomijam")
+        # Najpilniejsza klasa wygrywa, gdy zamówienie spełnia kilka reguł
+        self.rules.sort(key=lambda rule: self.classes[rule.priority_class][0])
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Tworzy harmonogram z ustawień ConfigManager.get_priority_settings()"""
+        return cls(settings['classes'], settings['rules'], default_class=settings['default_class'],
+                   aging_seconds=settings['aging_seconds'])
+
+    @property
+    def fields(self):
+        """Pola ZAMOWIENIE używane przez reguły"""
+        return sorted({rule.field for rule in self.rules})
+
+    def available_fields(self, cursor):
+        """
+        Pola reguł obecne w tabeli ZAMOWIENIE; reguły na nieistniejących
+        kolumnach są wyłączane zamiast psuć zapytanie o zamówienia.
+        """
+        if not self.rules:
+            return []
+        try:
+            cursor.execute(f"SELECT TOP 0 * FROM {ORDER_TABLE}")
+            columns = {column[0].upper() for column in cursor.description}
+        except Exception as e:
+            logger.warning(f"Nie udało się odczytać kolumn tabeli {ORDER_TABLE}: {e}")
+            return []
+        missing = [field for field in self.fields if field not in columns]
+        if missing:
+            logger.warning(f"Tabela {ORDER_TABLE} nie ma kolumn {', '.join(missing)} - "
+                           f"reguły priorytetu na tych polach są pomijane")
+            self.rules = [rule for rule in self.rules if rule.field in columns]
+        return self.fields
+
+    def classify(self, fields):
+        """Zwraca klasę priorytetu zamówienia o podanych polach"""
+        for rule in self.rules:
+            if rule.matches(fields):
+                return rule.priority_class
+        return self.default_class
+
+    def deadline(self, priority_class, created):
+        """Termin SLA (epoch) lub None, gdy klasa nie ma terminu"""
+        seconds = self.classes[priority_class][1]
+        return created + seconds if seconds else None
+
+    def queue_key(self, priority_class, created):
+        """Wirtualny czas przybycia: utworzenie + poziom * aging_seconds, najpóźniej termin SLA"""
+        key = created + self.classes[priority_class][0] * self.aging_seconds
+        deadline = self.deadline(priority_class, created)
+        return min(key, deadline) if deadline is not None else key
+
+
+class OrderQueue:
+    """Kolejka priorytetowa zamówień jednej drukarki (źródła)"""
+
+    def __init__(self, scheduler, printer='', clock=time.time):
+        """
+        Args:
+            scheduler (PriorityScheduler): Reguły klas i terminów
+            printer (str): Identyfikator drukarki (etykieta metryk)
+            clock: Funkcja zwracająca bieżący czas (testy)
+        """
+        self.scheduler = scheduler
+        self.printer = printer
+        self.clock = clock
+        self._heap = []
+        self._entries = {}
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, order_number, created=None, fields=None):
+        """
+        Dodaje zamówienie; zamówienie już znane kolejce (także wydane) jest pomijane.
+
+        Args:
+            order_number (str): Numer zamówienia
+            created: DATA_UTWORZENIA_WIERSZA (datetime) lub None - teraz
+            fields (dict): Pola zamówienia używane przez reguły
+
+        Returns:
+            bool: True, jeśli zamówienie dodano
+        """
+        if order_number in self._entries:
+            return False
+        created = _timestamp(created, self.clock())
+        priority_class = self.scheduler.classify(fields or {})
+        deadline = self.scheduler.deadline(priority_class, created)
+        self._counter += 1
+        entry = {
+            'order_number': order_number,
+            'priority': priority_class,
+            'created': created,
+            'deadline': deadline,
+            'key': (self.scheduler.queue_key(priority_class, created),
+                    deadline if deadline is not None else float('inf'), self._counter),
+        }
+        self._entries[order_number] = entry
+        heapq.heappush(self._heap, entry['key'] + (order_number,))
+        return True
+
+    def entry(self, order_number):
+        """Klasa, czas utworzenia i termin zamówienia lub None"""
+        return self._entries.get(order_number)
+
+    def order_batch(self, order_numbers):
+        """
+        Porządkuje partię zamówień przejętych z dzierżaw od najpilniejszego.
+        Zamówienia zarejestrowane przez inne węzły (nieznane kolejce) dostają
+        klasę domyślną i czas przejęcia jako czas utworzenia.
+        """
+        for order_number in order_numbers:
+            self.push(order_number)
+        return sorted(order_numbers, key=lambda order_number: self._entries[order_number]['key'])
+
+    def pop(self):
+        """Wydaje najpilniejsze zamówienie i zapisuje metryki czasu oczekiwania"""
+        order_number = heapq.heappop(self._heap)[-1]
+        self.record_dispatch(order_number)
+        return order_number
+
+    def record_dispatch(self, order_number):
+        """Zapisuje czas oczekiwania zamówienia i przekroczenie terminu SLA"""
+        entry = self._entries.get(order_number)
+        if entry is None:
+            return
+        now = self.clock()
+        missed = entry['deadline'] is not None and now > entry['deadline']
+        if missed:
+            logger.warning(f"Zamówienie {order_number} ({entry['priority']}) przekazane do wydruku "
+                           f"po terminie SLA ({now - entry['deadline']:.0f} s)")
+        observe_queue_wait(entry['priority'], now - entry['created'], missed, printer=self.printer)
+
+    def drain(self, refresh=None, refresh_seconds=0):
+        """
+        Wydaje zamówienia od najpilniejszego. Co ``refresh_seconds`` wywołuje
+        ``refresh()`` (nowe zamówienia z bazy), więc pilne zamówienie nie czeka
+        na koniec długiej zaległości z bieżącego cyklu.
+
+        Args:
+            refresh: Funkcja dodająca nowe zamówienia przez push() lub None
+            refresh_seconds (float): Odstęp odświeżania (0 - bez odświeżania)
+
+        Yields:
+            str: Numer zamówienia
+        """
+        last_refresh = time.monotonic()
+        while self._heap:
+            yield self.pop()
+            if refresh is not None and refresh_seconds and time.monotonic() - last_refresh >= refresh_seconds:
+                last_refresh = time.monotonic()
+                try:
+                    refresh()
+                except Exception as e:
+                    logger.error(f"Błąd odświeżania kolejki zamówień: {str(e)}")
+
+
+def get_priority_scheduler():
+    """Zwraca harmonogram priorytetów z bieżącej konfiguracji lub None, gdy jest wyłączony"""
+    try:
+        from lib.config_snapshot import get_config
+        settings = get_config().get_priority_settings()
+    except Exception as e:
+        logger.debug(f"Brak konfiguracji priorytetów zamówień: {e}")
+        return None
+    if not settings['enabled']:
+        return None
+    return PriorityScheduler.from_settings(settings)
@@ -5,12 +5,18 @@ from datetime import datetime
 import json
 import os
 import configparser
+from collections.abc import Mapping
 from decimal import Decimal
 
 from .html_generator import generate_order_html
 from .file_utils import normalize_filename, get_zo_html_dir, get_zo_json_dir
 from .logger import logger
 
+from .column_projection import select_list
+
+# Pamięć podręczna kontrahentów i artykułów (włączana w [DIMENSION_CACHE])
+from .dimension_cache import get_contractor_cache, get_article_cache, is_dimension_cache_enabled
+
 # Wczytaj konfigurację
 config = configparser.ConfigParser()
 config.read('config.ini')
@@ -30,7 +36,7 @@ def convert_decimal_to_str(obj):
         return str(obj)
     elif isinstance(obj, datetime):
         return obj.strftime('%Y-%m-%d %H:%M:%S')
-    elif isinstance(obj, dict):
+    elif isinstance(obj, Mapping):
         return {key: convert_decimal_to_str(value) for key, value in obj.items()}
     elif isinstance(obj, list):
         return [convert_decimal_to_str(item) for item in obj]
@@ -135,6 +141,18 @@ def diagnose_order_items(db_connection, order_number):
         return {"error": str(e)}
 
 
+def _merge_dimension(row, record, cache, cursor):
+    """
+    Łączy wiersz z rekordem słownikowym tak jak LEFT JOIN z ``SELECT A.*, B.*``:
+    kolumny rekordu nadpisują kolumny wiersza, a przy braku rekordu przyjmują None.
+    """
+    if record is None:
+        record = dict.fromkeys(cache.get_columns(cursor))
+    merged = dict(row)
+    merged.update(record)
+    return merged
+
+
 def load_orders_from_sql(db_connection, order_id=None):
     """
     Pobiera dane zamówienia z bazy SQL.
@@ -149,20 +167,27 @@ def load_orders_from_sql(db_connection, order_id=None):
     cursor = db_connection.cursor()
 
     try:
+        use_cache = is_dimension_cache_enabled()
+        # Przy włączonej pamięci podręcznej dane kontrahenta dołączane są z pamięci
+        order_columns = select_list(cursor, 'ZAMOWIENIE', 'Z')
+        if use_cache:
+            order_select = f"SELECT {order_columns} FROM ZAMOWIENIE Z"
+        else:
+            order_select = f"""SELECT {order_columns}, {select_list(cursor, 'KONTRAHENT', 'K')} FROM ZAMOWIENIE Z
+                LEFT JOIN KONTRAHENT K ON Z.ID_KONTRAHENTA = K.ID_KONTRAHENTA"""
+
         # Tworzenie zapytania SQL dla głównych danych zamówienia
         if order_id:
-            query = """
-                SELECT Z.*, K.* FROM ZAMOWIENIE Z
-                LEFT JOIN KONTRAHENT K ON Z.ID_KONTRAHENTA = K.ID_KONTRAHENTA
+            query = f"""
+                {order_select}
                 WHERE Z.NUMER = ?
             """
             cursor.execute(query, (order_id,))
             logger.info(
                 f"Wykonano zapytanie o zamówienie z numerem {order_id}")
         else:
-            query = """
-                SELECT Z.*, K.* FROM ZAMOWIENIE Z
-                LEFT JOIN KONTRAHENT K ON Z.ID_KONTRAHENTA = K.ID_KONTRAHENTA
+            query = f"""
+                {order_select}
                 ORDER BY Z.ID_ZAMOWIENIA
             """
             cursor.execute(query)
@@ -183,6 +208,17 @@ def load_orders_from_sql(db_connection, order_id=None):
             order_dict = {columns[i]: value for i, value in enumerate(row)}
             orders.append(order_dict)
 
+        if use_cache:
+            contractor_cache = get_contractor_cache(cursor)
+            contractors = contractor_cache.get_many(
+                cursor, [order.get('ID_KONTRAHENTA') for order in orders])
+            orders = [_merge_dimension(order, contractors.get(order.get('ID_KONTRAHENTA')),
+                                       contractor_cache, cursor)
+                      for order in orders]
+
+        position_columns = select_list(cursor, 'POZYCJA_ZAMOWIENIA', 'PZ')
+        article_columns = select_list(cursor, 'ARTYKUL', 'A')
+
         # Dla każdego zamówienia pobierz jego pozycje
         for order in orders:
             # Pobranie ID_ZAMOWIENIA
@@ -229,13 +265,21 @@ def load_orders_from_sql(db_connection, order_id=None):
             # if len(item_rows) == 0:
             logger.warning(
                 f"Brak pozycji z ZREALIZOWANO > 0, pobieram wszystkie pozycje")
-            query = """
-                SELECT PZ.*, A.*
-                FROM POZYCJA_ZAMOWIENIA PZ
-                LEFT JOIN ARTYKUL A ON PZ.ID_ARTYKULU = A.ID_ARTYKULU
-                WHERE PZ.ID_ZAMOWIENIA = ?
-                ORDER BY PZ.ID_POZYCJI_ZAMOWIENIA
-            """
+            if use_cache:
+                query = f"""
+                    SELECT {position_columns}
+                    FROM POZYCJA_ZAMOWIENIA PZ
+                    WHERE PZ.ID_ZAMOWIENIA = ?
+                    ORDER BY PZ.ID_POZYCJI_ZAMOWIENIA
+                """
+            else:
+                query = f"""
+                    SELECT {position_columns}, {article_columns}
+                    FROM POZYCJA_ZAMOWIENIA PZ
+                    LEFT JOIN ARTYKUL A ON PZ.ID_ARTYKULU = A.ID_ARTYKULU
+                    WHERE PZ.ID_ZAMOWIENIA = ?
+                    ORDER BY PZ.ID_POZYCJI_ZAMOWIENIA
+                """
             cursor.execute(query, (order_id_from_row,))
             item_rows = cursor.fetchall()
             logger.info(
@@ -249,6 +293,16 @@ def load_orders_from_sql(db_connection, order_id=None):
                 continue
 
             columns = [column[0] for column in cursor.description]
+            item_dicts = [{columns[i]: value for i, value in enumerate(row)}
+                          for row in item_rows]
+
+            if use_cache:
+                article_cache = get_article_cache(cursor)
+                articles = article_cache.get_many(
+                    cursor, [item.get('ID_ARTYKULU') for item in item_dicts])
+                item_dicts = [_merge_dimension(item, articles.get(item.get('ID_ARTYKULU')),
+                                               article_cache, cursor)
+                              for item in item_dicts]
 
             # Zbiór do śledzenia unikalnych ID artykułów
             # Zbiór do śledzenia unikalnych ID artykułów
@@ -257,8 +311,7 @@ def load_orders_from_sql(db_connection, order_id=None):
             # Słownik do grupowania ilości według ID artykułu
             article_quantities = {}
 
-            for row in item_rows:
-                item_dict = {columns[i]: value for i, value in enumerate(row)}
+            for item_dict in item_dicts:
                 article_id = item_dict.get('ID_ARTYKULU')
 
                 if article_id is None:
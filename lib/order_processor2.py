@@ -11,12 +11,14 @@ import json
 import os
 import sys
 import logging
+from collections.abc import Mapping
 from decimal import Decimal
 
 # Importy z oryginalnego projektu
 try:
     from lib.DatabaseManager import DatabaseManager
     from lib.ConfigManager import ConfigManager
+    from lib.config_snapshot import get_config
     from lib.file_utils import get_zo_html_dir, get_zo_json_dir, normalize_filename, get_path_order, get_printed_orders
     from lib.logger import logger
     from lib.html_generator import generate_order_html
@@ -26,6 +28,7 @@ except ImportError:
     try:
         from lib.DatabaseManager import DatabaseManager
         from lib.ConfigManager import ConfigManager
+        from lib.config_snapshot import get_config
         from lib.file_utils import get_zo_html_dir, get_zo_json_dir, normalize_filename, get_path_order, \
             get_printed_orders
         from lib.logger import logger
@@ -125,6 +128,13 @@ except ImportError:
                         f"Błąd podczas generowania connection string: {str(e)}", exc_info=True)
                     return None
 
+        _config = []
+
+        def get_config():
+            if not _config:
+                _config.append(ConfigManager())
+            return _config[0]
+
         def generate_order_html(order_data, items):
             """Prosta implementacja generowania HTML dla zamówienia."""
             html = f"""
@@ -178,6 +188,61 @@ except ImportError:
             return html
 
 
+# Projekcja kolumn deklarowanych przez szablon zamówienia
+from lib.column_projection import select_list
+
+from lib.order_model import Order, Contractor, Article, OrderLine, Record
+
+# Zdarzenia strukturalne i ograniczanie powtarzalnych komunikatów
+from lib.log_config import log_event, log_sampled
+
+# Metryki etapów przetwarzania
+from lib.metrics import stage_timer
+
+# Śledzenie zamówień (próbkowanie w [TRACING])
+from lib.tracing import start_trace
+
+# Archiwum artefaktów zamówień (włączane w [ARCHIVE])
+from lib.artifact_archive import get_archive
+
+# Kolejność wydruku według klas priorytetu i terminów SLA (włączana w [PRIORITY])
+from lib.order_priority import OrderQueue, get_priority_scheduler
+
+# Pamięć podręczna kontrahentów i artykułów (włączana w [DIMENSION_CACHE])
+from lib.dimension_cache import get_contractor_cache, get_article_cache, is_dimension_cache_enabled
+
+
+def _load_contractor(cursor, kontrahent_id, use_cache):
+    """Zwraca rekord kontrahenta lub None"""
+    if use_cache:
+        return get_contractor_cache(cursor).get(cursor, kontrahent_id)
+
+    cursor.execute(f"""
+        SELECT {select_list(cursor, 'KONTRAHENT')} FROM KONTRAHENT WHERE ID_KONTRAHENTA = ?
+    """, (kontrahent_id,))
+    kontrahent_row = cursor.fetchone()
+    if not kontrahent_row:
+        return None
+    return Contractor.from_row(cursor, kontrahent_row)
+
+
+def _load_articles(cursor, article_ids, use_cache):
+    """Zwraca słownik ID_ARTYKULU -> rekord artykułu dla istniejących artykułów"""
+    if use_cache:
+        return get_article_cache(cursor).get_many(cursor, article_ids)
+
+    articles = {}
+    columns = select_list(cursor, 'ARTYKUL')
+    for article_id in dict.fromkeys(article_ids):
+        cursor.execute(f"""
+            SELECT {columns} FROM ARTYKUL WHERE ID_ARTYKULU = ?
+        """, (article_id,))
+        article_row = cursor.fetchone()
+        if article_row:
+            articles[article_id] = Article.from_row(cursor, article_row)
+    return articles
+
+
 def convert_decimal_to_str(obj):
     """
     Rekurencyjnie konwertuje wszystkie wartości typu Decimal, datetime i type na stringi.
@@ -194,48 +259,37 @@ def convert_decimal_to_str(obj):
         return obj.strftime('%Y-%m-%d %H:%M:%S')
     elif isinstance(obj, type):
         return obj.__name__  # Konwertuj typy na ich nazwy
-    elif isinstance(obj, dict):
+    elif isinstance(obj, Mapping):
+        # Słowniki oraz rekordy zamówień (lib.order_model)
         return {key: convert_decimal_to_str(value) for key, value in obj.items()}
     elif isinstance(obj, list):
         return [convert_decimal_to_str(item) for item in obj]
     return obj
 
 
-def get_id_uzytkownika_by_order(order_number):
-    """
-    Pobiera ID użytkownika na podstawie numeru zamówienia.
-    """
-    # Inicjalizacja konfiguracji jeśli nie podano
-    config = ConfigManager()
-    conn_str = config.get_connection_string()
-    if not conn_str:
-        logger.error("Nie udało się pobrać connection string")
-        return
+def _json_default(obj):
+    """Serializacja JSON bez kopiowania całej struktury (jak convert_decimal_to_str)"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (Decimal, datetime, type)):
+        return convert_decimal_to_str(obj)
+    return str(obj)
 
-    db_manager = DatabaseManager(conn_str)
-    if not db_manager.connect():
-        logger.error("Nie udało się połączyć z bazą danych")
-        return
 
-    cursor = db_manager.connection.cursor()
-    try:
-        query = """
-            SELECT ID_UZYTKOWNIKA FROM ZAMOWIENIE WHERE NUMER = ?
-        """
-        cursor.execute(query, (order_number))
-        result = cursor.fetchone()
-        if result:
-            logger.info(
-                f"ID użytkownika: {result[0]} dla zamówienia o numerze {order_number}")
-            return result[0]
-        else:
-            logger.warning(
-                f"Nie znaleziono użytkownika dla zamówienia o numerze {order_number}")
-            return None
-    except Exception as e:
-        logger.error(
-            f"Błąd podczas pobierania zamówienia {order_number}: {str(e)}", exc_info=True)
+def _archive_order_json(order_data, order_number):
+    """
+    Zapisuje dane zamówienia w archiwum artefaktów (zwarty JSON).
+
+    Returns:
+        str: Opis lokalizacji wpisu lub None, gdy archiwum jest wyłączone
+    """
+    archive = get_archive()
+    if archive is None:
         return None
+    payload = json.dumps(order_data, ensure_ascii=False, separators=(',', ':'),
+                         default=_json_default)
+    entry = archive.put(order_number, 'json', payload)
+    return os.path.join(archive.directory, f"{entry['segment']}#{entry['offset']}")
 
 
 def get_order_by_number(db_connection, order_number):
@@ -253,8 +307,8 @@ def get_order_by_number(db_connection, order_number):
 
     try:
         # Pobierz dane zamówienia
-        query = """
-            SELECT * FROM ZAMOWIENIE WHERE NUMER = ?
+        query = f"""
+            SELECT {select_list(cursor, 'ZAMOWIENIE')} FROM ZAMOWIENIE WHERE NUMER = ?
         """
         cursor.execute(query, (order_number,))
         order_row = cursor.fetchone()
@@ -264,36 +318,28 @@ def get_order_by_number(db_connection, order_number):
                 f"Nie znaleziono zamówienia o numerze {order_number}")
             return None
 
-        # Konwertujemy wiersz na słownik
-        order_columns = [column[0] for column in cursor.description]
-        order_data = {order_columns[i]: value for i,
-                      value in enumerate(order_row)}
+        # Rekord zamówienia oparty bezpośrednio na wierszu z bazy
+        order_data = Order.from_row(cursor, order_row)
 
         # Pobierz dane kontrahenta
         kontrahent_id = order_data.get('ID_KONTRAHENTA')
         kontrahent_data = {}
 
+        use_cache = is_dimension_cache_enabled()
+
         if kontrahent_id:
-            query = """
-                SELECT * FROM KONTRAHENT WHERE ID_KONTRAHENTA = ?
-            """
-            cursor.execute(query, (kontrahent_id,))
-            kontrahent_row = cursor.fetchone()
+            kontrahent_row = _load_contractor(cursor, kontrahent_id, use_cache)
 
             if kontrahent_row:
-                kontrahent_columns = [column[0]
-                                      for column in cursor.description]
-                kontrahent_data = {
-                    kontrahent_columns[i]: value for i, value in enumerate(kontrahent_row)}
+                kontrahent_data = kontrahent_row
 
                 # Dodaj dane kontrahenta jako podsłownik
                 order_data['kontrahent'] = kontrahent_data
 
         # Log diagnostyczny
-        logger.info(
-            f"Kod kreskowy zamówienia: {order_data.get('KOD_KRESKOWY', '')}")
-        logger.info(
-            f"Kod kreskowy kontrahenta: {kontrahent_data.get('KOD_KRESKOWY', '')}")
+        log_event(logger, 'order.barcodes', logging.DEBUG, order=order_number,
+                  order_barcode=order_data.get('KOD_KRESKOWY', ''),
+                  contractor_barcode=kontrahent_data.get('KOD_KRESKOWY', ''))
 
         # Pobieramy pozycje zamówienia
         order_id = order_data.get('ID_ZAMOWIENIA')
@@ -302,66 +348,40 @@ def get_order_by_number(db_connection, order_number):
             return {'order': order_data, 'items': []}
 
         # Pobierz pozycje zamówienia
-        query = """
-            SELECT * FROM POZYCJA_ZAMOWIENIA WHERE ID_ZAMOWIENIA = ? ORDER BY ID_POZYCJI_ZAMOWIENIA
+        query = f"""
+            SELECT {select_list(cursor, 'POZYCJA_ZAMOWIENIA')} FROM POZYCJA_ZAMOWIENIA
+            WHERE ID_ZAMOWIENIA = ? ORDER BY ID_POZYCJI_ZAMOWIENIA
         """
         cursor.execute(query, (order_id,))
-        position_rows = cursor.fetchall()
-        position_columns = [column[0] for column in cursor.description]
+        positions = Record.from_rows(cursor, cursor.fetchall())
 
-        # Konwertujemy pozycje na listę słowników
-        items = []
-        for row in position_rows:
-            position_dict = {
-                position_columns[i]: value for i, value in enumerate(row)}
-
-            # Zachowaj wartości z pozycji zamówienia
-            zamowiono = position_dict.get('ZAMOWIONO')
-            zrealizowano = position_dict.get('ZREALIZOWANO')
+        # Pobierz dane artykułów wszystkich pozycji
+        articles = _load_articles(
+            cursor, [p.get('ID_ARTYKULU') for p in positions if p.get('ID_ARTYKULU')], use_cache)
 
-            # Pobierz dane artykułu
-            article_id = position_dict.get('ID_ARTYKULU')
+        # Pozycja odczytuje najpierw własne wartości (w tym ZAMOWIONO i ZREALIZOWANO),
+        # a pozostałe pola ze współdzielonego rekordu artykułu
+        items = []
+        for position in positions:
+            article_id = position.get('ID_ARTYKULU')
             if article_id:
-                query = """
-                    SELECT * FROM ARTYKUL WHERE ID_ARTYKULU = ?
-                """
-                cursor.execute(query, (article_id,))
-                article_row = cursor.fetchone()
-
-                if article_row:
-                    article_columns = [column[0]
-                                       for column in cursor.description]
-
-                    # Przygotuj pusty słownik dla połączonych danych
-                    item_dict = {}
-
-                    # Najpierw dodaj dane artykułu
-                    for i, col_name in enumerate(article_columns):
-                        item_dict[col_name] = article_row[i]
-
-                    # Następnie dodaj/nadpisz dane pozycji zamówienia
-                    for key, value in position_dict.items():
-                        item_dict[key] = value
-
-                    # Upewnij się, że wartości ZAMOWIONO i ZREALIZOWANO są poprawne
-                    item_dict['ZAMOWIONO'] = zamowiono
-                    item_dict['ZREALIZOWANO'] = zrealizowano
-
-                    items.append(item_dict)
+                article = articles.get(article_id)
+                if article:
+                    items.append(OrderLine(position, article))
             else:
                 # Jeśli nie ma artykułu, dodaj tylko dane pozycji
-                items.append(position_dict)
+                items.append(OrderLine(position))
 
-        logger.info(
-            f"Znaleziono {len(items)} pozycji dla zamówienia {order_number}")
+        log_event(logger, 'order.items', order=order_number, items=len(items),
+                  positions=len(positions), skipped=len(positions) - len(items))
 
-        # Dodaj informacje diagnostyczne o każdej pozycji
-        for i, item in enumerate(items):
-            item_id = item.get('ID_ARTYKULU')
-            item_name = item.get('NAZWA', 'Nieznany artykuł')
-            zamowiono = item.get('ZAMOWIONO', 0)
-            logger.info(
-                f"Pozycja {i + 1}: ID={item_id}, Nazwa={item_name}, ZAMOWIONO={zamowiono}")
+        # Informacje diagnostyczne o każdej pozycji (tylko na poziomie DEBUG)
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, item in enumerate(items):
+                log_event(logger, 'order.item', logging.DEBUG, order=order_number, position=i + 1,
+                          article=item.get('ID_ARTYKULU'),
+                          name=item.get('NAZWA', 'Nieznany artykuł'),
+                          ordered=item.get('ZAMOWIONO', 0))
 
         # Przygotuj wynikowy słownik w oczekiwanym formacie
         result = {
@@ -380,14 +400,16 @@ def get_order_by_number(db_connection, order_number):
 def save_order_to_json(order_data, output_dir=None):
     """
     Zapisuje dane zamówienia do pliku JSON.
-    Używa tych samych ścieżek co oryginalne skrypty.
+    Używa tych samych ścieżek co oryginalne skrypty. Gdy archiwum artefaktów
+    jest włączone ([ARCHIVE]), dane trafiają do archiwum, a plik jest
+    zapisywany tylko przy keep_files = true.
 
     Args:
         order_data (dict): Dane zamówienia
         output_dir (str, optional): Katalog wyjściowy. Jeśli None, użyje get_zo_json_dir()
 
     Returns:
-        str: Ścieżka do zapisanego pliku lub None w przypadku błędu
+        str: Ścieżka do zapisanego pliku (lub wpisu archiwum) albo None w przypadku błędu
     """
     if not order_data:
         logger.warning("Próba zapisania pustych danych zamówienia")
@@ -397,9 +419,6 @@ def save_order_to_json(order_data, output_dir=None):
     if output_dir is None:
         output_dir = get_zo_json_dir()
 
-    # Upewniamy się, że katalog istnieje
-    os.makedirs(output_dir, exist_ok=True)
-
     # Pobieramy numer zamówienia
     try:
         # W zależności od struktury danych
@@ -416,6 +435,19 @@ def save_order_to_json(order_data, output_dir=None):
         logger.error(f"Błąd podczas pobierania numeru zamówienia: {str(e)}")
         order_number = 'unknown'
 
+    try:
+        location = _archive_order_json(order_data, order_number)
+    except Exception as e:
+        logger.error(f"Błąd zapisu zamówienia {order_number} w archiwum: {str(e)}")
+        location = None
+    if location:
+        logger.info(f"Zapisano dane zamówienia {order_number} w archiwum: {location}")
+        if not get_config().get_archive_settings()['keep_files']:
+            return location
+
+    # Upewniamy się, że katalog istnieje
+    os.makedirs(output_dir, exist_ok=True)
+
     normalized_order_number = normalize_filename(order_number)
     logger.info(f"Sciezka pliku: {output_dir}\\{normalized_order_number}.json")
 
@@ -510,51 +542,106 @@ def generate_html_for_order(order_data):
         """
 
 
-def get_todays_orders(db_connection):
+def _fill_allowed_users_table(cursor, allowed_users):
+    """
+    Tworzy tabelę tymczasową #WP_ALLOWED_USERS z listą dozwolonych użytkowników.
+    Kolumna ma ten sam typ co ZAMOWIENIE.ID_UZYTKOWNIKA (INT), więc złączenie
+    nie wymaga konwersji (brak konfliktu collation, możliwe użycie indeksu).
+
+    Args:
+        cursor: Kursor bazy danych
+        allowed_users (list): Lista identyfikatorów dozwolonych użytkowników
     """
-    Pobiera numery zamówień z dzisiejszego dnia.
+    cursor.execute("""
+        IF OBJECT_ID('tempdb..#WP_ALLOWED_USERS') IS NOT NULL
+            DROP TABLE #WP_ALLOWED_USERS;
+        CREATE TABLE #WP_ALLOWED_USERS (ID_UZYTKOWNIKA INT PRIMARY KEY);
+    """)
+    users = set()
+    for user in allowed_users:
+        user = str(user).strip()
+        if not user:
+            continue
+        try:
+            users.add(int(user))
+        except ValueError:
+            logger.warning(f"Pominięto nieprawidłowe ID użytkownika w allowed_users: {user}")
+    users = sorted(users)
+    if users:
+        cursor.executemany(
+            "INSERT INTO #WP_ALLOWED_USERS (ID_UZYTKOWNIKA) VALUES (?)",
+            [(user,) for user in users])
+
+
+def get_todays_order_rows(db_connection, allowed_users=None, fields=()):
+    """
+    Pobiera zamówienia z dzisiejszego dnia wraz z polami potrzebnymi
+    regułom priorytetu ([PRIORITY]).
+    Jeśli podano listę dozwolonych użytkowników, filtrowanie odbywa się w zapytaniu
+    (złączenie wewnętrzne z tabelą tymczasową #WP_ALLOWED_USERS po
+    ZAMOWIENIE.ID_UZYTKOWNIKA): zamówienia pozostałych użytkowników nie opuszczają
+    serwera bazy, więc nie ma w aplikacji decyzji o pominięciu do zapamiętania.
 
     Args:
         db_connection: Połączenie z bazą danych
+        allowed_users (list, optional): Lista ID dozwolonych użytkowników.
+            None oznacza brak filtrowania, pusta lista - brak uprawnionych użytkowników.
+        fields: Dodatkowe kolumny ZAMOWIENIE (zweryfikowane nazwy)
 
     Returns:
-        list: Lista numerów zamówień z dzisiejszego dnia
+        list: Słowniki (numer, id_zamowienia, data_utworzenia, id_uzytkownika, fields)
+            w kolejności utworzenia
     """
     cursor = db_connection.cursor()
+    fields = list(fields)
+    extra = ''.join(f", Z.{field}" for field in fields)
 
     try:
-        query = """
-            SELECT NUMER, ID_ZAMOWIENIA, DATA_UTWORZENIA_WIERSZA
-            FROM ZAMOWIENIE 
-            WHERE CAST(DATA_UTWORZENIA_WIERSZA AS date) = CAST(GETDATE() AS date)
-            ORDER BY DATA_UTWORZENIA_WIERSZA ASC
-        """
+        if allowed_users is None:
+            query = f"""
+                SELECT Z.NUMER, Z.ID_ZAMOWIENIA, Z.DATA_UTWORZENIA_WIERSZA, Z.ID_UZYTKOWNIKA{extra}
+                FROM ZAMOWIENIE Z
+                WHERE CAST(Z.DATA_UTWORZENIA_WIERSZA AS date) = CAST(GETDATE() AS date)
+                ORDER BY Z.DATA_UTWORZENIA_WIERSZA ASC
+            """
+        else:
+            _fill_allowed_users_table(cursor, allowed_users)
+            query = f"""
+                SELECT Z.NUMER, Z.ID_ZAMOWIENIA, Z.DATA_UTWORZENIA_WIERSZA, Z.ID_UZYTKOWNIKA{extra}
+                FROM ZAMOWIENIE Z
+                INNER JOIN #WP_ALLOWED_USERS U
+                    ON U.ID_UZYTKOWNIKA = Z.ID_UZYTKOWNIKA
+                WHERE CAST(Z.DATA_UTWORZENIA_WIERSZA AS date) = CAST(GETDATE() AS date)
+                ORDER BY Z.DATA_UTWORZENIA_WIERSZA ASC
+            """
         cursor.execute(query)
         rows = cursor.fetchall()
 
         # Pobieramy numer zamówienia oraz dodatkowe informacje
         order_details = []
         for row in rows:
-            if row[0]:  # Jeśli numer zamówienia istnieje
-                order_details.append({
-                    'numer': row[0],
-                    'id_zamowienia': row[1],
-                    'data_utworzenia': row[2]
-                })
+            if not row[0]:  # Jeśli numer zamówienia nie istnieje
+                continue
 
-        # Tworzymy listę numerów zamówień
-        order_numbers = [detail['numer'] for detail in order_details]
+            order_details.append({
+                'numer': row[0],
+                'id_zamowienia': row[1],
+                'data_utworzenia': row[2],
+                'id_uzytkownika': row[3],
+                'fields': dict(zip(fields, row[4:]))
+            })
 
-        logger.info(
-            f"Znaleziono {len(order_numbers)} zamówień z dzisiejszego dnia")
+        log_sampled(logger, 'todays_orders',
+                    f"Znaleziono {len(order_details)} zamówień z dzisiejszego dnia")
 
-        # Wyświetl szczegóły zamówień
-        logger.info("Szczegóły znalezionych zamówień:")
-        for i, detail in enumerate(order_details):
-            logger.info(
-                f"{i + 1}. NUMER: {detail['numer']}, ID: {detail['id_zamowienia']}, DATA: {detail['data_utworzenia']}")
+        # Szczegóły zamówień (tylko na poziomie DEBUG)
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, detail in enumerate(order_details):
+                log_event(logger, 'order.found', logging.DEBUG, position=i + 1,
+                          order=detail['numer'], id=detail['id_zamowienia'],
+                          created=detail['data_utworzenia'])
 
-        return order_numbers
+        return order_details
 
     except Exception as e:
         logger.error(
@@ -562,20 +649,129 @@ def get_todays_orders(db_connection):
         return []
 
 
-def process_todays_orders(db_manager=None, printed_orders=None):
+def get_todays_orders(db_connection, allowed_users=None):
+    """
+    Pobiera numery zamówień z dzisiejszego dnia (zob. get_todays_order_rows).
+
+    Args:
+        db_connection: Połączenie z bazą danych
+        allowed_users (list, optional): Lista ID dozwolonych użytkowników.
+            None oznacza brak filtrowania, pusta lista - brak uprawnionych użytkowników.
+
+    Returns:
+        list: Lista numerów zamówień z dzisiejszego dnia
+    """
+    return [detail['numer'] for detail in get_todays_order_rows(db_connection, allowed_users)]
+
+
+def claimed_orders(leases, batch_size=5, order_queue=None):
+    """
+    Przejmuje zamówienia z kolejki dzierżaw partiami po ``batch_size``, aby
+    pozostałe węzły mogły w tym czasie przejmować kolejne. Z kolejką priorytetów
+    zamówienia każdej partii są wydawane od najpilniejszego.
+
+    Zamówienie zwolnione po nieudanej próbie może wrócić w tym samym cyklu;
+    wtedy przejmowanie kończy się do następnego cyklu. Zamówienia przejęte,
+    ale nieprzekazane (przerwanie pętli przez wywołującego) są zwalniane.
+
+    Args:
+        leases: Obiekt OrderLeases
+        batch_size (int): Liczba zamówień przejmowanych jednym zapytaniem
+        order_queue: Opcjonalna kolejka priorytetów (lib.order_priority.OrderQueue)
+
+    Yields:
+        str: Numer przejętego zamówienia
+    """
+    seen = set()
+    pending = []
+    try:
+        while True:
+            pending = leases.claim(batch_size)
+            if not pending:
+                return
+            if order_queue is not None:
+                pending = order_queue.order_batch(pending)
+            repeated = False
+            while pending:
+                order_number = pending.pop(0)
+                if order_number in seen:
+                    repeated = True
+                    leases.release(order_number)
+                    continue
+                seen.add(order_number)
+                if order_queue is not None:
+                    order_queue.record_dispatch(order_number)
+                yield order_number
+            if repeated:
+                return
+    finally:
+        for order_number in pending:
+            leases.release(order_number, retry_delay=0)
+
+
+def _print_candidates(order_rows, printed_orders):
+    """Zamówienia ZO, których jeszcze nie wydrukowano (wiersze get_todays_order_rows)"""
+    candidates = []
+    for row in order_rows:
+        order_number = row['numer']
+        # Sprawdź czy zamówienie było już wydrukowane
+        normalized_number = normalize_filename(order_number)
+        # if normalized_number started not from ZO do not print
+        if not normalized_number.startswith('ZO'):
+            log_sampled(logger, 'skip_not_zo',
+                        f"Zamówienie {order_number} nie zaczyna sie od ZO ... , pomijam...")
+            continue
+
+        if normalized_number in printed_orders:
+            log_sampled(logger, 'skip_printed',
+                        f"Zamówienie {order_number} zostało już wydrukowane, pomijam...")
+            continue
+        candidates.append(row)
+    return candidates
+
+
+def _printer_label(config):
+    """Identyfikator drukarki źródła (etykieta metryk kolejki)"""
+    return config.get_thermal_printer_ip() or normalize_filename(config.get_thermal_printer_name() or '')
+
+
+def process_todays_orders(db_manager=None, printed_orders=None, allowed_users=None,
+                          leases=None, batch_size=5):
     """
     Przetwarza zamówienia z dzisiejszego dnia.
 
+    Z dzierżawami (kilka instancji sql2html) zamówienia są najpierw rejestrowane
+    w tabeli WaproPrintLease, a przetwarzane są tylko te przejęte przez ten węzeł.
+    Wywołujący po wydruku zamówienia wywołuje leases.complete() (lub release()
+    po nieudanej próbie); zamówienia, których nie udało się przygotować, są
+    zwalniane tutaj. O wydruku przejętego zamówienia decyduje wyłącznie status
+    dzierżawy: lokalny plik HTML zapisany przed nieudaną próbą wydruku nie
+    oznacza zamówienia jako wydrukowanego.
+
+    Z priorytetami ([PRIORITY], lib.order_priority) zamówienia są wydawane
+    z kolejki priorytetowej z postarzaniem, a nie w kolejności utworzenia;
+    co ``refresh_seconds`` kolejka jest uzupełniana o nowe zamówienia z bazy.
+    Z dzierżawami priorytet porządkuje zamówienia w obrębie przejętej partii.
+
     Args:
         db_manager: Instancja DatabaseManager
         printed_orders: Zbiór identyfikatorów już wydrukowanych zamówień
+        allowed_users: Lista ID użytkowników uprawnionych do drukowania
+            (domyślnie [USERS] allowed_users z konfiguracji)
+        leases: Opcjonalny obiekt OrderLeases (lib.order_leases)
+        batch_size (int): Liczba zamówień przejmowanych jednym zapytaniem
 
     Yields:
         tuple: Para (order_number, html_content) dla każdego przetworzonego zamówienia
     """
-    # Inicjalizacja konfiguracji jeśli nie podano
+    config = get_config()
+
+    # Lista uprawnionych użytkowników (brak wpisu w konfiguracji = brak uprawnionych)
+    if allowed_users is None:
+        allowed_users = config.get_allowed_users() or []
+
+    # Inicjalizacja połączenia jeśli nie podano
     if db_manager is None:
-        config = ConfigManager()
         conn_str = config.get_connection_string()
         if not conn_str:
             logger.error("Nie udało się pobrać connection string")
@@ -592,78 +788,116 @@ def process_todays_orders(db_manager=None, printed_orders=None):
         logger.info(
             f"Znaleziono {len(printed_orders)} już wydrukowanych zamówień")
 
+    queue = None
     try:
+        # Klasy priorytetu i terminy SLA ([PRIORITY]); bez nich kolejność utworzenia
+        scheduler = get_priority_scheduler()
+        fields = ()
+        if scheduler is not None:
+            fields = scheduler.available_fields(db_manager.connection.cursor())
+
         # Pobierz dzisiejsze zamówienia
-        order_numbers = get_todays_orders(db_manager.connection)
+        order_rows = get_todays_order_rows(db_manager.connection, allowed_users, fields)
 
         # Jeśli brak zamówień, zakończ
-        if not order_numbers:
+        if not order_rows:
             logger.info("Brak zamówień z dzisiejszego dnia")
             return
 
+        # Zamówienia do wydruku
+        candidates = _print_candidates(order_rows, printed_orders)
+
+        order_queue = None
+        if scheduler is not None:
+            order_queue = OrderQueue(scheduler, printer=_printer_label(config))
+            for row in candidates:
+                order_queue.push(row['numer'], row['data_utworzenia'], row['fields'])
+
+        if leases is not None:
+            # Klucz kolejki priorytetów trafia do tabeli dzierżaw, więc węzły
+            # przejmują najpilniejsze zamówienia z całej kolejki, nie tylko z partii
+            priority_keys = None
+            if order_queue is not None:
+                priority_keys = {row['numer']: order_queue.entry(row['numer'])['key'][0]
+                                 for row in candidates}
+            leases.register([row['numer'] for row in candidates], priority_keys)
+            queue = claimed_orders(leases, batch_size, order_queue)
+        elif order_queue is not None:
+            def refresh():
+                # Nowe zamówienia (np. pilne) dołączają do kolejki w trakcie cyklu
+                new_rows = get_todays_order_rows(db_manager.connection, allowed_users, fields)
+                for row in _print_candidates(new_rows, printed_orders):
+                    order_queue.push(row['numer'], row['data_utworzenia'], row['fields'])
+
+            queue = order_queue.drain(refresh, config.get_priority_settings()['refresh_seconds'])
+        else:
+            queue = [row['numer'] for row in candidates]
+
         # Przetwórz każde zamówienie
-        for order_number in order_numbers:
+        for order_number in queue:
+            handed_over = False
+            entry = order_queue.entry(order_number) if order_queue is not None else None
             try:
-                # Sprawdź czy zamówienie było już wydrukowane
-                normalized_number = normalize_filename(order_number)
-                # if normalized_number started not from ZO do not print
-                if not normalized_number.startswith('ZO'):
-                    logger.info(
-                        f"Zamówienie {order_number} nie zaczyna sie od ZO ... , pomijam...")
-                    continue
-
-                if normalized_number in printed_orders:
+                # Ślad zamówienia obejmuje też etapy wykonywane przez konsumenta
+                # po yield (renderowanie, ZPL, wysyłka): generator działa w kontekście
+                # wywołującego, więc span główny kończy się przy pobraniu kolejnego zamówienia
+                trace_attrs = {'priority': entry['priority']} if entry else {}
+                with start_trace(order_number, **trace_attrs):
+                    logger.info(f"Przetwarzanie zamówienia {order_number}")
+
+                    # Pobierz dane zamówienia
+                    with stage_timer('db_fetch'):
+                        order_data = get_order_by_number(
+                            db_manager.connection, order_number)
+
+                    if not order_data:
+                        logger.warning(
+                            f"Nie znaleziono danych dla zamówienia {order_number}")
+                        continue
+
+                    # Zapisz dane do JSON
+                    json_file = save_order_to_json(order_data)
+
+                    if not json_file:
+                        logger.error(
+                            f"Nie udało się zapisać danych zamówienia {order_number} do pliku JSON")
+                        continue
+
+                    # Generuj HTML dla zamówienia
+                    with stage_timer('html'):
+                        html_content = generate_html_for_order(order_data)
+
+                    if not html_content:
+                        logger.error(
+                            f"Nie udało się wygenerować HTML dla zamówienia {order_number}")
+                        continue
+
+                    # Zwróć parę (order_number, html_content)
                     logger.info(
-                        f"Zamówienie {order_number} zostało już wydrukowane, pomijam...")
-                    continue
-
-                logger.info(f"Przetwarzanie zamówienia {order_number}")
-
-                # Pobierz dane zamówienia
-                order_data = get_order_by_number(
-                    db_manager.connection, order_number)
-
-                if not order_data:
-                    logger.warning(
-                        f"Nie znaleziono danych dla zamówienia {order_number}")
-                    continue
-
-                # Zapisz dane do JSON
-                json_file = save_order_to_json(order_data)
-
-                if not json_file:
-                    logger.error(
-                        f"Nie udało się zapisać danych zamówienia {order_number} do pliku JSON")
-                    continue
-
-                # Generuj HTML dla zamówienia
-                html_content = generate_html_for_order(order_data)
-
-                if not html_content:
-                    logger.error(
-                        f"Nie udało się wygenerować HTML dla zamówienia {order_number}")
-                    continue
-
-                # Zwróć parę (order_number, html_content)
-                logger.info(
-                    f"Przygotowano zamówienie {order_number} do wydruku")
-                yield (order_number, html_content)
+                        f"Przygotowano zamówienie {order_number} do wydruku")
+                    handed_over = True
+                    yield (order_number, html_content)
 
             except Exception as e:
                 logger.error(
                     f"Błąd podczas przetwarzania zamówienia {order_number}: {str(e)}", exc_info=True)
+            finally:
+                if leases is not None and not handed_over:
+                    leases.release(order_number)
 
     except Exception as e:
         logger.error(
             f"Błąd podczas wykonywania skryptu: {str(e)}", exc_info=True)
     finally:
-        # Nie zamykamy połączenia jeśli zostało przekazane z zewnątrz
-        pass
+        # Nie zamykamy połączenia jeśli zostało przekazane z zewnątrz;
+        # zwalniamy tylko zamówienia przejęte, ale nieprzetworzone
+        if leases is not None and queue is not None:
+            queue.close()
 
 
 def main():
     """Główna funkcja skryptu do uruchamiania autonomicznego."""
-    config = ConfigManager()
+    config = get_config()
     conn_str = config.get_connection_string()
 
     if not conn_str:
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/order_sources.py
+"""
+Kilka źródeł zamówień (baz WAPRO / magazynów) w jednym procesie sql2html.
+
+Źródło to sekcja [SOURCE:nazwa] w config.ini z nadpisaniami sekcji głównych
+(baza, uprawnieni użytkownicy, drukarka, katalogi). Każde źródło ma własne
+połączenie z bazą, drukarki i dzierżawy, a wspólne są przeglądarka, pula
+kodowania ZPL i rejestr metryk.
+
+Kod źródła działa w jego własnym kontekście (contextvars), w którym
+get_config() zwraca konfigurację źródła. fair_orders() przeplata zamówienia
+źródeł (ważony round-robin), więc źródło z setkami zamówień nie blokuje
+pozostałych do końca swojej kolejki.
+"""
+
+from lib.config_snapshot import get_config, source_context
+from lib.log_config import get_logger
+
+logger = get_logger().getLogger(__name__)
+
+
+class OrderSource:
+    """Źródło zamówień z własną bazą, drukarkami i dzierżawami"""
+
+    def __init__(self, name=None, weight=1):
+        """
+        Args:
+            name (str): Nazwa źródła z sekcji [SOURCE:nazwa]; None - konfiguracja główna
+            weight (int): Liczba zamówień źródła w jednej kolejce przeplatania
+        """
+        self.name = name
+        self.weight = max(int(weight), 1)
+        self.context = source_context(name)
+        self.db_manager = None
+        self.printer_manager = None
+        self.printer_name = None
+        self.leases = None
+        self.orders = 0
+
+    @property
+    def label(self):
+        return self.name or 'default'
+
+    def run(self, function, *args, **kwargs):
+        """Wywołuje funkcję w kontekście źródła (get_config() zwraca konfigurację źródła)"""
+        return self.context.run(function, *args, **kwargs)
+
+    def status(self):
+        """Zwraca stan źródła (część odpowiedzi status trybu rezydentnego)"""
+        # Kopia kontekstu: status jest odczytywany także wtedy, gdy kontekst źródła
+        # jest aktywny w wątku roboczym (pobieranie zamówień)
+        printer_ip = self.context.copy().run(lambda: get_config().get_thermal_printer_ip())
+        return {
+            'source': self.label,
+            'database': self.db_manager is not None and self.db_manager.connection is not None,
+            'printer': printer_ip or self.printer_name,
+            'orders': self.orders,
+            'leases': self.leases.stats() if self.leases is not None else None,
+        }
+
+    def close(self):
+        """Zatrzymuje odnawianie dzierżaw i zamyka połączenie z bazą"""
+        if self.leases is not None:
+            self.leases.stop_heartbeat()
+        if self.db_manager is not None:
+            self.db_manager.close()
+
+
+def fair_orders(sources, make_orders):
+    """
+    Przeplata zamówienia źródeł: z każdego źródła po ``weight`` zamówień na kolejkę.
+    Generatory zamówień są tworzone i wznawiane w kontekstach swoich źródeł,
+    a przerwanie pętli przez wywołującego zamyka je (np. zwalnia dzierżawy).
+
+    Args:
+        sources: Lista obiektów OrderSource
+        make_orders: Funkcja (source) -> iterator par (order_number, html_content)
+
+    Yields:
+        tuple: (source, order_number, html_content)
+    """
+    streams = [(source, source.run(make_orders, source)) for source in sources]
+    try:
+        while streams:
+            for stream in list(streams):
+                source, orders = stream
+                for _ in range(source.weight):
+                    item = source.run(next, orders, None)
+                    if item is None:
+                        streams.remove(stream)
+                        break
+                    source.orders += 1
+                    order_number, html_content = item
+                    yield source, order_number, html_content
+    finally:
+        for source, orders in streams:
+            close = getattr(orders, 'close', None)
+            if close is not None:
+                source.run(close)
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/print_history.py
+"""
+Zarządzanie tabelą historii wydruków WaproPrintHistory.
+
+- migracje schematu (tabela historii, indeksy na DOK_ID i PRINT_DATE,
+  tabela podsumowań WaproPrintHistorySummary),
+- warunek NOT EXISTS do wykluczania wydrukowanych dokumentów,
+- retencja: wiersze starsze niż zadana liczba dni są przenoszone partiami
+  do tabeli podsumowań (liczba wydruków na dzień, operatora i status),
+- benchmark porównujący NOT IN bez indeksu z NOT EXISTS z indeksem.
+
+Retencja nie może być krótsza niż okno wyszukiwania nowych dokumentów
+(dokumenty z bieżącego dnia), dlatego minimalna wartość to 1 dzień.
+
+Benchmark:
+    python -m lib.print_history --benchmark --sqlite
+    python -m lib.print_history --benchmark --rows 1000000
+"""
+
+import sys
+import time
+import argparse
+import threading
+
+from lib.log_config import get_logger
+
+logger = get_logger().getLogger(__name__)
+
+HISTORY_TABLE = 'WaproPrintHistory'
+SUMMARY_TABLE = 'WaproPrintHistorySummary'
+MIN_RETENTION_DAYS = 1
+
+# Migracje schematu - każda jest idempotentna i wykonywana w podanej kolejności
+MIGRATIONS = [
+    ('create_history_table', f"""
+        IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{HISTORY_TABLE}')
+        BEGIN
+            CREATE TABLE {HISTORY_TABLE} (
+                ID INT IDENTITY(1,1) PRIMARY KEY,
+                DOK_ID INT NOT NULL,
+                PRINT_DATE DATETIME DEFAULT GETDATE(),
+                OPERATOR_ID VARCHAR(50),
+                PRINT_STATUS VARCHAR(20)
+            );
+        END
+    """),
+    ('index_dok_id', f"""
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'IX_{HISTORY_TABLE}_DOK_ID'
+                       AND object_id = OBJECT_ID('{HISTORY_TABLE}'))
+        BEGIN
+            CREATE NONCLUSTERED INDEX IX_{HISTORY_TABLE}_DOK_ID
+                ON {HISTORY_TABLE} (DOK_ID) INCLUDE (PRINT_STATUS);
+        END
+    """),
+    ('index_print_date', f"""
+        IF NOT EXISTS (SELECT * FROM sys.indexes
+                       WHERE name = 'IX_{HISTORY_TABLE}_PRINT_DATE'
+                       AND object_id = OBJECT_ID('{HISTORY_TABLE}'))
+        BEGIN
+            CREATE NONCLUSTERED INDEX IX_{HISTORY_TABLE}_PRINT_DATE
+                ON {HISTORY_TABLE} (PRINT_DATE);
+        END
+    """),
+    ('create_summary_table', f"""
+        IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{SUMMARY_TABLE}')
+        BEGIN
+            CREATE TABLE {SUMMARY_TABLE} (
+                PRINT_DAY DATE NOT NULL,
+                OPERATOR_ID VARCHAR(50) NOT NULL,
+                PRINT_STATUS VARCHAR(20) NOT NULL,
+                PRINT_COUNT INT NOT NULL,
+                CONSTRAINT PK_{SUMMARY_TABLE} PRIMARY KEY (PRINT_DAY, OPERATOR_ID, PRINT_STATUS)
+            );
+        END
+    """),
+]
+
+# Jedna partia retencji: usunięcie starych wierszy z zapisaniem ich do zmiennej
+# tabelarycznej, a następnie dopisanie zagregowanych liczników do podsumowania
+ARCHIVE_BATCH_SQL = f"""
+    SET NOCOUNT ON;
+    DECLARE @archived TABLE (PRINT_DAY DATE, OPERATOR_ID VARCHAR(50), PRINT_STATUS VARCHAR(20));
+
+    DELETE TOP (?) FROM {HISTORY_TABLE}
+    OUTPUT CAST(deleted.PRINT_DATE AS DATE), deleted.OPERATOR_ID, deleted.PRINT_STATUS
+        INTO @archived
+    WHERE PRINT_DATE < DATEADD(day, -?, CAST(GETDATE() AS DATE));
+
+    MERGE {SUMMARY_TABLE} AS s
+    USING (
+        SELECT PRINT_DAY, ISNULL(OPERATOR_ID, ''), ISNULL(PRINT_STATUS, ''), COUNT(*)
+        FROM @archived
+        GROUP BY PRINT_DAY, ISNULL(OPERATOR_ID, ''), ISNULL(PRINT_STATUS, '')
+    ) AS a (PRINT_DAY, OPERATOR_ID, PRINT_STATUS, PRINT_COUNT)
+    ON s.PRINT_DAY = a.PRINT_DAY AND s.OPERATOR_ID = a.OPERATOR_ID AND s.PRINT_STATUS = a.PRINT_STATUS
+    WHEN MATCHED THEN
+        UPDATE SET s.PRINT_COUNT = s.PRINT_COUNT + a.PRINT_COUNT
+    WHEN NOT MATCHED THEN
+        INSERT (PRINT_DAY, OPERATOR_ID, PRINT_STATUS, PRINT_COUNT)
+        VALUES (a.PRINT_DAY, a.OPERATOR_ID, a.PRINT_STATUS, a.PRINT_COUNT);
+
+    SELECT COUNT(*) FROM @archived;
+"""
+
+
+def not_printed_condition(id_expression, history_alias='h'):
+    """
+    Zwraca warunek SQL wykluczający dokumenty obecne w historii wydruków.
+    Anti-join NOT EXISTS korzysta z indeksu na DOK_ID i, w przeciwieństwie
+    do NOT IN, nie wymaga filtrowania wartości NULL.
+
+    Args:
+        id_expression (str): Wyrażenie z identyfikatorem dokumentu, np. 'd.ID_DOK_MAGAZYNOWEGO'
+        history_alias (str): Alias tabeli historii w podzapytaniu
+
+    Returns:
+        str: Fragment klauzuli WHERE
+    """
+    return (f"NOT EXISTS (SELECT 1 FROM {HISTORY_TABLE} {history_alias} "
+            f"WHERE {history_alias}.DOK_ID = {id_expression})")
+
+
+def ensure_history_schema(cursor):
+    """
+    Wykonuje migracje schematu historii wydruków.
+
+    Args:
+        cursor: Kursor bazy danych (SQL Server)
+    """
+    for name, sql in MIGRATIONS:
+        cursor.execute(sql)
+        logger.debug(f"Migracja historii wydruków: {name}")
+    cursor.connection.commit()
+    logger.info("Schemat historii wydruków jest aktualny")
+
+
+def archive_old_history(connection, retention_days=90, batch_size=50000):
+    """
+    Przenosi wiersze historii starsze niż retention_days do tabeli podsumowań.
+    Każda partia jest osobną transakcją, aby nie blokować tabeli na długo.
+
+    Args:
+        connection: Połączenie z bazą danych
+        retention_days (int): Liczba dni przechowywania pełnej historii
+        batch_size (int): Maksymalna liczba wierszy w jednej partii
+
+    Returns:
+        int: Liczba zarchiwizowanych wierszy
+    """
+    retention_days = max(int(retention_days), MIN_RETENTION_DAYS)
+    total = 0
+    cursor = connection.cursor()
+    try:
+        while True:
+            cursor.execute(ARCHIVE_BATCH_SQL, (batch_size, retention_days))
+            archived = cursor.fetchone()[0]
+            connection.commit()
+            total += archived
+            if archived < batch_size:
+                break
+    except Exception as e:
+        connection.rollback()
+        logger.error(
+            f"Błąd podczas archiwizacji historii wydruków: {e}", exc_info=True)
+    finally:
+        cursor.close()
+
+    if total:
+        logger.info(
+            f"Zarchiwizowano {total} wierszy historii wydruków starszych niż {retention_days} dni")
+    return total
+
+
+class HistoryRetentionJob:
+    """Wątek w tle okresowo uruchamiający retencję historii wydruków"""
+
+    def __init__(self, connect, retention_days=90, batch_size=50000, interval_hours=24):
+        """
+        Args:
+            connect: Funkcja zwracająca nowe połączenie z bazą danych
+            retention_days (int): Liczba dni przechowywania pełnej historii
+            batch_size (int): Liczba wierszy w jednej partii
+            interval_hours (float): Odstęp między uruchomieniami w godzinach
+        """
+        self.connect = connect
+        self.retention_days = max(int(retention_days), MIN_RETENTION_DAYS)
+        self.batch_size = batch_size
+        self.interval = interval_hours * 3600
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """Uruchamia retencję jeden raz na osobnym połączeniu"""
+        connection = self.connect()
+        try:
+            return archive_old_history(connection, self.retention_days, self.batch_size)
+        finally:
+            connection.close()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='print-history-retention', daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Uruchomiono retencję historii wydruków ({self.retention_days} dni)")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Błąd zadania retencji historii wydruków: {e}")
+            self._stop_event.wait(self.interval)
+
+
+def _bench_setup_sqlite(cursor, rows, documents):
+    cursor.execute("CREATE TEMP TABLE bench_history (ID INTEGER PRIMARY KEY, DOK_ID INT NOT NULL, "
+                   "PRINT_DATE TEXT, OPERATOR_ID TEXT, PRINT_STATUS TEXT)")
+    cursor.execute("CREATE TEMP TABLE bench_documents (ID INT PRIMARY KEY)")
+    cursor.executemany(
+        "INSERT INTO bench_history (DOK_ID, PRINT_DATE, OPERATOR_ID, PRINT_STATUS) "
+        "VALUES (?, '2024-01-01', 'SYSTEM', 'PRINTED')",
+        ((i,) for i in range(rows)))
+    # Połowa dzisiejszych dokumentów jest już wydrukowana
+    first_document = rows - documents // 2
+    cursor.executemany("INSERT INTO bench_documents (ID) VALUES (?)",
+                       ((first_document + i,) for i in range(documents)))
+
+
+def _bench_setup_mssql(cursor, rows, documents):
+    cursor.execute("""
+        SET NOCOUNT ON;
+        CREATE TABLE #bench_history (ID INT IDENTITY(1,1) PRIMARY KEY, DOK_ID INT NOT NULL,
+            PRINT_DATE DATETIME, OPERATOR_ID VARCHAR(50), PRINT_STATUS VARCHAR(20));
+        CREATE TABLE #bench_documents (ID INT PRIMARY KEY);
+    """)
+    cursor.execute("""
+        SET NOCOUNT ON;
+        WITH n AS (
+            SELECT TOP (?) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS i
+            FROM sys.all_objects a CROSS JOIN sys.all_objects b CROSS JOIN sys.all_objects c
+        )
+        INSERT INTO #bench_history (DOK_ID, PRINT_DATE, OPERATOR_ID, PRINT_STATUS)
+        SELECT i, DATEADD(minute, -i, GETDATE()), 'SYSTEM', 'PRINTED' FROM n;
+    """, (rows,))
+    cursor.execute("""
+        SET NOCOUNT ON;
+        WITH n AS (
+            SELECT TOP (?) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS i
+            FROM sys.all_objects a CROSS JOIN sys.all_objects b
+        )
+        INSERT INTO #bench_documents (ID) SELECT ? + i FROM n;
+    """, (documents, rows - documents // 2))
+
+
+def benchmark(connection, rows=1000000, documents=500, repeat=5, dialect='mssql'):
+    """
+    Porównuje koszt wyszukiwania niewydrukowanych dokumentów na dużej historii:
+    NOT IN bez indeksu (dotychczasowe zapytanie) i NOT EXISTS z indeksem na DOK_ID.
+    Dane testowe tworzone są w tabelach tymczasowych.
+
+    Args:
+        connection: Połączenie z bazą danych (pyodbc lub sqlite3)
+        rows (int): Liczba wierszy historii
+        documents (int): Liczba dzisiejszych dokumentów
+        repeat (int): Liczba powtórzeń każdego zapytania
+        dialect (str): 'mssql' lub 'sqlite'
+
+    Returns:
+        dict: Najlepsze czasy zapytań w milisekundach
+    """
+    prefix = '#' if dialect == 'mssql' else ''
+    history, docs = f"{prefix}bench_history", f"{prefix}bench_documents"
+    cursor = connection.cursor()
+
+    if dialect == 'mssql':
+        _bench_setup_mssql(cursor, rows, documents)
+    else:
+        _bench_setup_sqlite(cursor, rows, documents)
+    connection.commit()
+
+    queries = {
+        'not_in': f"SELECT COUNT(*) FROM {docs} d WHERE d.ID NOT IN "
+                  f"(SELECT DOK_ID FROM {history} WHERE DOK_ID IS NOT NULL)",
+        'not_exists': f"SELECT COUNT(*) FROM {docs} d WHERE NOT EXISTS "
+                      f"(SELECT 1 FROM {history} h WHERE h.DOK_ID = d.ID)",
+    }
+
+    def measure(sql):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cursor.execute(sql)
+            cursor.fetchall()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best, 2)
+
+    results = {'rows': rows, 'documents': documents,
+               'not_in_without_index_ms': measure(queries['not_in'])}
+
+    cursor.execute(f"CREATE INDEX IX_bench_history_DOK_ID ON {history} (DOK_ID)")
+    connection.commit()
+    results['not_exists_with_index_ms'] = measure(queries['not_exists'])
+    cursor.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Historia wydruków WaproPrintHistory')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Porównaj NOT IN bez indeksu z NOT EXISTS z indeksem')
+    parser.add_argument('--archive', action='store_true',
+                        help='Uruchom retencję historii zgodnie z konfiguracją')
+    parser.add_argument('--migrate', action='store_true',
+                        help='Wykonaj migracje schematu historii')
+    parser.add_argument('--sqlite', action='store_true',
+                        help='Benchmark na lokalnej bazie SQLite zamiast SQL Server')
+    parser.add_argument('--rows', type=int, default=1000000,
+                        help='Liczba wierszy historii w benchmarku')
+    args = parser.parse_args()
+
+    if args.benchmark and args.sqlite:
+        import sqlite3
+        connection = sqlite3.connect(':memory:')
+        dialect = 'sqlite'
+    elif args.benchmark or args.archive or args.migrate:
+        from lib.config_snapshot import get_config
+        from lib.DatabaseManager import connect_database
+        from lib.wapro_emulator import is_emulator_dsn
+        connection_string = get_config().get_connection_string()
+        connection = connect_database(connection_string)
+        dialect = 'sqlite' if is_emulator_dsn(connection_string) else 'mssql'
+    else:
+        parser.print_help()
+        return 1
+
+    try:
+        if args.migrate:
+            ensure_history_schema(connection.cursor())
+        if args.archive:
+            settings = get_config().get_history_settings()
+            archive_old_history(connection, settings['retention_days'], settings['batch_size'])
+        if args.benchmark:
+            results = benchmark(connection, rows=args.rows, dialect=dialect)
+            print(f"Wiersze historii: {results['rows']}, dokumenty: {results['documents']}")
+            print(f"NOT IN bez indeksu:      {results['not_in_without_index_ms']:>10.2f} ms")
+            print(f"NOT EXISTS z indeksem:   {results['not_exists_with_index_ms']:>10.2f} ms")
+    finally:
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/print_history_writer.py
+"""
+Buforowany zapis historii wydruków (write-behind).
+
+Wpisy historii trafiają najpierw do lokalnego dziennika (plik JSON Lines)
+i bufora w pamięci, a wątek w tle zapisuje je do WaproPrintHistory jednym
+wywołaniem executemany co batch_size wpisów lub co flush_interval_ms.
+Drukowanie nie czeka więc na zatwierdzenie transakcji w bazie.
+
+Po awarii wpisy z dziennika są wczytywane przy starcie i zapisywane ponownie;
+insert pomija wiersze już obecne w historii (ten sam DOK_ID i PRINT_DATE),
+więc ponowne odtworzenie dziennika nie tworzy duplikatów. Dziennik przechowuje
+czas z dokładnością do mikrosekund, a kolumna DATETIME w SQL Server zaokrągla
+go do 1/300 s - przed zapisem i porównaniem czas jest zaokrąglany tak samo.
+Parametr jest też jawnie rzutowany na DATETIME: pyodbc przekazuje datetime2,
+a przy poziomie zgodności >= 130 kolumna DATETIME porównywana z datetime2 jest
+rozszerzana dokładnie (.123 -> .1233333) i równość nigdy nie zachodzi.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+
+from lib.log_config import get_logger
+
+logger = get_logger().getLogger(__name__)
+
+INSERT_SQL = """
+    INSERT INTO WaproPrintHistory (DOK_ID, PRINT_DATE, OPERATOR_ID, PRINT_STATUS)
+    SELECT ?, CAST(? AS DATETIME), ?, ?
+    WHERE NOT EXISTS (SELECT 1 FROM WaproPrintHistory
+                      WHERE DOK_ID = ? AND PRINT_DATE = CAST(? AS DATETIME))
+"""
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def to_sql_datetime(value):
+    """
+    Zaokrągla czas tak, jak typ DATETIME w SQL Server (do 1/300 s,
+    milisekundy kończą się na .000, .003 lub .007).
+
+    Args:
+        value (datetime): Czas z dokładnością do mikrosekund
+
+    Returns:
+        datetime: Czas równy wartości zapisanej w kolumnie DATETIME
+    """
+    ticks = round(value.microsecond * 300 / 1000000)
+    milliseconds = round(ticks * 10 / 3)
+    return value.replace(microsecond=0) + timedelta(milliseconds=milliseconds)
+
+
+class PrintHistoryWriter:
+    """Bufor zapisu historii wydruków z dziennikiem na dysku"""
+
+    def __init__(self, connect, batch_size=100, flush_interval_ms=500,
+                 journal_file='print_history.journal'):
+        """
+        Args:
+            connect: Funkcja zwracająca nowe połączenie z bazą danych
+            batch_size (int): Liczba wpisów wyzwalająca natychmiastowy zapis
+            flush_interval_ms (int): Maksymalny czas oczekiwania wpisu w buforze
+            journal_file (str): Ścieżka do lokalnego dziennika wpisów
+        """
+        self.connect = connect
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = max(flush_interval_ms, 1) / 1000.0
+        self.journal_file = journal_file
+        self._pending = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._connection = None
+        self._journal = None
+        self._thread = None
+        self._running = False
+        self._failed = False
+        self.flushed = 0
+        self._recover_journal()
+
+    def _recover_journal(self):
+        """Wczytuje wpisy niezapisane przed poprzednim zamknięciem"""
+        if not os.path.exists(self.journal_file):
+            return
+        recovered = []
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    recovered.append(json.loads(line))
+                except ValueError:
+                    # Niepełny ostatni wiersz po awarii
+                    logger.warning(f"Pominięto uszkodzony wpis dziennika historii: {line[:80]}")
+        self._pending = recovered
+        if recovered:
+            logger.info(
+                f"Odtworzono {len(recovered)} niezapisanych wpisów historii wydruków z dziennika")
+
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+        return self._journal
+
+    def record(self, document_id, operator_id='SYSTEM', status='PRINTED'):
+        """
+        Dodaje wpis historii do bufora.
+
+        Args:
+            document_id: ID dokumentu
+            operator_id (str): Identyfikator operatora
+            status (str): Status wydruku
+        """
+        entry = {
+            'dok_id': document_id,
+            'print_date': datetime.now().strftime(DATE_FORMAT),
+            'operator_id': operator_id,
+            'status': status
+        }
+        with self._condition:
+            journal = self._open_journal()
+            journal.write(json.dumps(entry) + '\n')
+            journal.flush()
+            self._pending.append(entry)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Zapisuje wszystkie buforowane wpisy do bazy danych.
+
+        Returns:
+            int: Liczba zapisanych wpisów (0 przy błędzie - wpisy pozostają w buforze)
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch = self._pending
+                self._pending = []
+            if not batch:
+                return 0
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.error(
+                    f"Błąd zapisu {len(batch)} wpisów historii wydruków, ponowię próbę: {e}")
+                self._close_connection()
+                with self._condition:
+                    self._pending = batch + self._pending
+                    self._failed = True
+                return 0
+
+            with self._condition:
+                self._failed = False
+                self._rewrite_journal()
+            self.flushed += len(batch)
+            return len(batch)
+
+    def _write_batch(self, batch):
+        if self._connection is None:
+            self._connection = self.connect()
+        cursor = self._connection.cursor()
+        try:
+            if hasattr(cursor, 'fast_executemany'):
+                cursor.fast_executemany = True
+            rows = []
+            for entry in batch:
+                print_date = to_sql_datetime(datetime.strptime(entry['print_date'], DATE_FORMAT))
+                rows.append((entry['dok_id'], print_date, entry['operator_id'], entry['status'],
+                             entry['dok_id'], print_date))
+            cursor.executemany(INSERT_SQL, rows)
+            self._connection.commit()
+        except Exception:
+            try:
+                self._connection.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            cursor.close()
+
+    def _rewrite_journal(self):
+        """Zastępuje dziennik wpisami, które wciąż czekają na zapis (wywoływane pod blokadą)"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if not self._pending:
+            try:
+                os.remove(self.journal_file)
+            except FileNotFoundError:
+                pass
+            return
+        temp_file = self.journal_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            for entry in self._pending:
+                f.write(json.dumps(entry) + '\n')
+        os.replace(temp_file, self.journal_file)
+
+    def _close_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def start(self):
+        """Uruchamia wątek zapisujący bufor w tle"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name='print-history-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Po błędzie zapisu czekamy pełny interwał przed ponowną próbą
+                if self._running and (self._failed or len(self._pending) < self.batch_size):
+                    self._condition.wait(self.flush_interval)
+                running = self._running
+            self.flush()
+            if not running:
+                break
+
+    def close(self):
+        """Zatrzymuje wątek i synchronicznie zapisuje pozostałe wpisy"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+        with self._condition:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+        self._close_connection()
+        remaining = self.pending_count()
+        if remaining:
+            logger.warning(
+                f"{remaining} wpisów historii wydruków pozostało w dzienniku {self.journal_file}")
@@ -30,15 +30,17 @@ class Printer:
     Wspiera drukowanie PDF na drukarkach termicznych bezpośrednio lub przez konwersję do ZPL.
     """
 
-    def __init__(self, printer_name=None):
+    def __init__(self, printer_name=None, encoder_pool=None):
         """
         Inicjalizuje obiekt drukarki.
 
         Parametry:
         - printer_name: Nazwa drukarki. Jeśli None, zostanie użyta domyślna drukarka.
+        - encoder_pool: Opcjonalna pula ZplEncoderPool do konwersji PDF na ZPL
         """
         self.logger = logging.getLogger(__name__)
         self.printer_name = printer_name
+        self.encoder_pool = encoder_pool
         self.printer_manager = ThermalPrinterManager()
         self.initialize()
 
@@ -255,8 +257,14 @@ class Printer:
             self.logger.info(
                 f"Konwertuję PDF na format ZPL z rozdzielczością {dpi} DPI...")
             with open(pdf_path, "rb") as pdf:
+                pdf_content = pdf.read()
+
+            if self.encoder_pool is not None:
+                zpl_string = self.encoder_pool.pdf_to_zpl(
+                    pdf_content, dpi=dpi, pos_x=0, pos_y=0, threshold=128, invert=True)
+            else:
                 zpl_string = ZebrafyPDF(
-                    pdf.read(),
+                    pdf_content,
                     format="ASCII",
                     invert=True,
                     dither=False,
@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/query_registry.py
+"""
+Rejestr sparametryzowanych zapytań SQL i pula połączeń z ponownym użyciem
+przygotowanych instrukcji.
+
+Każde zapytanie z gorącej ścieżki jest definiowane raz, a jego tekst SQL nie
+zależy od wartości parametrów:
+
+- nazwy tabel podstawiane są jednorazowo przy rejestracji (tylko poprawne
+  identyfikatory),
+- listy wartości w klauzuli IN rozwijane są do stałej liczby znaczników ``?``
+  (kolejna potęga dwójki, brakujące pozycje wypełniane ostatnią wartością),
+  więc zmiana listy użytkowników nie tworzy nowego planu zapytania,
+- pyodbc przygotowuje instrukcję tylko raz dla danego kursora, dlatego każde
+  połączenie z puli przechowuje osobny kursor dla każdego tekstu SQL.
+
+Liczniki trafień/chybień przygotowanych instrukcji dostępne są przez
+QueryRegistry.stats() do celów diagnostycznych.
+"""
+
+import re
+import queue
+import string
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from lib.log_config import get_logger
+
+logger = get_logger().getLogger(__name__)
+
+# SQL Server przyjmuje maksymalnie 2100 parametrów w jednym zapytaniu
+MAX_IN_ARITY = 2048
+
+_IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$')
+_formatter = string.Formatter()
+
+
+def validate_identifier(name):
+    """
+    Sprawdza, czy nazwa może być bezpiecznie wstawiona do tekstu SQL jako
+    nazwa tabeli lub kolumny.
+
+    Args:
+        name (str): Nazwa obiektu SQL (opcjonalnie ze schematem, np. dbo.TABELA)
+
+    Returns:
+        str: Ta sama nazwa
+
+    Raises:
+        ValueError: Gdy nazwa zawiera niedozwolone znaki
+    """
+    if not isinstance(name, str) or not _IDENTIFIER_RE.match(name):
+        raise ValueError(f"Niepoprawna nazwa obiektu SQL: {name!r}")
+    return name
+
+
+def in_list_arity(count):
+    """
+    Zwraca stałą liczbę znaczników dla listy IN o podanej długości.
+
+    Args:
+        count (int): Liczba wartości na liście
+
+    Returns:
+        int: Najmniejsza potęga dwójki >= count (co najmniej 1)
+    """
+    if count > MAX_IN_ARITY:
+        raise ValueError(
+            f"Lista IN zawiera {count} wartości, maksimum to {MAX_IN_ARITY}")
+    arity = 1
+    while arity < count:
+        arity *= 2
+    return arity
+
+
+def pad_in_list(values):
+    """
+    Dopełnia listę wartości do stałej długości powtarzając ostatnią wartość.
+    Powtórzenia nie zmieniają wyniku warunku IN.
+
+    Args:
+        values (list): Wartości listy IN (niepusta)
+
+    Returns:
+        list: Lista o długości in_list_arity(len(values))
+    """
+    values = list(values)
+    if not values:
+        raise ValueError("Lista IN nie może być pusta")
+    return values + [values[-1]] * (in_list_arity(len(values)) - len(values))
+
+
+class RegisteredQuery:
+    """Zapytanie zarejestrowane w QueryRegistry"""
+
+    def __init__(self, name, sql, list_params=(), identifiers=None):
+        identifiers = identifiers or {}
+        for value in identifiers.values():
+            validate_identifier(value)
+
+        self.name = name
+        self.list_params = frozenset(list_params)
+        self._parts = []
+        self.param_names = []
+        for literal, field_name, _, _ in _formatter.parse(sql):
+            self._parts.append((literal, field_name))
+            if field_name is None or field_name in identifiers:
+                continue
+            self.param_names.append(field_name)
+        self._identifiers = identifiers
+        self._sql_cache = {}
+
+    def build(self, params):
+        """
+        Tworzy tekst SQL i krotkę parametrów dla podanych wartości.
+
+        Args:
+            params (dict): Wartości parametrów wg nazw
+
+        Returns:
+            tuple: (sql, parametry)
+        """
+        values = []
+        arities = []
+        for name in self.param_names:
+            if name not in params:
+                raise KeyError(f"Brak parametru '{name}' dla zapytania '{self.name}'")
+            if name in self.list_params:
+                padded = pad_in_list(params[name])
+                arities.append(len(padded))
+                values.extend(padded)
+            else:
+                values.append(params[name])
+
+        key = tuple(arities)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            sql = self._render(iter(arities))
+            self._sql_cache[key] = sql
+        return sql, tuple(values)
+
+    def _render(self, arities):
+        chunks = []
+        for literal, field_name in self._parts:
+            chunks.append(literal)
+            if field_name is None:
+                continue
+            if field_name in self._identifiers:
+                chunks.append(self._identifiers[field_name])
+            elif field_name in self.list_params:
+                chunks.append(', '.join(['?'] * next(arities)))
+            else:
+                chunks.append('?')
+        return ''.join(chunks)
+
+
+class QueryRegistry:
+    """Rejestr nazwanych zapytań z licznikami użycia przygotowanych instrukcji"""
+
+    def __init__(self):
+        self._queries = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._per_query = {}
+
+    def register(self, name, sql, list_params=(), identifiers=None):
+        """
+        Rejestruje zapytanie.
+
+        Args:
+            name (str): Nazwa zapytania
+            sql (str): Tekst SQL; ``{nazwa}`` oznacza parametr, listę IN lub identyfikator
+            list_params (iterable): Nazwy parametrów będących listami IN
+            identifiers (dict): Nazwy tabel/kolumn podstawiane przy rejestracji
+
+        Returns:
+            RegisteredQuery: Zarejestrowane zapytanie
+        """
+        query = RegisteredQuery(name, sql, list_params, identifiers)
+        with self._lock:
+            self._queries[name] = query
+        return query
+
+    def __contains__(self, name):
+        return name in self._queries
+
+    def build(self, name, **params):
+        """Zwraca (sql, parametry) dla zarejestrowanego zapytania"""
+        try:
+            query = self._queries[name]
+        except KeyError:
+            raise KeyError(f"Nieznane zapytanie: {name}")
+        return query.build(params)
+
+    def record(self, name, hit):
+        """Zapisuje trafienie lub chybienie przygotowanej instrukcji"""
+        with self._lock:
+            counters = self._per_query.setdefault(name, {'hits': 0, 'misses': 0})
+            if hit:
+                self._hits += 1
+                counters['hits'] += 1
+            else:
+                self._misses += 1
+                counters['misses'] += 1
+
+    def stats(self):
+        """
+        Zwraca liczniki ponownego użycia przygotowanych instrukcji.
+
+        Returns:
+            dict: hits, misses, hit_ratio oraz liczniki dla poszczególnych zapytań
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / total, 3) if total else 0.0,
+                'queries': {name: dict(counters) for name, counters in self._per_query.items()}
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._per_query = {}
+
+
+class PooledConnection:
+    """Połączenie z puli przechowujące kursory przygotowanych instrukcji"""
+
+    def __init__(self, connection, registry, max_statements=64):
+        self.connection = connection
+        self.registry = registry
+        self.max_statements = max_statements
+        self._cursors = OrderedDict()
+
+    def _cursor_for(self, sql, label):
+        cursor = self._cursors.get(sql)
+        if cursor is not None:
+            self._cursors.move_to_end(sql)
+            self.registry.record(label, True)
+            return cursor
+
+        self.registry.record(label, False)
+        cursor = self.connection.cursor()
+        self._cursors[sql] = cursor
+        if len(self._cursors) > self.max_statements:
+            _, evicted = self._cursors.popitem(last=False)
+            evicted.close()
+        return cursor
+
+    def execute(self, name, **params):
+        """
+        Wykonuje zarejestrowane zapytanie.
+
+        Returns:
+            Kursor z wynikami zapytania
+        """
+        sql, values = self.registry.build(name, **params)
+        cursor = self._cursor_for(sql, name)
+        cursor.execute(sql, values)
+        return cursor
+
+    def execute_sql(self, sql, params=None):
+        """Wykonuje dowolne zapytanie, ponownie używając kursora dla tego samego tekstu SQL"""
+        cursor = self._cursor_for(sql, '<sql>')
+        if params:
+            cursor.execute(sql, params)
+        else:
+            cursor.execute(sql)
+        return cursor
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        for cursor in self._cursors.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._cursors.clear()
+        self.connection.close()
+
+
+class ConnectionPool:
+    """Prosta pula połączeń z bazą danych"""
+
+    def __init__(self, connect, registry, size=4, max_statements=64):
+        """
+        Args:
+            connect: Funkcja zwracająca nowe połączenie (np. lambda: pyodbc.connect(...))
+            registry (QueryRegistry): Rejestr zapytań
+            size (int): Maksymalna liczba bezczynnych połączeń w puli
+            max_statements (int): Liczba przygotowanych instrukcji na połączenie
+        """
+        self.connect = connect
+        self.registry = registry
+        self.max_statements = max_statements
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def acquire(self):
+        """
+        Pobiera połączenie z puli. Po błędzie połączenie jest zamykane,
+        a nie zwracane do puli.
+        """
+        try:
+            pooled = self._idle.get_nowait()
+        except queue.Empty:
+            pooled = PooledConnection(self.connect(), self.registry, self.max_statements)
+
+        try:
+            yield pooled
+        except Exception:
+            try:
+                pooled.rollback()
+            except Exception:
+                pass
+            pooled.close()
+            raise
+
+        try:
+            self._idle.put_nowait(pooled)
+        except queue.Full:
+            pooled.close()
+
+    def close(self):
+        """Zamyka wszystkie bezczynne połączenia"""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                pooled.close()
+            except Exception as e:
+                logger.debug(f"Błąd podczas zamykania połączenia z puli: {e}")
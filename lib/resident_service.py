@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/resident_service.py
+"""
+Tryb rezydentny: jedna pętla zdarzeń zamiast uruchamiania sql2html.py
+w nowym procesie w każdym cyklu.
+
+ResidentService wywołuje korutynę cyklu (pobranie i wydruk zamówień) co
+``interval`` sekund albo od razu po powiadomieniu: komendzie ``poll`` na
+gnieździe statusu lub wywołaniu notify() z innego wątku. Zasoby cyklu
+(połączenie z bazą, przeglądarka, drukarki) tworzy wywołujący i trzyma je
+przez cały czas życia procesu.
+
+SIGTERM/SIGINT rozpoczynają łagodne zatrzymanie (drain): nowy cykl nie jest
+uruchamiany, cykl może sprawdzać ``service.draining`` i zakończyć się po
+bieżącym zamówieniu, a po ``drain_timeout`` sekundach jest anulowany.
+Drugi sygnał anuluje cykl od razu.
+
+Gniazdo statusu (TCP na adresie lokalnym) przyjmuje komendy tekstowe
+zakończone znakiem nowej linii i odpowiada jedną linią JSON:
+- status - stan usługi,
+- poll - natychmiastowy cykl,
+- drain - łagodne zatrzymanie.
+
+Klient: send_command('status', port=9465) lub ``python sql2html.py --status``.
+"""
+
+import json
+import time
+import signal
+import socket
+import asyncio
+import contextlib
+
+from lib.log_config import get_logger
+
+logger = get_logger().getLogger(__name__)
+
+COMMANDS = ('status', 'poll', 'drain')
+
+
+class ResidentService:
+    """Pętla cykli z powiadomieniami, gniazdem statusu i łagodnym zatrzymaniem"""
+
+    def __init__(self, cycle, interval=5.0, host='127.0.0.1', port=9465,
+                 drain_timeout=60.0, status_callback=None):
+        """
+        Args:
+            cycle: Korutyna bez argumentów wykonująca jeden cykl; może zwrócić
+                liczbę przetworzonych zamówień
+            interval (float | callable): Odstęp między cyklami w sekundach lub funkcja
+                zwracająca go przed każdym oczekiwaniem (np. po zmianie config.ini)
+            host (str): Adres gniazda statusu
+            port (int): Port gniazda statusu (0 - wybrany przez system); None - bez gniazda
+            drain_timeout (float): Czas na dokończenie cyklu po żądaniu zatrzymania
+            status_callback: Funkcja zwracająca słownik dołączany do odpowiedzi status
+        """
+        self.cycle = cycle
+        self.interval = interval
+        self.host = host
+        self.port = port
+        self.drain_timeout = drain_timeout
+        self.status_callback = status_callback
+        self.state = 'starting'
+        self.started_at = time.time()
+        self.cycles = 0
+        self.orders = 0
+        self.failed_cycles = 0
+        self.last_cycle = None
+        self._loop = None
+        self._wake = None
+        self._stopping = None
+        self._task = None
+        self._server = None
+        self._signals = []
+
+    @property
+    def draining(self):
+        return self._stopping is not None and self._stopping.is_set()
+
+    def _interval(self):
+        interval = self.interval() if callable(self.interval) else self.interval
+        return max(float(interval), 0.0)
+
+    def status(self):
+        """Zwraca stan usługi (odpowiedź na komendę status)"""
+        status = {
+            'state': self.state,
+            'uptime': round(time.time() - self.started_at, 3),
+            'cycles': self.cycles,
+            'orders': self.orders,
+            'failed_cycles': self.failed_cycles,
+            'last_cycle': self.last_cycle,
+            'interval': self._interval(),
+        }
+        if self.status_callback is not None:
+            try:
+                status.update(self.status_callback())
+            except Exception as e:
+                status['status_error'] = str(e)
+        return status
+
+    def notify(self):
+        """Żąda natychmiastowego cyklu (bezpieczne z dowolnego wątku)"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def drain(self):
+        """Żąda łagodnego zatrzymania (bezpieczne z dowolnego wątku)"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._request_stop)
+
+    def _request_stop(self):
+        if self.draining:
+            # Ponowne żądanie (np. drugi Ctrl+C) - bez czekania na koniec cyklu
+            if self._task is not None and not self._task.done():
+                logger.warning("Ponowne żądanie zatrzymania - przerywam bieżący cykl")
+                self._task.cancel()
+            return
+        logger.info("Żądanie zatrzymania - kończę bieżący cykl (drain)")
+        if self.state in ('running', 'processing'):
+            self.state = 'draining'
+        self._stopping.set()
+
+    def _install_signal_handlers(self):
+        for name in ('SIGTERM', 'SIGINT'):
+            sig = getattr(signal, name, None)
+            if sig is None:
+                continue
+            try:
+                self._loop.add_signal_handler(sig, self._request_stop)
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Windows lub wątek inny niż główny: zwykła obsługa sygnału
+                try:
+                    signal.signal(sig, lambda signum, frame: self.drain())
+                except ValueError:
+                    continue
+            self._signals.append(sig)
+
+    def _remove_signal_handlers(self):
+        for sig in self._signals:
+            try:
+                self._loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError, ValueError):
+                with contextlib.suppress(ValueError):
+                    signal.signal(sig, signal.SIG_DFL)
+        self._signals = []
+
+    async def run(self):
+        """Wykonuje cykle do czasu żądania zatrzymania"""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._install_signal_handlers()
+        try:
+            if self.port is not None:
+                self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+                self.port = self._server.sockets[0].getsockname()[1]
+                logger.info(f"Gniazdo statusu: {self.host}:{self.port}")
+            self.state = 'running'
+            while not self.draining:
+                self._wake.clear()
+                await self._run_cycle()
+                if not self.draining:
+                    await self._wait(self._interval())
+        finally:
+            self.state = 'stopped'
+            self._remove_signal_handlers()
+            if self._server is not None:
+                self._server.close()
+                await self._server.wait_closed()
+                self._server = None
+            logger.info("Tryb rezydentny zatrzymany")
+
+    async def _wait(self, timeout):
+        waiters = [asyncio.ensure_future(self._wake.wait()),
+                   asyncio.ensure_future(self._stopping.wait())]
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def _run_cycle(self):
+        self.state = 'processing'
+        started = time.monotonic()
+        self._task = asyncio.ensure_future(self.cycle())
+        stop_waiter = asyncio.ensure_future(self._stopping.wait())
+        result = None
+        error = None
+        try:
+            await asyncio.wait([self._task, stop_waiter], return_when=asyncio.FIRST_COMPLETED)
+            if not self._task.done():
+                done, _ = await asyncio.wait([self._task], timeout=self.drain_timeout)
+                if not done:
+                    logger.warning(
+                        f"Cykl nie zakończył się w ciągu {self.drain_timeout} s - przerywam")
+                    self._task.cancel()
+                    await asyncio.wait([self._task])
+            if self._task.cancelled():
+                error = 'cancelled'
+            elif self._task.exception() is not None:
+                error = str(self._task.exception())
+                logger.error(f"Błąd cyklu trybu rezydentnego: {error}",
+                             exc_info=self._task.exception())
+            else:
+                result = self._task.result()
+        finally:
+            stop_waiter.cancel()
+            self._task = None
+
+        self.cycles += 1
+        if error is not None:
+            self.failed_cycles += 1
+        if isinstance(result, int):
+            self.orders += result
+        self.last_cycle = {
+            'finished': time.time(),
+            'duration': round(time.monotonic() - started, 3),
+            'orders': result if isinstance(result, int) else None,
+            'error': error,
+        }
+        if not self.draining:
+            self.state = 'running'
+
+    async def _handle_client(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), timeout=10)
+            command = line.decode('utf-8', errors='replace').strip().lower()
+            if command == 'status':
+                response = dict(self.status(), ok=True)
+            elif command == 'poll':
+                self._wake.set()
+                response = {'ok': True, 'command': command}
+            elif command == 'drain':
+                self._request_stop()
+                response = {'ok': True, 'command': command}
+            else:
+                response = {'ok': False,
+                            'error': f"Nieznana komenda {command!r}; dostępne: {', '.join(COMMANDS)}"}
+            writer.write(json.dumps(response, default=str).encode('utf-8') + b'\n')
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+
+def send_command(command, host='127.0.0.1', port=9465, timeout=5.0):
+    """
+    Wysyła komendę do działającej usługi rezydentnej.
+
+    Args:
+        command (str): status, poll lub drain
+        host (str): Adres gniazda statusu
+        port (int): Port gniazda statusu
+        timeout (float): Limit czasu w sekundach
+
+    Returns:
+        dict: Odpowiedź usługi
+
+    Raises:
+        OSError: Gdy usługa nie działa lub nie odpowiada
+    """
+    with socket.create_connection((host, port), timeout=timeout) as connection:
+        connection.sendall(command.encode('utf-8') + b'\n')
+        response = b''
+        while not response.endswith(b'\n'):
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+    return json.loads(response.decode('utf-8'))
@@ -0,0 +1,479 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/retry_queue.py
+"""
+Trwała kolejka ponownych wydruków (plik SQLite) z wyłącznikiem na drukarkę.
+
+Plik HTML zamówienia jest zapisywany przed wydrukiem, więc zamówienie, którego
+nie udało się wysłać (drukarka wyłączona, przekroczony czas gniazda), było
+dotąd uznawane za wydrukowane i nigdy nie wracało. Teraz:
+
+- nieudana wysyłka dopisuje zamówienie (plik ZPL, adres drukarki) do kolejki,
+- ponowne próby odbywają się z wykładniczym opóźnieniem z losowym rozrzutem
+  (jitter), liczonym osobno dla każdego zamówienia,
+- wyłącznik (circuit breaker) drukarki otwiera się po ``failure_threshold``
+  kolejnych błędach: do drukarki nic nie jest wysyłane (nowe zamówienia trafiają
+  od razu do kolejki) przez czas rosnący wykładniczo z każdym kolejnym
+  otwarciem; po nim jedna próba sprawdza, czy drukarka działa,
+- po ``max_attempts`` próbach zamówienie trafia do martwych (dead letter) i czeka
+  na operatora: ``python -m lib.retry_queue --requeue "ZO 12/26"``.
+
+Każda drukarka ma własny wątek wysyłki, więc wyłączona drukarka (czekanie na
+limit czasu gniazda) nie spowalnia pozostałych.
+
+    python -m lib.retry_queue --list
+    python -m lib.retry_queue --list --dead
+    python -m lib.retry_queue --requeue "ZO 12/26"
+    python -m lib.retry_queue --requeue-all
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.log_config import get_logger
+
+logger = get_logger().getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_DEAD = 'dead'
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS print_retry (
+        source TEXT NOT NULL DEFAULT '',
+        order_number TEXT NOT NULL,
+        printer TEXT NOT NULL,
+        host TEXT NOT NULL,
+        port INTEGER NOT NULL,
+        zpl_path TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL,
+        last_error TEXT,
+        created REAL NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (source, order_number)
+    );
+    CREATE INDEX IF NOT EXISTS ix_print_retry_due ON print_retry (status, printer, next_attempt);
+    CREATE TABLE IF NOT EXISTS printer_circuit (
+        printer TEXT PRIMARY KEY,
+        failures INTEGER NOT NULL DEFAULT 0,
+        trips INTEGER NOT NULL DEFAULT 0,
+        open_until REAL NOT NULL DEFAULT 0,
+        last_error TEXT,
+        updated REAL NOT NULL
+    );
+"""
+
+JOB_COLUMNS = ('source', 'order_number', 'printer', 'host', 'port', 'zpl_path', 'status',
+               'attempts', 'next_attempt', 'last_error')
+
+
+def backoff_delay(attempt, base_delay, max_delay, rng=random):
+    """
+    Opóźnienie wykładnicze z rozrzutem ("equal jitter"): połowa stała,
+    połowa losowa, aby ponowne próby wielu zamówień nie trafiały w ten sam moment.
+
+    Args:
+        attempt (int): Numer kolejnej próby (od 1)
+        base_delay (float): Opóźnienie pierwszej próby
+        max_delay (float): Górny limit opóźnienia
+
+    Returns:
+        float: Opóźnienie w sekundach
+    """
+    delay = min(max_delay, base_delay * (2 ** max(attempt - 1, 0)))
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+def printer_key(host, port):
+    """Identyfikator drukarki sieciowej w kolejce"""
+    return f"{host}:{port}"
+
+
+class RetryQueue:
+    """Kolejka ponownych wydruków i stan wyłączników drukarek w pliku SQLite"""
+
+    def __init__(self, path='retry_queue.db', base_delay=5.0, max_delay=600.0, max_attempts=10,
+                 failure_threshold=3, open_seconds=30.0, clock=time.time, rng=None):
+        """
+        Args:
+            path (str): Plik bazy kolejki
+            base_delay (float): Opóźnienie pierwszej ponownej próby w sekundach
+            max_delay (float): Górny limit opóźnień (próby i otwarcia wyłącznika)
+            max_attempts (int): Liczba prób, po której zamówienie trafia do martwych
+            failure_threshold (int): Liczba kolejnych błędów drukarki otwierająca wyłącznik
+            open_seconds (float): Czas pierwszego otwarcia wyłącznika (kolejne - dwukrotnie dłuższe)
+            clock: Funkcja zwracająca bieżący czas (testy)
+            rng: Generator liczb losowych (testy)
+        """
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max(int(max_attempts), 1)
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            with self._db:
+                return self._db.execute(sql, params).rowcount
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params).fetchall()]
+
+    # --- Zamówienia ---------------------------------------------------------
+
+    def enqueue(self, order_number, zpl_path, host, port, error=None, source=None):
+        """
+        Dopisuje zamówienie do kolejki (lub ponawia istniejący wpis).
+        Pierwsza ponowna próba następuje po base_delay sekundach (z rozrzutem).
+
+        Args:
+            order_number (str): Numer zamówienia
+            zpl_path (str): Plik ZPL do wysłania
+            host (str): Adres drukarki
+            port (int): Port drukarki
+            error (str): Opis błędu wysyłki
+            source (str): Źródło zamówienia ([SOURCE:nazwa]) lub None
+        """
+        now = self.clock()
+        next_attempt = now + backoff_delay(1, self.base_delay, self.max_delay, self.rng)
+        self._write(
+            """INSERT INTO print_retry (source, order_number, printer, host, port, zpl_path,
+                                        next_attempt, last_error, created, updated)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (source, order_number) DO UPDATE SET
+                   printer = excluded.printer, host = excluded.host, port = excluded.port,
+                   zpl_path = excluded.zpl_path, status = 'pending',
+                   next_attempt = excluded.next_attempt, last_error = excluded.last_error,
+                   updated = excluded.updated""",
+            (source or '', order_number, printer_key(host, port), host, int(port), zpl_path,
+             next_attempt, error, now, now))
+        logger.warning(f"Zamówienie {order_number} dodane do kolejki ponownych wydruków "
+                       f"({printer_key(host, port)}): {error}")
+
+    def due_printers(self):
+        """Drukarki z zamówieniami gotowymi do ponownej próby"""
+        rows = self._query("SELECT DISTINCT printer FROM print_retry "
+                           "WHERE status = 'pending' AND next_attempt <= ?", (self.clock(),))
+        return [row['printer'] for row in rows]
+
+    def next_due(self, printer):
+        """Najstarsze zamówienie drukarki gotowe do ponownej próby lub None"""
+        rows = self._query(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM print_retry "
+            "WHERE status = 'pending' AND printer = ? AND next_attempt <= ? "
+            "ORDER BY next_attempt LIMIT 1", (printer, self.clock()))
+        return rows[0] if rows else None
+
+    def mark_printed(self, job):
+        """Usuwa wydrukowane zamówienie z kolejki"""
+        self._write("DELETE FROM print_retry WHERE source = ? AND order_number = ?",
+                    (job['source'], job['order_number']))
+
+    def mark_failed(self, job, error, dead=False):
+        """
+        Zapisuje nieudaną próbę: kolejny termin z opóźnieniem wykładniczym
+        albo, po max_attempts próbach, przeniesienie do martwych.
+
+        Args:
+            job (dict): Wpis kolejki
+            error (str): Opis błędu
+            dead (bool): Przenieś do martwych bez kolejnych prób (np. brak pliku ZPL)
+
+        Returns:
+            bool: True, jeśli zamówienie trafiło do martwych
+        """
+        attempts = job['attempts'] + 1
+        dead = dead or attempts >= self.max_attempts
+        now = self.clock()
+        self._write(
+            "UPDATE print_retry SET attempts = ?, status = ?, next_attempt = ?, last_error = ?, "
+            "updated = ? WHERE source = ? AND order_number = ?",
+            (attempts, STATUS_DEAD if dead else STATUS_PENDING,
+             now + backoff_delay(attempts + 1, self.base_delay, self.max_delay, self.rng),
+             error, now, job['source'], job['order_number']))
+        if dead:
+            logger.error(f"Zamówienie {job['order_number']} przeniesione do martwych po "
+                         f"{attempts} próbach: {error}")
+        return dead
+
+    def requeue(self, order_number=None, source=None):
+        """
+        Przywraca martwe zamówienia do kolejki z wyzerowanym licznikiem prób
+        (komenda operatora).
+
+        Args:
+            order_number (str): Numer zamówienia; None - wszystkie martwe
+            source (str): Źródło zamówienia; None - wszystkie źródła
+
+        Returns:
+            int: Liczba przywróconych zamówień
+        """
+        conditions = ["status = 'dead'"]
+        params = [self.clock(), self.clock()]
+        if order_number is not None:
+            conditions.append("order_number = ?")
+            params.append(order_number)
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        return self._write(
+            "UPDATE print_retry SET status = 'pending', attempts = 0, next_attempt = ?, "
+            f"updated = ? WHERE {' AND '.join(conditions)}", params)
+
+    def jobs(self, status=None):
+        """Wpisy kolejki (wszystkie lub o danym statusie)"""
+        where = "WHERE status = ?" if status else ""
+        return self._query(f"SELECT {', '.join(JOB_COLUMNS)} FROM print_retry {where} "
+                           "ORDER BY created", (status,) if status else ())
+
+    # --- Wyłączniki drukarek ------------------------------------------------
+
+    def printer_available(self, printer):
+        """Czy wyłącznik drukarki jest zamknięty (lub minął czas otwarcia - próba)"""
+        rows = self._query("SELECT open_until FROM printer_circuit WHERE printer = ?", (printer,))
+        return not rows or rows[0]['open_until'] <= self.clock()
+
+    def record_success(self, printer):
+        """Zamyka wyłącznik drukarki po udanej wysyłce"""
+        closed = self._write(
+            "UPDATE printer_circuit SET failures = 0, trips = 0, open_until = 0, updated = ? "
+            "WHERE printer = ? AND (failures > 0 OR open_until > 0)", (self.clock(), printer))
+        if closed:
+            logger.info(f"Drukarka {printer} znowu odpowiada - wyłącznik zamknięty")
+
+    def record_failure(self, printer, error=None):
+        """
+        Zlicza błąd drukarki; po failure_threshold kolejnych błędach otwiera
+        wyłącznik na czas rosnący wykładniczo z każdym kolejnym otwarciem.
+
+        Returns:
+            bool: True, jeśli wyłącznik jest otwarty
+        """
+        now = self.clock()
+        with self._lock:
+            with self._db:
+                row = self._db.execute("SELECT failures, trips FROM printer_circuit WHERE printer = ?",
+                                       (printer,)).fetchone()
+                failures = (row['failures'] if row else 0) + 1
+                trips = row['trips'] if row else 0
+                open_until = 0.0
+                if failures >= self.failure_threshold:
+                    trips += 1
+                    open_until = now + backoff_delay(trips, self.open_seconds, self.max_delay, self.rng)
+                self._db.execute(
+                    """INSERT INTO printer_circuit (printer, failures, trips, open_until, last_error, updated)
+                       VALUES (?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (printer) DO UPDATE SET failures = excluded.failures,
+                           trips = excluded.trips, open_until = excluded.open_until,
+                           last_error = excluded.last_error, updated = excluded.updated""",
+                    (printer, failures, trips, open_until, error, now))
+        if open_until:
+            logger.warning(f"Wyłącznik drukarki {printer} otwarty na {open_until - now:.0f} s "
+                           f"po {failures} kolejnych błędach")
+        return bool(open_until)
+
+    def stats(self):
+        """Liczba zamówień w kolejce i martwych oraz otwarte wyłączniki"""
+        counts = {row['status']: row['count'] for row in self._query(
+            "SELECT status, COUNT(*) AS count FROM print_retry GROUP BY status")}
+        open_printers = [row['printer'] for row in self._query(
+            "SELECT printer FROM printer_circuit WHERE open_until > ?", (self.clock(),))]
+        return {'pending': counts.get(STATUS_PENDING, 0), 'dead': counts.get(STATUS_DEAD, 0),
+                'open_printers': open_printers}
+
+
+class RetryScheduler:
+    """Ponowne wysyłki z kolejki: osobny wątek dla każdej drukarki z zaległościami"""
+
+    def __init__(self, queue, dispatch, workers=4, interval=1.0, on_dead=None):
+        """
+        Args:
+            queue (RetryQueue): Kolejka ponownych wydruków
+            dispatch: Funkcja (job) -> dict z kluczem 'success' (i 'message' przy błędzie)
+            workers (int): Maksymalna liczba drukarek obsługiwanych równocześnie
+            interval (float): Odstęp między sprawdzeniami kolejki w wątku w tle
+            on_dead: Opcjonalna funkcja (job) wywoływana po przeniesieniu do martwych
+        """
+        self.queue = queue
+        self.dispatch = dispatch
+        self.on_dead = on_dead
+        self.interval = interval
+        self._executor = ThreadPoolExecutor(max_workers=max(int(workers), 1),
+                                            thread_name_prefix='print-retry')
+        self._busy = set()
+        self._busy_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def run_once(self, wait=False):
+        """
+        Uruchamia wysyłkę zaległych zamówień dla drukarek z zamkniętym wyłącznikiem.
+
+        Args:
+            wait (bool): Czekaj na zakończenie (tryb jednorazowy sql2html)
+
+        Returns:
+            int: Liczba drukarek, dla których uruchomiono wysyłkę
+        """
+        futures = []
+        for printer in self.queue.due_printers():
+            if not self.queue.printer_available(printer):
+                continue
+            with self._busy_lock:
+                if printer in self._busy:
+                    continue
+                self._busy.add(printer)
+            futures.append(self._executor.submit(self._drain_printer, printer))
+        if wait:
+            for future in futures:
+                future.result()
+        return len(futures)
+
+    def _drain_printer(self, printer):
+        try:
+            while not self._stop_event.is_set() and self.queue.printer_available(printer):
+                job = self.queue.next_due(printer)
+                if job is None:
+                    return
+                self._retry(job)
+        except Exception as e:
+            logger.error(f"Błąd kolejki ponownych wydruków ({printer}): {str(e)}", exc_info=True)
+        finally:
+            with self._busy_lock:
+                self._busy.discard(printer)
+
+    def _retry(self, job):
+        if not os.path.exists(job['zpl_path']):
+            self._failed(job, f"Plik ZPL {job['zpl_path']} nie istnieje", dead=True)
+            return
+        try:
+            result = self.dispatch(job)
+        except Exception as e:
+            result = {'success': False, 'message': str(e)}
+        if result and result.get('success', False):
+            self.queue.mark_printed(job)
+            self.queue.record_success(job['printer'])
+            logger.info(f"Zamówienie {job['order_number']} wydrukowane po "
+                        f"{job['attempts'] + 1} ponownych próbach")
+            return
+        error = (result or {}).get('message', 'Nieznany błąd')
+        self.queue.record_failure(job['printer'], error)
+        self._failed(job, error)
+
+    def _failed(self, job, error, dead=False):
+        if self.queue.mark_failed(job, error, dead=dead) and self.on_dead is not None:
+            self.on_dead(job)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='print-retry-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._executor.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Błąd kolejki ponownych wydruków: {str(e)}")
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_retry_queue():
+    """
+    Zwraca wspólną kolejkę ponownych wydruków lub None, gdy jest wyłączona
+    w konfiguracji (sekcja [RETRY]).
+    """
+    try:
+        from lib.config_snapshot import get_config
+        settings = get_config().get_retry_settings()
+    except Exception as e:
+        logger.debug(f"Brak konfiguracji kolejki ponownych wydruków: {e}")
+        return None
+    if not settings['enabled']:
+        return None
+
+    with _queues_lock:
+        queue = _queues.get(settings['database'])
+        if queue is None:
+            try:
+                queue = RetryQueue(settings['database'], base_delay=settings['base_delay'],
+                                   max_delay=settings['max_delay'],
+                                   max_attempts=settings['max_attempts'],
+                                   failure_threshold=settings['failure_threshold'],
+                                   open_seconds=settings['open_seconds'])
+            except Exception as e:
+                logger.error(f"Nie udało się otworzyć kolejki ponownych wydruków: {e}")
+                return None
+            _queues[settings['database']] = queue
+        return queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kolejka ponownych wydruków')
+    parser.add_argument('--database', help='Plik kolejki (domyślnie z config.ini)')
+    parser.add_argument('--list', action='store_true', help='Wypisz zamówienia w kolejce')
+    parser.add_argument('--dead', action='store_true', help='Tylko martwe zamówienia (z --list)')
+    parser.add_argument('--requeue', metavar='NUMER', help='Przywróć martwe zamówienie do kolejki')
+    parser.add_argument('--requeue-all', action='store_true', help='Przywróć wszystkie martwe zamówienia')
+    parser.add_argument('--source', help='Źródło zamówienia ([SOURCE:nazwa])')
+    args = parser.parse_args()
+
+    if args.database:
+        queue = RetryQueue(args.database)
+    else:
+        queue = get_retry_queue()
+        if queue is None:
+            print("Kolejka ponownych wydruków jest wyłączona ([RETRY] enabled = false)", file=sys.stderr)
+            return 1
+
+    if args.requeue or args.requeue_all:
+        count = queue.requeue(None if args.requeue_all else args.requeue, args.source)
+        print(f"Przywrócono do kolejki: {count}")
+        return 0 if count else 1
+
+    for job in queue.jobs(STATUS_DEAD if args.dead else None):
+        source = f"[{job['source']}] " if job['source'] else ''
+        print(f"{source}{job['order_number']}\t{job['printer']}\t{job['status']}\t"
+              f"prób: {job['attempts']}\t{job['last_error'] or ''}")
+    stats = queue.stats()
+    print(f"W kolejce: {stats['pending']}, martwe: {stats['dead']}, "
+          f"otwarte wyłączniki: {', '.join(stats['open_printers']) or 'brak'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
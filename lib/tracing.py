@@ -0,0 +1,442 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/tracing.py
+"""
+Lekkie śledzenie przetwarzania zamówień (spany z numerem zamówienia).
+
+Każde zamówienie objęte próbkowaniem otrzymuje span główny ``order`` oraz
+zagnieżdżone spany etapów (pobranie z bazy, HTML, renderowanie w Chromium,
+przycinanie PDF, kodowanie ZPL, wysyłka). Decyzja o próbkowaniu zapada na
+początku zamówienia (head-based, [TRACING] sample_rate); dla zamówień
+nieobjętych próbkowaniem span() zwraca współdzielony pusty kontekst, więc
+koszt w kodzie produkcyjnym to jeden odczyt zmiennej kontekstowej.
+
+Kontekst przechowywany jest w contextvars, dlatego przechodzi automatycznie
+do zadań asyncio. Do wątków przekazuje go wrap(), a do procesów roboczych
+(ProcessPoolExecutor) - słownik z current_context() przyjmowany przez
+attach_context() w procesie roboczym.
+
+Spany zamówienia są zapisywane razem, po zakończeniu spanu głównego, jako
+linie JSON w pliku z rotacją według rozmiaru. Procesy robocze dopisują swoje
+spany do tego samego pliku bezpośrednio.
+
+Użycie:
+    python -m lib.tracing --slowest 10
+    python -m lib.tracing --flame > orders.folded
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from lib.log_config import get_logger
+
+logger = get_logger().getLogger(__name__)
+
+_current_span = contextvars.ContextVar('waproprint_span', default=None)
+
+# Pusty kontekst zwracany dla zamówień nieobjętych próbkowaniem
+_NOOP = nullcontext()
+
+
+class TraceWriter:
+    """Dopisuje spany jako linie JSON do pliku z rotacją według rozmiaru"""
+
+    def __init__(self, path, max_bytes=20 * 1024 * 1024, backup_count=3, rotate=True):
+        """
+        Args:
+            path (str): Ścieżka pliku śladów
+            max_bytes (int): Rozmiar pliku, po którym następuje rotacja
+            backup_count (int): Liczba zachowywanych plików po rotacji
+            rotate (bool): Czy ten proces wykonuje rotację (procesy robocze tylko dopisują)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate = rotate
+        self._lock = threading.Lock()
+
+    def write(self, records):
+        if not records:
+            return
+        data = ''.join(json.dumps(record, ensure_ascii=False, default=str) + '\n'
+                       for record in records)
+        with self._lock:
+            try:
+                if self.rotate and self.max_bytes and os.path.exists(self.path) \
+                        and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+            except OSError as e:
+                logger.warning(f"Nie udało się zapisać śladów do {self.path}: {e}")
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+class _Trace:
+    """Stan jednego śledzonego zamówienia: zebrane spany i miejsce zapisu"""
+
+    __slots__ = ('trace_id', 'order', 'writer', 'records', 'finished', '_lock')
+
+    def __init__(self, trace_id, order, writer, finished=False):
+        self.trace_id = trace_id
+        self.order = order
+        self.writer = writer
+        self.records = []
+        # Ślad przekazany do procesu roboczego zapisuje spany od razu
+        self.finished = finished
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            if not self.finished:
+                self.records.append(record)
+                return
+        self.writer.write([record])
+
+    def flush(self):
+        with self._lock:
+            records, self.records = self.records, []
+            self.finished = True
+        self.writer.write(records)
+
+
+class Span:
+    """Pojedynczy span; używany jako menedżer kontekstu"""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'attrs', 'start',
+                 '_started', '_token', 'root')
+
+    def __init__(self, trace, name, parent_id=None, attrs=None, root=False):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.root = root
+        self.start = None
+        self._started = None
+        self._token = None
+
+    def __enter__(self):
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self._started
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Zakończenie w innym kontekście (np. zamknięcie generatora przez GC)
+            _current_span.set(None)
+        record = {
+            'trace': self.trace.trace_id,
+            'span': self.span_id,
+            'parent': self.parent_id,
+            'name': self.name,
+            'order': self.trace.order,
+            'start': round(self.start, 6),
+            'ms': round(duration * 1000, 3),
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name,
+        }
+        if self.attrs:
+            record['attrs'] = self.attrs
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        self.trace.add(record)
+        if self.root:
+            self.trace.flush()
+        return False
+
+    def set_attribute(self, key, value):
+        if self.attrs is None:
+            self.attrs = {}
+        self.attrs[key] = value
+
+
+def _new_id(size):
+    return os.urandom(size).hex()
+
+
+class Tracer:
+    """Ustawienia śledzenia i miejsce zapisu spanów"""
+
+    def __init__(self, enabled=True, sample_rate=0.05, path='traces.jsonl',
+                 max_bytes=20 * 1024 * 1024, backup_count=3):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.writer = TraceWriter(path, max_bytes, backup_count)
+
+    def should_sample(self):
+        return self.enabled and self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def configure_tracing(settings):
+    """
+    Ustawia śledzenie według słownika z ConfigManager.get_tracing_settings().
+
+    Returns:
+        Tracer
+    """
+    global _tracer
+
+    tracer = Tracer(enabled=settings['enabled'], sample_rate=settings['sample_rate'],
+                    path=settings['file'], max_bytes=settings['max_bytes'],
+                    backup_count=settings['backup_count'])
+    with _tracer_lock:
+        _tracer = tracer
+    return tracer
+
+
+def _reconfigure(snapshot):
+    try:
+        configure_tracing(snapshot.get_tracing_settings())
+    except Exception as e:
+        logger.error(f"Nie udało się zastosować ustawień śledzenia: {e}")
+
+
+def get_tracer():
+    """Zwraca wspólny obiekt Tracer (ustawienia z sekcji [TRACING] przy pierwszym użyciu)"""
+    global _tracer
+
+    tracer = _tracer
+    if tracer is None:
+        try:
+            from lib.config_snapshot import get_config, add_reload_listener
+            tracer = configure_tracing(get_config().get_tracing_settings())
+            # Zmiana sample_rate w config.ini działa bez restartu usługi
+            add_reload_listener(_reconfigure)
+        except Exception as e:
+            logger.debug(f"Brak konfiguracji śledzenia, śledzenie wyłączone: {e}")
+            with _tracer_lock:
+                _tracer = tracer = Tracer(enabled=False)
+    return tracer
+
+
+def start_trace(order, sampled=None, **attrs):
+    """
+    Rozpoczyna ślad zamówienia (span główny 'order').
+
+    Args:
+        order (str): Numer zamówienia
+        sampled (bool): Wymuszenie decyzji o próbkowaniu; None - według sample_rate
+        attrs: Dodatkowe atrybuty spanu głównego
+
+    Returns:
+        Menedżer kontekstu (Span lub pusty kontekst, gdy zamówienie nie jest śledzone)
+    """
+    tracer = get_tracer()
+    if sampled is None:
+        sampled = tracer.should_sample()
+    if not sampled:
+        return _NOOP
+    trace = _Trace(_new_id(16), order, tracer.writer)
+    return Span(trace, 'order', attrs=attrs or None, root=True)
+
+
+def span(name, **attrs):
+    """
+    Span zagnieżdżony w bieżącym śladzie; bez aktywnego śladu zwraca pusty kontekst.
+
+    Args:
+        name (str): Nazwa spanu, np. 'render'
+        attrs: Atrybuty spanu (np. printer)
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP
+    return Span(parent.trace, name, parent.span_id, attrs or None)
+
+
+def current_span():
+    """Zwraca bieżący span lub None"""
+    return _current_span.get()
+
+
+def wrap(function):
+    """
+    Zwraca funkcję uruchamiającą ``function`` w bieżącym kontekście śladu
+    (do przekazania do threading.Thread lub ThreadPoolExecutor.submit).
+    """
+    context = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        return context.run(function, *args, **kwargs)
+    return wrapper
+
+
+def current_context():
+    """
+    Zwraca kontekst bieżącego spanu do przekazania do procesu roboczego
+    (słownik możliwy do serializacji) lub None, gdy brak aktywnego śladu.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    writer = parent.trace.writer
+    return {'trace': parent.trace.trace_id, 'span': parent.span_id, 'order': parent.trace.order,
+            'file': writer.path, 'max_bytes': writer.max_bytes}
+
+
+@contextmanager
+def attach_context(context):
+    """
+    Przywraca w procesie roboczym kontekst z current_context(); spany
+    utworzone wewnątrz są zapisywane od razu do pliku śladów.
+    """
+    if not context:
+        yield None
+        return
+    writer = TraceWriter(context['file'], context.get('max_bytes'), rotate=False)
+    trace = _Trace(context['trace'], context['order'], writer, finished=True)
+    parent = Span(trace, '', context['span'])
+    parent.span_id = context['span']
+    token = _current_span.set(parent)
+    try:
+        yield parent
+    finally:
+        _current_span.reset(token)
+
+
+def _trace_files(path):
+    files = [path] + [f"{path}.{i}" for i in range(1, 100)]
+    return [f for f in files if os.path.exists(f)]
+
+
+def load_traces(path):
+    """
+    Wczytuje spany z pliku śladów (wraz z plikami po rotacji).
+
+    Returns:
+        dict: ID śladu -> lista spanów
+    """
+    traces = defaultdict(list)
+    for file in reversed(_trace_files(path)):
+        with open(file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                traces[record['trace']].append(record)
+    return traces
+
+
+def _children(spans):
+    children = defaultdict(list)
+    for record in spans:
+        children[record.get('parent')].append(record)
+    for items in children.values():
+        items.sort(key=lambda r: r['start'])
+    return children
+
+
+def _root(spans):
+    for record in spans:
+        if record.get('parent') is None:
+            return record
+    return None
+
+
+def slowest_orders(traces, limit=10):
+    """Zwraca [(span główny, spany)] najwolniejszych zamówień"""
+    roots = [(_root(spans), spans) for spans in traces.values()]
+    roots = [item for item in roots if item[0] is not None]
+    roots.sort(key=lambda item: item[0]['ms'], reverse=True)
+    return roots[:limit]
+
+
+def format_breakdown(root, spans):
+    """Zwraca tekstowe drzewo spanów zamówienia z czasem i udziałem w całości"""
+    children = _children(spans)
+    total = root['ms'] or 1
+    lines = [f"{root['order']}  {root['ms']:.1f} ms  "
+             f"({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(root['start']))})"]
+
+    def walk(record, depth):
+        for child in children.get(record['span'], []):
+            error = f"  [{child['error']}]" if child.get('error') else ''
+            lines.append(f"{'  ' * depth}{child['name']:<{max(28 - 2 * depth, 8)}} "
+                         f"{child['ms']:>10.1f} ms {100 * child['ms'] / total:>5.1f}%{error}")
+            walk(child, depth + 1)
+
+    walk(root, 1)
+    return '\n'.join(lines)
+
+
+def folded_stacks(traces):
+    """
+    Agreguje czas własny spanów wszystkich zamówień w formacie "folded"
+    (``order;render;chromium.networkidle 1234``, wartości w ms) - wejście
+    dla flamegraph.pl lub speedscope.
+    """
+    totals = defaultdict(float)
+    for spans in traces.values():
+        root = _root(spans)
+        if root is None:
+            continue
+        children = _children(spans)
+
+        def walk(record, stack):
+            path = stack + [record['name']]
+            nested = children.get(record['span'], [])
+            self_ms = record['ms'] - sum(child['ms'] for child in nested
+                                         if child.get('pid') == record.get('pid'))
+            totals[';'.join(path)] += max(self_ms, 0.0)
+            for child in nested:
+                walk(child, path)
+
+        walk(root, [])
+    return [f"{stack} {int(round(ms))}" for stack, ms in sorted(totals.items()) if ms >= 0.5]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analiza śladów przetwarzania zamówień')
+    parser.add_argument('--file', help='Plik śladów (domyślnie z config.ini)')
+    parser.add_argument('--slowest', type=int, default=10,
+                        help='Liczba najwolniejszych zamówień do wyświetlenia')
+    parser.add_argument('--flame', action='store_true',
+                        help='Wypisz zagregowane stosy w formacie folded (flamegraph)')
+    args = parser.parse_args()
+
+    path = args.file or get_tracer().writer.path
+    traces = load_traces(path)
+    if not traces:
+        print(f"Brak śladów w pliku {path}")
+        return 1
+
+    if args.flame:
+        print('\n'.join(folded_stacks(traces)))
+        return 0
+
+    for root, spans in slowest_orders(traces, args.slowest):
+        print(format_breakdown(root, spans))
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,872 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# lib/wapro_emulator.py
+"""
+Lokalny emulator bazy WAPRO oparty na SQLite.
+
+Emulator udostępnia połączenie o tym samym kształcie co pyodbc (DB-API:
+cursor/execute/fetchone/fetchall/executemany/description/commit), więc
+DatabaseManager i lib.order_processor2 działają bez SQL Servera:
+
+- schemat obejmuje podzbiór tabel używanych przez aplikację (ZAMOWIENIE,
+  POZYCJA_ZAMOWIENIA, KONTRAHENT, ARTYKUL, DOKUMENT_MAGAZYNOWY wraz z
+  pozycjami i towarami, AUK_PACZKA_OPERATORZY oraz WaproPrintHistory),
+- generator wypełnia bazę dziesiątkami tysięcy zamówień i milionami pozycji
+  z realistycznym rozkładem (liczba pozycji log-normalna, popularność
+  artykułów i kontrahentów wg rozkładu Zipfa, godziny pracy biura),
+- warstwa zgodności tłumaczy konstrukcje T-SQL używane w zapytaniach
+  aplikacji (TOP, GETDATE, CAST/CONVERT, ISNULL, DATEADD, tabele #tymczasowe,
+  IF NOT EXISTS ... BEGIN ... END, IDENTITY, BINARY_CHECKSUM,
+  INFORMATION_SCHEMA.TABLES/COLUMNS) na dialekt SQLite.
+
+Nieobsługiwane konstrukcje (MERGE, DELETE TOP, OUTPUT, zmienne @) zgłaszają
+NotSupportedError - dotyczy to m.in. retencji historii wydruków.
+
+Połączenie wybiera się w config.ini ([DATABASE] emulator = ścieżka do pliku)
+lub ciągiem połączenia ``sqlite:///ścieżka``.
+
+Użycie:
+    python -m lib.wapro_emulator --create wapro.db --orders 100000
+    python -m lib.wapro_emulator --database wapro.db --append 20
+    python -m lib.wapro_emulator --database wapro.db --query "SELECT TOP 5 NUMER FROM ZAMOWIENIE"
+    python -m lib.wapro_emulator --translate "SELECT TOP 5 * FROM ZAMOWIENIE WHERE DATA > GETDATE()"
+"""
+
+import re
+import sys
+import math
+import time
+import zlib
+import random
+import sqlite3
+import argparse
+import itertools
+from decimal import Decimal
+from datetime import datetime, timedelta
+from functools import lru_cache
+from collections import namedtuple
+
+from lib.log_config import get_logger
+
+logger = get_logger().getLogger(__name__)
+
+EMULATOR_PREFIX = 'sqlite:///'
+
+# Zgodność z wyjątkami DB-API (pyodbc.Error <- sqlite3.Error)
+Error = sqlite3.Error
+NotSupportedError = sqlite3.NotSupportedError
+
+# Tabele bazy emulatora; typy DATETIME i DECIMAL są konwertowane na datetime/Decimal
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS KONTRAHENT (
+        ID_KONTRAHENTA INTEGER PRIMARY KEY,
+        KOD_KONTRAHENTA VARCHAR(20),
+        NAZWA VARCHAR(100),
+        NAZWA_PELNA VARCHAR(255),
+        KOD_POCZTOWY VARCHAR(10),
+        MIEJSCOWOSC VARCHAR(50),
+        ULICA_LOKAL VARCHAR(100),
+        NIP VARCHAR(20),
+        PESEL VARCHAR(11),
+        KOD_KRESKOWY VARCHAR(20),
+        TELEFON VARCHAR(30),
+        E_MAIL VARCHAR(100)
+    )""",
+    """CREATE TABLE IF NOT EXISTS ARTYKUL (
+        ID_ARTYKULU INTEGER PRIMARY KEY,
+        INDEKS_KATALOGOWY VARCHAR(30),
+        NAZWA VARCHAR(50),
+        NAZWA_CALA VARCHAR(255),
+        JEDNOSTKA VARCHAR(10),
+        KOD_KRESKOWY VARCHAR(20),
+        STAWKA_VAT DECIMAL(5,2)
+    )""",
+    """CREATE TABLE IF NOT EXISTS ZAMOWIENIE (
+        ID_ZAMOWIENIA INTEGER PRIMARY KEY,
+        NUMER VARCHAR(30) NOT NULL,
+        ID_KONTRAHENTA INTEGER,
+        KONTRAHENT_NAZWA VARCHAR(100),
+        ID_UZYTKOWNIKA INTEGER,
+        DATA_UTWORZENIA_WIERSZA DATETIME,
+        NR_ZAMOWIENIA_KLIENTA VARCHAR(30),
+        KOD_KRESKOWY VARCHAR(20),
+        UWAGI VARCHAR(1000),
+        WARTOSC_NETTO DECIMAL(18,2),
+        WARTOSC_BRUTTO DECIMAL(18,2),
+        STATUS_ZAM VARCHAR(1)
+    )""",
+    """CREATE TABLE IF NOT EXISTS POZYCJA_ZAMOWIENIA (
+        ID_POZYCJI_ZAMOWIENIA INTEGER PRIMARY KEY,
+        ID_ZAMOWIENIA INTEGER NOT NULL,
+        ID_ARTYKULU INTEGER,
+        ZAMOWIONO DECIMAL(18,4),
+        ZREALIZOWANO DECIMAL(18,4),
+        CENA_NETTO DECIMAL(18,2),
+        CENA_BRUTTO DECIMAL(18,2),
+        NARZUT DECIMAL(9,2),
+        DO_REZ_USER DECIMAL(18,4),
+        OPIS VARCHAR(255)
+    )""",
+    """CREATE TABLE IF NOT EXISTS AUK_PACZKA_OPERATORZY (
+        ID INTEGER PRIMARY KEY,
+        KOD VARCHAR(20) NOT NULL,
+        NAZWA VARCHAR(100)
+    )""",
+    """CREATE TABLE IF NOT EXISTS DOKUMENT_MAGAZYNOWY (
+        ID_DOK_MAGAZYNOWEGO INTEGER PRIMARY KEY,
+        RODZAJ_DOKUMENTU VARCHAR(3) NOT NULL,
+        NUMER VARCHAR(30) NOT NULL,
+        ID_KONTRAHENTA INTEGER,
+        ID_UZYTKOWNIKA INTEGER,
+        ID_ZAMOWIENIA INTEGER,
+        DATA INTEGER,
+        UWAGI VARCHAR(1000)
+    )""",
+    """CREATE TABLE IF NOT EXISTS TOWAR (
+        ID_TOWARU INTEGER PRIMARY KEY,
+        KOD VARCHAR(30),
+        NAZWA VARCHAR(255),
+        JM VARCHAR(10)
+    )""",
+    """CREATE TABLE IF NOT EXISTS POZYCJA_DOKUMENTU_MAGAZYNOWEGO (
+        ID_POZYCJI INTEGER PRIMARY KEY,
+        ID_DOKUMENTU INTEGER NOT NULL,
+        ID_TOWARU INTEGER,
+        ILOSC DECIMAL(18,4)
+    )""",
+]
+
+# Indeksy tworzone po załadowaniu danych (szybsze wstawianie)
+INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS IX_ZAMOWIENIE_NUMER ON ZAMOWIENIE (NUMER)",
+    "CREATE INDEX IF NOT EXISTS IX_ZAMOWIENIE_DZIEN ON ZAMOWIENIE (date(DATA_UTWORZENIA_WIERSZA))",
+    "CREATE INDEX IF NOT EXISTS IX_POZYCJA_ZAMOWIENIA ON POZYCJA_ZAMOWIENIA (ID_ZAMOWIENIA, ID_POZYCJI_ZAMOWIENIA)",
+    "CREATE INDEX IF NOT EXISTS IX_POZYCJA_ARTYKUL ON POZYCJA_ZAMOWIENIA (ID_ARTYKULU)",
+    "CREATE INDEX IF NOT EXISTS IX_DOKUMENT_DATA ON DOKUMENT_MAGAZYNOWY (RODZAJ_DOKUMENTU, DATA)",
+    "CREATE INDEX IF NOT EXISTS IX_POZYCJA_DOKUMENTU ON POZYCJA_DOKUMENTU_MAGAZYNOWEGO (ID_DOKUMENTU, ID_POZYCJI)",
+]
+
+
+# --- Warstwa zgodności T-SQL -> SQLite ---------------------------------------
+
+Statement = namedtuple('Statement', 'sql params top_param')
+
+_NOW = "datetime('now', 'localtime')"
+
+_DATEADD_UNITS = {
+    'year': 'years', 'yy': 'years', 'yyyy': 'years',
+    'month': 'months', 'mm': 'months', 'm': 'months',
+    'day': 'days', 'dd': 'days', 'd': 'days',
+    'hour': 'hours', 'hh': 'hours',
+    'minute': 'minutes', 'mi': 'minutes', 'n': 'minutes',
+    'second': 'seconds', 'ss': 'seconds', 's': 'seconds',
+}
+
+_UNSUPPORTED_RE = re.compile(r'\bMERGE\b|\bDELETE\s+TOP\b|\bOUTPUT\b|(?<!@)@(?!@)\w+', re.IGNORECASE)
+_NOCOUNT_RE = re.compile(r'\bSET\s+NOCOUNT\s+(ON|OFF)\s*;?', re.IGNORECASE)
+_DROP_TEMP_RE = re.compile(
+    r"\bIF\s+OBJECT_ID\s*\(\s*'tempdb\.\.#(\w+)'\s*\)\s+IS\s+NOT\s+NULL\s+DROP\s+TABLE\s+#\w+\s*;?",
+    re.IGNORECASE)
+_IF_NOT_EXISTS_RE = re.compile(r'\bIF\s+NOT\s+EXISTS\s*\(', re.IGNORECASE)
+_BEGIN_END_RE = re.compile(r'\s*BEGIN\b(.*?)\bEND\b\s*;?', re.IGNORECASE | re.DOTALL)
+_CREATE_RE = re.compile(r'\bCREATE\s+(UNIQUE\s+)?(TABLE|INDEX)\s+(?!IF\s+NOT\s+EXISTS)', re.IGNORECASE)
+_CREATE_TEMP_RE = re.compile(r'\bCREATE\s+TABLE\s+#', re.IGNORECASE)
+_TEMP_NAME_RE = re.compile(r'#(\w+)')
+_IDENTITY_RE = re.compile(r'\bINT\s+IDENTITY\s*\(\s*\d+\s*,\s*\d+\s*\)\s+PRIMARY\s+KEY', re.IGNORECASE)
+_CLUSTERED_RE = re.compile(r'\b(NON)?CLUSTERED\s+', re.IGNORECASE)
+_INCLUDE_RE = re.compile(r'\)\s*INCLUDE\s*\([^)]*\)', re.IGNORECASE)
+_INFORMATION_SCHEMA_RE = re.compile(r'\bINFORMATION_SCHEMA\.(TABLES|COLUMNS)\b', re.IGNORECASE)
+_VERSION_RE = re.compile(r'@@VERSION\b', re.IGNORECASE)
+_TOP_RE = re.compile(r'\bSELECT\s+(DISTINCT\s+)?TOP\s*(?:\(\s*(\?|\d+)\s*\)|(\d+))\s+', re.IGNORECASE)
+_CALL_RE = re.compile(r'\b(CAST|CONVERT|GETDATE|ISNULL|DATEADD)\s*\(', re.IGNORECASE)
+_CHECKSUM_ALL_RE = re.compile(r'\bBINARY_CHECKSUM\s*\(\s*\*\s*\)(?=.*?\bFROM\s+(\w+))',
+                              re.IGNORECASE | re.DOTALL)
+_AS_RE = re.compile(r'\s+AS\s+', re.IGNORECASE)
+
+# Widoki INFORMATION_SCHEMA odtworzone z katalogu SQLite
+_INFORMATION_SCHEMA = {
+    'TABLES': ("(SELECT 'dbo' AS TABLE_SCHEMA, name AS TABLE_NAME, 'BASE TABLE' AS TABLE_TYPE "
+               "FROM sqlite_master WHERE type = 'table')"),
+    'COLUMNS': ("(SELECT 'dbo' AS TABLE_SCHEMA, m.name AS TABLE_NAME, p.name AS COLUMN_NAME, "
+                "p.cid + 1 AS ORDINAL_POSITION, p.type AS DATA_TYPE "
+                "FROM sqlite_master m JOIN pragma_table_info(m.name) p WHERE m.type = 'table')"),
+}
+
+
+def _scan(sql, start=0):
+    """Zwraca kolejne (indeks, znak) z pominięciem literałów tekstowych '...'"""
+    i = start
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if char == "'":
+            end = sql.find("'", i + 1)
+            while end != -1 and sql[end + 1:end + 2] == "'":
+                end = sql.find("'", end + 2)
+            i = length if end == -1 else end + 1
+            continue
+        yield i, char
+        i += 1
+
+
+def _closing_paren(sql, open_index):
+    """Zwraca indeks nawiasu zamykającego dla nawiasu na pozycji open_index"""
+    depth = 0
+    for i, char in _scan(sql, open_index):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise NotSupportedError(f"Niezamknięty nawias w zapytaniu: {sql[open_index:open_index + 60]}")
+
+
+def _split_top_level(text, separator=','):
+    """Dzieli tekst po separatorze poza nawiasami i literałami"""
+    parts = []
+    depth = 0
+    start = 0
+    for i, char in _scan(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts]
+
+
+def _split_cast(inner):
+    """Dzieli argument CAST na wyrażenie i typ (ostatnie AS poza nawiasami)"""
+    depth = 0
+    split = None
+    for i, char in _scan(inner):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0:
+            match = _AS_RE.match(inner, i)
+            if match:
+                split = match
+    if split is None:
+        raise NotSupportedError(f"Nieprawidłowe wyrażenie CAST({inner})")
+    return inner[:split.start()].strip(), inner[split.end():].strip()
+
+
+def _cast(expression, sql_type):
+    """Odpowiednik CAST/CONVERT bez stylu dla typu T-SQL"""
+    base = sql_type.split('(')[0].strip().upper()
+    if base == 'DATE':
+        return f"date({expression})"
+    if base == 'DATETIME':
+        # DATETIME przechowuje milisekundy - porównania z kolumną muszą je zachować
+        return f"strftime('%Y-%m-%d %H:%M:%f', {expression})"
+    if base in ('DATETIME2', 'SMALLDATETIME'):
+        return f"datetime({expression})"
+    if base in ('VARCHAR', 'NVARCHAR', 'CHAR', 'NCHAR', 'TEXT'):
+        return f"CAST({expression} AS TEXT)"
+    if base in ('INT', 'BIGINT', 'SMALLINT', 'TINYINT', 'BIT'):
+        return f"CAST({expression} AS INTEGER)"
+    if base in ('DECIMAL', 'NUMERIC', 'FLOAT', 'REAL', 'MONEY'):
+        return f"CAST({expression} AS REAL)"
+    return f"CAST({expression} AS {sql_type})"
+
+
+def _rewrite_call(name, inner):
+    if name == 'GETDATE':
+        return _NOW
+    args = _split_top_level(inner)
+    if name == 'ISNULL':
+        return f"IFNULL({', '.join(_rewrite_calls(arg) for arg in args)})"
+    if name == 'CAST':
+        expression, sql_type = _split_cast(inner)
+        return _cast(_rewrite_calls(expression), sql_type)
+    if name == 'CONVERT':
+        sql_type, expression = args[0], _rewrite_calls(args[1])
+        style = args[2] if len(args) > 2 else None
+        base = sql_type.split('(')[0].strip().upper()
+        if style == '112' and base in ('VARCHAR', 'CHAR', 'NVARCHAR'):
+            return f"strftime('%Y%m%d', {expression})"
+        if style in ('120', '20') and base in ('VARCHAR', 'CHAR', 'NVARCHAR'):
+            return f"strftime('%Y-%m-%d %H:%M:%S', {expression})"
+        return _cast(expression, sql_type)
+    if name == 'DATEADD':
+        unit = _DATEADD_UNITS.get(args[0].lower())
+        if unit is None:
+            raise NotSupportedError(f"DATEADD: nieobsługiwana jednostka {args[0]}")
+        return (f"datetime({_rewrite_calls(args[2])}, "
+                f"printf('%+d {unit}', {_rewrite_calls(args[1])}))")
+    raise NotSupportedError(name)
+
+
+def _rewrite_calls(sql):
+    """Zastępuje wywołania funkcji T-SQL odpowiednikami SQLite (rekurencyjnie)"""
+    parts = []
+    position = 0
+    while True:
+        match = _CALL_RE.search(sql, position)
+        if not match:
+            break
+        open_index = match.end() - 1
+        close_index = _closing_paren(sql, open_index)
+        parts.append(sql[position:match.start()])
+        parts.append(_rewrite_call(match.group(1).upper(), sql[open_index + 1:close_index]))
+        position = close_index + 1
+    parts.append(sql[position:])
+    return ''.join(parts)
+
+
+def _unwrap_if_not_exists(sql):
+    """IF NOT EXISTS (...) BEGIN CREATE ... END -> CREATE ... IF NOT EXISTS"""
+    while True:
+        match = _IF_NOT_EXISTS_RE.search(sql)
+        if not match:
+            return sql
+        close_index = _closing_paren(sql, match.end() - 1)
+        block = _BEGIN_END_RE.match(sql, close_index + 1)
+        if not block:
+            raise NotSupportedError("IF NOT EXISTS bez bloku BEGIN ... END")
+        body = block.group(1)
+        if not re.match(r'\s*CREATE\b', body, re.IGNORECASE):
+            raise NotSupportedError("IF NOT EXISTS obsługuje tylko CREATE TABLE/INDEX")
+        body = _CREATE_RE.sub(lambda m: f"CREATE {m.group(1) or ''}{m.group(2)} IF NOT EXISTS ", body)
+        sql = sql[:match.start()] + body.strip() + '\n' + sql[block.end():]
+
+
+def _split_statements(sql):
+    statements = []
+    start = 0
+    for i, char in _scan(sql):
+        if char == ';':
+            statements.append(sql[start:i])
+            start = i + 1
+    statements.append(sql[start:])
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def _count_params(sql):
+    return sum(1 for _, char in _scan(sql) if char == '?')
+
+
+def _translate_statement(sql):
+    top_param = None
+    match = _TOP_RE.search(sql)
+    if match:
+        if _TOP_RE.search(sql, match.end()):
+            raise NotSupportedError("Więcej niż jedno TOP w instrukcji")
+        limit = match.group(2) or match.group(3)
+        if limit == '?':
+            top_param = _count_params(sql[:match.start()])
+        sql = f"{sql[:match.start()]}SELECT {match.group(1) or ''}{sql[match.end():]} LIMIT {limit}"
+    return Statement(sql, _count_params(sql), top_param)
+
+
+@lru_cache(maxsize=512)
+def translate(sql):
+    """
+    Tłumaczy zapytanie T-SQL na instrukcje SQLite.
+
+    Args:
+        sql (str): Zapytanie T-SQL (może zawierać kilka instrukcji rozdzielonych ';')
+
+    Returns:
+        tuple: Instrukcje (Statement: sql, liczba parametrów, indeks parametru TOP
+            przeniesionego na koniec jako LIMIT lub None)
+
+    Raises:
+        NotSupportedError: Konstrukcja T-SQL bez odpowiednika w emulatorze
+    """
+    unsupported = _UNSUPPORTED_RE.search(sql)
+    if unsupported:
+        raise NotSupportedError(f"Emulator WAPRO nie obsługuje: {unsupported.group(0).strip()}")
+
+    sql = _NOCOUNT_RE.sub('', sql)
+    sql = _DROP_TEMP_RE.sub(r'DROP TABLE IF EXISTS temp.\1;', sql)
+    sql = _CLUSTERED_RE.sub('', sql)
+    sql = _unwrap_if_not_exists(sql)
+    sql = _CREATE_TEMP_RE.sub('CREATE TEMP TABLE ', sql)
+    sql = _TEMP_NAME_RE.sub(r'\1', sql)
+    sql = _IDENTITY_RE.sub('INTEGER PRIMARY KEY AUTOINCREMENT', sql)
+    sql = _INCLUDE_RE.sub(')', sql)
+    sql = re.sub(r'\bDEFAULT\s+GETDATE\s*\(\s*\)', f'DEFAULT ({_NOW})', sql, flags=re.IGNORECASE)
+    sql = _INFORMATION_SCHEMA_RE.sub(lambda m: _INFORMATION_SCHEMA[m.group(1).upper()], sql)
+    sql = _VERSION_RE.sub("('SQLite ' || sqlite_version())", sql)
+    sql = _rewrite_calls(sql)
+    return tuple(_translate_statement(statement) for statement in _split_statements(sql))
+
+
+def _binary_checksum(*values):
+    """Odpowiednik BINARY_CHECKSUM - suma kontrolna wartości kolumn"""
+    return zlib.crc32(repr(values).encode('utf-8')) - 2 ** 31
+
+
+# --- Połączenie DB-API --------------------------------------------------------
+
+def _convert_datetime(value):
+    text = value.decode('utf-8').replace('T', ' ')
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return text
+
+
+def _convert_decimal(value):
+    return Decimal(value.decode('utf-8'))
+
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('DECIMAL', _convert_decimal)
+
+
+class EmulatorCursor:
+    """Kursor o interfejsie pyodbc wykonujący zapytania T-SQL na SQLite"""
+
+    arraysize = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.fast_executemany = False
+        self._cursor = connection._db.cursor()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, *params):
+        """Wykonuje zapytanie; parametry jako sekwencja lub kolejne argumenty (jak pyodbc)"""
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        params = list(params)
+        statements = self.connection.translate(sql)
+        if _count_total(statements) != len(params):
+            raise sqlite3.ProgrammingError(
+                f"Oczekiwano {_count_total(statements)} parametrów, przekazano {len(params)}")
+        for statement in statements:
+            values, params = params[:statement.params], params[statement.params:]
+            self._cursor.execute(statement.sql, _reorder(values, statement.top_param))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        statements = self.connection.translate(sql)
+        if len(statements) != 1:
+            raise NotSupportedError("executemany obsługuje jedną instrukcję")
+        statement = statements[0]
+        self._cursor.executemany(
+            statement.sql, (_reorder(list(params), statement.top_param) for params in seq_of_params))
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+def _count_total(statements):
+    return sum(statement.params for statement in statements)
+
+
+def _reorder(values, top_param):
+    if top_param is not None:
+        values.append(values.pop(top_param))
+    return values
+
+
+class EmulatorConnection:
+    """Połączenie z plikiem bazy emulatora (interfejs pyodbc.Connection)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False, timeout=30)
+        self._db.create_function('BINARY_CHECKSUM', -1, _binary_checksum)
+        # Czytelnicy nie blokują zapisu (jak READ COMMITTED SNAPSHOT w SQL Server)
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._columns = {}
+
+    def translate(self, sql):
+        """Tłumaczy zapytanie, rozwijając BINARY_CHECKSUM(*) do kolumn tabeli"""
+        if 'BINARY_CHECKSUM' in sql.upper():
+            sql = _CHECKSUM_ALL_RE.sub(
+                lambda m: f"BINARY_CHECKSUM({', '.join(self._table_columns(m.group(1)))})", sql)
+        return translate(sql)
+
+    def _table_columns(self, table):
+        columns = self._columns.get(table)
+        if columns is None:
+            columns = [row[1] for row in self._db.execute(f"PRAGMA table_info({table})")]
+            if not columns:
+                raise sqlite3.OperationalError(f"no such table: {table}")
+            self._columns[table] = columns
+        return columns
+
+    def cursor(self):
+        return EmulatorCursor(self)
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+
+
+def is_emulator_dsn(connection_string):
+    """Sprawdza, czy ciąg połączenia wskazuje bazę emulatora"""
+    return bool(connection_string) and connection_string.startswith(EMULATOR_PREFIX)
+
+
+def connect(connection_string):
+    """
+    Otwiera połączenie z bazą emulatora.
+
+    Args:
+        connection_string (str): ``sqlite:///ścieżka`` lub ścieżka do pliku bazy
+
+    Returns:
+        EmulatorConnection: Połączenie o interfejsie pyodbc
+    """
+    path = connection_string[len(EMULATOR_PREFIX):] if is_emulator_dsn(connection_string) \
+        else connection_string
+    # Parametry dopisywane do ciągów połączenia ODBC nie dotyczą pliku SQLite
+    return EmulatorConnection(path.split(';')[0])
+
+
+# --- Generator danych ---------------------------------------------------------
+
+_WORDS = ('płyta', 'gipsowo-kartonowa', 'wkręt', 'ocynkowany', 'klej', 'żywiczny',
+          'taśma', 'zbrojąca', 'profil', 'ścienny', 'kołek', 'rozporowy', 'farba',
+          'lateksowa', 'biała', 'grunt', 'głęboko', 'penetrujący', 'łącznik', 'kątowy',
+          'wełna', 'mineralna', 'rura', 'kanalizacyjna', 'zaprawa', 'murarska')
+_UNITS = ('szt.', 'szt.', 'szt.', 'kg', 'm', 'opak.', 'm2')
+_CITIES = (('Gdańsk', '80-'), ('Gdynia', '81-'), ('Sopot', '81-'), ('Warszawa', '00-'),
+           ('Kraków', '30-'), ('Poznań', '60-'), ('Wrocław', '50-'), ('Łódź', '90-'))
+_STREETS = ('Długa', 'Grunwaldzka', 'Polna', 'Leśna', 'Kościuszki', 'Mickiewicza', 'Ogrodowa')
+_COMPANY = ('Hurtownia', 'Skład', 'Budmax', 'Przedsiębiorstwo', 'Zakład', 'Instal', 'Dom')
+
+
+def _zipf_cum_weights(count, exponent):
+    """Skumulowane wagi rozkładu Zipfa dla random.choices (pozycja 1 najczęstsza)"""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def _words(rng, count):
+    return ' '.join(rng.choice(_WORDS) for _ in range(count))
+
+
+def create_schema(connection):
+    """
+    Tworzy tabele emulatora oraz, przez warstwę zgodności, tabele historii
+    wydruków z migracji lib.print_history.
+
+    Args:
+        connection (EmulatorConnection): Połączenie z bazą emulatora
+    """
+    from lib.print_history import ensure_history_schema
+
+    for sql in SCHEMA:
+        connection._db.execute(sql)
+    ensure_history_schema(connection.cursor())
+    connection.commit()
+
+
+def create_indexes(connection):
+    for sql in INDEXES:
+        connection._db.execute(sql)
+    connection._db.execute('ANALYZE')
+    connection.commit()
+
+
+def _insert(connection, table, columns, rows, batch_size):
+    """Wstawia wiersze partiami; zwraca liczbę wstawionych wierszy"""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    total = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return total
+        connection._db.executemany(sql, batch)
+        total += len(batch)
+
+
+def _contractor_rows(rng, count, start=1):
+    for contractor_id in range(start, start + count):
+        city, zip_prefix = rng.choice(_CITIES)
+        name = f"{rng.choice(_COMPANY)} {rng.choice(_WORDS).capitalize()} {contractor_id}"
+        yield (contractor_id, f"K{contractor_id:06d}", name[:100],
+               f"{name} Sp. z o.o.", f"{zip_prefix}{rng.randrange(1000):03d}", city,
+               f"{rng.choice(_STREETS)} {rng.randrange(1, 200)}/{rng.randrange(1, 30)}",
+               f"{rng.randrange(10 ** 10):010d}", '', f"{rng.randrange(10 ** 12):012d}",
+               f"+48 {rng.randrange(500000000, 800000000)}", f"biuro{contractor_id}@example.com")
+
+
+def _article_rows(rng, count, start=1):
+    for article_id in range(start, start + count):
+        full_name = _words(rng, rng.randint(3, 9)).capitalize()
+        yield (article_id, f"IDX-{article_id:06d}", full_name[:50], full_name,
+               rng.choice(_UNITS), f"590{rng.randrange(10 ** 10):010d}", Decimal('23'))
+
+
+def populate(connection, orders=100000, lines_mean=20, contractors=None, articles=None,
+             users=8, days=90, today_fraction=0.01, printed_fraction=0.3, seed=1,
+             batch_size=10000):
+    """
+    Wypełnia bazę emulatora danymi o realistycznym rozkładzie.
+
+    Args:
+        connection (EmulatorConnection): Połączenie z pustą bazą emulatora
+        orders (int): Liczba zamówień
+        lines_mean (float): Średnia liczba pozycji zamówienia (rozkład log-normalny,
+            długi ogon do 1000 pozycji)
+        contractors (int): Liczba kontrahentów (domyślnie orders / 20)
+        articles (int): Liczba artykułów (domyślnie orders / 5, maks. 50000)
+        users (int): Liczba operatorów (ID_UZYTKOWNIKA 1..users, pierwsi najaktywniejsi)
+        days (int): Zakres dat zamówień wstecz od dziś
+        today_fraction (float): Udział zamówień z bieżącego dnia
+        printed_fraction (float): Udział dzisiejszych dokumentów już obecnych w historii
+            wydruków (dokumenty z poprzednich dni są wydrukowane)
+        seed (int): Ziarno generatora
+        batch_size (int): Liczba wierszy w jednej partii INSERT
+
+    Returns:
+        dict: Liczby wygenerowanych wierszy w tabelach
+    """
+    rng = random.Random(seed)
+    contractors = contractors or max(orders // 20, 10)
+    articles = articles or min(max(orders // 5, 50), 50000)
+    started = time.perf_counter()
+
+    create_schema(connection)
+    connection._db.execute('PRAGMA synchronous = OFF')
+
+    counts = {
+        'KONTRAHENT': _insert(connection, 'KONTRAHENT', (
+            'ID_KONTRAHENTA', 'KOD_KONTRAHENTA', 'NAZWA', 'NAZWA_PELNA', 'KOD_POCZTOWY',
+            'MIEJSCOWOSC', 'ULICA_LOKAL', 'NIP', 'PESEL', 'KOD_KRESKOWY', 'TELEFON', 'E_MAIL'),
+            _contractor_rows(rng, contractors), batch_size),
+        'ARTYKUL': _insert(connection, 'ARTYKUL', (
+            'ID_ARTYKULU', 'INDEKS_KATALOGOWY', 'NAZWA', 'NAZWA_CALA', 'JEDNOSTKA',
+            'KOD_KRESKOWY', 'STAWKA_VAT'), _article_rows(rng, articles), batch_size),
+    }
+    _insert(connection, 'AUK_PACZKA_OPERATORZY', ('ID', 'KOD', 'NAZWA'),
+            ((user, f"OP{user:02d}", f"Operator {user}") for user in range(1, users + 1)),
+            batch_size)
+    _insert(connection, 'TOWAR', ('ID_TOWARU', 'KOD', 'NAZWA', 'JM'),
+            connection._db.execute(
+                "SELECT ID_ARTYKULU, INDEKS_KATALOGOWY, NAZWA_CALA, JEDNOSTKA FROM ARTYKUL"),
+            batch_size)
+
+    # Zamówienia z poprzednich dni w kolejności dat (rosnące ID jak w produkcji)
+    now = datetime.now().replace(microsecond=0)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    todays = sum(1 for _ in range(orders) if rng.random() < today_fraction)
+    dates = sorted(_order_time(rng, today - timedelta(days=rng.randint(1, max(days - 1, 1))))
+                   for _ in range(orders - todays))
+    dates += sorted(min(_order_time(rng, today), now) for _ in range(todays))
+
+    counts.update(add_orders(connection, dates, lines_mean=lines_mean, rng=rng,
+                             printed_fraction=printed_fraction, batch_size=batch_size))
+    create_indexes(connection)
+    connection._db.execute('PRAGMA synchronous = FULL')
+    logger.info(f"Emulator WAPRO: wygenerowano {counts} w {time.perf_counter() - started:.1f} s")
+    return counts
+
+
+def _order_time(rng, day):
+    """Godzina utworzenia zamówienia skupiona w godzinach pracy biura"""
+    hours = rng.triangular(7.0, 17.0, 10.0)
+    return (day + timedelta(hours=hours)).replace(microsecond=0)
+
+
+def add_orders(connection, dates, lines_mean=20, rng=None, printed_fraction=0.0,
+               batch_size=10000):
+    """
+    Dopisuje zamówienia (z dokumentami magazynowymi) utworzone w podanych chwilach,
+    np. do symulacji napływu nowych zamówień podczas testu obciążenia.
+
+    Args:
+        connection (EmulatorConnection): Połączenie z wypełnioną bazą emulatora
+        dates (list): Daty utworzenia kolejnych zamówień (datetime)
+        lines_mean (float): Średnia liczba pozycji zamówienia
+        rng (random.Random): Generator liczb losowych
+        printed_fraction (float): Udział dzisiejszych dokumentów zapisanych w historii wydruków
+        batch_size (int): Liczba wierszy w jednej partii INSERT
+
+    Returns:
+        dict: Liczby dopisanych wierszy w tabelach
+    """
+    rng = rng or random.Random()
+    db = connection._db
+    contractors = db.execute("SELECT COUNT(*) FROM KONTRAHENT").fetchone()[0]
+    articles = db.execute("SELECT COUNT(*) FROM ARTYKUL").fetchone()[0]
+    users = db.execute("SELECT COUNT(*) FROM AUK_PACZKA_OPERATORZY").fetchone()[0]
+    if not (contractors and articles and users):
+        raise ValueError("Baza emulatora nie zawiera kontrahentów, artykułów lub operatorów")
+
+    first_order = (db.execute("SELECT MAX(ID_ZAMOWIENIA) FROM ZAMOWIENIE").fetchone()[0] or 0) + 1
+    first_line = (db.execute(
+        "SELECT MAX(ID_POZYCJI_ZAMOWIENIA) FROM POZYCJA_ZAMOWIENIA").fetchone()[0] or 0) + 1
+    first_position = (db.execute(
+        "SELECT MAX(ID_POZYCJI) FROM POZYCJA_DOKUMENTU_MAGAZYNOWEGO").fetchone()[0] or 0) + 1
+
+    contractor_weights = _zipf_cum_weights(contractors, 0.8)
+    article_weights = _zipf_cum_weights(articles, 1.1)
+    user_weights = _zipf_cum_weights(users, 1.0)
+    contractor_ids = range(1, contractors + 1)
+    article_ids = range(1, articles + 1)
+    user_ids = range(1, users + 1)
+    names = dict(db.execute("SELECT ID_KONTRAHENTA, NAZWA FROM KONTRAHENT"))
+
+    # Log-normalny rozkład liczby pozycji o zadanej średniej
+    sigma = 1.0
+    mu = math.log(max(lines_mean, 1)) - sigma ** 2 / 2
+    today = datetime.now().date()
+    line_counter = itertools.count(first_line)
+    position_counter = itertools.count(first_position)
+    counts = dict.fromkeys(('ZAMOWIENIE', 'POZYCJA_ZAMOWIENIA', 'DOKUMENT_MAGAZYNOWY',
+                            'POZYCJA_DOKUMENTU_MAGAZYNOWEGO', 'WaproPrintHistory'), 0)
+
+    orders, lines, documents, positions, history = [], [], [], [], []
+
+    def flush():
+        for table, columns, rows in (
+                ('ZAMOWIENIE', ('ID_ZAMOWIENIA', 'NUMER', 'ID_KONTRAHENTA', 'KONTRAHENT_NAZWA',
+                                'ID_UZYTKOWNIKA', 'DATA_UTWORZENIA_WIERSZA',
+                                'NR_ZAMOWIENIA_KLIENTA', 'KOD_KRESKOWY', 'UWAGI',
+                                'WARTOSC_NETTO', 'WARTOSC_BRUTTO', 'STATUS_ZAM'), orders),
+                ('POZYCJA_ZAMOWIENIA', ('ID_POZYCJI_ZAMOWIENIA', 'ID_ZAMOWIENIA', 'ID_ARTYKULU',
+                                        'ZAMOWIONO', 'ZREALIZOWANO', 'CENA_NETTO', 'CENA_BRUTTO',
+                                        'NARZUT', 'DO_REZ_USER', 'OPIS'), lines),
+                ('DOKUMENT_MAGAZYNOWY', ('ID_DOK_MAGAZYNOWEGO', 'RODZAJ_DOKUMENTU', 'NUMER',
+                                         'ID_KONTRAHENTA', 'ID_UZYTKOWNIKA', 'ID_ZAMOWIENIA',
+                                         'DATA', 'UWAGI'), documents),
+                ('POZYCJA_DOKUMENTU_MAGAZYNOWEGO', ('ID_POZYCJI', 'ID_DOKUMENTU', 'ID_TOWARU',
+                                                    'ILOSC'), positions),
+                ('WaproPrintHistory', ('DOK_ID', 'PRINT_DATE', 'OPERATOR_ID', 'PRINT_STATUS'),
+                 history)):
+            counts[table] += _insert(connection, table, columns, rows, batch_size)
+            rows.clear()
+        connection.commit()
+
+    for order_id, created in enumerate(dates, start=first_order):
+        contractor_id = rng.choices(contractor_ids, cum_weights=contractor_weights)[0]
+        user_id = rng.choices(user_ids, cum_weights=user_weights)[0]
+        number = f"ZO {order_id}/{created:%y}"
+        line_count = min(max(1, int(rng.lognormvariate(mu, sigma))), 1000)
+        is_today = created.date() == today
+
+        net_total = Decimal(0)
+        for article_id in rng.choices(article_ids, cum_weights=article_weights, k=line_count):
+            quantity = Decimal(rng.choice((1, 1, 1, 2, 2, 3, 5, 10, 25, 100)))
+            price = Decimal(rng.randrange(99, 250000)) / 100
+            gross = (price * Decimal('1.23')).quantize(Decimal('0.01'))
+            net_total += price * quantity
+            lines.append((next(line_counter), order_id, article_id, quantity,
+                          quantity if not is_today else Decimal(0), price, gross,
+                          Decimal(rng.choice((0, 0, 5, 10, 15))), Decimal(0),
+                          _words(rng, 2) if rng.random() < 0.05 else None))
+            if is_today:
+                positions.append((next(position_counter), order_id, article_id, quantity))
+
+        remarks = _words(rng, rng.randint(2, 40)).capitalize() if rng.random() < 0.6 else ''
+        orders.append((order_id, number, contractor_id, names[contractor_id], user_id, created,
+                       f"K/{rng.randrange(100000)}/{created:%y}", f"{rng.randrange(10 ** 12):012d}",
+                       remarks, net_total, (net_total * Decimal('1.23')).quantize(Decimal('0.01')),
+                       'Z' if is_today else 'R'))
+        documents.append((order_id, 'ZO', number, contractor_id, user_id, order_id,
+                          int(created.strftime('%Y%m%d')), remarks))
+        if not is_today or rng.random() < printed_fraction:
+            history.append((order_id, created + timedelta(minutes=rng.randint(1, 30)),
+                            f"OP{user_id:02d}", 'PRINTED'))
+
+        if len(lines) >= batch_size:
+            flush()
+    flush()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lokalny emulator bazy WAPRO (SQLite)')
+    parser.add_argument('--create', metavar='PLIK',
+                        help='Utwórz i wypełnij nową bazę emulatora')
+    parser.add_argument('--database', metavar='PLIK',
+                        help='Istniejąca baza emulatora (dla --append/--query)')
+    parser.add_argument('--orders', type=int, default=100000, help='Liczba zamówień')
+    parser.add_argument('--lines-mean', type=float, default=20,
+                        help='Średnia liczba pozycji zamówienia')
+    parser.add_argument('--users', type=int, default=8, help='Liczba operatorów')
+    parser.add_argument('--days', type=int, default=90, help='Zakres dat zamówień w dniach')
+    parser.add_argument('--today-fraction', type=float, default=0.01,
+                        help='Udział zamówień z bieżącego dnia')
+    parser.add_argument('--seed', type=int, default=1, help='Ziarno generatora')
+    parser.add_argument('--append', type=int, metavar='N',
+                        help='Dopisz N nowych zamówień z bieżącą datą')
+    parser.add_argument('--query', help='Wykonaj zapytanie T-SQL i wypisz wynik')
+    parser.add_argument('--translate', metavar='SQL', help='Pokaż tłumaczenie zapytania T-SQL')
+    args = parser.parse_args()
+
+    if args.translate:
+        for statement in translate(args.translate):
+            print(statement.sql + ';')
+        return 0
+
+    path = args.create or args.database
+    if not path:
+        parser.print_help()
+        return 1
+
+    connection = connect(path)
+    try:
+        if args.create:
+            counts = populate(connection, orders=args.orders, lines_mean=args.lines_mean,
+                              users=args.users, days=args.days,
+                              today_fraction=args.today_fraction, seed=args.seed)
+            for table, count in counts.items():
+                print(f"{table:<32} {count:>12}")
+            print(f"Ciąg połączenia: {EMULATOR_PREFIX}{path}")
+        if args.append:
+            counts = add_orders(connection, [datetime.now().replace(microsecond=0)] * args.append,
+                                rng=random.Random())
+            print(f"Dopisano {counts['ZAMOWIENIE']} zamówień "
+                  f"({counts['POZYCJA_ZAMOWIENIA']} pozycji)")
+        if args.query:
+            cursor = connection.cursor().execute(args.query)
+            if cursor.description:
+                print('\t'.join(column[0] for column in cursor.description))
+                for row in cursor.fetchall():
+                    print('\t'.join('' if value is None else str(value) for value in row))
+            connection.commit()
+    finally:
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,14 +16,14 @@ def get_next_zo_number(db_manager):
     try:
         current_year = datetime.now().year % 100  # Pobieramy ostatnie 2 cyfry roku
 
-        query = f"""
+        query = """
         SELECT MAX(CAST(SUBSTRING(NUMER, 4, CHARINDEX('/', NUMER) - 4) AS INT)) as max_number
         FROM DOKUMENT_MAGAZYNOWY
         WHERE RODZAJ_DOKUMENTU = 'ZO'
-        AND NUMER LIKE 'ZO %/{current_year}'
+        AND NUMER LIKE ?
         """
 
-        result = db_manager.execute_query(query)
+        result = db_manager.execute_query(query, (f"ZO %/{current_year}",))
         if result and result[0]['max_number'] is not None:
             next_number = result[0]['max_number'] + 1
         else:
@@ -7,44 +7,39 @@ Moduł integrujący ulepszoną obsługę drukarek termicznych z istniejącym sys
 Zintegrowany z funkcjonalnością drukowania plików ZPL na drukarkach sieciowych.
 """
 
-import pikepdf
 import decimal
-from decimal import Decimal
-from zpl.zpl_file import *
-from html2pdfs.pdf_trimmer import (
-    trim_pdf_to_content,
-    detect_content_height_from_pdf,
-    trim_existing_pdf
-)
-from html2pdfs.html_processor import preprocess_html, calculate_optimal_height
-from html2pdfs.utils import (
-    find_wkhtmltopdf_path,
-    generate_temp_filename,
-    ensure_directory_exists,
-    pdf_to_final_location
-)
-from zpl2print import *
-from html2pdf3 import *
 import asyncio
 import os
 import time
 import signal
 import sys
 
-from thermal_printer import *
+from thermal_printer import ThermalPrinterManager
 from lib.DatabaseManager import DatabaseManager
 from lib.ConfigManager import ConfigManager
+from lib.config_snapshot import (get_config, start_config_watcher, current_source, use_source,
+                                 run_in_thread)
 # from lib.order_processor import  process_todays_orders
-from lib.order_processor2 import process_todays_orders, get_id_uzytkownika_by_order
+from lib.order_processor2 import process_todays_orders
 from lib.file_utils import get_printed_orders, save_order_html, normalize_filename, get_path_order
 from lib.file_utils import get_zo_html_dir, get_zo_json_dir, get_zo_zpl_dir, get_zo_pdf_dir
 from lib.logger import logger
-from zpl.html2zpl import *
-from zebrafy import ZebrafyPDF
+from zpl.zpl_file import validate_zpl_file, repair_zpl_file
 
+# Ciężkie biblioteki (pikepdf, zebrafy, playwright przez html2pdf3, PyPDF2 przez
+# html2pdfs.pdf_trimmer) są importowane dopiero w funkcjach, które ich używają,
+# aby uruchomienie skryptu nie płaciło za nie przy każdym cyklu db_monitor.
 
 # Import nowego modułu do obsługi drukowania ZPL
 from zpl.network_printer import print_zpl_to_network_printer, list_zpl_files
+from zpl.printer_discovery import (
+    get_discovery_service, start_discovery_service, stop_discovery_service)
+from lib.dimension_cache import warm_up_dimension_caches
+from lib.artifact_archive import get_archive
+from lib.retry_queue import get_retry_queue, printer_key
+from lib.tracing import span
+from lib.metrics import (stage_timer, observe_stage, record_stage_error, record_order,
+                         start_metrics_service, stop_metrics_service)
 
 
 # Obsługa przerwania skryptu
@@ -53,9 +48,6 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 
-# Rejestracja handlera dla SIGINT (Ctrl+C)
-signal.signal(signal.SIGINT, signal_handler)
-
 # Pobierz ścieżkę do katalogu skryptu
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -64,7 +56,7 @@ def save_order_zpl(order_number, html_path):
     """Zapisuje plik ZPL dla zamówienia w folderze skonfigurowanym w config.ini"""
     try:
         # Pobierz ścieżkę do katalogu ZPL z konfiguracji
-        config = ConfigManager()
+        config = get_config()
         zpl_dir = config.get_zo_zpl_dir()
         if not zpl_dir:
             logger.error(
@@ -93,6 +85,7 @@ def save_order_zpl(order_number, html_path):
             return False
 
         # Konwertuj HTML na ZPL i zapisz do pliku
+        from zpl.zpl_printer import print_html_from_file
         result = print_html_from_file(
             file_path=html_path,
             output_file=zpl_path,
@@ -134,9 +127,13 @@ def initialize_thermal_printer_manager(config: ConfigManager) -> ThermalPrinterM
         # Ścieżka do pliku konfiguracyjnego drukarek (opcjonalnie)
         printer_config_file = 'thermal_printers.json'
 
-        # Inicjalizacja menedżera drukarek
+        # Inicjalizacja menedżera drukarek z pamięcią podręczną listy i statusów
+        cache_settings = config.get_printer_cache_settings()
         printer_manager = ThermalPrinterManager(
-            config_file=printer_config_file)
+            config_file=printer_config_file,
+            enumeration_ttl=cache_settings['enumeration_ttl'],
+            status_ttl=cache_settings['status_ttl'],
+            job_check_timeout=cache_settings['job_check_timeout'])
 
         # Wykryj dostępne drukarki termiczne
         thermal_printers = printer_manager.get_thermal_printers()
@@ -160,9 +157,12 @@ def initialize_thermal_printer_manager(config: ConfigManager) -> ThermalPrinterM
             else:
                 logger.warning("Nie znaleziono żadnej drukarki termicznej!")
 
-        # Zapisz konfigurację drukarek do pliku
+        # Zapisz konfigurację drukarek do pliku (tylko jeśli się zmieniła)
         printer_manager.save_configuration(printer_config_file)
 
+        # Odświeżanie pamięci podręcznej drukarek w tle
+        printer_manager.start_cache_refresher(cache_settings['refresh_interval'])
+
         return printer_manager
     except Exception as e:
         logger.error(
@@ -171,13 +171,15 @@ def initialize_thermal_printer_manager(config: ConfigManager) -> ThermalPrinterM
 
 
 # Nowa funkcja drukowania ZPL za pomocą połączenia sieciowego
-def print_zpl_network(zpl_path, config=None):
+def print_zpl_network(zpl_path, config=None, printer_ip=None, port=None):
     """
     Drukuje plik ZPL na drukarce sieciowej korzystając z konfiguracji w config.ini.
 
     Parametry:
     - zpl_path: Ścieżka do pliku ZPL
-    - config: Opcjonalny obiekt ConfigManager. Jeśli None, tworzy nowy.
+    - config: Opcjonalny obiekt konfiguracji. Jeśli None, używa współdzielonej migawki.
+    - printer_ip, port: Opcjonalny adres drukarki (ponowne wydruki z kolejki);
+      domyślnie z sekcji [THERMAL_PRINTER]
 
     Zwraca:
     - Słownik z informacją o statusie operacji
@@ -189,14 +191,13 @@ def print_zpl_network(zpl_path, config=None):
             logger.error(error_msg)
             return {'success': False, 'message': error_msg, 'status': 'error'}
 
-        # Inicjalizacja konfiguracji, jeśli nie została podana
+        # Użyj współdzielonej migawki konfiguracji, jeśli nie podano innej
         if config is None:
-            config = ConfigManager()
-            config.load_config()
+            config = get_config()
 
         # Pobierz parametry drukarki z konfiguracji
-        printer_ip = config.get_thermal_printer_ip()
-        port = config.get_thermal_printer_port()
+        printer_ip = printer_ip or config.get_thermal_printer_ip()
+        port = port or config.get_thermal_printer_port()
 
         if not printer_ip:
             logger.error("Nie znaleziono adresu IP drukarki w konfiguracji")
@@ -209,8 +210,11 @@ def print_zpl_network(zpl_path, config=None):
         # Drukowanie ZPL na drukarce sieciowej
         logger.info(
             f"Drukuję plik ZPL {zpl_path} na drukarce sieciowej {printer_ip}:{port}")
-        result = print_zpl_to_network_printer(
-            zpl_path, printer_ip, port, config)
+        with stage_timer('send', printer=printer_ip):
+            result = print_zpl_to_network_printer(
+                zpl_path, printer_ip, port, config)
+        if not result or not result.get('success', False):
+            record_stage_error('send', printer=printer_ip)
 
         return result
 
@@ -225,10 +229,13 @@ def print_zpl_network(zpl_path, config=None):
 
 
 # Utwórz zmodyfikowaną asynchroniczną funkcję pomocniczą
-async def generate_pdf(html_path, pdf_path, label_width_mm, continuous=True, margins=None):
+async def generate_pdf(html_path, pdf_path, label_width_mm, continuous=True, margins=None,
+                       html_content=None, browser=None):
     """
     Generuje plik PDF na podstawie pliku HTML.
     Najpierw generuje PDF za pomocą html_to_pdf, a następnie obcina go za pomocą trim_existing_pdf.
+    Jeśli podano html_content i w konfiguracji ustawiono render_mode = lean (domyślnie),
+    zawartość jest przekazywana bezpośrednio do html_content_to_pdf (page.set_content).
 
     Parametry:
     - html_path: Ścieżka do pliku HTML
@@ -236,23 +243,48 @@ async def generate_pdf(html_path, pdf_path, label_width_mm, continuous=True, mar
     - label_width_mm: Szerokość etykiety w milimetrach
     - continuous: Czy używać trybu ciągłego bez podziału na strony
     - margins: Marginesy (słownik z kluczami 'top', 'right', 'bottom', 'left')
+    - html_content: Opcjonalna zawartość HTML (tryb renderowania 'lean')
+    - browser: Opcjonalna ciepła przeglądarka (ResidentBrowser); None - nowa instancja Chromium
 
     Zwraca:
     - Ścieżka do wygenerowanego pliku PDF lub None w przypadku błędu
     """
     try:
-        # Najpierw generuj PDF używając html_to_pdf
-        logger.info(
-            f"Generowanie wstępnego PDF za pomocą html_to_pdf dla pliku {html_path}")
-
-        initial_pdf = await html_to_pdf(
-            url=html_path,
-            output_path=pdf_path,
-            label_width_mm=label_width_mm,
-            continuous=continuous,
-            margins=margins or {"top": 0, "right": 0, "bottom": 0, "left": 0},
-            css_styles="body { font-size: 12px; line-height: 1.2; } img { max-width: 100%; }"
-        )
+        from html2pdf3 import html_to_pdf, html_content_to_pdf
+
+        css_styles = "body { font-size: 12px; line-height: 1.2; } img { max-width: 100%; }"
+        config = get_config()
+        printer = get_printer_id(config)
+        lean = html_content is not None and config.get_render_mode() == 'lean'
+        # Najpierw generuj wstępny PDF (set_content lub wczytanie pliku HTML)
+        if lean:
+            logger.info(
+                f"Generowanie wstępnego PDF za pomocą html_content_to_pdf (tryb lean) dla pliku {html_path}")
+        else:
+            logger.info(
+                f"Generowanie wstępnego PDF za pomocą html_to_pdf dla pliku {html_path}")
+        with stage_timer('render', printer=printer):
+            if lean:
+                initial_pdf = await html_content_to_pdf(
+                    html_content,
+                    output_path=pdf_path,
+                    label_width_mm=label_width_mm,
+                    continuous=continuous,
+                    css_styles=css_styles,
+                    assets_dir=config.get_assets_dir(),
+                    font_files=config.get_font_files(),
+                    browser=browser
+                )
+            else:
+                initial_pdf = await html_to_pdf(
+                    url=html_path,
+                    output_path=pdf_path,
+                    label_width_mm=label_width_mm,
+                    continuous=continuous,
+                    margins=margins or {"top": 0, "right": 0, "bottom": 0, "left": 0},
+                    css_styles=css_styles,
+                    browser=browser
+                )
 
         if not initial_pdf:
             logger.error(
@@ -266,7 +298,9 @@ async def generate_pdf(html_path, pdf_path, label_width_mm, continuous=True, mar
 
         try:
             # Przycinanie PDF bez zmiany nazwy pliku (nadpisanie)
-            trimmed_pdf = trim_existing_pdf(initial_pdf)
+            from html2pdfs.pdf_trimmer import trim_existing_pdf
+            with stage_timer('trim', printer=printer):
+                trimmed_pdf = await run_in_thread(trim_existing_pdf, initial_pdf)
 
             if trimmed_pdf:
                 logger.info(f"PDF został pomyślnie przycięty: {trimmed_pdf}")
@@ -314,7 +348,7 @@ def convert_to_float(value):
         raise TypeError(f"Nie można skonwertować wartości {value} do float")
 
 
-def convert_pdf_to_zpl_with_original_dimensions(pdf_path, dpi=203, split_pages=False):
+def convert_pdf_to_zpl_with_original_dimensions(pdf_path, dpi=203, split_pages=False, encoder_pool=None):
     """
     Konwertuje PDF do ZPL zachowując oryginalne wymiary strony.
     Implementuje komendę ZPL LL do ustawienia długości etykiety.
@@ -322,8 +356,11 @@ def convert_pdf_to_zpl_with_original_dimensions(pdf_path, dpi=203, split_pages=F
     :param pdf_path: Ścieżka do pliku PDF
     :param dpi: Rozdzielczość wydruku (domyślnie 203 DPI)
     :param split_pages: Czy rozdzielać strony (domyślnie False)
+    :param encoder_pool: Opcjonalna pula procesów ZplEncoderPool do kodowania rastrów
     :return: Ciąg znaków ZPL
     """
+    import pikepdf
+
     # Otwórz PDF za pomocą pikepdf, aby uzyskać dokładne wymiary
     pdf = pikepdf.Pdf.open(pdf_path)
 
@@ -347,21 +384,37 @@ def convert_pdf_to_zpl_with_original_dimensions(pdf_path, dpi=203, split_pages=F
         pdf_content = pdf_file.read()
 
     # Konwersja do ZPL z zachowaniem wymiarów
-    zpl_string = ZebrafyPDF(
-        pdf_content,
-        format="ASCII",  # Format wyjściowy
-        invert=True,  # Inwersja kolorów (dla etykiet)
-        dither=False,  # Bez rozmycia
-        threshold=128,  # Próg binaryzacji
-        dpi=dpi,  # Rozdzielczość wydruku
-        pos_x=9,  # Pozycja X
-        pos_y=9,  # Pozycja Y
-        rotation=0,  # Bez rotacji
-        complete_zpl=True,  # Pełny kod ZPL
-        split_pages=split_pages,  # Podział stron
-        width=width_mm,  # Szerokość etykiety w mm
-        height=height_mm  # Wysokość etykiety w mm
-    ).to_zpl()
+    if encoder_pool is not None:
+        # Kodowanie rastrów w puli procesów (poza GIL procesu głównego)
+        zpl_string = encoder_pool.pdf_to_zpl(
+            pdf_content,
+            dpi=dpi,
+            pos_x=9,
+            pos_y=9,
+            split_pages=split_pages,
+            threshold=128,
+            width=width_mm,
+            height=height_mm,
+            invert=True  # Inwersja kolorów jak w gałęzi ZebrafyPDF
+        )
+    else:
+        from zebrafy import ZebrafyPDF
+        with span('zebrafy'):
+            zpl_string = ZebrafyPDF(
+                pdf_content,
+                format="ASCII",  # Format wyjściowy
+                invert=True,  # Inwersja kolorów (dla etykiet)
+                dither=False,  # Bez rozmycia
+                threshold=128,  # Próg binaryzacji
+                dpi=dpi,  # Rozdzielczość wydruku
+                pos_x=9,  # Pozycja X
+                pos_y=9,  # Pozycja Y
+                rotation=0,  # Bez rotacji
+                complete_zpl=True,  # Pełny kod ZPL
+                split_pages=split_pages,  # Podział stron
+                width=width_mm,  # Szerokość etykiety w mm
+                height=height_mm  # Wysokość etykiety w mm
+            ).to_zpl()
 
     # Sprawdź, czy ZPL zawiera już komendę LL
     if "^LL" not in zpl_string:
@@ -444,10 +497,24 @@ def process_pdf_to_zpl(pdf_path, zo_zpl, logger=None, **kwargs):
 
     # Pobierz dpi z konfiguracji, jeśli nie podano w kwargs
     if 'dpi' not in kwargs and configs:
-        kwargs['dpi'] = config.get_printer_dpi()
+        kwargs['dpi'] = configs.get_printer_dpi()
+
+    # Użyj puli koderów ZPL, jeśli została włączona w konfiguracji
+    if 'encoder_pool' not in kwargs and configs:
+        workers = configs.get_zpl_encoder_workers()
+        if workers > 0:
+            # Pula (multiprocessing.shared_memory, Python 3.8+) jest importowana
+            # dopiero po włączeniu jej w konfiguracji
+            from zpl.zpl_encoder_pool import get_encoder_pool
+            kwargs['encoder_pool'] = get_encoder_pool(workers)
+
+    printer = get_printer_id(configs or get_config())
 
     # Wywołanie bezpiecznej konwersji
-    conversion_result = safe_convert_pdf_to_zpl(pdf_path, logger, **kwargs)
+    with stage_timer('zpl_encode', printer=printer):
+        conversion_result = safe_convert_pdf_to_zpl(pdf_path, logger, **kwargs)
+    if not conversion_result['success']:
+        record_stage_error('zpl_encode', printer=printer)
 
     if conversion_result['success']:
         try:
@@ -459,23 +526,24 @@ def process_pdf_to_zpl(pdf_path, zo_zpl, logger=None, **kwargs):
                 logger.info(f"Pomyślnie wygenerowano plik ZPL: {zo_zpl}")
 
             # Walidacja pliku ZPL
-            result = validate_zpl_file(zo_zpl)
-            if not result['success']:
-                if logger:
-                    for issue in result['issues']:
-                        if issue['type'] == 'error':
-                            logger.error(f"BŁĄD: {issue['message']}")
-                        else:
-                            logger.warning(f"UWAGA: {issue['message']}")
-
-                    # Naprawa pliku ZPL
-                    repair_result = repair_zpl_file(zo_zpl)
-                    if repair_result['success']:
-                        logger.info(f"Status: {repair_result['message']}")
-                        if repair_result['fixed_issues']:
-                            logger.info("Naprawione problemy:")
-                            for fix in repair_result['fixed_issues']:
-                                logger.info(f"- {fix}")
+            with stage_timer('validate', printer=printer):
+                result = validate_zpl_file(zo_zpl)
+                if not result['success']:
+                    if logger:
+                        for issue in result['issues']:
+                            if issue['type'] == 'error':
+                                logger.error(f"BŁĄD: {issue['message']}")
+                            else:
+                                logger.warning(f"UWAGA: {issue['message']}")
+
+                        # Naprawa pliku ZPL
+                        repair_result = repair_zpl_file(zo_zpl)
+                        if repair_result['success']:
+                            logger.info(f"Status: {repair_result['message']}")
+                            if repair_result['fixed_issues']:
+                                logger.info("Naprawione problemy:")
+                                for fix in repair_result['fixed_issues']:
+                                    logger.info(f"- {fix}")
 
             return {
                 'success': True,
@@ -502,248 +570,696 @@ def process_pdf_to_zpl(pdf_path, zo_zpl, logger=None, **kwargs):
         }
 
 
-# Inicjalizacja konfiguracji
-config = ConfigManager()
-config.load_config()
-logger.info("Wczytano konfigurację")
+def setup_printers(config):
+    """
+    Przygotowuje drukarki: menedżer drukarek lokalnych i wybór drukarki.
+    Drukarka sieciowa jest sprawdzana we wspólnym inwentarzu wykrywania
+    (usługa uruchamiana raz na proces w main/run_daemon).
 
-zpl_dir = config.get_zo_zpl_dir()
-# Pobierz parametry drukarki z konfiguracji
-dpi = config.get_printer_dpi()
-printer_ip = config.get_thermal_printer_ip()
-printer_port = config.get_thermal_printer_port()
-printer_name = config.get_thermal_printer_name()
+    Parametry:
+    - config: Migawka konfiguracji
 
+    Zwraca:
+    - Para (printer_manager, printer_name) lub None, gdy drukowanie nie jest możliwe
+    """
+    printer_ip = config.get_thermal_printer_ip()
+    printer_port = config.get_thermal_printer_port()
 
-def main():
+    # Sprawdź, czy zdefiniowano adres IP drukarki
+    if not printer_ip:
+        logger.warning(
+            "Brak adresu IP drukarki w konfiguracji. Drukowanie sieciowe nie będzie działać.")
+    else:
+        logger.info(
+            f"Wykryto drukarkę sieciową: {printer_ip}:{printer_port}")
+
+    # Inicjalizacja menedżera drukarek termicznych (dla lokalnych drukarek)
+    printer_manager = initialize_thermal_printer_manager(config)
+
+    discovery_service = get_discovery_service()
+    if discovery_service and printer_ip:
+        known_printer = discovery_service.find_printer(printer_ip, printer_port)
+        if known_printer:
+            logger.info(
+                f"Drukarka {printer_ip}:{printer_port} w inwentarzu: "
+                f"{known_printer.get('specs', {}).get('model')}, "
+                f"{known_printer.get('specs', {}).get('dpi')} DPI")
+
+    # Sprawdzenie, czy menedżer drukarek został prawidłowo zainicjalizowany
+    if printer_manager is None and not printer_ip:
+        logger.error(
+            "Nie można zainicjalizować menedżera drukarek lokalnych i brak konfiguracji drukarki sieciowej.")
+        logger.error(
+            "Zatrzymuję skrypt, ponieważ drukowanie nie będzie możliwe.")
+        return None
+
+    # Pobierz nazwę drukarki termicznej z config.ini (dla lokalnych drukarek)
+    printer_name = None
+    if printer_manager:
+        printer_name = config.get_thermal_printer_name()
+        if not printer_name:
+            logger.warning(
+                "Brak dostępnej drukarki lokalnej w konfiguracji.")
+            printer_name = printer_manager.get_default_thermal_printer()
+            if printer_name:
+                logger.info(f"Używam domyślnej drukarki: {printer_name}")
+
+    if not printer_name and not printer_ip:
+        logger.error(
+            "Brak dostępnej drukarki (lokalnej lub sieciowej). Zatrzymuję skrypt.")
+        return None
+
+    return printer_manager, printer_name
+
+
+def connect_database_manager(config):
     """
-    Główna funkcja skryptu. Uruchamia proces generowania i drukowania zamówień.
-    Wykorzystuje drukowanie ZPL przez sieć zamiast print_pdf_directly.
+    Łączy się z bazą danych i wczytuje pamięć podręczną wymiarów artykułów.
+
+    Parametry:
+    - config: Migawka konfiguracji
+
+    Zwraca:
+    - Obiekt DatabaseManager (connection = None, gdy połączenie się nie powiodło)
     """
-    logger.info("Rozpoczęcie wykonywania skryptu")
+    # Generowanie connection string
+    conn_str = config.get_connection_string()
+    logger.info("Wygenerowano connection string")
+
+    # Inicjalizacja połączenia z bazą danych
+    db_manager = DatabaseManager(conn_str)
+    if db_manager.connect():
+        logger.info("Połączono z bazą danych")
+
+    # Wczytaj najczęściej zamawiane artykuły do pamięci podręcznej
+    if config.get_dimension_cache_settings()['enabled'] and db_manager.connection:
+        warm_up_dimension_caches(db_manager.connection)
+    return db_manager
 
+
+def setup_order_leases(config, db_manager):
+    """
+    Przygotowuje dzierżawy zamówień (sekcja [LEASES]), gdy kilka instancji
+    sql2html obsługuje tę samą bazę: tworzy tabelę WaproPrintLease i uruchamia
+    wątek odnawiający dzierżawy.
+
+    Parametry:
+    - config: Migawka konfiguracji
+    - db_manager: Obiekt DatabaseManager z aktywnym połączeniem
+
+    Zwraca:
+    - Obiekt OrderLeases lub None, gdy dzierżawy są wyłączone
+    """
+    settings = config.get_lease_settings()
+    if not settings['enabled']:
+        return None
+
+    from lib.DatabaseManager import connect_database
+    from lib.order_leases import OrderLeases, ensure_lease_schema
+    from lib.wapro_emulator import is_emulator_dsn
+
+    connection_string = db_manager.connection_string
+    ensure_lease_schema(db_manager.connection.cursor())
+    leases = OrderLeases(
+        db_manager.connection,
+        owner=settings['node_id'] or None,
+        dialect='sqlite' if is_emulator_dsn(connection_string) else 'mssql',
+        lease_seconds=settings['lease_seconds'],
+        heartbeat_interval=settings['heartbeat_interval'] or None,
+        max_attempts=settings['max_attempts'],
+        retry_delay=settings['retry_delay'],
+        retention_days=settings['retention_days'],
+        connect=lambda: connect_database(connection_string))
+    leases.start_heartbeat()
+    logger.info(f"Dzierżawy zamówień włączone, węzeł {leases.owner}")
+    return leases
+
+
+def finish_order_lease(leases, order_number, order_result):
+    """
+    Zamyka dzierżawę zamówienia po próbie wydruku: wydrukowane (lub przekazane
+    do kolejki ponownych wydruków) zamówienie oznacza jako DONE, nieudane
+    zwalnia do ponownej próby.
+
+    Parametry:
+    - leases: Obiekt OrderLeases lub None
+    - order_number: Numer zamówienia
+    - order_result: Wynik process_order
+    """
+    if leases is None:
+        return
     try:
+        if order_result in ('printed', 'queued'):
+            # Zamówienie w kolejce [RETRY] drukuje ten węzeł - inne go nie przejmują
+            leases.complete(order_number)
+        elif order_result == 'failed':
+            leases.release(order_number)
+    except Exception as e:
+        # Dzierżawa wygaśnie i zamówienie przejmie inny węzeł
+        logger.error(f"Błąd zamykania dzierżawy zamówienia {order_number}: {str(e)}")
 
-        # Sprawdź, czy zdefiniowano adres IP drukarki
-        if not printer_ip:
-            logger.warning(
-                "Brak adresu IP drukarki w konfiguracji. Drukowanie sieciowe nie będzie działać.")
+
+def store_printed_zpl(order_number, zo_zpl, config):
+    """
+    Zapisuje wydrukowany plik ZPL w archiwum (lub kopię w folderze drukarki).
+
+    Parametry:
+    - order_number: Numer zamówienia
+    - zo_zpl: Ścieżka wydrukowanego pliku ZPL
+    - config: Migawka konfiguracji (źródła) zamówienia
+    """
+    archive = get_archive()
+    if archive is not None:
+        # Wydrukowany ZPL trafia do archiwum (identyczne dane zapisywane są raz)
+        with open(zo_zpl, 'rb') as zpl_file:
+            entry = archive.put(order_number, 'zpl', zpl_file.read(),
+                                tag=get_printer_id(config))
+        zo_printed = os.path.join(archive.directory, entry['segment'])
+        if not config.get_archive_settings()['keep_files']:
+            os.remove(zo_zpl)
+    else:
+        # Zapisz kopię wydrukowanego pliku
+        zo_printed = get_path_order(
+            order_number, get_printer_folder(config), '.zpl')
+        try:
+            import shutil
+            shutil.copy2(zo_zpl, zo_printed)
+            logger.debug(
+                f"Zapisano ZPL to printer folder: {zo_printed}")
+        except:
+            pass
+
+    logger.info(
+        f"Plik {zo_zpl} został wydrukowany i zapisano kopię w {zo_printed}")
+
+
+def retry_print_job(job):
+    """
+    Ponawia wysyłkę zamówienia z kolejki [RETRY] w kontekście jego źródła.
+    Wywoływana przez RetryScheduler w wątku drukarki.
+
+    Parametry:
+    - job: Wpis kolejki ponownych wydruków
+
+    Zwraca:
+    - Słownik z informacją o statusie operacji
+    """
+    with use_source(job['source'] or None):
+        config = get_config()
+        result = print_zpl_network(job['zpl_path'], config, printer_ip=job['host'], port=job['port'])
+        if result is not None and result.get('success', False):
+            store_printed_zpl(job['order_number'], job['zpl_path'], config)
+            record_order('printed', printer=job['host'])
+        return result
+
+
+def start_retry_scheduler(config):
+    """
+    Tworzy harmonogram ponownych wydruków z kolejki [RETRY].
+
+    Parametry:
+    - config: Główna migawka konfiguracji
+
+    Zwraca:
+    - Obiekt RetryScheduler lub None, gdy kolejka jest wyłączona
+    """
+    from lib.retry_queue import RetryScheduler
+
+    retry_queue = get_retry_queue()
+    if retry_queue is None:
+        return None
+    settings = config.get_retry_settings()
+    return RetryScheduler(
+        retry_queue, retry_print_job, workers=settings['workers'],
+        interval=settings['poll_interval'],
+        on_dead=lambda job: record_order('dead', printer=job['host']))
+
+
+async def process_order(order_number, html_content, printer_manager=None, printer_name=None,
+                        browser=None, leases=None):
+    """
+    Renderuje, konwertuje do ZPL i drukuje jedno zamówienie.
+
+    Konwersja do ZPL i wysyłka do drukarki są wykonywane w wątku roboczym,
+    więc pętla zdarzeń trybu rezydentnego pozostaje responsywna.
+
+    Parametry:
+    - order_number: Numer zamówienia
+    - html_content: Zawartość HTML zamówienia
+    - printer_manager: Menedżer drukarek lokalnych (ThermalPrinterManager) lub None
+    - printer_name: Nazwa drukarki lokalnej
+    - browser: Opcjonalna ciepła przeglądarka (ResidentBrowser); None - nowa instancja Chromium
+    - leases: Opcjonalne dzierżawy zamówień (OrderLeases); dzierżawa jest
+      odnawiana tuż przed wysyłką, a zamówienie przejęte przez inny węzeł pomijane
+
+    Zwraca:
+    - Wynik zamówienia: 'printed', 'failed', 'skipped' (dzierżawa przejęta)
+      lub 'queued' (drukarka sieciowa niedostępna - zamówienie w kolejce [RETRY])
+    """
+    order_started = time.perf_counter()
+    order_result = 'failed'
+    try:
+        # Pobierz aktualną migawkę (mogła zostać podmieniona po zmianie config.ini)
+        config = get_config()
+        printer_ip = config.get_thermal_printer_ip()
+
+        # Zapisz HTML w archiwum; plik jest potrzebny tylko przy renderowaniu z pliku
+        archive = get_archive()
+        keep_files = config.get_archive_settings()['keep_files']
+        if archive is not None:
+            archive.put(order_number, 'html', html_content)
+        if archive is None or keep_files or config.get_render_mode() != 'lean':
+            zo_html = save_order_html(order_number, html_content)
+            logger.info(
+                f"Zapisano plik HTML dla zamówienia {order_number}")
         else:
+            zo_html = get_path_order(order_number, get_zo_html_dir(), '.html')
             logger.info(
-                f"Wykryto drukarkę sieciową: {printer_ip}:{printer_port}")
+                f"Zapisano HTML zamówienia {order_number} w archiwum")
 
-        # Inicjalizacja menedżera drukarek termicznych (dla lokalnych drukarek)
-        printer_manager = initialize_thermal_printer_manager(config)
+        # Pobierz parametry drukarki z konfiguracji
+        label_width_mm = config.get_printer_label_width_mm()
 
-        # Sprawdzenie, czy menedżer drukarek został prawidłowo zainicjalizowany
-        if printer_manager is None and not printer_ip:
-            logger.error(
-                "Nie można zainicjalizować menedżera drukarek lokalnych i brak konfiguracji drukarki sieciowej.")
+        # Określ ścieżkę pliku PDF
+        zo_pdf = get_path_order(order_number, get_zo_pdf_dir(), '.pdf')
+
+        # Generuj PDF z dwuetapowym procesem: html_to_pdf + html_to_continuous_pdf
+        pdf_path = await generate_pdf(
+            zo_html,
+            zo_pdf,
+            label_width_mm=label_width_mm,
+            continuous=True,
+            margins={"top": 0, "right": 0, "bottom": 0, "left": 0},
+            html_content=html_content,
+            browser=browser
+        )
+
+        if not pdf_path:
             logger.error(
-                "Zatrzymuję skrypt, ponieważ drukowanie nie będzie możliwe.")
-            return
+                f"Nie udało się wygenerować PDF dla zamówienia {order_number}")
+            return order_result
 
-        # Generowanie connection string
-        conn_str = config.get_connection_string()
-        logger.info("Wygenerowano connection string")
+        logger.info(
+            f"PDF dla zamówienia {order_number} został wygenerowany: {pdf_path}")
 
-        # Inicjalizacja połączenia z bazą danych
-        db_manager = DatabaseManager(conn_str)
-        db_manager.connect()
-        logger.info("Połączono z bazą danych")
+        # Określ ścieżkę pliku ZPL
+        zo_zpl = get_path_order(
+            order_number, get_zo_zpl_dir(), '.zpl')
+        os.makedirs(os.path.dirname(zo_zpl), exist_ok=True)
 
-        # Pobierz listę już wydrukowanych zamówień
-        printed_orders = get_printed_orders()
-        logger.info(f"Znaleziono {len(printed_orders)} wydrukowanych zamówień")
+        # Generowanie ZPL z PDF
+        try:
+            result = await run_in_thread(
+                process_pdf_to_zpl,
+                pdf_path=zo_pdf,
+                zo_zpl=zo_zpl,
+                logger=logger,
+                config=config
+            )
 
-        # Pobierz nazwę drukarki termicznej z config.ini (dla lokalnych drukarek)
-        printer_name = None
-        if printer_manager:
-            printer_name = config.get_thermal_printer_name()
-            if not printer_name:
-                logger.warning(
-                    "Brak dostępnej drukarki lokalnej w konfiguracji.")
-                printer_name = printer_manager.get_default_thermal_printer()
-                if printer_name:
-                    logger.info(f"Używam domyślnej drukarki: {printer_name}")
+            if not result['success']:
+                logger.error(
+                    f"Nie udało się utworzyć pliku ZPL dla zamówienia {order_number}")
+                return order_result
 
-        if not printer_name and not printer_ip:
+        except Exception as e:
             logger.error(
-                "Brak dostępnej drukarki (lokalnej lub sieciowej). Zatrzymuję skrypt.")
-            return
+                f"Błąd podczas generowania lub zapisywania ZPL: {str(e)}")
+        # Sprawdź, czy plik ZPL został utworzony
+        if not os.path.exists(zo_zpl):
+            logger.error(
+                f"Nie udało się utworzyć pliku ZPL dla zamówienia {order_number}")
+            return order_result
 
-        # Przetwórz dzisiejsze zamówienia
-        # for order_number, html_content in process_todays_orders(db_manager, printed_orders):
-        for order_number, html_content in process_todays_orders():
-            try:
-                # Zapisz plik HTML
-                zo_html = save_order_html(order_number, html_content)
-                logger.info(
-                    f"Zapisano plik HTML dla zamówienia {order_number}")
-
-                # Pobierz parametry drukarki z konfiguracji
-                dpi = config.get_printer_dpi()
-                label_margin = config.get_printer_label_margin()
-                label_width = config.get_printer_label_width()
-                label_width_mm = config.get_printer_label_width_mm()
-                label_height = config.get_printer_label_height()
-                folder_prefix = config.get_printer_folder_prefix()
-
-                # Określ ścieżkę pliku PDF
-                zo_pdf = get_path_order(order_number, get_zo_pdf_dir(), '.pdf')
-
-                # Generuj PDF z dwuetapowym procesem: html_to_pdf + html_to_continuous_pdf
-                try:
-                    # Użyj kontekstu timeout, aby zapobiec zawieszeniu
-                    pdf_path = asyncio.run(generate_pdf(
-                        zo_html,
-                        zo_pdf,
-                        label_width_mm=label_width_mm,
-                        continuous=True,
-                        margins={"top": 0, "right": 0, "bottom": 0, "left": 0}
-                    ))
-                except KeyboardInterrupt:
-                    logger.warning(
-                        "Przerwano generowanie PDF. Kontynuowanie przetwarzania zamówień...")
-                    continue
-
-                if pdf_path:
-                    logger.info(
-                        f"PDF dla zamówienia {order_number} został wygenerowany: {pdf_path}")
-
-                    # Określ ścieżkę pliku ZPL
-                    zo_zpl = get_path_order(
-                        order_number, get_zo_zpl_dir(), '.zpl')
-                    os.makedirs(os.path.dirname(zo_zpl), exist_ok=True)
-
-                    # Generowanie ZPL z PDF
-                    try:
-                        # Generowanie ZPL z PDF
-                        # with open(pdf_path, "rb") as pdf:
-                        #     zpl_string = ZebrafyPDF(
-                        #         pdf.read(),
-                        #         format="ASCII",
-                        #         invert=True,
-                        #         dither=False,
-                        #         threshold=128,
-                        #         dpi=dpi,
-                        #         pos_x=0,
-                        #         pos_y=0,
-                        #         rotation=0,
-                        #         complete_zpl=True,
-                        #         split_pages=False,
-                        #         width=0,
-                        #         height=0,
-                        #     ).to_zpl()
-                        #
-                        # # Zapisz plik ZPL
-                        # os.makedirs(os.path.dirname(zo_zpl), exist_ok=True)
-                        # with open(zo_zpl, "w") as zpl_file:
-                        #     zpl_file.write(zpl_string)
-                        result = process_pdf_to_zpl(
-                            pdf_path=zo_pdf,
-                            zo_zpl=zo_zpl,
-                            logger=logger,
-                            config=config
-                        )
-
-                        if not result['success']:
-                            logger.error(
-                                f"Nie udało się utworzyć pliku ZPL dla zamówienia {order_number}")
-                            continue
-
-                    except Exception as e:
-                        logger.error(
-                            f"Błąd podczas generowania lub zapisywania ZPL: {str(e)}")
-                    # Sprawdź, czy plik ZPL został utworzony
-                    if not os.path.exists(zo_zpl):
-                        logger.error(
-                            f"Nie udało się utworzyć pliku ZPL dla zamówienia {order_number}")
-                        continue
-
-                    id_uzytkownika = str(
-                        get_id_uzytkownika_by_order(order_number))
-                    allowed_users = config.get_allowed_users()
-                    # Convert all allowed users to strings for consistent comparison
-                    allowed_users_str = [str(user_id)
-                                         for user_id in allowed_users]
-
-                    if id_uzytkownika not in allowed_users_str:
-                        logger.error(
-                            f"Nie udało się wydrukować zamówienia {order_number}, id_uzytkownika ({id_uzytkownika}) nie znajduje się na liście dozwolonych użytkowników: {allowed_users_str}")
-                        continue
-                    else:
-                        logger.info(
-                            f"Zamówienie {order_number}, id_uzytkownika: ({id_uzytkownika}) - użytkownik z uprawnieniami do drukowania")
-
-                    # Drukowanie pliku ZPL na drukarce sieciowej lub lokalnej                    result = None
-                    if printer_ip:
-                        # Użyj drukowania sieciowego
-                        result = print_zpl_network(zo_zpl, config)
-                    elif printer_manager and printer_name:
-                        # Użyj standardowego drukowania lokalnego (poprzez ThermalPrinterManager)
-                        result = printer_manager.print_zpl_file(
-                            zo_zpl, printer_name)
-                    else:
-                        logger.error(
-                            "Brak skonfigurowanej drukarki (sieciowej lub lokalnej)")
-                        continue
-
-                    # Obsługa wyniku drukowania
-                    if result is not None and result.get('success', False):
-                        logger.info(
-                            f"Zamówienie {order_number} zostało pomyślnie wydrukowane.")
-
-                        # Zapisz kopię wydrukowanego pliku
-                        zo_printed = get_path_order(
-                            order_number, get_printer_folder(config), '.zpl')
-                        try:
-                            import shutil
-                            shutil.copy2(zo_zpl, zo_printed)
-                            logger.debug(
-                                f"Zapisano ZPL to printer folder: {zo_printed}")
-                        except:
-                            pass
-                        # with open(zo_printed, "w") as zpl_printed:
-                        #     zpl_printed.write(zpl_string)
-
-                        logger.info(
-                            f"Plik {zo_zpl} został wydrukowany i zapisano kopię w {zo_printed}")
-                    else:
-                        error_msg = "Nieznany błąd"
-                        if result is not None and 'message' in result:
-                            error_msg = result['message']
-                        logger.error(
-                            f"Nie udało się wydrukować zamówienia {order_number}: {error_msg}")
+        # Zamówienie mógł w międzyczasie przejąć inny węzeł (wygasła dzierżawa)
+        if leases is not None and not leases.renew(order_number):
+            order_result = 'skipped'
+            logger.warning(
+                f"Zamówienie {order_number} przejął inny węzeł - pomijam wydruk")
+            return order_result
+
+        # Drukowanie pliku ZPL na drukarce sieciowej lub lokalnej
+        if printer_ip:
+            # Użyj drukowania sieciowego; przy niedostępnej drukarce zamówienie
+            # trafia do kolejki ponownych wydruków
+            port = config.get_thermal_printer_port()
+            retry_queue = get_retry_queue()
+            printer = printer_key(printer_ip, port)
+            if retry_queue is not None and not retry_queue.printer_available(printer):
+                retry_queue.enqueue(order_number, zo_zpl, printer_ip, port,
+                                    "Wyłącznik drukarki otwarty", source=current_source())
+                order_result = 'queued'
+                return order_result
+            result = await run_in_thread(print_zpl_network, zo_zpl, config)
+            if retry_queue is not None:
+                if result is not None and result.get('success', False):
+                    retry_queue.record_success(printer)
                 else:
-                    logger.error(
-                        f"Nie udało się wygenerować PDF dla zamówienia {order_number}")
+                    error_msg = (result or {}).get('message', "Nieznany błąd")
+                    retry_queue.record_failure(printer, error_msg)
+                    retry_queue.enqueue(order_number, zo_zpl, printer_ip, port, error_msg,
+                                        source=current_source())
+                    order_result = 'queued'
+                    return order_result
+        elif printer_manager and printer_name:
+            # Użyj standardowego drukowania lokalnego (poprzez ThermalPrinterManager)
+            result = await run_in_thread(
+                printer_manager.print_zpl_file, zo_zpl, printer_name)
+        else:
+            logger.error(
+                "Brak skonfigurowanej drukarki (sieciowej lub lokalnej)")
+            return order_result
 
-            except Exception as e:
-                logger.exception(
-                    f"Błąd podczas przetwarzania zamówienia {order_number}: {str(e)}")
+        # Obsługa wyniku drukowania
+        if result is not None and result.get('success', False):
+            order_result = 'printed'
+            logger.info(
+                f"Zamówienie {order_number} zostało pomyślnie wydrukowane.")
+            store_printed_zpl(order_number, zo_zpl, config)
+        else:
+            error_msg = "Nieznany błąd"
+            if result is not None and 'message' in result:
+                error_msg = result['message']
+            logger.error(
+                f"Nie udało się wydrukować zamówienia {order_number}: {error_msg}")
+
+    except Exception as e:
+        logger.exception(
+            f"Błąd podczas przetwarzania zamówienia {order_number}: {str(e)}")
+    finally:
+        # Czas całego zamówienia i wynik (metryki [METRICS])
+        printer = get_printer_id(get_config())
+        observe_stage('order', time.perf_counter() - order_started, printer=printer)
+        record_order(order_result, printer=printer)
+    return order_result
+
+
+def open_order_sources(config):
+    """
+    Przygotowuje źródła zamówień: jedno dla konfiguracji głównej albo po jednym
+    dla każdej sekcji [SOURCE:nazwa]. Każde źródło dostaje własne drukarki
+    i połączenie z bazą, przygotowane w jego kontekście konfiguracji.
+
+    Parametry:
+    - config: Główna migawka konfiguracji
+
+    Zwraca:
+    - Lista obiektów OrderSource (pusta, gdy żadne źródło nie ma drukarki)
+    """
+    from lib.order_sources import OrderSource
+
+    sources = []
+    for name in config.get_source_names() or [None]:
+        if name is None:
+            source = OrderSource()
+        else:
+            settings = config.get_source_settings(name)
+            if not settings['enabled']:
+                logger.info(f"Źródło zamówień {name} jest wyłączone")
+                continue
+            source = OrderSource(name, weight=settings['weight'])
+            logger.info(f"Przygotowanie źródła zamówień {name}")
+
+        printers = source.run(lambda: setup_printers(get_config()))
+        if printers is None:
+            logger.error(f"Pomijam źródło zamówień {source.label} - brak drukarki")
+            continue
+        source.printer_manager, source.printer_name = printers
+        source.db_manager = source.run(lambda: connect_database_manager(get_config()))
+        sources.append(source)
+    return sources
+
+
+def prepare_order_source(source):
+    """
+    Sprawdza połączenie źródła z bazą i przygotowuje jego dzierżawy zamówień.
+    Wywoływana w kontekście źródła przed każdym cyklem.
+
+    Parametry:
+    - source: Obiekt OrderSource
+
+    Zwraca:
+    - True, jeśli źródło może przetwarzać zamówienia
+    """
+    if not ensure_database_connection(source.db_manager):
+        logger.error(f"Brak połączenia z bazą danych źródła {source.label}")
+        return False
+    if source.leases is None:
+        source.leases = setup_order_leases(get_config(), source.db_manager)
+    else:
+        # Połączenie mogło zostać odtworzone przez ensure_database_connection
+        source.leases.connection = source.db_manager.connection
+    return True
+
+
+def source_orders(source):
+    """Generator dzisiejszych zamówień źródła (wywoływany w kontekście źródła)"""
+    return process_todays_orders(
+        source.db_manager, leases=source.leases,
+        batch_size=get_config().get_lease_settings()['batch_size'])
+
+
+def main():
+    """
+    Główna funkcja skryptu. Uruchamia proces generowania i drukowania zamówień.
+    Wykorzystuje drukowanie ZPL przez sieć zamiast print_pdf_directly.
+    """
+    from lib.order_sources import fair_orders
+
+    logger.info("Rozpoczęcie wykonywania skryptu")
+
+    # Bieżąca migawka konfiguracji; zmiany config.ini są wczytywane w tle
+    config = get_config()
+    logger.info("Wczytano konfigurację")
+    start_config_watcher()
+
+    sources = []
+    try:
+        # Metryki etapów (endpoint HTTP i migawka JSON)
+        start_metrics_service(config)
+        # Wykrywanie drukarek sieciowych w tle (nie blokuje startu)
+        start_discovery_service(config)
+
+        # Zaległe ponowne wydruki (drukarki z zamkniętym wyłącznikiem)
+        retry_scheduler = start_retry_scheduler(config)
+        if retry_scheduler is not None:
+            retry_scheduler.run_once(wait=True)
+            retry_scheduler.stop()
+
+        sources = open_order_sources(config)
+        ready = [source for source in sources if source.db_manager.connection is not None
+                 and source.run(prepare_order_source, source)]
+        if not ready:
+            return
+
+        # Przetwórz dzisiejsze zamówienia (przeplatając źródła)
+        for source, order_number, html_content in fair_orders(ready, source_orders):
+            try:
+                order_result = source.run(asyncio.run, process_order(
+                    order_number, html_content, source.printer_manager, source.printer_name,
+                    leases=source.leases))
+                finish_order_lease(source.leases, order_number, order_result)
+            except KeyboardInterrupt:
+                logger.warning(
+                    "Przerwano przetwarzanie zamówienia. Kontynuowanie przetwarzania zamówień...")
+                continue
 
     except Exception as e:
         logger.error(f"Wystąpił błąd: {str(e)}", exc_info=True)
     finally:
         # Zamknij połączenia
-        if 'db_manager' in locals():
-            db_manager.close()
+        for source in sources:
+            source.close()
+        if sources:
             logger.info("Zamknięto połączenie z bazą danych")
+        stop_discovery_service()
+        stop_metrics_service()
+
+
+def ensure_database_connection(db_manager):
+    """
+    Sprawdza połączenie trybu rezydentnego (SELECT 1) i w razie potrzeby łączy ponownie.
+
+    Parametry:
+    - db_manager: Obiekt DatabaseManager
+
+    Zwraca:
+    - True, jeśli połączenie jest dostępne
+    """
+    if db_manager.connection is not None:
+        try:
+            cursor = db_manager.connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Utracono połączenie z bazą danych: {e}. Łączę ponownie...")
+            try:
+                db_manager.connection.close()
+            except Exception:
+                pass
+            db_manager.connection = None
+    return db_manager.connect()
+
+
+async def run_daemon():
+    """
+    Tryb rezydentny: jeden proces z jedną pętlą zdarzeń, który co poll_interval
+    sekund (lub po komendzie poll) przetwarza nowe zamówienia wszystkich źródeł.
+    Połączenia z bazami, przeglądarka Chromium, menedżery drukarek, wykrywanie
+    drukarek i pula kodowania ZPL są tworzone raz na cały czas życia procesu;
+    przeglądarka, pula kodowania i metryki są wspólne dla źródeł. Zamówienia
+    z kolejki ponownych wydruków [RETRY] są wysyłane w tle, osobno dla każdej drukarki.
+    SIGTERM/SIGINT kończą pracę po bieżącym zamówieniu.
+
+    Zwraca:
+    - Kod wyjścia procesu
+    """
+    from html2pdf3 import ResidentBrowser
+    from lib.order_sources import fair_orders
+    from lib.resident_service import ResidentService
+
+    logger.info("Uruchamianie sql2html w trybie rezydentnym")
+    config = get_config()
+    start_config_watcher()
+    settings = config.get_daemon_settings()
+
+    start_metrics_service(config)
+    start_discovery_service(config)
+    sources = open_order_sources(config)
+    if not sources:
+        stop_discovery_service()
+        stop_metrics_service()
+        return 1
+
+    browser = ResidentBrowser(max_pages=settings['browser_max_pages'])
+    service = None
+    retry_scheduler = start_retry_scheduler(config)
+    if retry_scheduler is not None:
+        retry_scheduler.start()
+
+    async def cycle():
+        # Zapytania do bazy i generowanie HTML działają w wątku roboczym,
+        # więc gniazdo statusu odpowiada również w trakcie pobierania zamówień
+        ready = [source for source in sources
+                 if await run_in_thread(source.run, prepare_order_source, source)]
+        if not ready:
+            raise ConnectionError("Brak połączenia z bazą danych")
+        processed = 0
+        orders = fair_orders(ready, source_orders)
+        try:
+            while True:
+                item = await run_in_thread(next, orders, None)
+                if item is None:
+                    break
+                source, order_number, html_content = item
+                # Zadanie dziedziczy kontekst źródła (konfiguracja, katalogi, drukarka)
+                order_result = await source.run(asyncio.ensure_future, process_order(
+                    order_number, html_content, source.printer_manager, source.printer_name,
+                    browser=browser, leases=source.leases))
+                await run_in_thread(finish_order_lease, source.leases, order_number, order_result)
+                processed += 1
+                if service.draining:
+                    logger.info("Zatrzymywanie - pozostałe zamówienia zostaną przetworzone po restarcie")
+                    break
+        finally:
+            # Zamknięcie generatora zwalnia niewykorzystane dzierżawy (zapytanie do bazy)
+            try:
+                await run_in_thread(orders.close)
+            except ValueError:
+                # Cykl przerwany w trakcie pobierania zamówienia - generator zostanie
+                # zamknięty przy zwolnieniu, gdy wątek roboczy zakończy next()
+                pass
+        return processed
+
+    def interval():
+        return get_config().get_daemon_settings()['poll_interval'] or get_config().get_check_interval()
+
+    def status():
+        source_status = [source.status() for source in sources]
+        return {'browser': browser.stats(),
+                'database': all(entry['database'] for entry in source_status),
+                'sources': source_status,
+                'retry': retry_scheduler.queue.stats() if retry_scheduler is not None else None}
+
+    service = ResidentService(
+        cycle, interval=interval, host=settings['host'], port=settings['port'] or None,
+        drain_timeout=settings['drain_timeout'], status_callback=status)
+    try:
+        await service.run()
+    finally:
+        if retry_scheduler is not None:
+            retry_scheduler.stop()
+        await browser.close()
+        for source in sources:
+            source.close()
+        stop_discovery_service()
+        stop_metrics_service()
+    return 0
+
+
+def get_printer_id(config):
+    printer_name = config.get_thermal_printer_name()
+    printer_ip = config.get_thermal_printer_ip()
+    return printer_ip if printer_ip else normalize_filename(printer_name or '')
 
 
 def get_printer_folder(config):
     folder_prefix = config.get_printer_folder_prefix()
-    printer_name = config.get_thermal_printer_name()
-    printer_id = printer_ip if printer_ip else normalize_filename(printer_name)
-    zo_prt = f"{folder_prefix}{printer_id}"
+    zo_prt = f"{folder_prefix}{get_printer_id(config)}"
     # Utwórz folder dla wydrukowanych plików
     os.makedirs(zo_prt, exist_ok=True)
 
     return zo_prt
 
 
+def run_command(command):
+    """
+    Wysyła komendę (status, poll, drain) do działającego trybu rezydentnego
+    i wypisuje odpowiedź w JSON.
+
+    Zwraca:
+    - Kod wyjścia procesu
+    """
+    import json
+    from lib.resident_service import send_command
+
+    settings = get_config().get_daemon_settings()
+    try:
+        response = send_command(command, settings['host'], settings['port'])
+    except OSError as e:
+        print(f"Tryb rezydentny nie odpowiada na {settings['host']}:{settings['port']}: {e}",
+              file=sys.stderr)
+        return 1
+    print(json.dumps(response, indent=2, ensure_ascii=False))
+    return 0 if response.get('ok') else 1
+
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Generowanie i drukowanie dzisiejszych zamówień ZO')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--daemon', action='store_true',
+                      help='Tryb rezydentny: jeden proces z ciepłymi połączeniami (sekcja [DAEMON])')
+    mode.add_argument('--status', dest='command', action='store_const', const='status',
+                      help='Stan działającego trybu rezydentnego')
+    mode.add_argument('--poll', dest='command', action='store_const', const='poll',
+                      help='Natychmiastowe sprawdzenie zamówień w trybie rezydentnym')
+    mode.add_argument('--stop', dest='command', action='store_const', const='drain',
+                      help='Łagodne zatrzymanie trybu rezydentnego')
+    args = parser.parse_args()
+
+    if args.command:
+        sys.exit(run_command(args.command))
+    if args.daemon:
+        # SIGTERM/SIGINT obsługuje pętla trybu rezydentnego (łagodne zatrzymanie)
+        sys.exit(asyncio.run(run_daemon()))
+
+    # Rejestracja handlera dla SIGINT (Ctrl+C)
+    signal.signal(signal.SIGINT, signal_handler)
     try:
         main()
     except KeyboardInterrupt:
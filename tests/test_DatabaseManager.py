@@ -58,6 +58,21 @@ class TestDatabaseManager(unittest.TestCase):
             query = mock_cursor.execute.call_args[0][0]
             self.assertNotIn('AND op.KOD IN', query)
 
+    def test_get_new_documents_parameterises_users(self):
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = []
+        mock_conn = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+
+        with patch('pyodbc.connect', return_value=mock_conn):
+            self.db_manager.get_new_documents(['anna', 'jan', 'ola'])
+            query, params = mock_cursor.execute.call_args[0]
+
+        # Trzech użytkowników - lista IN dopełniona do czterech parametrów
+        self.assertIn('AND op.KOD IN (?, ?, ?, ?)', query)
+        self.assertNotIn("'anna'", query)
+        self.assertEqual(params, ('anna', 'jan', 'ola', 'ola'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+import multiprocessing
+from datetime import datetime
+from unittest.mock import patch
+
+from lib.artifact_archive import ArtifactArchive, PAST_DAYS_CACHED
+
+
+def write_artifacts(directory, writer, count):
+    """Zapis artefaktów w osobnym procesie (test współbieżnych zapisów)"""
+    archive = ArtifactArchive(directory, codec='gzip')
+    for number in range(count):
+        archive.put(f"ZO {writer}-{number}/25", 'zpl', f"^XA^FD{writer}-{number}^FS^XZ" * 50)
+        archive.put(f"ZO {writer}-{number}/25", 'json', '{"wspolny": true}')
+    archive.close()
+
+
+class TestArtifactArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, 'archive')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_random_access_and_zpl_dedup(self):
+        archive = ArtifactArchive(self.directory, codec='gzip')
+        archive.put('ZO 1/25', 'json', '{"order":{}}')
+        first = archive.put('ZO 1/25', 'zpl', b'^XA^FDtest^FS^XZ', tag='192.168.1.10')
+        second = archive.put('ZO 2/25', 'zpl', b'^XA^FDtest^FS^XZ', tag='192.168.1.11')
+        archive.put('ZO 2/25', 'html', '<html>Zażółć</html>')
+
+        self.assertEqual(first['offset'], second['offset'])
+        self.assertEqual(archive.stats()['deduplicated'], 1)
+        self.assertEqual(archive.get('ZO_2_25', 'zpl'), b'^XA^FDtest^FS^XZ')
+        self.assertEqual(archive.get_text('ZO 2/25', 'html'), '<html>Zażółć</html>')
+        self.assertIsNone(archive.get('ZO 3/25', 'zpl'))
+        self.assertEqual(archive.orders('html'), {'ZO_2_25'})
+        archive.close()
+
+    def test_reopen_and_export(self):
+        archive = ArtifactArchive(self.directory, codec='none')
+        archive.put('ZO 7/25', 'zpl', b'^XA^XZ')
+        archive.put('ZO 7/25', 'json', '{}')
+        archive.close()
+
+        # Niepełna linia indeksu po przerwanym zapisie jest pomijana
+        index = [name for name in os.listdir(self.directory) if name.endswith('.idx')][0]
+        with open(os.path.join(self.directory, index), 'a', encoding='utf-8') as f:
+            f.write('{"order": "ZO 8/25", "ki')
+
+        reopened = ArtifactArchive(self.directory)
+        output = os.path.join(self.tmp.name, 'export')
+        paths = reopened.export('ZO 7/25', output)
+        self.assertEqual(sorted(os.path.basename(p) for p in paths), ['ZO_7_25.json', 'ZO_7_25.zpl'])
+        with open(os.path.join(output, 'ZO_7_25.zpl'), 'rb') as f:
+            self.assertEqual(f.read(), b'^XA^XZ')
+        reopened.close()
+
+    def test_entries_of_other_writers_are_visible_and_deduplicated(self):
+        first = ArtifactArchive(self.directory, codec='none')
+        second = ArtifactArchive(self.directory, codec='none')
+        written = first.put('ZO 1/25', 'zpl', b'^XA^FDwspolny^FS^XZ')
+        # Drugi zapisujący (np. inny proces) widzi wpis i nie dopisuje tej samej ramki
+        reused = second.put('ZO 2/25', 'zpl', b'^XA^FDwspolny^FS^XZ')
+        self.assertEqual((reused['segment'], reused['offset']), (written['segment'], written['offset']))
+        self.assertEqual(second.stats()['deduplicated'], 1)
+        second.put('ZO 2/25', 'html', '<html/>')
+        self.assertEqual(first.orders('html'), {'ZO_2_25'})
+        self.assertEqual(first.get('ZO 2/25', 'zpl'), b'^XA^FDwspolny^FS^XZ')
+        first.close()
+        second.close()
+
+    def test_past_days_are_evicted_and_loaded_on_lookup(self):
+        with patch('lib.artifact_archive.datetime') as clock:
+            archive = ArtifactArchive(self.directory, codec='none')
+            for day in range(1, PAST_DAYS_CACHED + 3):
+                clock.now.return_value = datetime(2025, 1, day, 10)
+                archive.put(f'ZO {day}/25', 'zpl', f'^XA^FD{day}^FS^XZ')
+
+            # W pamięci jest tylko indeks bieżącego dnia
+            self.assertEqual(archive.orders(), {f'ZO_{PAST_DAYS_CACHED + 2}_25'})
+            self.assertEqual(archive.stats()['frames'], 1)
+
+            self.assertEqual(archive.get('ZO 1/25', 'zpl'), b'^XA^FD1^FS^XZ')
+            self.assertEqual(archive.orders('zpl', day='2025-01-02'), {'ZO_2_25'})
+            self.assertEqual(archive.kinds('ZO 2/25', day='2025-01-01'), [])
+            self.assertLessEqual(len(archive._past), PAST_DAYS_CACHED)
+            archive.close()
+
+    def test_concurrent_processes_do_not_interleave_frames(self):
+        processes = [multiprocessing.Process(target=write_artifacts, args=(self.directory, writer, 40))
+                     for writer in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+            self.assertEqual(process.exitcode, 0)
+
+        archive = ArtifactArchive(self.directory)
+        for writer in range(3):
+            for number in range(40):
+                order = f"ZO {writer}-{number}/25"
+                self.assertEqual(archive.get_text(order, 'zpl'), f"^XA^FD{writer}-{number}^FS^XZ" * 50)
+                self.assertEqual(archive.get_text(order, 'json'), '{"wspolny": true}')
+        self.assertEqual(archive.stats()['frames'], 3 * 40 + 1)
+        archive.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
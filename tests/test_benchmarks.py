@@ -0,0 +1,34 @@
+import tempfile
+import unittest
+
+from benchmarks.synthetic import make_order
+from benchmarks.stages import get_benchmarks
+from benchmarks.runner import compare, run_stages
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_synthetic_orders_are_deterministic(self):
+        order_data, items = make_order(100, 'long', seed=3)
+        self.assertEqual((order_data, items), make_order(100, 'long', seed=3))
+        self.assertEqual(len(items), 100)
+        self.assertLessEqual(len(items[0]['NAZWA_CALA']), 256)
+        self.assertNotEqual(make_order(10, 'short')[1], make_order(10, 'long')[1])
+
+    def test_run_stages_and_compare_with_baseline(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            cases, skipped = run_stages(get_benchmarks(['generate_order_html']), [1, 10],
+                                        ['short'], workdir, repeat=2)
+        self.assertEqual(skipped, {})
+        self.assertEqual(set(cases), {'generate_order_html[1/short]', 'generate_order_html[10/short]'})
+
+        current = {'benchmarks': {'a': {'median_ms': 30.0}, 'b': {'median_ms': 1.1},
+                                  'c': {'median_ms': 50.0, 'fixture': 'chromium'}}}
+        baseline = {'benchmarks': {'a': {'median_ms': 10.0}, 'b': {'median_ms': 0.5},
+                                   'c': {'median_ms': 5.0, 'fixture': 'reportlab'}}}
+        results = {c['key']: c['regression'] for c in compare(current, baseline, min_delta_ms=1.0)}
+        # 'b' mieści się w progu bezwzględnym, 'c' ma inne źródło danych
+        self.assertEqual(results, {'a': True, 'b': False})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import Mock
+
+from lib.column_projection import ColumnProjection
+
+
+class TestColumnProjection(unittest.TestCase):
+    def make_cursor(self, columns):
+        cursor = Mock()
+        cursor.description = [(name, None) for name in columns]
+        return cursor
+
+    def test_projects_declared_fields_in_table_order(self):
+        projection = ColumnProjection(
+            template_fields={'item': ('NAZWA', 'CENA_NETTO', 'BRAK_W_TABELI')},
+            processing_columns={'ARTYKUL': ('ID_ARTYKULU',)})
+        cursor = self.make_cursor(['ID_ARTYKULU', 'CENA_NETTO', 'OPIS', 'NAZWA', 'UWAGI'])
+
+        self.assertEqual(projection.select_list(cursor, 'ARTYKUL', 'A'),
+                         'A.ID_ARTYKULU, A.CENA_NETTO, A.NAZWA')
+        # Struktura tabeli odczytywana jest tylko raz
+        projection.select_list(cursor, 'ARTYKUL')
+        cursor.execute.assert_called_once_with("SELECT TOP 0 * FROM ARTYKUL")
+
+    def test_falls_back_to_star_when_schema_unavailable(self):
+        cursor = Mock()
+        cursor.execute.side_effect = Exception('brak uprawnień')
+        self.assertEqual(ColumnProjection().select_list(cursor, 'KONTRAHENT', 'K'), 'K.*')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import asyncio
+import tempfile
+import threading
+import unittest
+
+from lib import config_snapshot
+from lib.config_snapshot import (ConfigSnapshot, get_config, reload_config, add_reload_listener,
+                                 current_source, use_source, run_in_thread)
+
+CONFIG = """
+[DATABASE]
+server = localhost
+database = WAPRO
+username = sa
+password = secret
+
+[PRINTING]
+check_interval = 5
+render_mode = lean
+
+[THERMAL_PRINTER]
+ip_address = 192.168.1.50
+port = 9100
+dpi = 203
+
+[USERS]
+allowed_users = 1, 2
+"""
+
+
+class TestConfigSnapshot(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.config_file = os.path.join(tmp.name, 'config.ini')
+        self.write_config(CONFIG)
+        config_snapshot._current = None
+        self.addCleanup(setattr, config_snapshot, '_current', None)
+        self.addCleanup(config_snapshot._listeners.clear)
+
+    def write_config(self, content, mtime=None):
+        with open(self.config_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(self.config_file, (mtime, mtime))
+
+    def test_typed_values_and_delegated_getters(self):
+        snapshot = ConfigSnapshot.load(self.config_file)
+        self.assertEqual(snapshot.thermal_printer_port, 9100)
+        self.assertEqual(snapshot.get_allowed_users(), ['1', '2'])
+        self.assertEqual(snapshot.get_check_interval(), 5)
+        self.assertEqual(snapshot.get_files_dir('zo_pdf_dir', 'ZO_PDF'), 'ZO_PDF')
+        self.assertIn('PWD=secret', snapshot.get_connection_string())
+
+    def test_snapshot_is_immutable(self):
+        snapshot = ConfigSnapshot.load(self.config_file)
+        with self.assertRaises(AttributeError):
+            snapshot.check_interval = 10
+
+    def test_reload_swaps_snapshot_when_file_changes(self):
+        first = get_config(self.config_file)
+        self.assertIs(get_config(), first)
+        self.assertIs(reload_config(), first)
+
+        reloaded = []
+        add_reload_listener(reloaded.append)
+        self.write_config(CONFIG.replace('check_interval = 5', 'check_interval = 30'),
+                          mtime=first.mtime + 10)
+        second = reload_config()
+
+        self.assertIsNot(second, first)
+        self.assertIs(get_config(), second)
+        self.assertEqual(second.get_check_interval(), 30)
+        self.assertEqual(first.get_check_interval(), 5)
+        self.assertEqual(reloaded, [second])
+
+    def test_run_in_thread_keeps_source_context(self):
+        async def main():
+            with use_source('firma2'):
+                return await run_in_thread(lambda: (current_source(), threading.current_thread()))
+
+        source, thread = asyncio.run(main())
+        self.assertEqual(source, 'firma2')
+        self.assertIsNot(thread, threading.main_thread())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import sqlite3
+import unittest
+
+from lib.dimension_cache import DimensionCache
+
+
+class TestDimensionCache(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute("CREATE TABLE ARTYKUL (ID_ARTYKULU INT, NAZWA TEXT, VER INT)")
+        self.connection.executemany("INSERT INTO ARTYKUL VALUES (?, ?, 1)",
+                                    [(1, 'Śruba'), (2, 'Nakrętka'), (3, 'Podkładka')])
+        self.cursor = self.connection.cursor()
+        self.cache = DimensionCache('ARTYKUL', 'ID_ARTYKULU', version_column='VER',
+                                    max_entries=2, validate_interval=3600)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_hits_after_first_read(self):
+        rows = self.cache.get_many(self.cursor, [1, 2, 2, 99])
+        self.assertEqual(rows[1]['NAZWA'], 'Śruba')
+        self.assertNotIn(99, rows)
+        self.assertNotIn('DIM_CACHE_VERSION', rows[1])
+
+        self.assertEqual(self.cache.get(self.cursor, 2)['NAZWA'], 'Nakrętka')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+
+    def test_lru_bound(self):
+        self.cache.get_many(self.cursor, [1, 2])
+        self.cache.get(self.cursor, 1)
+        self.cache.get(self.cursor, 3)
+        stats = self.cache.stats()
+        self.assertEqual((stats['size'], stats['evictions']), (2, 1))
+        # Artykuł 2 był najdawniej używany
+        self.cache.get(self.cursor, 1)
+        self.assertEqual(self.cache.stats()['hits'], 2)
+
+    def test_validate_evicts_changed_rows(self):
+        self.cache.get_many(self.cursor, [1, 2])
+        self.connection.execute("UPDATE ARTYKUL SET NAZWA = 'Wkręt', VER = 2 WHERE ID_ARTYKULU = 1")
+
+        self.assertEqual(self.cache.validate(self.cursor), 1)
+        self.assertEqual(self.cache.get(self.cursor, 1)['NAZWA'], 'Wkręt')
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from html2pdfs.html_processor import inline_local_assets, build_font_face_css
+
+
+class TestInlineLocalAssets(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.assets_dir = tmp.name
+        with open(os.path.join(self.assets_dir, 'JsBarcode.all.min.js'), 'w', encoding='utf-8') as f:
+            f.write('var JsBarcode = function () {};')
+        with open(os.path.join(self.assets_dir, 'print.css'), 'w', encoding='utf-8') as f:
+            f.write('body { color: black; }')
+        with open(os.path.join(self.assets_dir, 'font.ttf'), 'wb') as f:
+            f.write(b'\x00\x01\x00\x00')
+
+    def test_inlines_local_script(self):
+        html = '<head><script src="JsBarcode.all.min.js"></script></head>'
+        result = inline_local_assets(html, self.assets_dir)
+        self.assertIn('<script>var JsBarcode = function () {};</script>', result)
+        self.assertNotIn('src=', result)
+
+    def test_inlines_local_stylesheet(self):
+        html = '<head><link rel="stylesheet" href="print.css"></head>'
+        result = inline_local_assets(html, self.assets_dir)
+        self.assertIn('<style>body { color: black; }</style>', result)
+
+    def test_keeps_remote_and_missing_assets(self):
+        html = ('<script src="https://cdn.example.com/a.js"></script>'
+                '<script src="missing.js"></script>')
+        self.assertEqual(inline_local_assets(html, self.assets_dir), html)
+
+    def test_font_face_is_data_uri(self):
+        css = build_font_face_css(
+            {'Label': os.path.join(self.assets_dir, 'font.ttf')})
+        self.assertIn("font-family: 'Label'", css)
+        self.assertIn('url(data:font/ttf;base64,AAEAAA==)', css)
+
+
+if __name__ == '__main__':
+    unittest.main()
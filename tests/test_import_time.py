@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budżet czasu importu sql2html (uruchamianego przez db_monitor w każdym cyklu);
+# pomiar lokalny to ok. 100-200 ms, wcześniej ok. 500 ms
+STARTUP_BUDGET_MS = 600
+
+# Biblioteki ładowane dopiero przy renderowaniu/konwersji
+HEAVY_MODULES = ('pikepdf', 'zebrafy', 'playwright', 'PyPDF2', 'reportlab', 'bs4',
+                 'html2text', 'tabulate', 'multiprocessing.shared_memory')
+
+
+def import_times(code, cwd=ROOT):
+    """Uruchamia kod w nowym interpreterze z -X importtime i zwraca {moduł: µs łącznie}"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=cwd, env=env, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise AssertionError(result.stderr[-2000:])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times, result.stdout
+
+
+class TestImportTime(unittest.TestCase):
+    def test_sql2html_defers_heavy_modules_and_fits_budget(self):
+        times, _ = import_times('import sql2html')
+        self.assertIn('sql2html', times)
+        self.assertEqual([m for m in HEAVY_MODULES if m in times], [])
+        # Najlepszy z kilku pomiarów, aby ograniczyć wpływ obciążenia maszyny
+        best = min([times['sql2html']] + [import_times('import sql2html')[0]['sql2html']
+                                           for _ in range(2)])
+        self.assertLess(best / 1000, STARTUP_BUDGET_MS)
+
+    def test_import_does_not_read_config_or_configure_logging_files(self):
+        app_log = os.path.join(ROOT, 'app.log')
+        before = os.stat(app_log).st_size if os.path.exists(app_log) else None
+        with tempfile.TemporaryDirectory() as cwd:
+            _, output = import_times(
+                'import threading\n'
+                'import sql2html, html2pdf3, zpl.html2zpl, zpl.network_printer\n'
+                'import lib.config_snapshot as snapshot\n'
+                'print(snapshot._current is None, threading.active_count())', cwd=cwd)
+            # Bez logów na konsoli, bez wątku zapisu logów i bez plików
+            self.assertEqual(output, 'True 1\n')
+            self.assertEqual(os.listdir(cwd), [])
+        after = os.stat(app_log).st_size if os.path.exists(app_log) else None
+        self.assertEqual(after, before)
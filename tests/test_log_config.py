@@ -0,0 +1,45 @@
+import logging
+import queue
+import unittest
+
+from lib.log_config import NonBlockingQueueHandler, _Sampler, format_event, log_sampled
+
+
+class TestLogConfig(unittest.TestCase):
+    def test_format_event_quotes_values(self):
+        self.assertEqual(format_event('order.items', order='ZO 1/25', items=3),
+                         'order.items order="ZO 1/25" items=3')
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        record = logging.LogRecord('test', logging.INFO, __file__, 1, 'x', None, None)
+        handler.emit(record)
+        handler.emit(record)
+        self.assertEqual(handler.dropped, 1)
+
+    def test_log_sampled_reports_suppressed_count(self):
+        log = logging.getLogger('tests.log_sampled')
+        with self.assertLogs(log, level='INFO') as captured:
+            for _ in range(3):
+                log_sampled(log, 'test-key', 'pozycja', interval=3600)
+            log_sampled(log, 'test-key', 'pozycja', interval=0)
+        self.assertEqual(captured.output, [
+            'INFO:tests.log_sampled:pozycja',
+            'INFO:tests.log_sampled:pozycja (pominięto 2 podobnych komunikatów)'])
+
+    def test_sampler_keeps_at_most_max_keys(self):
+        sampler = _Sampler(3600, max_keys=2)
+        for key in ('a', 'b', 'a', 'c'):
+            sampler.allow(key, interval=0)
+        sampler.allow('a')
+        self.assertEqual(list(sampler._last), ['a', 'c'])
+        self.assertEqual(sampler._suppressed, {'a': 1})
+
+        sampler.allow('d', interval=0)
+        sampler.allow('e', interval=0)
+        self.assertEqual(list(sampler._last), ['d', 'e'])
+        self.assertEqual(sampler._suppressed, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
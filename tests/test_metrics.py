@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+
+from lib.metrics import MetricsRegistry, MetricsService
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.stages = self.registry.histogram(
+            'stage_seconds', 'Czas etapu', labels=('stage', 'printer'), buckets=(0.1, 1.0, 10.0))
+
+    def test_histogram_exposition_and_quantiles(self):
+        for value in (0.05, 0.5, 0.5, 5.0):
+            self.stages.observe(value, stage='send', printer='10.0.0.5')
+
+        text = self.registry.render_prometheus()
+        self.assertIn('# TYPE stage_seconds histogram', text)
+        self.assertIn('stage_seconds_bucket{stage="send",printer="10.0.0.5",le="1"} 3', text)
+        self.assertIn('stage_seconds_bucket{stage="send",printer="10.0.0.5",le="+Inf"} 4', text)
+        self.assertIn('stage_seconds_count{stage="send",printer="10.0.0.5"} 4', text)
+
+        series = self.registry.snapshot()['metrics']['stage_seconds']['series'][0]
+        self.assertAlmostEqual(series['p50'], 0.55)
+        self.assertAlmostEqual(series['p99'], 9.64)
+
+    def test_service_serves_metrics_and_writes_snapshot(self):
+        self.registry.counter('orders_total', 'Zamówienia', labels=('result',)).inc(result='printed')
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot_file = os.path.join(tmp, 'metrics.json')
+            service = MetricsService(self.registry, port=0, snapshot_file=snapshot_file,
+                                     snapshot_interval=3600).start()
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{service.port}/metrics') as response:
+                    body = response.read().decode('utf-8')
+                self.assertIn('orders_total{result="printed"} 1', body)
+            finally:
+                service.stop()
+            with open(snapshot_file, encoding='utf-8') as f:
+                self.assertIn('orders_total', json.load(f)['metrics'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from lib.wapro_emulator import connect
+from lib.order_leases import OrderLeases, ensure_lease_schema, LEASE_TABLE
+from lib.order_processor2 import claimed_orders, process_todays_orders
+
+
+class TestOrderLeases(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dsn = 'sqlite:///' + os.path.join(self.tmp.name, 'wapro.db')
+        self.connections = []
+        ensure_lease_schema(self.connect().cursor())
+
+    def tearDown(self):
+        for connection in self.connections:
+            connection.close()
+        self.tmp.cleanup()
+
+    def connect(self):
+        connection = connect(self.dsn)
+        self.connections.append(connection)
+        return connection
+
+    def node(self, owner, **kwargs):
+        return OrderLeases(self.connect(), owner=owner, dialect='sqlite', **kwargs)
+
+    def expire(self, order_key):
+        connection = self.connect()
+        connection.execute(f"UPDATE {LEASE_TABLE} SET LEASE_UNTIL = DATEADD(second, -5, GETDATE()) "
+                           f"WHERE ORDER_KEY = ?", order_key)
+        connection.commit()
+
+    def test_concurrent_nodes_claim_each_order_once(self):
+        orders = [f"ZO {number}/26" for number in range(200)]
+        nodes = [self.node(f"node-{index}") for index in range(4)]
+        nodes[0].register(orders)
+        nodes[1].register(orders[:50])
+        claimed = {node.owner: [] for node in nodes}
+
+        def work(node):
+            while True:
+                keys = node.claim(3)
+                if not keys:
+                    return
+                for key in keys:
+                    self.assertTrue(node.renew(key))
+                    self.assertTrue(node.complete(key))
+                    claimed[node.owner].append(key)
+
+        threads = [threading.Thread(target=work, args=(node,)) for node in nodes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+
+        all_claimed = [key for keys in claimed.values() for key in keys]
+        self.assertEqual(sorted(all_claimed), sorted(orders))
+        # Ponowna rejestracja nie przywraca wydrukowanych zamówień
+        nodes[2].register(orders)
+        self.assertEqual(nodes[3].claim(10), [])
+
+    def test_claim_follows_priority_key_across_batches(self):
+        registrar, worker = self.node('registrar'), self.node('worker')
+        registrar.register(['ZO 1/26', 'ZO 2/26', 'ZO 3/26'],
+                           {'ZO 1/26': 300.0, 'ZO 2/26': 200.0, 'ZO 3/26': 100.0})
+        # Zamówienie bez klucza dostaje czas rejestracji - trafia za zaległe
+        registrar.register(['ZO 4/26'])
+
+        self.assertEqual(worker.claim(1), ['ZO 3/26'])
+        self.assertEqual(worker.claim(1), ['ZO 2/26'])
+        self.assertEqual(sorted(worker.claim(2)), ['ZO 1/26', 'ZO 4/26'])
+
+    def test_expired_lease_is_taken_over_and_old_owner_is_fenced(self):
+        dead, alive = self.node('dead', max_attempts=2), self.node('alive', max_attempts=2)
+        dead.register(['ZO 1/26', 'ZO 2/26'])
+        self.assertEqual(dead.claim(2), ['ZO 1/26', 'ZO 2/26'])
+        self.assertEqual(alive.claim(2), [])
+        self.assertEqual(dead.renew_all(), 2)
+
+        # Heartbeat węzła ustał - dzierżawa ZO 1 wygasa i przejmuje ją inny węzeł
+        self.expire('ZO 1/26')
+        self.assertEqual(alive.claim(2), ['ZO 1/26'])
+        self.assertFalse(dead.renew('ZO 1/26'))
+        self.assertFalse(dead.complete('ZO 1/26'))
+        self.assertEqual(dead.stats()['held'], ['ZO 2/26'])
+
+        # Drugie porzucenie (max_attempts=2) - zamówienie trafia do FAILED
+        self.expire('ZO 1/26')
+        self.assertEqual(dead.claim(2), [])
+        status, = self.connect().execute(
+            f"SELECT STATUS FROM {LEASE_TABLE} WHERE ORDER_KEY = 'ZO 1/26'").fetchone()
+        self.assertEqual(status, 'FAILED')
+
+        # Zwolnienie po nieudanym wydruku nie liczy się jako porzucenie
+        self.assertTrue(dead.release('ZO 2/26', retry_delay=0))
+        self.assertEqual(alive.claim(2), ['ZO 2/26'])
+
+    def test_claimed_orders_stops_on_retry_and_releases_unconsumed(self):
+        leases = self.node('worker', retry_delay=1)
+        leases.register([f"ZO {number}/26" for number in range(5)])
+
+        queue = claimed_orders(leases, batch_size=3)
+        self.assertEqual(next(queue), 'ZO 0/26')
+        leases.complete('ZO 0/26')
+        queue.close()
+        # Przerwanie pętli zwalnia pozostałe zamówienia z partii bez opóźnienia
+        self.assertEqual(leases.stats()['held'], [])
+
+        # Zamówienie zwolnione bez opóźnienia wraca w kolejnej partii - koniec cyklu
+        handled = []
+        for order_key in claimed_orders(leases, batch_size=3):
+            handled.append(order_key)
+            leases.release(order_key, retry_delay=0 if order_key == 'ZO 1/26' else None)
+        self.assertEqual(handled, ['ZO 1/26', 'ZO 2/26', 'ZO 3/26', 'ZO 4/26'])
+        self.assertEqual(leases.stats()['held'], [])
+
+    def test_released_order_is_reclaimed_and_printed_on_same_node(self):
+        leases = self.node('worker')
+        rows = [{'numer': 'ZO 1/26', 'data_utworzenia': None, 'fields': {}}]
+        db_manager = Mock(connection=self.connect())
+
+        def cycle(printed_orders):
+            return list(process_todays_orders(db_manager, printed_orders, allowed_users=[],
+                                              leases=leases))
+
+        with patch('lib.order_processor2.get_config'), \
+                patch('lib.order_processor2.get_priority_scheduler', return_value=None), \
+                patch('lib.order_processor2.get_todays_order_rows', return_value=rows), \
+                patch('lib.order_processor2.get_order_by_number', return_value={'numer': 'ZO 1/26'}), \
+                patch('lib.order_processor2.save_order_to_json', return_value='zo.json'), \
+                patch('lib.order_processor2.generate_html_for_order', return_value='<html/>'):
+            self.assertEqual(cycle(set()), [('ZO 1/26', '<html/>')])
+            # Wydruk się nie udał po zapisaniu HTML - zamówienie wraca do kolejki
+            self.assertTrue(leases.release('ZO 1/26', retry_delay=0))
+
+            # Lokalny HTML nie oznacza wydruku: ten sam węzeł przejmuje zamówienie ponownie
+            self.assertEqual(cycle({'ZO_1_26'}), [('ZO 1/26', '<html/>')])
+            status, = self.connect().execute(
+                f"SELECT STATUS FROM {LEASE_TABLE} WHERE ORDER_KEY = 'ZO 1/26'").fetchone()
+            self.assertEqual(status, 'PENDING')
+            self.assertTrue(leases.complete('ZO 1/26'))
+            self.assertEqual(cycle({'ZO_1_26'}), [])
@@ -0,0 +1,47 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import Mock
+
+from lib.order_model import Record, Article, OrderLine, RecordLayout
+from lib.order_processor2 import convert_decimal_to_str
+
+
+class TestOrderModel(unittest.TestCase):
+    def make_cursor(self, columns):
+        cursor = Mock()
+        cursor.description = [(name, None) for name in columns]
+        return cursor
+
+    def test_record_reads_row_and_keeps_overrides(self):
+        cursor = self.make_cursor(['ID', 'NUMER', 'UWAGI'])
+        first, second = Record.from_rows(cursor, [(1, 'ZO 1/25', None), (2, 'ZO 2/25', 'pilne')])
+
+        self.assertIs(first._layout, second._layout)
+        self.assertEqual(first['NUMER'], 'ZO 1/25')
+        self.assertEqual(second.get('BRAK', 'x'), 'x')
+
+        first['kontrahent'] = {'NIP': '123'}
+        self.assertEqual(list(first), ['ID', 'NUMER', 'UWAGI', 'kontrahent'])
+        self.assertNotIn('kontrahent', second)
+        self.assertEqual(first.copy()['kontrahent'], {'NIP': '123'})
+
+    def test_order_line_prefers_position_values(self):
+        article = Article(RecordLayout.for_columns(['ID_ARTYKULU', 'NAZWA', 'ZAMOWIONO']),
+                          (7, 'Śruba', Decimal('0')))
+        position = Record(RecordLayout.for_columns(['ID_ARTYKULU', 'ZAMOWIONO']),
+                          (7, Decimal('3.0000')))
+        line = OrderLine(position, article)
+
+        merged = dict(article)
+        merged.update(position)
+        self.assertEqual(dict(line), merged)
+        self.assertEqual(line['ZAMOWIONO'], Decimal('3.0000'))
+
+    def test_convert_decimal_to_str_accepts_records(self):
+        record = Record(RecordLayout.for_columns(['CENA']), (Decimal('10.50'),))
+        self.assertEqual(convert_decimal_to_str({'items': [OrderLine(record)]}),
+                         {'items': [{'CENA': '10.50'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
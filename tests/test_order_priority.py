@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from lib.wapro_emulator import connect, populate
+from lib.order_priority import PriorityScheduler, OrderQueue
+from lib.order_processor2 import get_todays_order_rows
+
+CLASSES = {'express': (0, 900), 'vip': (1, 3600), 'normal': (5, 0)}
+RULES = [('normal', 'UWAGI ~ zwykłe'), ('vip', 'ID_KONTRAHENTA = 17, 42'),
+         ('express', 'UWAGI ~ kurier, EXPRESS'), ('vip', 'BRAK_POLA = 1'), ('unknown', 'UWAGI = x')]
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestOrderPriority(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = PriorityScheduler(CLASSES, RULES, aging_seconds=600)
+        self.start = datetime(2026, 1, 5, 8, 0)
+        self.clock = FakeClock(self.start.timestamp())
+
+    def test_rules_pick_most_urgent_matching_class(self):
+        self.assertEqual(len(self.scheduler.rules), 4)
+        classify = self.scheduler.classify
+        self.assertEqual(classify({'UWAGI': 'Kurier DPD', 'ID_KONTRAHENTA': 42}), 'express')
+        self.assertEqual(classify({'UWAGI': 'zwykłe', 'ID_KONTRAHENTA': 42}), 'vip')
+        self.assertEqual(classify({'UWAGI': None, 'ID_KONTRAHENTA': 7}), 'normal')
+        self.assertEqual(classify({}), 'normal')
+
+    def test_queue_orders_by_priority_with_aging_and_deadline(self):
+        queue = OrderQueue(self.scheduler, clock=self.clock)
+        at = lambda minutes: self.start + timedelta(minutes=minutes)
+        # Zwykłe zamówienie sprzed godziny wyprzedza świeże (poziom 5 * 10 min = 50 min)
+        queue.push('ZO 1/26', at(-60), {'ID_KONTRAHENTA': 7})
+        queue.push('ZO 2/26', at(-5), {'UWAGI': 'kurier'})
+        queue.push('ZO 3/26', at(-30), {'ID_KONTRAHENTA': 7})
+        queue.push('ZO 4/26', at(0), {'ID_KONTRAHENTA': 17})
+        self.assertFalse(queue.push('ZO 2/26', at(0), {}))
+
+        self.assertEqual(list(queue.drain()), ['ZO 1/26', 'ZO 2/26', 'ZO 4/26', 'ZO 3/26'])
+        entry = queue.entry('ZO 4/26')
+        self.assertEqual((entry['priority'], entry['deadline'] - entry['created']), ('vip', 3600))
+
+        # Zamówienie dodane podczas opróżniania kolejki (odświeżenie) wyprzedza zaległe
+        queue.push('ZO 5/26', at(-40), {})
+        queue.push('ZO 6/26', at(-30), {})
+        drained = []
+        for order_number in queue.drain(lambda: queue.push('ZO 7/26', at(0), {'UWAGI': 'express'}),
+                                        refresh_seconds=1e-9):
+            drained.append(order_number)
+        self.assertEqual(drained, ['ZO 5/26', 'ZO 7/26', 'ZO 6/26'])
+
+        # Partia dzierżaw: zamówienia nieznane kolejce trafiają na koniec
+        queue.push('ZO 8/26', at(-5), {})
+        self.assertEqual(queue.order_batch(['ZO 9/26', 'ZO 8/26', 'ZO 2/26']),
+                         ['ZO 2/26', 'ZO 8/26', 'ZO 9/26'])
+
+    def test_rule_fields_are_read_from_database(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        connection = connect('sqlite:///' + os.path.join(tmp.name, 'wapro.db'))
+        self.addCleanup(connection.close)
+        populate(connection, orders=40, today_fraction=0.5, seed=3)
+
+        # Reguła na nieistniejącej kolumnie jest wyłączana
+        fields = self.scheduler.available_fields(connection.cursor())
+        self.assertEqual(fields, ['ID_KONTRAHENTA', 'UWAGI'])
+        self.assertEqual(len(self.scheduler.rules), 3)
+
+        rows = get_todays_order_rows(connection, fields=fields)
+        self.assertTrue(rows)
+        cursor = connection.cursor()
+        for row in rows[:5]:
+            cursor.execute("SELECT ID_KONTRAHENTA, UWAGI FROM ZAMOWIENIE WHERE NUMER = ?", row['numer'])
+            self.assertEqual(row['fields'], dict(zip(fields, cursor.fetchone())))
+            self.assertIsInstance(row['data_utworzenia'], datetime)
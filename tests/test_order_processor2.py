@@ -1,7 +1,7 @@
 import unittest
 from unittest.mock import Mock, patch
 from datetime import datetime
-from lib.order_processor2 import process_todays_orders, DatabaseManager, ConfigManager
+from lib.order_processor2 import process_todays_orders, get_todays_orders, DatabaseManager, ConfigManager
 from lib.file_utils import get_printed_orders
 
 
@@ -83,5 +83,31 @@ class TestOrderProcessor2(unittest.TestCase):
             mock_file.write.assert_called_once_with('<html>Test</html>')
 
 
+class TestGetTodaysOrders(unittest.TestCase):
+    def test_filters_unauthorized_users_in_query(self):
+        connection = Mock()
+        cursor = connection.cursor.return_value
+        # Zamówienia nieuprawnionych użytkowników odfiltrowuje już złączenie w SQL
+        cursor.fetchall.return_value = [('ZO 1/24', 1, datetime(2024, 1, 1, 8), 5)]
+
+        orders = get_todays_orders(connection, ['5', ' 6 ', 'abc'])
+
+        self.assertEqual(orders, ['ZO 1/24'])
+        cursor.executemany.assert_called_once_with(
+            "INSERT INTO #WP_ALLOWED_USERS (ID_UZYTKOWNIKA) VALUES (?)", [(5,), (6,)])
+        self.assertIn('ID_UZYTKOWNIKA INT PRIMARY KEY', cursor.execute.call_args_list[0][0][0])
+        query = cursor.execute.call_args_list[-1][0][0]
+        self.assertIn('INNER JOIN #WP_ALLOWED_USERS', query)
+        self.assertNotIn('CAST(Z.ID_UZYTKOWNIKA', query)
+
+    def test_no_filter_without_allowed_users(self):
+        connection = Mock()
+        cursor = connection.cursor.return_value
+        cursor.fetchall.return_value = [('ZO 3/24', 3, datetime(2024, 1, 1, 10), 9)]
+
+        self.assertEqual(get_todays_orders(connection), ['ZO 3/24'])
+        cursor.executemany.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from lib import config_snapshot
+from lib.config_snapshot import get_config, use_source, current_source
+from lib.order_sources import OrderSource, fair_orders
+
+CONFIG = """
+[DATABASE]
+server = localhost
+database = WAPRO
+username = sa
+password = secret
+
+[PRINTING]
+check_interval = 5
+
+[THERMAL_PRINTER]
+ip_address = 192.168.1.50
+
+[USERS]
+allowed_users = 1, 2
+
+[FILES]
+zo_html_dir = /data/ZO_HTML
+
+[SOURCE:firma2]
+weight = 3
+database.database = FIRMA2
+users.allowed_users = 7
+thermal_printer.ip_address = 10.0.0.5
+files.zo_pdf_dir = /data/pdf2
+
+[SOURCE:magazyn 3]
+enabled = false
+"""
+
+
+class TestOrderSources(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        config_file = os.path.join(self.tmp.name, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(CONFIG)
+        config_snapshot._current = None
+        self.addCleanup(setattr, config_snapshot, '_current', None)
+        self.root = get_config(config_file)
+
+    def test_source_overrides_sections_and_separates_directories(self):
+        self.assertEqual(self.root.get_source_names(), ['firma2'])
+        self.assertEqual(self.root.get_source_settings('firma2'), {'enabled': True, 'weight': 3})
+
+        with use_source('firma2'):
+            source = get_config()
+            self.assertEqual(current_source(), 'firma2')
+        self.assertIs(source, self.root.for_source('firma2'))
+        self.assertIs(get_config(), self.root)
+
+        self.assertIn('DATABASE=FIRMA2', source.get_connection_string())
+        self.assertEqual(source.get_allowed_users(), ['7'])
+        self.assertEqual(source.get_thermal_printer_ip(), '10.0.0.5')
+        self.assertEqual(source.get_check_interval(), 5)
+        self.assertEqual(source.get_files_dir('zo_html_dir', 'ZO_HTML'),
+                         os.path.join('/data/ZO_HTML', 'firma2'))
+        self.assertEqual(source.get_files_dir('zo_pdf_dir', 'ZO_PDF'), '/data/pdf2')
+        self.assertEqual(source.get_archive_settings()['directory'], os.path.join('ZO_ARCHIVE', 'firma2'))
+        # Konfiguracja główna pozostaje bez zmian
+        self.assertEqual(self.root.get_allowed_users(), ['1', '2'])
+        self.assertEqual(self.root.get_files_dir('zo_html_dir', 'ZO_HTML'), '/data/ZO_HTML')
+
+    def test_fair_orders_interleaves_by_weight_in_source_context(self):
+        sources = [OrderSource(), OrderSource('firma2', weight=2)]
+
+        def make_orders(source):
+            def orders():
+                for number in range(3 if source.name else 2):
+                    # Generator działa w kontekście swojego źródła
+                    yield f"{get_config().get_allowed_users()[0]}/{number}", ''
+            return orders()
+
+        result = [(source.label, order) for source, order, _ in fair_orders(sources, make_orders)]
+        self.assertEqual(result, [('default', '1/0'), ('firma2', '7/0'), ('firma2', '7/1'),
+                                  ('default', '1/1'), ('firma2', '7/2')])
+        self.assertEqual([source.orders for source in sources], [2, 3])
+        self.assertIsNone(current_source())
+
+    def test_stopping_early_closes_every_source_stream(self):
+        closed = []
+
+        def make_orders(source):
+            try:
+                for number in range(5):
+                    yield number, ''
+            finally:
+                closed.append(current_source())
+
+        stream = fair_orders([OrderSource(), OrderSource('firma2')], make_orders)
+        self.assertEqual([next(stream)[1] for _ in range(3)], [0, 0, 1])
+        stream.close()
+        self.assertEqual(sorted(closed, key=str), [None, 'firma2'])
@@ -0,0 +1,44 @@
+import sqlite3
+import unittest
+from unittest.mock import MagicMock
+
+from lib.print_history import archive_old_history, benchmark, not_printed_condition
+
+
+class TestPrintHistory(unittest.TestCase):
+    def test_not_exists_matches_not_in(self):
+        connection = sqlite3.connect(':memory:')
+        cursor = connection.cursor()
+        cursor.execute("CREATE TABLE WaproPrintHistory (DOK_ID INT NOT NULL)")
+        cursor.execute("CREATE TABLE docs (ID INT)")
+        cursor.executemany("INSERT INTO WaproPrintHistory VALUES (?)", [(1,), (3,)])
+        cursor.executemany("INSERT INTO docs VALUES (?)", [(1,), (2,), (3,), (4,)])
+
+        cursor.execute(
+            f"SELECT ID FROM docs d WHERE {not_printed_condition('d.ID')} ORDER BY ID")
+        self.assertEqual(cursor.fetchall(), [(2,), (4,)])
+        connection.close()
+
+    def test_benchmark_sqlite(self):
+        connection = sqlite3.connect(':memory:')
+        results = benchmark(connection, rows=2000, documents=100, repeat=1, dialect='sqlite')
+        connection.close()
+        self.assertEqual(results['rows'], 2000)
+        self.assertIn('not_in_without_index_ms', results)
+        self.assertIn('not_exists_with_index_ms', results)
+
+    def test_archive_runs_batches_until_partial(self):
+        connection = MagicMock()
+        cursor = connection.cursor.return_value
+        cursor.fetchone.side_effect = [(10,), (10,), (4,)]
+
+        total = archive_old_history(connection, retention_days=0, batch_size=10)
+
+        self.assertEqual(total, 24)
+        self.assertEqual(connection.commit.call_count, 3)
+        # Retencja nigdy nie jest krótsza niż jeden dzień
+        self.assertEqual(cursor.execute.call_args[0][1], (10, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from lib import wapro_emulator
+from lib.print_history_writer import PrintHistoryWriter, to_sql_datetime
+
+
+class TestPrintHistoryWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.temp_dir, 'history.db')
+        self.journal = os.path.join(self.temp_dir, 'history.journal')
+        connection = self.connect()
+        connection.execute("CREATE TABLE WaproPrintHistory (DOK_ID INT, PRINT_DATE DATETIME, "
+                           "OPERATOR_ID VARCHAR(50), PRINT_STATUS VARCHAR(20))")
+        connection.commit()
+        connection.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def connect(self):
+        return wapro_emulator.connect(self.db_file)
+
+    def count_rows(self):
+        connection = self.connect()
+        count = connection.execute("SELECT COUNT(*) FROM WaproPrintHistory").fetchone()[0]
+        connection.close()
+        return count
+
+    def test_close_flushes_batch(self):
+        writer = PrintHistoryWriter(self.connect, batch_size=50, flush_interval_ms=10000,
+                                    journal_file=self.journal)
+        writer.start()
+        for document_id in range(3):
+            writer.record(document_id)
+        self.assertEqual(self.count_rows(), 0)
+
+        writer.close()
+        self.assertEqual(self.count_rows(), 3)
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_journal_replay_after_crash_is_idempotent(self):
+        crashed = PrintHistoryWriter(self.connect, journal_file=self.journal)
+        crashed.record(1)
+        crashed.record(2)
+        # Kopia dziennika symuluje awarię po zapisie do bazy, a przed jego wyczyszczeniem
+        shutil.copy(self.journal, self.journal + '.copy')
+        self.assertEqual(crashed.flush(), 2)
+
+        shutil.move(self.journal + '.copy', self.journal)
+        recovered = PrintHistoryWriter(self.connect, journal_file=self.journal)
+        self.assertEqual(recovered.pending_count(), 2)
+        recovered.close()
+        self.assertEqual(self.count_rows(), 2)
+
+    def test_replay_of_microsecond_entry_matches_rounded_datetime(self):
+        # Wiersz zapisany przed awarią: SQL Server zaokrąglił .123456 do .123 (DATETIME)
+        connection = self.connect()
+        connection.execute("INSERT INTO WaproPrintHistory "
+                           "VALUES (7, CAST(? AS DATETIME), 'SYSTEM', 'PRINTED')",
+                           datetime(2024, 1, 1, 10, 0, 0, 123000))
+        connection.commit()
+        connection.close()
+        with open(self.journal, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'dok_id': 7, 'print_date': '2024-01-01T10:00:00.123456',
+                                'operator_id': 'SYSTEM', 'status': 'PRINTED'}) + '\n')
+
+        recovered = PrintHistoryWriter(self.connect, journal_file=self.journal)
+        self.assertEqual(recovered.flush(), 1)
+        recovered.close()
+        self.assertEqual(self.count_rows(), 1)
+
+    def test_replaying_entry_twice_against_datetime_column(self):
+        entry = {'dok_id': 8, 'print_date': '2024-01-01T10:00:00.125100',
+                 'operator_id': 'SYSTEM', 'status': 'PRINTED'}
+        for _ in range(2):
+            with open(self.journal, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+            recovered = PrintHistoryWriter(self.connect, journal_file=self.journal)
+            self.assertEqual(recovered.flush(), 1)
+            recovered.close()
+
+        connection = self.connect()
+        rows = connection.execute("SELECT PRINT_DATE FROM WaproPrintHistory").fetchall()
+        connection.close()
+        self.assertEqual([row[0] for row in rows], [datetime(2024, 1, 1, 10, 0, 0, 127000)])
+
+    def test_to_sql_datetime_rounds_to_three_hundredths(self):
+        base = datetime(2024, 1, 1, 10, 0, 0)
+        for microsecond, expected in [(123456, 123000), (125100, 127000), (1700, 3000),
+                                      (0, 0), (996000, 997000)]:
+            self.assertEqual(to_sql_datetime(base.replace(microsecond=microsecond)),
+                             base.replace(microsecond=expected))
+        self.assertEqual(to_sql_datetime(base.replace(microsecond=999900)),
+                         datetime(2024, 1, 1, 10, 0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from zpl.printer_discovery import (
+    PrinterDiscoveryService, get_discovery_service, parse_probe_response, probe_host,
+    save_printer_configuration, start_discovery_service, stop_discovery_service,
+    update_inventory
+)
+
+HI_RESPONSE = '\x02ZD421-203dpi,V84.20.18Z,8,8176KB\x03\r\n'
+HS_RESPONSE = ('\x02030,0,0,1245,000,0,0,0,000,0,0,0\x03\r\n'
+               '\x02000,0,1,0,0,2,4,0,00000000,1,000\x03\r\n'
+               '\x021234,0\x03\r\n')
+
+
+class TestParseProbeResponse(unittest.TestCase):
+    def test_parses_identification_and_status(self):
+        printer = parse_probe_response(HI_RESPONSE + HS_RESPONSE)
+        self.assertEqual(printer['model'], 'ZD421-203dpi')
+        self.assertEqual(printer['firmware'], 'V84.20.18Z')
+        self.assertEqual(printer['dpi'], 203)
+        self.assertTrue(printer['status']['head_open'])
+        self.assertFalse(printer['status']['ready'])
+
+    def test_rejects_non_zpl_response(self):
+        self.assertIsNone(parse_probe_response('HTTP/1.1 400 Bad Request\r\n'))
+
+
+class TestProbeHost(unittest.TestCase):
+    def test_probe_local_printer(self):
+        async def scenario():
+            async def handle(reader, writer):
+                await reader.readuntil(b'~HS\r\n')
+                writer.write((HI_RESPONSE.replace(',8,', ',12,') + HS_RESPONSE).encode('latin-1'))
+                await writer.drain()
+                writer.close()
+
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await probe_host('127.0.0.1', port, timeout=2)
+
+        printer = asyncio.run(scenario())
+        self.assertEqual(printer['dpi'], 300)
+        self.assertEqual(printer['ip'], '127.0.0.1')
+
+
+class TestUpdateInventory(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.inventory_file = os.path.join(tmp.name, 'thermal_printers.json')
+
+    def test_merges_network_printers(self):
+        inventory_file = self.inventory_file
+        with open(inventory_file, 'w', encoding='utf-8') as f:
+            json.dump({'ZDesigner ZD421': {'default': True},
+                       '10.0.0.9:9100': {'connection': 'network', 'port': 9100, 'online': True}}, f)
+
+        found = {'10.0.0.5:9100': dict(parse_probe_response(HI_RESPONSE),
+                                        ip='10.0.0.5', port=9100)}
+        inventory = update_inventory(found, inventory_file, scanned_port=9100)
+
+        self.assertTrue(inventory['ZDesigner ZD421']['default'])
+        self.assertEqual(inventory['10.0.0.5:9100']['specs']['dpi'], 203)
+        self.assertFalse(inventory['10.0.0.9:9100']['online'])
+        with open(inventory_file, encoding='utf-8') as f:
+            self.assertIn('10.0.0.5:9100', json.load(f))
+
+    def test_fresh_inventory_skips_scan_in_new_process(self):
+        service = PrinterDiscoveryService('10.0.0.0/30', ttl=3600,
+                                          inventory_file=self.inventory_file)
+        self.assertTrue(service.is_stale())
+
+        update_inventory({}, self.inventory_file)
+        service = PrinterDiscoveryService('10.0.0.0/30', ttl=3600,
+                                          inventory_file=self.inventory_file)
+        self.assertFalse(service.is_stale())
+
+    def test_save_configuration_keeps_discovered_printers(self):
+        stale_config = {'ZDesigner ZD421': {'default': True}}
+        found = {'10.0.0.5:9100': dict(parse_probe_response(HI_RESPONSE),
+                                        ip='10.0.0.5', port=9100)}
+        update_inventory(found, self.inventory_file)
+
+        merged = save_printer_configuration(stale_config, self.inventory_file)
+
+        with open(self.inventory_file, encoding='utf-8') as f:
+            saved = json.load(f)
+        self.assertEqual(saved, merged)
+        self.assertTrue(saved['ZDesigner ZD421']['default'])
+        self.assertTrue(saved['10.0.0.5:9100']['online'])
+
+
+class TestSharedDiscoveryService(unittest.TestCase):
+    def test_one_service_per_process(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        inventory_file = os.path.join(tmp.name, 'thermal_printers.json')
+        # Świeży inwentarz - wątek w tle nie skanuje sieci
+        update_inventory({}, inventory_file)
+        config = MagicMock()
+        config.get_discovery_settings.return_value = {
+            'enabled': True, 'cidr': '10.0.0.0/30', 'port': 9100, 'ttl': 3600,
+            'timeout': 0.1, 'concurrency': 4, 'inventory_file': inventory_file}
+        self.addCleanup(stop_discovery_service)
+
+        service = start_discovery_service(config)
+        self.assertIs(start_discovery_service(config), service)
+        self.assertIs(get_discovery_service(), service)
+
+        stop_discovery_service()
+        self.assertIsNone(get_discovery_service())
+        self.assertFalse(service._thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import json
+import socket
+import asyncio
+import tempfile
+import unittest
+
+from zpl.printer_emulator import EmulatorThread
+from zpl.printer_discovery import probe_host, _split_frames
+from zpl.network_printer import print_zpl_to_network_printer
+
+
+class TestPrinterEmulator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.printer = EmulatorThread(output_dir=self.tmp.name, time_scale=0, buffer_size=4096)
+
+    def tearDown(self):
+        self.printer.close()
+        self.tmp.cleanup()
+
+    def _query(self, command):
+        with socket.create_connection((self.printer.host, self.printer.port), timeout=5) as s:
+            s.sendall(command)
+            response = b''
+            while response.count(b'\x03') < 1:
+                response += s.recv(4096)
+        return response.decode('latin-1')
+
+    def test_print_job_counts_labels_and_records_timings(self):
+        printer = asyncio.run(probe_host(self.printer.host, self.printer.port, timeout=2))
+        self.assertEqual(printer['dpi'], 203)
+        self.assertTrue(printer['status']['ready'])
+
+        path = os.path.join(self.tmp.name, 'label.zpl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('^XA^LL406^FO20,20^A0N,30,30^FDZO 1/25^FS^PQ3^XZ')
+        self.assertTrue(print_zpl_to_network_printer(path, config=self.printer)['success'])
+        self.printer.wait_idle(jobs=1)
+
+        stats = self.printer.stats()
+        self.assertEqual((stats['jobs'], stats['printed_jobs'], stats['labels'], stats['buffered']),
+                         (1, 1, 3, 0))
+        with open(os.path.join(self.tmp.name, 'jobs.jsonl'), encoding='utf-8') as f:
+            timing = json.loads(f.readline())
+        self.assertEqual(timing['labels'], 3)
+        self.assertEqual(timing['label_length_in'], 2.0)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'job_000001.zpl')))
+
+    def test_paper_out_stops_printing_and_applies_backpressure(self):
+        self.printer.set_fault('paper_out')
+        job = b'^XA^FO0,0^FD' + b'X' * 1000 + b'^FS^XZ'
+        sender = socket.create_connection((self.printer.host, self.printer.port))
+        sender.settimeout(0.5)
+        sent = 0
+        with self.assertRaises(socket.timeout):
+            for _ in range(100000):
+                sender.sendall(job)
+                sent += 1
+
+        stats = self.printer.stats()
+        self.assertEqual(stats['labels'], 0)
+        self.assertGreater(stats['stalled_reads'], 0)
+        self.assertLessEqual(stats['buffered'], 4096 + 5)
+
+        # Komendy statusu są obsługiwane mimo pełnego bufora
+        self.assertIn('00000001', self._query(b'~HQES'))
+        self.assertEqual(_split_frames(self._query(b'~HS'))[0].split(',')[1], '1')
+
+        self.printer.set_fault('paper_out', False)
+        sender.close()
+        # Każde zadanie wysłane w całości zostaje wydrukowane, niepełne ostatnie jest odrzucane
+        self.printer.wait_idle(jobs=sent)
+        stats = self.printer.stats()
+        self.assertEqual((stats['printed_jobs'], stats['labels'], stats['buffered']), (sent, sent, 0))
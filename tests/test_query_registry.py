@@ -0,0 +1,49 @@
+import sqlite3
+import unittest
+
+from lib.query_registry import ConnectionPool, QueryRegistry, pad_in_list
+
+
+class TestQueryRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = QueryRegistry()
+        self.registry.register(
+            'users', "SELECT KOD FROM {table} WHERE KOD IN ({codes}) AND ID > {min_id} ORDER BY KOD",
+            list_params=('codes',), identifiers={'table': 'OPERATOR'})
+
+    def test_in_list_has_fixed_arity(self):
+        sql3, params3 = self.registry.build('users', codes=['a', 'b', 'c'], min_id=0)
+        sql4, _ = self.registry.build('users', codes=['d', 'e', 'f', 'g'], min_id=5)
+
+        self.assertEqual(sql3, sql4)
+        self.assertIn('FROM OPERATOR WHERE KOD IN (?, ?, ?, ?) AND ID > ?', sql3)
+        self.assertEqual(params3, ('a', 'b', 'c', 'c', 0))
+        self.assertEqual(pad_in_list([1]), [1])
+
+    def test_rejects_invalid_identifier(self):
+        with self.assertRaises(ValueError):
+            self.registry.register('bad', "SELECT * FROM {t}", identifiers={'t': 'X; DROP TABLE Y'})
+
+    def test_pool_reuses_prepared_cursor(self):
+        def connect():
+            connection = sqlite3.connect(':memory:')
+            connection.execute("CREATE TABLE OPERATOR (ID INT, KOD TEXT)")
+            connection.executemany("INSERT INTO OPERATOR VALUES (?, ?)",
+                                   [(1, 'anna'), (2, 'jan'), (3, 'ola')])
+            return connection
+
+        pool = ConnectionPool(connect, self.registry, size=1)
+        for codes in (['anna'], ['jan', 'ola'], ['ola', 'jan'], ['anna']):
+            with pool.acquire() as conn:
+                rows = conn.execute('users', codes=codes, min_id=0).fetchall()
+            self.assertEqual(sorted(r[0] for r in rows), sorted(set(codes)))
+        pool.close()
+
+        # Dwie długości list IN (1 i 2) - dwa przygotowania, pozostałe wywołania to trafienia
+        stats = self.registry.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+        self.assertEqual(stats['queries']['users'], {'hits': 2, 'misses': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import signal
+import asyncio
+import unittest
+
+from lib.config_snapshot import run_in_thread
+from lib.resident_service import ResidentService, send_command
+
+
+class TestResidentService(unittest.TestCase):
+    def test_poll_status_and_drain_over_socket(self):
+        calls = []
+
+        async def cycle():
+            calls.append(len(calls))
+            return 2
+
+        service = ResidentService(cycle, interval=60, port=0, status_callback=lambda: {'printer': 'p1'})
+
+        async def client():
+            while service.cycles < 1:
+                await asyncio.sleep(0.01)
+            # Powiadomienie uruchamia cykl bez czekania na interwał
+            self.assertEqual(await run_in_thread(send_command, 'poll', port=service.port),
+                             {'ok': True, 'command': 'poll'})
+            while service.cycles < 2:
+                await asyncio.sleep(0.01)
+            status = await run_in_thread(send_command, 'status', port=service.port)
+            self.assertFalse((await run_in_thread(send_command, 'reload', port=service.port))['ok'])
+            await run_in_thread(send_command, 'drain', port=service.port)
+            return status
+
+        async def main():
+            return (await asyncio.gather(service.run(), client()))[1]
+
+        status = asyncio.run(asyncio.wait_for(main(), timeout=10))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((status['cycles'], status['orders'], status['printer']), (2, 4, 'p1'))
+        self.assertEqual(status['last_cycle']['orders'], 2)
+        self.assertEqual(service.state, 'stopped')
+
+    def test_drain_finishes_current_order_and_times_out_stuck_cycle(self):
+        processed = []
+
+        async def cycle():
+            for order in range(100):
+                await asyncio.sleep(0.02)
+                processed.append(order)
+                if service.draining:
+                    break
+            return len(processed)
+
+        service = ResidentService(cycle, interval=0, port=None, drain_timeout=5)
+
+        async def main():
+            task = asyncio.ensure_future(service.run())
+            await asyncio.sleep(0.1)
+            service.drain()
+            await task
+
+        asyncio.run(asyncio.wait_for(main(), timeout=10))
+        self.assertLess(len(processed), 100)
+        self.assertEqual((service.cycles, service.failed_cycles), (1, 0))
+
+        async def stuck():
+            await asyncio.sleep(60)
+
+        service = ResidentService(stuck, port=None, drain_timeout=0.1)
+
+        async def stop_soon():
+            task = asyncio.ensure_future(service.run())
+            await asyncio.sleep(0.05)
+            service.drain()
+            await task
+
+        asyncio.run(asyncio.wait_for(stop_soon(), timeout=10))
+        self.assertEqual(service.last_cycle['error'], 'cancelled')
+
+    @unittest.skipIf(sys.platform == 'win32', 'SIGTERM przez os.kill tylko na POSIX')
+    def test_sigterm_starts_graceful_drain(self):
+        async def cycle():
+            if service.cycles == 0:
+                os.kill(os.getpid(), signal.SIGTERM)
+            await asyncio.sleep(0.05)
+            return 1
+
+        service = ResidentService(cycle, interval=0, port=None)
+        previous = signal.getsignal(signal.SIGTERM)
+        asyncio.run(asyncio.wait_for(service.run(), timeout=10))
+        self.assertEqual((service.cycles, service.orders), (1, 1))
+        self.assertEqual(signal.getsignal(signal.SIGTERM), previous)
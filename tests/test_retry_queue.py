@@ -0,0 +1,90 @@
+import os
+import random
+import tempfile
+import unittest
+
+from lib.retry_queue import RetryQueue, RetryScheduler, backoff_delay, printer_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRetryQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.clock = FakeClock()
+        self.queue = RetryQueue(os.path.join(self.tmp.name, 'retry.db'), base_delay=5, max_delay=60,
+                                max_attempts=3, failure_threshold=2, open_seconds=30,
+                                clock=self.clock, rng=random.Random(1))
+        self.addCleanup(self.queue.close)
+
+    def zpl(self, name):
+        path = os.path.join(self.tmp.name, f"{name}.zpl")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('^XA^XZ')
+        return path
+
+    def test_backoff_grows_exponentially_with_jitter_and_cap(self):
+        rng = random.Random(7)
+        for attempt, full in [(1, 5), (2, 10), (3, 20), (6, 60), (20, 60)]:
+            delay = backoff_delay(attempt, 5, 60, rng)
+            self.assertGreaterEqual(delay, full / 2)
+            self.assertLessEqual(delay, full)
+
+    def test_failed_order_retries_then_goes_dead_and_operator_requeues(self):
+        self.queue.enqueue('ZO 1/26', self.zpl('zo1'), '10.0.0.1', 9100, 'timeout', source='firma2')
+        self.assertIsNone(self.queue.next_due('10.0.0.1:9100'))
+        self.clock.now += 5
+        attempts = []
+        scheduler = RetryScheduler(self.queue, lambda job: attempts.append(job['attempts']) or
+                                   {'success': False, 'message': 'timeout'})
+        self.addCleanup(scheduler.stop)
+        while self.queue.stats()['pending']:
+            # Wyłącznik otwiera się po 2 błędach - czekamy dłużej niż otwarcie i opóźnienie próby
+            self.clock.now += 120
+            scheduler.run_once(wait=True)
+        self.assertEqual(attempts, [0, 1, 2])
+        dead, = self.queue.jobs('dead')
+        self.assertEqual((dead['source'], dead['attempts'], dead['last_error']), ('firma2', 3, 'timeout'))
+
+        self.assertEqual(self.queue.requeue('ZO 1/26', source='firma2'), 1)
+        scheduler.dispatch = lambda job: {'success': True}
+        self.clock.now += 120
+        scheduler.run_once(wait=True)
+        self.assertEqual(self.queue.jobs(), [])
+        self.assertEqual(self.queue.stats(), {'pending': 0, 'dead': 0, 'open_printers': []})
+
+    def test_open_circuit_pauses_dead_printer_and_healthy_printer_drains(self):
+        dead_printer, healthy_printer = printer_key('10.0.0.1', 9100), printer_key('10.0.0.2', 9100)
+        for number in range(4):
+            self.queue.enqueue(f"ZO {number}/26", self.zpl(f"dead{number}"), '10.0.0.1', 9100)
+            self.queue.enqueue(f"ZO {number}/26", self.zpl(f"ok{number}"), '10.0.0.2', 9100, source='b')
+        self.clock.now += 10
+        sent = []
+
+        def dispatch(job):
+            sent.append(job['printer'])
+            return {'success': job['printer'] == healthy_printer, 'message': 'connection refused'}
+
+        scheduler = RetryScheduler(self.queue, dispatch, workers=2)
+        self.addCleanup(scheduler.stop)
+        self.assertEqual(scheduler.run_once(wait=True), 2)
+        # Po dwóch błędach wyłącznik przerywa wysyłkę do martwej drukarki
+        self.assertEqual(sent.count(dead_printer), 2)
+        self.assertEqual(sent.count(healthy_printer), 4)
+        self.assertFalse(self.queue.printer_available(dead_printer))
+        self.assertEqual(self.queue.stats(), {'pending': 4, 'dead': 0, 'open_printers': [dead_printer]})
+        self.assertEqual(scheduler.run_once(wait=True), 0)
+
+        # Po czasie otwarcia próba kontrolna zamyka wyłącznik
+        self.clock.now += 60
+        scheduler.dispatch = lambda job: {'success': True}
+        scheduler.run_once(wait=True)
+        self.assertTrue(self.queue.printer_available(dead_printer))
+        self.assertEqual(self.queue.stats()['pending'], 0)
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from thermal_printer import ThermalPrinterManager
+
+PRINTERS = [{'name': 'ZDesigner ZD421', 'port': 'USB001', 'driver': 'ZDesigner', 'attributes': 0}]
+READY = {'ready': True, 'status': 0, 'status_message': "Drukarka gotowa"}
+NOT_READY = {'ready': False, 'status': 128, 'status_message': "Drukarka offline"}
+
+
+class TestThermalPrinterCache(unittest.TestCase):
+    def setUp(self):
+        enumerate_patch = patch.object(
+            ThermalPrinterManager, '_enumerate_printers', return_value=PRINTERS)
+        status_patch = patch.object(
+            ThermalPrinterManager, '_query_printer_status', return_value=READY)
+        self.enumerate_printers = enumerate_patch.start()
+        self.query_status = status_patch.start()
+        self.addCleanup(patch.stopall)
+        self.manager = ThermalPrinterManager(enumeration_ttl=60, status_ttl=60)
+
+    def test_enumeration_is_cached(self):
+        for _ in range(5):
+            self.assertTrue(self.manager.is_printer_available('ZDesigner ZD421'))
+        self.assertEqual(self.enumerate_printers.call_count, 1)
+
+    def test_unknown_printer_forces_single_refresh(self):
+        self.assertFalse(self.manager.is_printer_available('Brak'))
+        self.assertEqual(self.enumerate_printers.call_count, 2)
+
+    def test_status_cached_only_when_ready(self):
+        self.manager.get_printer_status('ZDesigner ZD421')
+        self.manager.get_printer_status('ZDesigner ZD421')
+        self.assertEqual(self.query_status.call_count, 1)
+
+        self.query_status.return_value = NOT_READY
+        self.manager.invalidate_cache('ZDesigner ZD421')
+        self.manager.get_printer_status('ZDesigner ZD421')
+        self.manager.get_printer_status('ZDesigner ZD421')
+        self.assertEqual(self.query_status.call_count, 3)
+
+    def test_save_configuration_skips_unchanged_file(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        config_file = os.path.join(tmp.name, 'thermal_printers.json')
+        self.manager.printers_config = {'ZDesigner ZD421': {'default': True}}
+        self.assertTrue(self.manager.save_configuration(config_file))
+        os.utime(config_file, ns=(0, 0))
+
+        self.assertTrue(self.manager.save_configuration(config_file))
+        self.assertEqual(os.stat(config_file).st_mtime_ns, 0)
+
+        self.manager.printers_config['ZDesigner ZD421']['default'] = False
+        self.manager.save_configuration(config_file)
+        with open(config_file, encoding='utf-8') as f:
+            self.assertFalse(json.load(f)['ZDesigner ZD421']['default'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+
+from lib.tracing import (configure_tracing, start_trace, span, current_context, attach_context,
+                         load_traces, slowest_orders, format_breakdown, folded_stacks)
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'traces.jsonl')
+        configure_tracing({'enabled': True, 'sample_rate': 0.0, 'file': self.path,
+                           'max_bytes': 1024 * 1024, 'backup_count': 1})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sampled_trace_nested_spans(self):
+        with start_trace('ZO 1/25', sampled=True):
+            with span('render', printer='192.168.1.10'):
+                with span('chromium.networkidle'):
+                    pass
+                context = current_context()
+            # Span procesu roboczego dołączony przez przekazany kontekst
+            with attach_context(context):
+                with span('zpl.encode_page', width=576):
+                    pass
+
+        with open(self.path, encoding='utf-8') as f:
+            records = {r['name']: r for r in map(json.loads, f)}
+        self.assertEqual(set(records), {'order', 'render', 'chromium.networkidle', 'zpl.encode_page'})
+        self.assertIsNone(records['order']['parent'])
+        self.assertEqual(records['render']['parent'], records['order']['span'])
+        self.assertEqual(records['chromium.networkidle']['parent'], records['render']['span'])
+        self.assertEqual(records['zpl.encode_page']['parent'], records['render']['span'])
+        self.assertEqual({r['order'] for r in records.values()}, {'ZO 1/25'})
+        self.assertEqual(records['render']['attrs'], {'printer': '192.168.1.10'})
+
+    def test_unsampled_trace_writes_nothing(self):
+        with start_trace('ZO 2/25') as root:
+            self.assertIsNone(root)
+            with span('render'):
+                self.assertIsNone(current_context())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_breakdown_and_folded_stacks(self):
+        for number in ('ZO 3/25', 'ZO 4/25'):
+            with start_trace(number, sampled=True):
+                with span('send'):
+                    pass
+        traces = load_traces(self.path)
+        slowest = slowest_orders(traces, 1)
+        self.assertEqual(len(slowest), 1)
+        self.assertIn('send', format_breakdown(*slowest[0]))
+        stacks = [line.rsplit(' ', 1)[0] for line in folded_stacks(traces)]
+        self.assertTrue(all(stack in ('order', 'order;send') for stack in stacks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from lib.wapro_emulator import translate, connect, populate, NotSupportedError
+from lib.print_history import ARCHIVE_BATCH_SQL
+
+
+class TestWaproEmulator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.connection = connect('sqlite:///' + os.path.join(self.tmp.name, 'wapro.db'))
+        self.counts = populate(self.connection, orders=300, lines_mean=5, today_fraction=0.2,
+                               printed_fraction=0.5, seed=7)
+
+    def tearDown(self):
+        self.connection.close()
+        self.tmp.cleanup()
+
+    def test_translate_tsql(self):
+        statement, = translate("SELECT TOP (?) NUMER FROM ZAMOWIENIE WHERE ID_KONTRAHENTA = ? "
+                               "AND CAST(DATA_UTWORZENIA_WIERSZA AS date) = CAST(GETDATE() AS date)")
+        self.assertEqual(statement.sql,
+                         "SELECT NUMER FROM ZAMOWIENIE WHERE ID_KONTRAHENTA = ? "
+                         "AND date(DATA_UTWORZENIA_WIERSZA) = date(datetime('now', 'localtime')) LIMIT ?")
+        self.assertEqual((statement.params, statement.top_param), (2, 0))
+
+        drop, create = translate("IF OBJECT_ID('tempdb..#U') IS NOT NULL DROP TABLE #U; "
+                                 "CREATE TABLE #U (ID VARCHAR(50) PRIMARY KEY);")
+        self.assertEqual(drop.sql, 'DROP TABLE IF EXISTS temp.U')
+        self.assertEqual(create.sql, 'CREATE TEMP TABLE U (ID VARCHAR(50) PRIMARY KEY)')
+
+        with self.assertRaises(NotSupportedError):
+            translate(ARCHIVE_BATCH_SQL)
+
+    def test_order_queries_on_generated_data(self):
+        from lib.order_processor2 import get_todays_orders, get_order_by_number
+
+        numbers = get_todays_orders(self.connection)
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM ZAMOWIENIE "
+                       "WHERE CAST(DATA_UTWORZENIA_WIERSZA AS date) = CAST(GETDATE() AS date)")
+        self.assertEqual(len(numbers), cursor.fetchone()[0])
+        self.assertTrue(numbers)
+
+        # Filtrowanie po operatorach przez tabelę tymczasową
+        allowed = get_todays_orders(self.connection, allowed_users=['1'])
+        self.assertTrue(set(allowed) <= set(numbers))
+
+        order = get_order_by_number(self.connection, numbers[0])
+        self.assertEqual(order['order']['NUMER'], numbers[0])
+        self.assertIsInstance(order['order']['DATA_UTWORZENIA_WIERSZA'], datetime)
+        self.assertIn('kontrahent', order['order'])
+        cursor.execute("SELECT COUNT(*) FROM POZYCJA_ZAMOWIENIA WHERE ID_ZAMOWIENIA = ?",
+                       order['order']['ID_ZAMOWIENIA'])
+        self.assertEqual(len(order['items']), cursor.fetchone()[0])
+        self.assertIsInstance(order['items'][0]['CENA_BRUTTO'], Decimal)
+
+    def test_print_history_excludes_printed_documents(self):
+        from lib.print_history import not_printed_condition
+        from lib.print_history_writer import INSERT_SQL
+
+        query = ("SELECT COUNT(*) FROM DOKUMENT_MAGAZYNOWY d WHERE d.DATA >= "
+                 "CAST(CONVERT(VARCHAR(8), GETDATE(), 112) AS INT) AND "
+                 + not_printed_condition('d.ID_DOK_MAGAZYNOWEGO'))
+        cursor = self.connection.cursor()
+        pending = cursor.execute(query).fetchone()[0]
+        self.assertGreater(pending, 0)
+
+        cursor.execute("SELECT TOP 1 d.ID_DOK_MAGAZYNOWEGO FROM DOKUMENT_MAGAZYNOWY d WHERE d.DATA >= "
+                       "CAST(CONVERT(VARCHAR(8), GETDATE(), 112) AS INT) AND "
+                       + not_printed_condition('d.ID_DOK_MAGAZYNOWEGO'))
+        document_id = cursor.fetchone()[0]
+        printed = datetime.now()
+        # Powtórzony wpis (np. z dziennika) nie tworzy duplikatu
+        row = (document_id, printed, 'SYSTEM', 'PRINTED', document_id, printed)
+        cursor.executemany(INSERT_SQL, [row, row])
+        self.connection.commit()
+        self.assertEqual(cursor.execute(query).fetchone()[0], pending - 1)
@@ -0,0 +1,69 @@
+import io
+import unittest
+
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from zebrafy import ZebrafyPDF
+
+from zpl.zpl_encoder_pool import ZplEncoderPool, encode_raster
+
+
+def label_pdf(pages=1):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(50 * mm, 30 * mm))
+    for page in range(pages):
+        # Tekst i skośna linia dają wygładzone krawędzie (piksele pośrednie)
+        pdf.setFont('Helvetica-Bold', 14)
+        pdf.drawString(5 * mm, 15 * mm, f"ZO {page + 12}/26")
+        pdf.rect(2 * mm, 2 * mm, 20 * mm, 6 * mm, fill=1)
+        pdf.line(25 * mm, 3 * mm, 48 * mm, 12 * mm)
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+class TestEncodeRaster(unittest.TestCase):
+    def test_packs_dark_pixels_as_set_bits(self):
+        # 10 pikseli: czarny, biały, czarny..., wiersz dopełniany do 2 bajtów
+        raster = bytes([0, 255] * 5)
+        bytes_per_row, total_bytes, hex_data = encode_raster(raster, 10, 1)
+        self.assertEqual(bytes_per_row, 2)
+        self.assertEqual(total_bytes, 2)
+        self.assertEqual(hex_data, 'AA80')
+
+    def test_threshold(self):
+        raster = bytes([100, 200, 100, 200, 100, 200, 100, 200])
+        self.assertEqual(encode_raster(raster, 8, 1, threshold=128)[2], 'AA')
+        self.assertEqual(encode_raster(raster, 8, 1, threshold=250)[2], 'FF')
+
+
+class TestZplEncoderPool(unittest.TestCase):
+    def test_pool_matches_inline_encoding(self):
+        pages = [(bytes((x * 37 + seed) % 256 for x in range(20 * 6)), 20, 6)
+                 for seed in range(3)]
+        with ZplEncoderPool(workers=2) as pool:
+            encoded = pool.encode_pages(pages)
+            zpl = pool.pages_to_zpl(pages, pos_x=9, pos_y=9)
+
+        self.assertEqual(encoded, [encode_raster(*page) for page in pages])
+        self.assertTrue(zpl.startswith('^XA\n^FO9,9^GFA,18,18,3,'))
+        self.assertIn('^FO9,15^GFA', zpl)
+        self.assertTrue(zpl.endswith('^FS\n^XZ\n'))
+
+    def test_pdf_output_matches_zebrafy(self):
+        # Te same parametry co w sql2html i lib/printer.py (etykiety w inwersji)
+        cases = [dict(pos_x=9, pos_y=9, split_pages=False, width=400, height=240),
+                 dict(pos_x=0, pos_y=0, split_pages=True)]
+        with ZplEncoderPool(workers=2) as pool:
+            for options in cases:
+                pdf_content = label_pdf(pages=2)
+                with self.subTest(**options):
+                    expected = ZebrafyPDF(pdf_content, format="ASCII", invert=True, dither=False,
+                                          threshold=128, dpi=203, rotation=0, complete_zpl=True,
+                                          **options).to_zpl()
+                    self.assertEqual(pool.pdf_to_zpl(pdf_content, dpi=203, threshold=128,
+                                                     invert=True, **options), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
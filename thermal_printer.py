@@ -5,6 +5,7 @@ import logging
 import glob
 import json
 import re
+import threading
 from typing import Dict, Any, Optional, List, Tuple, Set
 
 # Windows-specific imports
@@ -73,17 +74,33 @@ class ThermalPrinterManager:
         }
     }
 
-    def __init__(self, config_file: Optional[str] = None):
+    def __init__(self, config_file: Optional[str] = None, enumeration_ttl: float = 300,
+                 status_ttl: float = 10, job_check_timeout: float = 1.5):
         """
         Inicjalizuje menedżera drukarek termicznych.
 
         Parametry:
         - config_file: Opcjonalna ścieżka do pliku konfiguracyjnego z ustawieniami drukarek
+        - enumeration_ttl: Czas ważności listy drukarek systemowych w sekundach
+        - status_ttl: Czas ważności statusu drukarki w sekundach
+        - job_check_timeout: Maksymalny czas oczekiwania na opuszczenie kolejki przez zadanie
         """
         self.logger = logging.getLogger(__name__)
         self.printers_config = {}
         self.detected_printers = {}
 
+        # Pamięć podręczna listy drukarek i ich statusów
+        self.enumeration_ttl = enumeration_ttl
+        self.status_ttl = status_ttl
+        self.job_check_timeout = job_check_timeout
+        self._cache_lock = threading.RLock()
+        self._printers_cache = None
+        self._printers_cache_time = 0.0
+        self._printer_names = set()
+        self._status_cache = {}
+        self._refresher_thread = None
+        self._refresher_stop = threading.Event()
+
         # Wczytaj konfigurację, jeśli podano plik
         if config_file and os.path.exists(config_file):
             try:
@@ -203,9 +220,104 @@ class ThermalPrinterManager:
             'font_size': 10  # Domyślny rozmiar czcionki
         }
 
-    def get_available_printers(self) -> List[Dict[str, Any]]:
+    def get_available_printers(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """
         Zwraca listę dostępnych drukarek w systemie.
+        Wynik jest przechowywany w pamięci podręcznej przez enumeration_ttl sekund.
+
+        Parametry:
+        - force_refresh: Czy pominąć pamięć podręczną
+
+        Zwraca:
+        - Lista słowników zawierających informacje o drukarkach
+        """
+        with self._cache_lock:
+            cache_age = time.monotonic() - self._printers_cache_time
+            if not force_refresh and self._printers_cache is not None \
+                    and cache_age < self.enumeration_ttl:
+                return self._printers_cache
+
+            try:
+                printers = self._enumerate_printers()
+            except Exception:
+                self.invalidate_cache()
+                raise
+
+            self._printers_cache = printers
+            self._printers_cache_time = time.monotonic()
+            self._printer_names = {printer['name'] for printer in printers}
+            return printers
+
+    def is_printer_available(self, printer_name: str) -> bool:
+        """
+        Sprawdza, czy drukarka jest zainstalowana w systemie.
+        Korzysta z pamięci podręcznej; przy braku drukarki odświeża listę jeden raz.
+
+        Parametry:
+        - printer_name: Nazwa drukarki
+
+        Zwraca:
+        - True, jeśli drukarka istnieje w systemie
+        """
+        self.get_available_printers()
+        if printer_name in self._printer_names:
+            return True
+        self.get_available_printers(force_refresh=True)
+        return printer_name in self._printer_names
+
+    def invalidate_cache(self, printer_name: Optional[str] = None) -> None:
+        """
+        Unieważnia pamięć podręczną drukarek.
+
+        Parametry:
+        - printer_name: Nazwa drukarki, której status należy unieważnić.
+          Jeśli None, unieważniana jest lista drukarek i wszystkie statusy.
+        """
+        with self._cache_lock:
+            if printer_name is None:
+                self._printers_cache = None
+                self._printers_cache_time = 0.0
+                self._status_cache.clear()
+            else:
+                self._status_cache.pop(printer_name, None)
+
+    def start_cache_refresher(self, interval: float) -> None:
+        """
+        Uruchamia wątek w tle odświeżający listę drukarek i statusy drukarek termicznych.
+
+        Parametry:
+        - interval: Odstęp między odświeżeniami w sekundach
+        """
+        if interval <= 0 or (self._refresher_thread and self._refresher_thread.is_alive()):
+            return
+
+        def refresh_loop():
+            while not self._refresher_stop.wait(interval):
+                try:
+                    self.get_available_printers(force_refresh=True)
+                    for printer_name in list(self.detected_printers):
+                        self.get_printer_status(printer_name, force_refresh=True)
+                except Exception as e:
+                    self.logger.warning(
+                        f"Błąd podczas odświeżania pamięci podręcznej drukarek: {str(e)}")
+
+        self._refresher_stop.clear()
+        self._refresher_thread = threading.Thread(
+            target=refresh_loop, name='printer-cache-refresher', daemon=True)
+        self._refresher_thread.start()
+        self.logger.info(
+            f"Uruchomiono odświeżanie pamięci podręcznej drukarek co {interval}s")
+
+    def stop_cache_refresher(self) -> None:
+        """Zatrzymuje wątek odświeżający pamięć podręczną drukarek."""
+        self._refresher_stop.set()
+        if self._refresher_thread:
+            self._refresher_thread.join(timeout=5)
+            self._refresher_thread = None
+
+    def _enumerate_printers(self) -> List[Dict[str, Any]]:
+        """
+        Pobiera listę drukarek bezpośrednio z systemu (bez pamięci podręcznej).
 
         Zwraca:
         - Lista słowników zawierających informacje o drukarkach
@@ -261,6 +373,8 @@ class ThermalPrinterManager:
     def save_configuration(self, config_file: str) -> bool:
         """
         Zapisuje konfigurację drukarek do pliku.
+        Plik jest współdzielony z wykrywaniem drukarek w tle, dlatego zapis
+        odbywa się pod blokadą i zachowuje aktualne wpisy drukarek sieciowych.
 
         Parametry:
         - config_file: Ścieżka do pliku konfiguracyjnego
@@ -268,12 +382,14 @@ class ThermalPrinterManager:
         Zwraca:
         - True, jeśli zapis się powiódł, False w przeciwnym razie
         """
+        # Import lokalny: zpl.printer_discovery importuje pakiet lib, który
+        # z kolei importuje ten moduł
+        from zpl.printer_discovery import save_printer_configuration
         try:
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.printers_config, f,
-                          indent=4, ensure_ascii=False)
-            self.logger.info(
-                f"Zapisano konfigurację drukarek do {config_file}")
+            merged = save_printer_configuration(self.printers_config, config_file)
+            if merged is None:
+                return False
+            self.printers_config = merged
             return True
         except Exception as e:
             self.logger.error(
@@ -312,9 +428,38 @@ class ThermalPrinterManager:
             f"Ustawiono drukarkę {printer_name} jako domyślną drukarkę termiczną")
         return True
 
-    def get_printer_status(self, printer_name: str) -> Dict[str, Any]:
+    def get_printer_status(self, printer_name: str, force_refresh: bool = False) -> Dict[str, Any]:
         """
         Pobiera status drukarki.
+        Status gotowej drukarki jest przechowywany w pamięci podręcznej przez
+        status_ttl sekund; błędy i stany niegotowości nie są zapamiętywane.
+
+        Parametry:
+        - printer_name: Nazwa drukarki
+        - force_refresh: Czy pominąć pamięć podręczną
+
+        Zwraca:
+        - Słownik ze statusem drukarki
+        """
+        with self._cache_lock:
+            cached = self._status_cache.get(printer_name)
+            if not force_refresh and cached and \
+                    time.monotonic() - cached[0] < self.status_ttl:
+                return cached[1]
+
+        result = self._query_printer_status(printer_name)
+
+        with self._cache_lock:
+            if result['ready']:
+                self._status_cache[printer_name] = (time.monotonic(), result)
+            else:
+                self._status_cache.pop(printer_name, None)
+
+        return result
+
+    def _query_printer_status(self, printer_name: str) -> Dict[str, Any]:
+        """
+        Pobiera status drukarki bezpośrednio z systemu (bez pamięci podręcznej).
 
         Parametry:
         - printer_name: Nazwa drukarki
@@ -410,6 +555,42 @@ class ThermalPrinterManager:
 
         return jobs
 
+    def _wait_for_job(self, printer_name: str, job_id: Optional[int]) -> List[Dict]:
+        """
+        Czeka, aż wysłane zadanie opuści kolejkę drukarki.
+        Sprawdzane jest tylko zadanie o podanym identyfikatorze, w krótkich
+        odstępach, maksymalnie przez job_check_timeout sekund.
+
+        Parametry:
+        - printer_name: Nazwa drukarki
+        - job_id: Identyfikator zadania zwrócony przez StartDocPrinter
+
+        Zwraca:
+        - Lista zadań pozostających w kolejce (pusta, jeśli zadanie zostało przetworzone)
+        """
+        if job_id is None:
+            time.sleep(self.job_check_timeout)
+            return self.get_printer_jobs(printer_name)
+
+        deadline = time.monotonic() + self.job_check_timeout
+        delay = 0.05
+        while True:
+            try:
+                hPrinter = win32print.OpenPrinter(printer_name)
+                try:
+                    job = win32print.GetJob(hPrinter, job_id, 1)
+                finally:
+                    win32print.ClosePrinter(hPrinter)
+            except Exception:
+                # Zadanie nie istnieje już w kolejce
+                return []
+
+            if time.monotonic() >= deadline:
+                return [job]
+
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
     def clear_printer_queue(self, printer_name: str) -> Dict[str, Any]:
         """
         Czyści kolejkę drukarki.
@@ -506,11 +687,9 @@ class ThermalPrinterManager:
                 self.logger.info(
                     f"Używam domyślnej drukarki termicznej: {printer_name}")
 
-            # Sprawdź, czy drukarka istnieje w systemie
-            all_printers = self.get_available_printers()
-            printer_names = [printer['name'] for printer in all_printers]
-
-            if printer_name not in printer_names:
+            # Sprawdź, czy drukarka istnieje w systemie (lista z pamięci podręcznej)
+            if not self.is_printer_available(printer_name):
+                printer_names = sorted(self._printer_names)
                 self.logger.error(
                     f"Drukarka '{printer_name}' nie została znaleziona w systemie.")
                 return {
@@ -544,13 +723,11 @@ class ThermalPrinterManager:
             # Funkcja pomocnicza dla czystszego kodu
             result = self._send_to_printer(printer_name, zpl_content)
             if not result['success']:
+                self.invalidate_cache(printer_name)
                 return result
 
-            # Sprawdź status kolejki drukarki po wysłaniu
-            time.sleep(1.5)  # Daj trochę czasu na aktualizację statusu
-
-            # Sprawdź, czy są jakieś dokumenty w kolejce
-            jobs = self.get_printer_jobs(printer_name)
+            # Sprawdź, czy wysłane zadanie opuściło kolejkę drukarki
+            jobs = self._wait_for_job(printer_name, result.get('job_id'))
 
             if jobs:
                 job_names = [job["pDocument"] for job in jobs]
@@ -587,6 +764,7 @@ class ThermalPrinterManager:
                 }
 
         except Exception as e:
+            self.invalidate_cache(printer_name)
             self.logger.exception(
                 f"Wystąpił nieoczekiwany błąd podczas drukowania: {str(e)}")
             return {
@@ -686,7 +864,8 @@ class ThermalPrinterManager:
             return {
                 'success': True,
                 'message': "Dane zostały wysłane do drukarki.",
-                'status': 'sent'
+                'status': 'sent',
+                'job_id': hJob
             }
         except Exception as e:
             return {
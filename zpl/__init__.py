@@ -5,20 +5,40 @@ This package provides tools for working with ZPL, including conversion from HTML
 ZPL to PDF, and direct printing to Zebra label printers.
 """
 
+import importlib
+
 __version__ = "0.1.0"
 
-# Import key functions and classes to make them available at the package level
-from .network_printer import print_zpl_to_network_printer, list_zpl_files
-from .zpl_printer import print_zpl, save_zpl_to_file, print_html_from_file
-from .html_to_zpl import HtmlToZplConverter
-from .zpl_to_pdf import (
-    convert_zpl_to_image,
-    image_to_pdf,
-    convert_zpl_file_to_pdf,
-    convert_zpl_string_to_pdf,
-    print_pdf,
-    create_label_pdf_direct
-)
+# Key functions and classes are available at the package level, but their
+# modules (bs4, cssutils, reportlab, PyPDF2...) are imported on first access,
+# so importing a single submodule such as zpl.network_printer stays cheap.
+_LAZY_ATTRIBUTES = {
+    'print_zpl_to_network_printer': '.network_printer',
+    'list_zpl_files': '.network_printer',
+    'print_zpl': '.zpl_printer',
+    'save_zpl_to_file': '.zpl_printer',
+    'print_html_from_file': '.zpl_printer',
+    'HtmlToZplConverter': '.html_to_zpl',
+    'convert_zpl_to_image': '.zpl_to_pdf',
+    'image_to_pdf': '.zpl_to_pdf',
+    'convert_zpl_file_to_pdf': '.zpl_to_pdf',
+    'convert_zpl_string_to_pdf': '.zpl_to_pdf',
+    'print_pdf': '.zpl_to_pdf',
+    'create_label_pdf_direct': '.zpl_to_pdf',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    elif name in __all__:
+        # Podmoduł wymieniony w __all__ (np. zpl_to_pdf)
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
 
 # For backward compatibility, create a default converter instance
 _html_to_zpl_converter = None
@@ -31,6 +51,7 @@ def html_to_zpl(html_content, **kwargs):
     """
     global _html_to_zpl_converter
     if _html_to_zpl_converter is None:
+        from .html_to_zpl import HtmlToZplConverter
         _html_to_zpl_converter = HtmlToZplConverter(**kwargs)
     return _html_to_zpl_converter.convert(html_content)
 
@@ -14,16 +14,6 @@ import logging
 from zpl.zpl_utils import *
 from zpl.zpl_printer import *
 
-# Konfiguracja logowania
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('html2zpl.log'),
-        logging.StreamHandler()
-    ]
-)
-
 
 def main():
     """
@@ -155,6 +145,16 @@ def main():
 
 
 if __name__ == '__main__':
+    # Konfiguracja logowania (tylko przy uruchomieniu jako skrypt, nie przy imporcie)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('html2zpl.log'),
+            logging.StreamHandler()
+        ]
+    )
+
     # Obsługa braku parametrów - uruchomienie w trybie interaktywnym
     if len(sys.argv) == 1:
         sys.argv.append('-i')  # Dodaj flagę trybu interaktywnego
@@ -11,7 +11,7 @@ import os
 import sys
 import socket
 import logging
-from lib.ConfigManager import ConfigManager
+from lib.config_snapshot import get_config
 
 # Konfiguracja loggera
 logger = logging.getLogger("zpl_printer")
@@ -26,16 +26,15 @@ def print_zpl_to_network_printer(zpl_file, printer_ip=None, port=None, config=No
         zpl_file (str): Ścieżka do pliku ZPL
         printer_ip (str, optional): Adres IP drukarki. Jeśli None, pobierane z konfiguracji.
         port (int, optional): Port drukarki. Jeśli None, pobierane z konfiguracji.
-        config (ConfigManager, optional): Obiekt konfiguracyjny. Jeśli None, tworzy nowy.
+        config (ConfigManager, optional): Obiekt konfiguracyjny. Jeśli None, używa współdzielonej migawki.
 
     Returns:
         dict: Słownik zawierający informację o statusie operacji
     """
     try:
-        # Inicjalizacja konfiguracji, jeśli nie została podana
+        # Użyj współdzielonej migawki konfiguracji, jeśli nie podano innej
         if config is None:
-            config = ConfigManager()
-            config.load_config()
+            config = get_config()
 
         # Pobierz parametry z konfiguracji jeśli nie zostały podane
         if printer_ip is None:
@@ -129,16 +128,15 @@ def list_zpl_files(directory=None, config=None):
 
     Args:
         directory (str, optional): Katalog do przeszukania. Domyślnie używa katalogu z konfiguracji.
-        config (ConfigManager, optional): Obiekt konfiguracyjny. Jeśli None, tworzy nowy.
+        config (ConfigManager, optional): Obiekt konfiguracyjny. Jeśli None, używa współdzielonej migawki.
 
     Returns:
         list: Lista ścieżek do plików ZPL
     """
     try:
-        # Inicjalizacja konfiguracji, jeśli nie została podana
+        # Użyj współdzielonej migawki konfiguracji, jeśli nie podano innej
         if config is None:
-            config = ConfigManager()
-            config.load_config()
+            config = get_config()
 
         # Użyj katalogu z konfiguracji, jeśli nie podano
         if directory is None:
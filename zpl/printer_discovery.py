@@ -0,0 +1,581 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# zpl/printer_discovery.py
+
+"""
+Asynchroniczne wykrywanie drukarek ZPL w sieci lokalnej.
+
+Moduł równolegle sprawdza adresy z zadanego zakresu CIDR na porcie 9100,
+rozpoznaje drukarki Zebra po odpowiedziach na komendy ~HI (identyfikacja)
+i ~HS (status), a wyniki zapisuje w pliku thermal_printers.json pod kluczami
+"ip:port". Usługa PrinterDiscoveryService odświeża inwentarz w tle
+zgodnie z TTL, dzięki czemu start aplikacji nie czeka na skanowanie.
+
+Użycie z linii poleceń:
+    python -m zpl.printer_discovery 192.168.1.0/24
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+import ipaddress
+import tempfile
+import threading
+
+from lib.file_lock import locked
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9100
+DEFAULT_INVENTORY_FILE = 'thermal_printers.json'
+
+# Komendy ZPL: identyfikacja drukarki i status hosta
+HOST_IDENTIFICATION = b'~HI\r\n'
+HOST_STATUS = b'~HS\r\n'
+
+# Rozdzielczość głowicy w punktach na mm -> DPI
+DPMM_TO_DPI = {6: 152, 8: 203, 12: 300, 24: 600}
+
+STX = '\x02'
+ETX = '\x03'
+
+# Blokada zapisu inwentarza (skanowanie w tle i zapis przy starcie); między
+# procesami chroni go dodatkowo blokada pliku <inwentarz>.lock
+_inventory_lock = threading.Lock()
+
+# Wspólna usługa wykrywania (jedna na proces, niezależnie od liczby źródeł)
+_default_service = None
+_default_service_lock = threading.Lock()
+
+
+def _split_frames(response):
+    """
+    Dzieli odpowiedź drukarki na ramki ograniczone znakami STX/ETX.
+
+    Parametry:
+    - response: Odpowiedź drukarki (str)
+
+    Zwraca:
+    - Lista zawartości ramek
+    """
+    frames = []
+    for chunk in response.split(STX)[1:]:
+        frames.append(chunk.split(ETX, 1)[0].strip())
+    return frames
+
+
+def parse_host_identification(frame):
+    """
+    Parsuje odpowiedź na komendę ~HI.
+    Format: model,wersja_firmware,punkty_na_mm,pamięć[,opcje]
+
+    Parametry:
+    - frame: Zawartość ramki odpowiedzi ~HI
+
+    Zwraca:
+    - Słownik z kluczami model, firmware, dpi, memory lub None
+    """
+    fields = [field.strip() for field in frame.split(',')]
+    if len(fields) < 3 or not fields[0]:
+        return None
+
+    try:
+        dpmm = int(fields[2])
+    except ValueError:
+        return None
+
+    return {
+        'model': fields[0],
+        'firmware': fields[1],
+        'dpi': DPMM_TO_DPI.get(dpmm, round(dpmm * 25.4)),
+        'memory': fields[3] if len(fields) > 3 else None
+    }
+
+
+def parse_host_status(frames):
+    """
+    Parsuje odpowiedź na komendę ~HS (trzy ramki statusu).
+
+    Parametry:
+    - frames: Lista ramek odpowiedzi ~HS
+
+    Zwraca:
+    - Słownik ze stanem drukarki lub None, jeśli odpowiedź jest niepełna
+    """
+    if len(frames) < 2:
+        return None
+
+    first = frames[0].split(',')
+    second = frames[1].split(',')
+    if len(first) < 12 or len(second) < 8:
+        return None
+
+    try:
+        status = {
+            'paper_out': first[1] == '1',
+            'paused': first[2] == '1',
+            'label_length': int(first[3]),
+            'formats_in_buffer': int(first[4]),
+            'buffer_full': first[5] == '1',
+            'under_temperature': first[10] == '1',
+            'over_temperature': first[11] == '1',
+            'head_open': second[2] == '1',
+            'ribbon_out': second[3] == '1',
+            'labels_waiting': int(second[7]),
+        }
+    except ValueError:
+        return None
+
+    status['ready'] = not (status['paper_out'] or status['paused'] or status['head_open']
+                           or status['ribbon_out'] or status['buffer_full'])
+    return status
+
+
+def parse_probe_response(response):
+    """
+    Parsuje łączną odpowiedź na komendy ~HI i ~HS.
+
+    Parametry:
+    - response: Odpowiedź drukarki (str)
+
+    Zwraca:
+    - Słownik z danymi drukarki lub None, jeśli urządzenie nie jest drukarką ZPL
+    """
+    frames = _split_frames(response)
+    if not frames:
+        return None
+
+    identification = parse_host_identification(frames[0])
+    if identification is None:
+        return None
+
+    identification['status'] = parse_host_status(frames[1:])
+    return identification
+
+
+async def probe_host(ip, port=DEFAULT_PORT, timeout=1.0):
+    """
+    Sprawdza, czy pod wskazanym adresem działa drukarka ZPL.
+
+    Parametry:
+    - ip: Adres IP
+    - port: Port TCP drukarki
+    - timeout: Limit czasu połączenia i odpowiedzi w sekundach
+
+    Zwraca:
+    - Słownik z danymi drukarki lub None
+    """
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(str(ip), port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+    response = b''
+    try:
+        writer.write(HOST_IDENTIFICATION + HOST_STATUS)
+        await writer.drain()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Oczekiwane 4 ramki: jedna dla ~HI i trzy dla ~HS
+        while response.count(b'\x03') < 4:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            chunk = await asyncio.wait_for(reader.read(1024), remaining)
+            if not chunk:
+                break
+            response += chunk
+    except (OSError, asyncio.TimeoutError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    printer = parse_probe_response(response.decode('latin-1'))
+    if printer is not None:
+        printer.update({'ip': str(ip), 'port': port})
+    return printer
+
+
+async def discover_printers(cidr, port=DEFAULT_PORT, timeout=1.0, concurrency=128):
+    """
+    Równolegle skanuje zakres adresów w poszukiwaniu drukarek ZPL.
+
+    Parametry:
+    - cidr: Zakres adresów, np. '192.168.1.0/24' (lub lista zakresów)
+    - port: Port TCP drukarek
+    - timeout: Limit czasu dla pojedynczego hosta
+    - concurrency: Maksymalna liczba jednoczesnych połączeń
+
+    Zwraca:
+    - Słownik {"ip:port": dane_drukarki}
+    """
+    networks = [cidr] if isinstance(cidr, str) else list(cidr)
+    hosts = []
+    for network in networks:
+        network = ipaddress.ip_network(network.strip(), strict=False)
+        hosts.extend(network.hosts() if network.num_addresses > 1 else [network.network_address])
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited_probe(ip):
+        async with semaphore:
+            return await probe_host(ip, port, timeout)
+
+    started = time.monotonic()
+    results = await asyncio.gather(*(limited_probe(ip) for ip in hosts))
+    found = {f"{printer['ip']}:{printer['port']}": printer
+             for printer in results if printer}
+
+    logger.info(
+        f"Przeskanowano {len(hosts)} adresów w {time.monotonic() - started:.1f}s, "
+        f"znaleziono {len(found)} drukarek ZPL")
+    return found
+
+
+def load_inventory(inventory_file=DEFAULT_INVENTORY_FILE):
+    """
+    Wczytuje inwentarz drukarek z pliku JSON.
+
+    Parametry:
+    - inventory_file: Ścieżka do pliku inwentarza
+
+    Zwraca:
+    - Słownik z konfiguracją drukarek (pusty, jeśli plik nie istnieje)
+    """
+    try:
+        with open(inventory_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error(
+            f"Błąd podczas wczytywania inwentarza drukarek: {str(e)}")
+        return {}
+
+
+def update_inventory(found, inventory_file=DEFAULT_INVENTORY_FILE, scanned_port=None):
+    """
+    Scala wyniki skanowania z plikiem thermal_printers.json.
+    Wpisy drukarek systemowych pozostają bez zmian; drukarki sieciowe, których
+    nie znaleziono w tym skanowaniu, są oznaczane jako niedostępne.
+    Plik jest zapisywany tylko wtedy, gdy jego zawartość się zmieniła.
+
+    Parametry:
+    - found: Wynik discover_printers
+    - inventory_file: Ścieżka do pliku inwentarza
+    - scanned_port: Port, którego dotyczyło skanowanie (domyślnie wszystkie)
+
+    Zwraca:
+    - Zaktualizowany inwentarz
+    """
+    with _inventory_lock, locked(inventory_file + '.lock'):
+        inventory = load_inventory(inventory_file)
+        updated = json.loads(json.dumps(inventory))
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        for key, entry in updated.items():
+            if (_is_network_entry(entry) and key not in found
+                    and (scanned_port is None or entry.get('port') == scanned_port)):
+                entry['online'] = False
+
+        for key, printer in found.items():
+            entry = updated.setdefault(key, {})
+            entry.update({
+                'family': 'zebra',
+                'connection': 'network',
+                'ip': printer['ip'],
+                'port': printer['port'],
+                'online': True,
+                'last_seen': now,
+            })
+            specs = entry.setdefault('specs', {})
+            specs.update({
+                'dpi': printer['dpi'],
+                'model': printer['model'],
+                'firmware': printer['firmware'],
+            })
+            if printer.get('status') is not None:
+                entry['status'] = printer['status']
+
+        if _without_timestamps(updated) != _without_timestamps(inventory):
+            _write_inventory(updated, inventory_file)
+        _mark_scanned(inventory_file)
+        return updated
+
+
+def save_printer_configuration(printers_config, inventory_file=DEFAULT_INVENTORY_FILE):
+    """
+    Zapisuje konfigurację drukarek systemowych do pliku inwentarza, zachowując
+    drukarki sieciowe zapisane w międzyczasie przez skanowanie (także w innym
+    procesie). Wpisy sieciowe pochodzą z pliku, pozostałe z printers_config.
+
+    Parametry:
+    - printers_config: Konfiguracja drukarek (np. ThermalPrinterManager.printers_config)
+    - inventory_file: Ścieżka do pliku inwentarza
+
+    Zwraca:
+    - Scalona konfiguracja lub None, jeśli zapis się nie powiódł
+    """
+    with _inventory_lock, locked(inventory_file + '.lock'):
+        inventory = load_inventory(inventory_file)
+        merged = {key: entry for key, entry in printers_config.items()
+                  if not _is_network_entry(entry)}
+        merged.update((key, entry) for key, entry in inventory.items()
+                      if _is_network_entry(entry))
+
+        if merged != inventory and not _write_inventory(merged, inventory_file):
+            return None
+        return merged
+
+
+def _is_network_entry(entry):
+    """Sprawdza, czy wpis inwentarza pochodzi ze skanowania sieci."""
+    return isinstance(entry, dict) and entry.get('connection') == 'network'
+
+
+def _without_timestamps(inventory):
+    """Zwraca kopię inwentarza bez pól last_seen (do porównania zmian)."""
+    return {key: {k: v for k, v in entry.items() if k != 'last_seen'}
+            if isinstance(entry, dict) else entry
+            for key, entry in inventory.items()}
+
+
+def _write_inventory(inventory, inventory_file):
+    """Atomowo zapisuje inwentarz (plik tymczasowy + os.replace); zwraca True po sukcesie."""
+    directory = os.path.dirname(os.path.abspath(inventory_file))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(inventory, f, indent=4, ensure_ascii=False)
+        os.replace(temp_path, inventory_file)
+        logger.info(f"Zaktualizowano inwentarz drukarek: {inventory_file}")
+        return True
+    except OSError as e:
+        logger.error(f"Błąd podczas zapisu inwentarza drukarek: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+
+def _mark_scanned(inventory_file):
+    """
+    Zapisuje czas zakończenia skanowania jako mtime pliku <inwentarz>.scan,
+    dzięki czemu kolejne procesy respektują TTL bez ponownego skanowania.
+    """
+    try:
+        with open(inventory_file + '.scan', 'a'):
+            pass
+        os.utime(inventory_file + '.scan')
+    except OSError as e:
+        logger.warning(f"Nie można zapisać czasu skanowania drukarek: {str(e)}")
+
+
+def last_scan_age(inventory_file=DEFAULT_INVENTORY_FILE):
+    """
+    Zwraca liczbę sekund od ostatniego skanowania zapisanego przez
+    update_inventory lub None, jeśli skanowania jeszcze nie było.
+    """
+    try:
+        return max(time.time() - os.path.getmtime(inventory_file + '.scan'), 0.0)
+    except OSError:
+        return None
+
+
+class PrinterDiscoveryService:
+    """
+    Usługa okresowo odświeżająca inwentarz drukarek sieciowych w tle.
+    """
+
+    def __init__(self, cidr, port=DEFAULT_PORT, ttl=3600, timeout=1.0, concurrency=128,
+                 inventory_file=DEFAULT_INVENTORY_FILE):
+        """
+        Inicjalizuje usługę wykrywania drukarek.
+
+        Parametry:
+        - cidr: Zakres(y) adresów do skanowania (oddzielone przecinkami)
+        - port: Port TCP drukarek
+        - ttl: Czas ważności inwentarza w sekundach
+        - timeout: Limit czasu dla pojedynczego hosta
+        - concurrency: Maksymalna liczba jednoczesnych połączeń
+        - inventory_file: Ścieżka do pliku inwentarza
+        """
+        self.cidrs = [c.strip() for c in cidr.split(',') if c.strip()] \
+            if isinstance(cidr, str) else list(cidr)
+        self.port = port
+        self.ttl = ttl
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.inventory_file = inventory_file
+        # Czas ostatniego skanowania odtwarzany z pliku, aby nowy proces nie
+        # skanował sieci, dopóki inwentarz jest świeży
+        age = last_scan_age(inventory_file)
+        self.last_refresh = time.monotonic() - (ttl if age is None else age)
+        self._inventory = load_inventory(inventory_file)
+        self._stop_event = threading.Event()
+        self._refresh_event = threading.Event()
+        self._thread = None
+
+    def get_inventory(self):
+        """Zwraca ostatnio znany inwentarz (bez oczekiwania na skanowanie)."""
+        return self._inventory
+
+    def get_network_printers(self, online_only=True):
+        """
+        Zwraca drukarki sieciowe z inwentarza.
+
+        Parametry:
+        - online_only: Czy zwracać tylko drukarki widoczne w ostatnim skanowaniu
+
+        Zwraca:
+        - Słownik {"ip:port": wpis_inwentarza}
+        """
+        return {key: entry for key, entry in self._inventory.items()
+                if isinstance(entry, dict) and entry.get('connection') == 'network'
+                and (entry.get('online') or not online_only)}
+
+    def find_printer(self, ip, port=DEFAULT_PORT):
+        """Zwraca wpis inwentarza dla podanego adresu lub None."""
+        return self._inventory.get(f"{ip}:{port}")
+
+    def is_stale(self):
+        """Sprawdza, czy inwentarz przekroczył TTL."""
+        return time.monotonic() - self.last_refresh >= self.ttl
+
+    def refresh(self):
+        """
+        Synchronicznie skanuje sieć i aktualizuje inwentarz.
+
+        Zwraca:
+        - Zaktualizowany inwentarz
+        """
+        try:
+            found = asyncio.run(discover_printers(
+                self.cidrs, self.port, self.timeout, self.concurrency))
+            self._inventory = update_inventory(
+                found, self.inventory_file, scanned_port=self.port)
+        except Exception as e:
+            logger.error(f"Błąd podczas wykrywania drukarek: {str(e)}")
+        finally:
+            self.last_refresh = time.monotonic()
+        return self._inventory
+
+    def request_refresh(self):
+        """Wymusza odświeżenie inwentarza przez wątek w tle."""
+        self._refresh_event.set()
+
+    def start(self):
+        """Uruchamia odświeżanie inwentarza w wątku w tle."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='printer-discovery', daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Uruchomiono wykrywanie drukarek w tle: {', '.join(self.cidrs)} (TTL {self.ttl}s)")
+
+    def stop(self):
+        """Zatrzymuje wątek odświeżania."""
+        self._stop_event.set()
+        self._refresh_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.timeout + 1)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self.is_stale() or self._refresh_event.is_set():
+                self._refresh_event.clear()
+                self.refresh()
+            wait = max(self.ttl - (time.monotonic() - self.last_refresh), 0)
+            self._refresh_event.wait(timeout=wait)
+
+
+def start_discovery_service(config):
+    """
+    Uruchamia wspólną usługę wykrywania drukarek na podstawie konfiguracji.
+    Kolejne wywołania zwracają już działającą usługę, więc plik inwentarza
+    odświeża tylko jeden wątek w procesie.
+
+    Parametry:
+    - config: Obiekt ConfigManager
+
+    Zwraca:
+    - Obiekt PrinterDiscoveryService lub None, jeśli wykrywanie jest wyłączone
+    """
+    global _default_service
+
+    with _default_service_lock:
+        if _default_service is not None:
+            return _default_service
+
+        settings = config.get_discovery_settings()
+        if not settings['enabled'] or not settings['cidr']:
+            return None
+
+        _default_service = PrinterDiscoveryService(
+            settings['cidr'],
+            port=settings['port'],
+            ttl=settings['ttl'],
+            timeout=settings['timeout'],
+            concurrency=settings['concurrency'],
+            inventory_file=settings['inventory_file'])
+        _default_service.start()
+        return _default_service
+
+
+def get_discovery_service():
+    """Zwraca wspólną usługę wykrywania drukarek lub None, jeśli nie działa."""
+    return _default_service
+
+
+def stop_discovery_service():
+    """Zatrzymuje wspólną usługę wykrywania drukarek, jeśli była uruchomiona."""
+    global _default_service
+
+    with _default_service_lock:
+        if _default_service is not None:
+            _default_service.stop()
+            _default_service = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Wykrywanie drukarek ZPL w sieci lokalnej')
+    parser.add_argument('cidr', help='Zakres adresów, np. 192.168.1.0/24')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='Port drukarek (domyślnie 9100)')
+    parser.add_argument('--timeout', type=float, default=1.0,
+                        help='Limit czasu dla hosta w sekundach')
+    parser.add_argument('--concurrency', type=int, default=128,
+                        help='Liczba jednoczesnych połączeń')
+    parser.add_argument('--save', metavar='PLIK', nargs='?', const=DEFAULT_INVENTORY_FILE,
+                        help='Zapisz wyniki w pliku inwentarza (domyślnie thermal_printers.json)')
+    args = parser.parse_args()
+
+    found = asyncio.run(discover_printers(
+        args.cidr.split(','), args.port, args.timeout, args.concurrency))
+
+    for key, printer in sorted(found.items()):
+        status = printer.get('status') or {}
+        state = 'gotowa' if status.get('ready') else 'niegotowa' if status else 'brak statusu'
+        print(f"{key:<21} {printer['model']:<20} {printer['firmware']:<16} "
+              f"{printer['dpi']} DPI  {state}")
+
+    if args.save:
+        update_inventory(found, args.save, scanned_port=args.port)
+
+    return 0 if found else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
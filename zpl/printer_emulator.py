@@ -0,0 +1,585 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# zpl/printer_emulator.py
+
+"""
+Emulator sieciowej drukarki ZPL (port 9100) oparty na asyncio.
+
+Serwer przyjmuje surowy ZPL przez TCP jak drukarka Zebra, wydziela zadania
+^XA...^XZ i "drukuje" je z zadaną prędkością (cale na sekundę), dzięki czemu
+wysyłkę z zpl/network_printer.py, html2pdf3.print_network_raw
+i zpl/html2zpl2print.print_to_zebra można testować i mierzyć bez sprzętu:
+
+- bufor odbiorczy o ograniczonym rozmiarze - gdy jest pełny, emulator przestaje
+  czytać z gniazda, więc nadawca odczuwa przeciwciśnienie TCP,
+- licznik etykiet (^PQ) i czas druku wyliczany z długości etykiety (^LL) i DPI,
+- odpowiedzi na ~HI, ~HS i ~HQES w formacie parsowanym przez zpl.printer_discovery,
+- wstrzykiwanie awarii: brak papieru (również po N etykietach), otwarta
+  głowica, pauza oraz wolny odczyt z gniazda,
+- czasy każdego zadania w pliku jobs.jsonl oraz podgląd (ZPL i PNG przez
+  zebrafy, jeśli jest dostępne) w katalogu wyjściowym.
+
+Użycie z linii poleceń:
+    python -m zpl.printer_emulator --port 9100 --ips 6 --output emulator_out
+    python -m zpl.printer_emulator --port 9101 --paper-out-after 20 --read-delay 0.05
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+import socket
+import threading
+
+try:
+    from zebrafy import ZebrafyZPL
+    ZEBRAFY_AVAILABLE = True
+except ImportError:
+    ZEBRAFY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9100
+STX = b'\x02'
+ETX = b'\x03'
+CRLF = b'\r\n'
+
+# Awarie obsługiwane przez set_fault (zatrzymują druk, widoczne w ~HS/~HQES)
+FAULTS = ('paper_out', 'head_open', 'ribbon_out', 'paused')
+
+# Bity pola błędów odpowiedzi ~HQES
+HQES_ERROR_BITS = {'paper_out': 0x1, 'ribbon_out': 0x2, 'head_open': 0x4}
+
+# Punkty na mm dla odpowiedzi ~HI
+DPI_TO_DPMM = {152: 6, 203: 8, 300: 12, 600: 24}
+
+_TILDE_RE = re.compile(rb'~(HQ[A-Z]{2}|[A-Z]{2})')
+_LABEL_LENGTH_RE = re.compile(rb'\^LL\s*(\d+)')
+_QUANTITY_RE = re.compile(rb'\^PQ\s*(\d+)')
+
+
+class PrinterEmulator:
+    """Emulowana drukarka ZPL: serwer TCP, bufor odbiorczy i mechanizm druku"""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, dpi=203, ips=6.0,
+                 buffer_size=512 * 1024, label_length=1218, model=None,
+                 firmware='V84.20.21Z', output_dir=None, previews=True,
+                 time_scale=1.0, read_chunk=4096, read_delay=0.0,
+                 paper_out_after=None, socket_buffer=None):
+        """
+        Parametry:
+        - host, port: Adres nasłuchiwania (port 0 - dowolny wolny port)
+        - dpi: Rozdzielczość głowicy (czas druku, ~HI, podgląd)
+        - ips: Prędkość druku w calach na sekundę
+        - buffer_size: Rozmiar bufora odbiorczego w bajtach
+        - label_length: Domyślna długość etykiety w punktach (gdy zadanie nie zawiera ^LL)
+        - model, firmware: Identyfikacja zwracana przez ~HI
+        - output_dir: Katalog podglądów i pliku jobs.jsonl (None - bez zapisu)
+        - previews: Zapis podglądu zadań (ZPL oraz PNG przez zebrafy)
+        - time_scale: Mnożnik czasu druku (0 - druk natychmiastowy)
+        - read_chunk: Maksymalna liczba bajtów jednego odczytu z gniazda
+        - read_delay: Opóźnienie po każdym odczycie (awaria "wolny odczyt")
+        - paper_out_after: Liczba etykiet, po której kończy się papier
+        - socket_buffer: Rozmiar bufora jądra SO_RCVBUF (None - domyślny systemu)
+        """
+        self.host = host
+        self.port = port
+        self.dpi = dpi
+        self.ips = float(ips)
+        self.buffer_size = int(buffer_size)
+        self.label_length = int(label_length)
+        self.model = model or f"ZD421-{dpi}dpi"
+        self.firmware = firmware
+        self.output_dir = output_dir
+        self.previews = previews
+        self.time_scale = float(time_scale)
+        self.read_chunk = int(read_chunk)
+        self.read_delay = float(read_delay)
+        self.paper_out_after = paper_out_after
+        self.socket_buffer = socket_buffer
+
+        self.faults = dict.fromkeys(FAULTS, False)
+        self.label_counter = 0
+        self._stats = {'jobs': 0, 'printed_jobs': 0, 'bytes': 0, 'connections': 0, 'commands': 0,
+                       'max_buffered': 0, 'busy_ms': 0.0, 'stalled_reads': 0}
+        self._buffered = 0
+        self._job_number = 0
+        self._printing = None
+        self._server = None
+        self._engine = None
+        self._clients = set()
+        self._last_activity = 0.0
+        self._queue = None
+        self._space = None
+        self._ready = None
+        self._loop = None
+
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    # --- Stan drukarki -------------------------------------------------------
+
+    def set_fault(self, name, active=True):
+        """
+        Włącza lub wyłącza awarię.
+
+        Parametry:
+        - name: Jedna z FAULTS ('paper_out', 'head_open', 'ribbon_out', 'paused')
+        - active: True - awaria aktywna
+        """
+        if name not in self.faults:
+            raise ValueError(f"Nieznana awaria: {name}")
+        self.faults[name] = bool(active)
+        logger.info(f"Emulator drukarki: {name}={'1' if active else '0'}")
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._notify_ready)
+
+    def _notify_ready(self):
+        if not any(self.faults.values()):
+            self._ready.set()
+        else:
+            self._ready.clear()
+
+    @property
+    def formats_in_buffer(self):
+        waiting = self._queue.qsize() if self._queue is not None else 0
+        return waiting + (1 if self._printing is not None else 0)
+
+    def stats(self):
+        """
+        Zwraca liczniki emulatora.
+
+        Zwraca:
+        - Słownik: jobs, printed_jobs, labels, bytes, connections, commands, buffered, max_buffered,
+          formats_in_buffer, busy_ms, stalled_reads, faults
+        """
+        return dict(self._stats, labels=self.label_counter, buffered=self._buffered,
+                    formats_in_buffer=self.formats_in_buffer,
+                    faults=[name for name, active in self.faults.items() if active])
+
+    # --- Odpowiedzi na komendy ~ ---------------------------------------------
+
+    def host_identification(self):
+        """Odpowiedź ~HI: model,firmware,punkty_na_mm,pamięć"""
+        dpmm = DPI_TO_DPMM.get(self.dpi, round(self.dpi / 25.4))
+        return STX + f"{self.model},{self.firmware},{dpmm},8176KB".encode('ascii') + ETX + CRLF
+
+    def host_status(self):
+        """Odpowiedź ~HS: trzy ramki statusu"""
+        buffer_full = self._buffered >= self.buffer_size
+        labels_waiting = 0
+        if self._printing is not None:
+            labels_waiting = self._printing['labels'] - self._printing['printed']
+        first = (f"030,{int(self.faults['paper_out'])},{int(self.faults['paused'])},"
+                 f"{self.label_length:04d},{self.formats_in_buffer:03d},{int(buffer_full)},"
+                 f"0,0,000,0,0,0")
+        second = (f"000,0,{int(self.faults['head_open'])},{int(self.faults['ribbon_out'])},"
+                  f"0,2,6,{int(labels_waiting > 0)},{labels_waiting:08d},0,000")
+        third = "1234,0"
+        return b''.join(STX + frame.encode('ascii') + ETX + CRLF for frame in (first, second, third))
+
+    def extended_status(self):
+        """Odpowiedź ~HQES: pola błędów i ostrzeżeń"""
+        errors = 0
+        for name, bit in HQES_ERROR_BITS.items():
+            if self.faults[name]:
+                errors |= bit
+        return (STX + CRLF + b"  PRINTER STATUS" + CRLF +
+                f"   ERRORS:         {int(errors > 0)} 00000000 {errors:08X}".encode('ascii') + CRLF +
+                b"   WARNINGS:       0 00000000 00000000" + CRLF + ETX + CRLF)
+
+    def _tilde_response(self, command):
+        self._stats['commands'] += 1
+        if command == b'HI':
+            return self.host_identification()
+        if command == b'HS':
+            return self.host_status()
+        if command == b'HQES':
+            return self.extended_status()
+        logger.debug(f"Emulator drukarki: pominięto komendę ~{command.decode('ascii')}")
+        return b''
+
+    # --- Odbiór danych -------------------------------------------------------
+
+    def _add_buffered(self, size):
+        self._buffered += size
+        self._stats['max_buffered'] = max(self._stats['max_buffered'], self._buffered)
+
+    def _can_read(self):
+        # Zadanie większe niż bufor jest przyjmowane, gdy nie czeka żadne inne
+        return self._buffered < self.buffer_size or self._queue.empty()
+
+    async def _handle_client(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        peer = f"{peer[0]}:{peer[1]}" if peer else '?'
+        self._stats['connections'] += 1
+        self._last_activity = time.monotonic()
+        task = asyncio.current_task()
+        self._clients.add(task)
+        data = b''
+        in_format = False
+        first_byte = None
+        try:
+            while True:
+                if self._can_read():
+                    size = min(self.read_chunk, max(self.buffer_size - self._buffered, 1))
+                elif not in_format and not data:
+                    # Przy pełnym buforze czytamy tylko początek kolejnych danych,
+                    # aby odpowiadać na komendy ~ (np. ~HS w trakcie braku papieru)
+                    size = 5
+                else:
+                    # Bufor pełny - nie czytamy z gniazda (przeciwciśnienie TCP)
+                    self._stats['stalled_reads'] += 1
+                    while not self._can_read():
+                        self._space.clear()
+                        await self._space.wait()
+                    continue
+                chunk = await reader.read(size)
+                if not chunk:
+                    break
+                self._stats['bytes'] += len(chunk)
+                self._last_activity = time.monotonic()
+                self._add_buffered(len(chunk))
+                if first_byte is None:
+                    first_byte = time.time()
+                data += chunk
+
+                while True:
+                    if in_format:
+                        end = data.find(b'^XZ')
+                        if end < 0:
+                            break
+                        job, data = data[:end + 3], data[end + 3:]
+                        await self._queue.put(self._new_job(job, peer, first_byte))
+                        in_format = False
+                        first_byte = time.time() if data.strip() else None
+                        continue
+
+                    start = data.find(b'^XA')
+                    tilde = data.find(b'~')
+                    if tilde >= 0 and (start < 0 or tilde < start):
+                        available = len(data) - tilde
+                        if available < 3 or (data.startswith(b'~HQ', tilde) and available < 5):
+                            break  # Niepełna komenda - czekaj na kolejne bajty
+                        match = _TILDE_RE.match(data, tilde)
+                        end = match.end() if match else tilde + 1
+                        if match:
+                            response = self._tilde_response(match.group(1))
+                            if response:
+                                writer.write(response)
+                                await writer.drain()
+                        self._discard(end)
+                        data = data[end:]
+                        continue
+                    if start >= 0:
+                        self._discard(start)
+                        data = data[start:]
+                        in_format = True
+                        continue
+                    # Poza formatem pozostają tylko białe znaki; zachowaj możliwy początek ^XA
+                    keep = 2 if data.endswith((b'^', b'^X')) else 0
+                    self._discard(len(data) - keep)
+                    data = data[len(data) - keep:]
+                    break
+
+                if self.read_delay:
+                    await asyncio.sleep(self.read_delay)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logger.debug(f"Emulator drukarki: połączenie {peer} przerwane: {e}")
+        except asyncio.CancelledError:
+            # Zatrzymanie emulatora (stop) przy otwartym połączeniu
+            pass
+        finally:
+            self._clients.discard(task)
+            if data:
+                if in_format:
+                    logger.warning(f"Emulator drukarki: niepełne zadanie od {peer} ({len(data)} B)")
+                self._discard(len(data))
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    def _discard(self, size):
+        if size > 0:
+            self._buffered -= size
+            self._space.set()
+
+    def _new_job(self, zpl, peer, first_byte):
+        self._job_number += 1
+        self._stats['jobs'] += 1
+        formats = max(zpl.count(b'^XA'), 1)
+        quantity = _QUANTITY_RE.search(zpl)
+        length = _LABEL_LENGTH_RE.search(zpl)
+        now = time.time()
+        return {
+            'job': self._job_number,
+            'peer': peer,
+            'zpl': zpl,
+            'bytes': len(zpl),
+            'labels': formats * (int(quantity.group(1)) if quantity else 1),
+            'label_length': int(length.group(1)) if length else self.label_length,
+            'received': now,
+            'receive_ms': round((now - (first_byte or now)) * 1000, 3),
+            'printed': 0,
+        }
+
+    # --- Mechanizm druku -----------------------------------------------------
+
+    async def _print_engine(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            self._printing = job
+            started = None
+            label_seconds = job['label_length'] / self.dpi / self.ips * self.time_scale
+            while job['printed'] < job['labels']:
+                await self._ready.wait()
+                if started is None:
+                    started = time.time()
+                if label_seconds > 0:
+                    await asyncio.sleep(label_seconds)
+                job['printed'] += 1
+                self.label_counter += 1
+                if self.paper_out_after and self.label_counter >= self.paper_out_after:
+                    self.faults['paper_out'] = True
+                    self._notify_ready()
+            finished = time.time()
+            self._printing = None
+            self._stats['busy_ms'] += (finished - started) * 1000
+            self._discard(job['bytes'])
+            await self._record(loop, job, started, finished)
+            self._stats['printed_jobs'] += 1
+
+    async def _record(self, loop, job, started, finished):
+        timing = {
+            'job': job['job'],
+            'peer': job['peer'],
+            'bytes': job['bytes'],
+            'labels': job['labels'],
+            'label_length_in': round(job['label_length'] / self.dpi, 3),
+            'receive_ms': job['receive_ms'],
+            'queued_ms': round((started - job['received']) * 1000, 3),
+            'print_ms': round((finished - started) * 1000, 3),
+            'counter': self.label_counter,
+            'finished': round(finished, 3),
+        }
+        logger.info(f"Emulator drukarki: zadanie {job['job']} ({job['labels']} etyk., "
+                    f"{job['bytes']} B) wydrukowane w {timing['print_ms']} ms")
+        if self.output_dir:
+            await loop.run_in_executor(None, self._write_outputs, job, timing)
+
+    def _write_outputs(self, job, timing):
+        with open(os.path.join(self.output_dir, 'jobs.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(timing) + '\n')
+        if not self.previews:
+            return
+        base = os.path.join(self.output_dir, f"job_{job['job']:06d}")
+        with open(base + '.zpl', 'wb') as f:
+            f.write(job['zpl'])
+        if ZEBRAFY_AVAILABLE:
+            try:
+                images = ZebrafyZPL(job['zpl'].decode('utf-8', 'replace'), dpi=self.dpi).to_images()
+                for page, image in enumerate(images, start=1):
+                    image.save(f"{base}_{page}.png")
+            except Exception as e:
+                logger.debug(f"Emulator drukarki: brak podglądu PNG zadania {job['job']}: {e}")
+
+    # --- Cykl życia ----------------------------------------------------------
+
+    async def start(self):
+        """Uruchamia serwer i mechanizm druku w bieżącej pętli asyncio"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._space = asyncio.Event()
+        self._ready = asyncio.Event()
+        self._notify_ready()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.socket_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, int(self.socket_buffer))
+        sock.bind((self.host, self.port))
+        self._server = await asyncio.start_server(self._handle_client, sock=sock)
+        self.host, self.port = sock.getsockname()[:2]
+        self._engine = asyncio.ensure_future(self._print_engine())
+        logger.info(f"Emulator drukarki {self.model} nasłuchuje na {self.host}:{self.port}")
+
+    async def wait_idle(self, timeout=None, jobs=None, quiet=0.05):
+        """
+        Czeka na wydrukowanie wszystkich przyjętych zadań.
+
+        Parametry:
+        - timeout: Limit czasu w sekundach (None - bez limitu)
+        - jobs: Oczekiwana liczba wydrukowanych zadań (łącznie od startu emulatora);
+          emulator czeka, aż zostaną wydrukowane i zapisane, a bufor będzie pusty
+        - quiet: Używany tylko bez ``jobs`` - czas bez nowych połączeń i danych
+          (liczony najwcześniej od wywołania), po którym emulator uznaje, że nadawca
+          skończył; dane z połączenia już zamkniętego przez klienta mogły nie zostać
+          jeszcze odczytane, więc jest to tylko przybliżenie
+        """
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+
+        def busy():
+            if self.formats_in_buffer or self._buffered > 0:
+                return True
+            if jobs is not None:
+                return self._stats['printed_jobs'] < jobs
+            return time.monotonic() - max(self._last_activity, started) < quiet
+
+        while busy():
+            if deadline is not None and time.monotonic() > deadline:
+                raise asyncio.TimeoutError("Emulator drukarki nie opróżnił bufora")
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        # Zamknięcie otwartych połączeń (również czekających na miejsce w buforze)
+        for task in list(self._clients):
+            task.cancel()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        if self._engine is not None:
+            self._engine.cancel()
+            try:
+                await self._engine
+            except asyncio.CancelledError:
+                pass
+            self._engine = None
+
+
+class EmulatorThread:
+    """
+    Emulator drukarki uruchomiony w osobnym wątku z własną pętlą asyncio
+    (do testów i benchmarków wywołujących synchroniczne funkcje wysyłki).
+    Udostępnia interfejs ConfigManager używany przez print_zpl_to_network_printer.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('port', 0)
+        self.emulator = PrinterEmulator(**kwargs)
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self._error = None
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.emulator.start())
+            except Exception as e:
+                self._error = e
+                started.set()
+                return
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='zpl-printer-emulator', daemon=True)
+        self._thread.start()
+        started.wait()
+        if self._error is not None:
+            raise self._error
+
+    @property
+    def host(self):
+        return self.emulator.host
+
+    @property
+    def port(self):
+        return self.emulator.port
+
+    def get_thermal_printer_ip(self):
+        return self.emulator.host
+
+    def get_thermal_printer_port(self):
+        return self.emulator.port
+
+    def set_fault(self, name, active=True):
+        self.emulator.set_fault(name, active)
+
+    def stats(self):
+        return self._call(lambda: self.emulator.stats())
+
+    def wait_idle(self, timeout=10.0, jobs=None):
+        """Czeka na wydrukowanie wszystkich przyjętych zadań (lub ``jobs`` zadań)"""
+        asyncio.run_coroutine_threadsafe(
+            self.emulator.wait_idle(timeout, jobs=jobs), self._loop).result()
+
+    def _call(self, function):
+        async def call():
+            return function()
+        return asyncio.run_coroutine_threadsafe(call(), self._loop).result()
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.emulator.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+async def _serve(args):
+    emulator = PrinterEmulator(
+        host=args.host, port=args.port, dpi=args.dpi, ips=args.ips,
+        buffer_size=args.buffer, label_length=args.label_length, output_dir=args.output,
+        previews=not args.no_previews, time_scale=args.time_scale, read_delay=args.read_delay,
+        paper_out_after=args.paper_out_after, socket_buffer=args.socket_buffer)
+    for fault in args.fault:
+        emulator.set_fault(fault)
+    await emulator.start()
+    print(f"Emulator drukarki {emulator.model} na {emulator.host}:{emulator.port} (Ctrl+C kończy)")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await emulator.stop()
+        print(json.dumps(emulator.stats(), ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Emulator sieciowej drukarki ZPL (port 9100)')
+    parser.add_argument('--host', default='0.0.0.0', help='Adres nasłuchiwania')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port TCP')
+    parser.add_argument('--dpi', type=int, default=203, help='Rozdzielczość głowicy')
+    parser.add_argument('--ips', type=float, default=6.0, help='Prędkość druku (cale/s)')
+    parser.add_argument('--buffer', type=int, default=512 * 1024,
+                        help='Rozmiar bufora odbiorczego w bajtach')
+    parser.add_argument('--label-length', type=int, default=1218,
+                        help='Domyślna długość etykiety w punktach')
+    parser.add_argument('--output', help='Katalog podglądów i pliku jobs.jsonl')
+    parser.add_argument('--no-previews', action='store_true',
+                        help='Zapisuj tylko czasy zadań, bez podglądów')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help='Mnożnik czasu druku (0 - natychmiast)')
+    parser.add_argument('--fault', action='append', default=[], choices=FAULTS,
+                        help='Awaria aktywna od startu (można powtarzać)')
+    parser.add_argument('--paper-out-after', type=int,
+                        help='Brak papieru po wydrukowaniu N etykiet')
+    parser.add_argument('--read-delay', type=float, default=0.0,
+                        help='Opóźnienie po każdym odczycie z gniazda w sekundach')
+    parser.add_argument('--socket-buffer', type=int, help='Rozmiar SO_RCVBUF w bajtach')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,436 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# zpl/zpl_encoder_pool.py
+
+"""
+Wieloprocesowe kodowanie rastrów do ZPL (^GFA).
+
+Binaryzacja, pakowanie bitów i kodowanie szesnastkowe bitmap są operacjami
+obciążającymi CPU i trzymającymi GIL. Moduł przenosi je do puli procesów
+(concurrent.futures.ProcessPoolExecutor). Rastry stron przekazywane są przez
+multiprocessing.shared_memory zamiast serializowanych bajtów, a procesy
+robocze są "rozgrzewane" przy starcie (kodeki, tablice progowania).
+
+Użycie:
+    pool = get_encoder_pool(workers=4)
+    zpl = pool.pdf_to_zpl(pdf_bytes, dpi=203)
+
+Benchmark:
+    python -m zpl.zpl_encoder_pool --benchmark
+"""
+
+import os
+import sys
+import time
+import atexit
+import codecs
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+
+from lib.tracing import span, current_context, attach_context
+
+logger = logging.getLogger(__name__)
+
+# Tablice progowania (piksel w skali szarości -> znak bitu) współdzielone w procesie
+_threshold_tables = {}
+
+# Pula używana przez funkcje konwersji w całej aplikacji
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def _threshold_table(threshold, invert=False):
+    """
+    Zwraca tablicę translacji bytes.translate dla danego progu.
+    Piksele nie jaśniejsze niż próg stają się bitem '1' (drukowana kropka w ZPL),
+    tak jak przy binaryzacji w zebrafy.
+
+    Parametry:
+    - threshold: Próg binaryzacji (0-255)
+    - invert: Czy odwrócić kolory (drukowane są jasne piksele)
+
+    Zwraca:
+    - Tablica translacji (bytes o długości 256)
+    """
+    key = (threshold, invert)
+    table = _threshold_tables.get(key)
+    if table is None:
+        dark, light = (b'0', b'1') if invert else (b'1', b'0')
+        table = b''.join(dark if value <= threshold else light
+                         for value in range(256))
+        _threshold_tables[key] = table
+    return table
+
+
+def encode_raster(raster, width, height, threshold=128, invert=False):
+    """
+    Koduje raster w skali szarości (1 bajt na piksel) do danych pola ^GFA.
+
+    Parametry:
+    - raster: Bajty rastra (width * height, wiersz po wierszu)
+    - width: Szerokość rastra w pikselach
+    - height: Wysokość rastra w pikselach
+    - threshold: Próg binaryzacji (0-255)
+    - invert: Czy odwrócić kolory
+
+    Zwraca:
+    - Krotka (bytes_per_row, total_bytes, hex_data)
+    """
+    bytes_per_row = (width + 7) // 8
+    total_bytes = bytes_per_row * height
+    if total_bytes == 0:
+        return bytes_per_row, 0, ''
+
+    bits = bytes(raster[:width * height]).translate(
+        _threshold_table(threshold, invert))
+
+    # Dopełnij każdy wiersz do pełnych bajtów (dopełnienie nie jest drukowane)
+    padding = bytes_per_row * 8 - width
+    if padding:
+        pad = b'0' * padding
+        bits = b''.join(bits[offset:offset + width] + pad
+                        for offset in range(0, width * height, width))
+
+    packed = int(bits, 2).to_bytes(total_bytes, 'big')
+    return bytes_per_row, total_bytes, packed.hex().upper()
+
+
+def format_graphic_field(bytes_per_row, total_bytes, hex_data, pos_x=0, pos_y=0):
+    """
+    Buduje pole graficzne ZPL (^FO ... ^GFA ... ^FS).
+
+    Parametry:
+    - bytes_per_row: Liczba bajtów w wierszu
+    - total_bytes: Całkowita liczba bajtów grafiki
+    - hex_data: Dane grafiki w formacie szesnastkowym
+    - pos_x: Pozycja X pola w punktach
+    - pos_y: Pozycja Y pola w punktach
+
+    Zwraca:
+    - Fragment kodu ZPL
+    """
+    return (f"^FO{pos_x},{pos_y}"
+            f"^GFA,{total_bytes},{total_bytes},{bytes_per_row},{hex_data}^FS")
+
+
+def _init_worker():
+    """Rozgrzewa proces roboczy: ładuje kodeki i tablice progowania."""
+    for encoding in ('ascii', 'utf-8', 'latin-1', 'cp850'):
+        codecs.lookup(encoding)
+    _threshold_table(128)
+    # Pierwsze kodowanie ładuje ścieżki int/bytes/hex w interpreterze
+    encode_raster(bytes(64), 8, 8)
+
+
+def _encode_shared(shm_name, width, height, threshold, invert, trace_context=None):
+    """
+    Koduje raster przekazany przez pamięć współdzieloną (uruchamiane w procesie roboczym).
+
+    Parametry:
+    - shm_name: Nazwa segmentu pamięci współdzielonej
+    - width: Szerokość rastra
+    - height: Wysokość rastra
+    - threshold: Próg binaryzacji
+    - invert: Czy odwrócić kolory
+    - trace_context: Kontekst śledzenia zamówienia z procesu głównego (lib.tracing)
+
+    Zwraca:
+    - Krotka (bytes_per_row, total_bytes, hex_data)
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        raster = shm.buf[:width * height].tobytes()
+    finally:
+        shm.close()
+    if trace_context:
+        with attach_context(trace_context), span('zpl.encode_page', width=width, height=height):
+            return encode_raster(raster, width, height, threshold, invert)
+    return encode_raster(raster, width, height, threshold, invert)
+
+
+def rasterize_pdf(pdf_content, dpi=203, width=None, height=None):
+    """
+    Renderuje strony PDF do rastrów w skali szarości.
+    Wymaga bibliotek pypdfium2 i Pillow (zależności zebrafy).
+
+    Rastry powstają tak samo jak w ZebrafyPDF (render w kolorze w rozdzielczości
+    dpi, skalowanie do width/height, konwersja do skali szarości "L"), dzięki
+    czemu kod ZPL z puli jest identyczny z kodem z zebrafy.
+
+    Parametry:
+    - pdf_content: Zawartość pliku PDF (bytes)
+    - dpi: Rozdzielczość renderowania
+    - width: Opcjonalna docelowa szerokość rastra w punktach drukarki
+    - height: Opcjonalna docelowa wysokość rastra w punktach drukarki
+
+    Zwraca:
+    - Lista krotek (raster, width, height)
+    """
+    import pypdfium2 as pdfium
+    from PIL import Image
+
+    pages = []
+    document = pdfium.PdfDocument(pdf_content)
+    try:
+        for page in document:
+            try:
+                image = page.render(scale=dpi / 72.0).to_pil()
+            finally:
+                page.close()
+            # Przezroczyste piksele na białym tle (jak w zebrafy)
+            if image.has_transparency_data:
+                rgba = image.convert("RGBA")
+                image = Image.alpha_composite(Image.new("RGBA", rgba.size, "white"), rgba)
+            if width or height:
+                image = image.resize((width or image.width, height or image.height))
+            image = image.convert("L")
+            pages.append((image.tobytes(), image.width, image.height))
+    finally:
+        document.close()
+
+    return pages
+
+
+class ZplEncoderPool:
+    """
+    Pula procesów kodujących rastry do ZPL.
+    Rastry przekazywane są do procesów roboczych przez pamięć współdzieloną.
+    """
+
+    def __init__(self, workers=None, threshold=128):
+        """
+        Inicjalizuje pulę koderów.
+
+        Parametry:
+        - workers: Liczba procesów roboczych (domyślnie liczba rdzeni)
+        - threshold: Domyślny próg binaryzacji
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold = threshold
+        # Procesy robocze muszą dziedziczyć tracker zasobów procesu głównego,
+        # inaczej każdy z nich uzna segmenty pamięci współdzielonej za wycieki
+        resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker)
+        logger.info(
+            f"Uruchomiono pulę koderów ZPL z {self.workers} procesami")
+
+    def warm_up(self):
+        """Wymusza uruchomienie wszystkich procesów roboczych."""
+        futures = [self._executor.submit(encode_raster, bytes(64), 8, 8)
+                   for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def encode_pages(self, pages, threshold=None, invert=False):
+        """
+        Koduje listę rastrów równolegle.
+
+        Parametry:
+        - pages: Lista krotek (raster, width, height)
+        - threshold: Próg binaryzacji (domyślnie próg puli)
+        - invert: Czy odwrócić kolory
+
+        Zwraca:
+        - Lista krotek (bytes_per_row, total_bytes, hex_data) w kolejności stron
+        """
+        threshold = self.threshold if threshold is None else threshold
+        trace_context = current_context()
+        segments = []
+        futures = []
+        try:
+            for raster, width, height in pages:
+                size = max(width * height, 1)
+                shm = shared_memory.SharedMemory(create=True, size=size)
+                segments.append(shm)
+                shm.buf[:width * height] = raster[:width * height]
+                futures.append(self._executor.submit(
+                    _encode_shared, shm.name, width, height, threshold, invert, trace_context))
+            return [future.result() for future in futures]
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+
+    def pages_to_zpl(self, pages, pos_x=0, pos_y=0, split_pages=False, threshold=None,
+                     invert=False):
+        """
+        Koduje rastry i składa kompletny kod ZPL.
+
+        Parametry:
+        - pages: Lista krotek (raster, width, height)
+        - pos_x: Pozycja X grafiki
+        - pos_y: Pozycja Y grafiki
+        - split_pages: Czy każda strona ma być osobną etykietą
+        - threshold: Próg binaryzacji
+        - invert: Czy odwrócić kolory
+
+        Zwraca:
+        - Kod ZPL
+        """
+        encoded = self.encode_pages(pages, threshold, invert)
+
+        # Układ etykiety jak w ZebrafyPDF (complete_zpl=True): każde pole w osobnej linii
+        if split_pages:
+            return "".join(
+                "^XA\n" + format_graphic_field(*fields, pos_x=pos_x, pos_y=pos_y) + "\n^XZ\n"
+                for fields in encoded)
+
+        # Strony jedna pod drugą w jednej etykiecie
+        zpl_parts = ["^XA\n"]
+        offset_y = pos_y
+        for (raster, width, height), fields in zip(pages, encoded):
+            zpl_parts.append(format_graphic_field(
+                *fields, pos_x=pos_x, pos_y=offset_y) + "\n")
+            offset_y += height
+        zpl_parts.append("^XZ\n")
+        return "".join(zpl_parts)
+
+    def pdf_to_zpl(self, pdf_content, dpi=203, pos_x=0, pos_y=0, split_pages=False,
+                   threshold=None, width=None, height=None, invert=False):
+        """
+        Konwertuje PDF do ZPL: renderuje strony i koduje je w puli procesów.
+
+        Parametry:
+        - pdf_content: Zawartość pliku PDF (bytes)
+        - dpi: Rozdzielczość drukarki
+        - pos_x: Pozycja X grafiki
+        - pos_y: Pozycja Y grafiki
+        - split_pages: Czy każda strona ma być osobną etykietą
+        - threshold: Próg binaryzacji
+        - width: Opcjonalna docelowa szerokość grafiki w punktach
+        - height: Opcjonalna docelowa wysokość grafiki w punktach
+        - invert: Czy odwrócić kolory
+
+        Zwraca:
+        - Kod ZPL
+        """
+        with span('zpl.rasterize'):
+            pages = rasterize_pdf(pdf_content, dpi=dpi, width=width, height=height)
+        return self.pages_to_zpl(pages, pos_x=pos_x, pos_y=pos_y, split_pages=split_pages,
+                                 threshold=threshold, invert=invert)
+
+    def close(self):
+        """Zamyka pulę procesów."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_encoder_pool(workers=None):
+    """
+    Zwraca współdzieloną pulę koderów ZPL (tworzoną przy pierwszym użyciu).
+
+    Parametry:
+    - workers: Liczba procesów; 0 lub wartość ujemna wyłącza pulę
+
+    Zwraca:
+    - Obiekt ZplEncoderPool lub None, jeśli pula jest wyłączona
+    """
+    global _default_pool
+
+    if workers is not None and workers <= 0:
+        return None
+
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ZplEncoderPool(workers=workers)
+            atexit.register(shutdown_encoder_pool)
+        return _default_pool
+
+
+def shutdown_encoder_pool():
+    """Zamyka współdzieloną pulę koderów, jeśli była utworzona."""
+    global _default_pool
+
+    with _default_pool_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+            _default_pool = None
+
+
+def _synthetic_page(width, height, seed):
+    """Tworzy syntetyczny raster strony z poziomymi pasami tekstu."""
+    row_patterns = []
+    for pattern in range(16):
+        row = bytearray(width)
+        for x in range(width):
+            row[x] = 0 if ((x * 7 + pattern * 13 + seed) % 23) < 9 else 255
+        row_patterns.append(bytes(row))
+    blank = bytes([255]) * width
+    return b''.join(row_patterns[y % 16] if (y // 24) % 3 else blank
+                    for y in range(height))
+
+
+def benchmark(worker_counts=(1, 2, 4), pages=16, width=832, height=2400, rounds=3):
+    """
+    Mierzy przepustowość kodowania w zależności od liczby procesów.
+
+    Parametry:
+    - worker_counts: Liczby procesów do porównania
+    - pages: Liczba stron w jednej partii
+    - width: Szerokość strony w punktach (832 = 104 mm przy 203 DPI)
+    - height: Wysokość strony w punktach
+    - rounds: Liczba powtórzeń pomiaru
+
+    Zwraca:
+    - Lista słowników z wynikami dla każdej liczby procesów
+    """
+    batch = [(_synthetic_page(width, height, seed), width, height)
+             for seed in range(pages)]
+    results = []
+    baseline = None
+
+    for workers in worker_counts:
+        with ZplEncoderPool(workers=workers) as pool:
+            pool.warm_up()
+            best = None
+            for _ in range(rounds):
+                start = time.perf_counter()
+                pool.encode_pages(batch)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+        pages_per_second = pages / best
+        if baseline is None:
+            baseline = pages_per_second
+        results.append({
+            'workers': workers,
+            'seconds': round(best, 4),
+            'pages_per_second': round(pages_per_second, 2),
+            'speedup': round(pages_per_second / baseline, 2)
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pula koderów ZPL - benchmark przepustowości')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Uruchom benchmark kodowania')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4], help='Liczby procesów do porównania')
+    parser.add_argument('--pages', type=int, default=16,
+                        help='Liczba stron w partii')
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        return 1
+
+    for result in benchmark(worker_counts=args.workers, pages=args.pages):
+        print(f"procesy={result['workers']:>2}  czas={result['seconds']:.3f}s  "
+              f"strony/s={result['pages_per_second']:>8.2f}  przyspieszenie={result['speedup']:.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())